@@ -28,17 +28,23 @@ from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
 from core.csrf import CSRFMiddleware
 from core.errors import rate_limit_handler
+from core.instrumentacao import MetricasMiddleware
 from core.limiter import limiter
 from core.security_headers import SecurityHeadersMiddleware
 from infra import migrations as _migrations
 from infra.aws_clientes import rekognition_client, s3_client
 from infra.database import close_pool
+from infra.database_async import fechar_pool_async
+from infra.escuta_pg import escuta as _escuta_pg
+from repositories.camera_tokens import gravar_usos_pendentes
 from services.agendador import iniciar_agendador
+from services.fila_jobs import EM_PROCESSO as _JOBS_EM_PROCESSO, iniciar_consumidor
 from routers import (
     admin,
     alunos,
     auth,
     chamadas,
+    interno,
     notificacoes,
     professores,
     public,
@@ -97,6 +103,7 @@ def _check_aws_connectivity():
 
 
 _agendador_task: asyncio.Task | None = None
+_jobs_task: asyncio.Task | None = None
 
 
 @asynccontextmanager
@@ -111,15 +118,25 @@ async def lifespan(_app: FastAPI):
     Migrations concorrentes dos 4 workers do gunicorn já são cobertas por
     advisory lock dentro de `run_all` (infra/migrations.py).
     """
-    global _agendador_task
+    global _agendador_task, _jobs_task
     _migrations.run_all()
+    _escuta_pg.iniciar()
     _agendador_task = asyncio.create_task(iniciar_agendador())
+    # JOBS_EM_PROCESSO=0 quando o consumidor roda à parte (ops/jobs/).
+    if _JOBS_EM_PROCESSO:
+        _jobs_task = asyncio.create_task(iniciar_consumidor())
     _check_aws_connectivity()
     try:
         yield
     finally:
         if _agendador_task:
             _agendador_task.cancel()
+        if _jobs_task:
+            _jobs_task.cancel()
+        _escuta_pg.parar()
+        # Último uso dos tokens da câmera ainda só na memória deste worker.
+        gravar_usos_pendentes()
+        fechar_pool_async()
         close_pool()
 
 
@@ -165,6 +182,9 @@ app.add_middleware(
 
 app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=["127.0.0.1"])
 app.add_middleware(SecurityHeadersMiddleware)
+# Mais externo de todos: a latência medida inclui CORS/CSRF/headers, e a
+# resposta que qualquer um deles devolve sozinho (403 do CSRF) também conta.
+app.add_middleware(MetricasMiddleware)
 
 
 app.include_router(public.router)
@@ -176,3 +196,4 @@ app.include_router(professores.router)
 app.include_router(turmas.router)
 app.include_router(chamadas.router)
 app.include_router(relatorios.router)
+app.include_router(interno.router)
@@ -47,4 +47,18 @@ if not SCPI_EXPORT_HMAC_KEY:
 # ---------------------------------------------------------------------------
 POLITICA_PRIVACIDADE_VERSAO = "1.0"
 POLITICA_PRIVACIDADE_VIGENCIA = "2026-07-30"
-SCPI_PRIVACY_URL = os.getenv("SCPI_PRIVACY_URL", "")
\ No newline at end of file
+SCPI_PRIVACY_URL = os.getenv("SCPI_PRIVACY_URL", "")
+# ---------------------------------------------------------------------------
+# Endpoints internos (/interno/*, métricas) — só de dentro da rede.
+# Lista de redes CIDR separadas por vírgula, comparada com o IP do cliente já
+# resolvido pelo ProxyHeadersMiddleware (X-Forwarded-For do nginx).
+# Default: loopback + faixas privadas (scraper na mesma VPC/compose).
+# ---------------------------------------------------------------------------
+METRICAS_IPS_PERMITIDOS = [
+    rede.strip()
+    for rede in (
+        os.getenv("METRICAS_IPS_PERMITIDOS")
+        or "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"
+    ).split(",")
+    if rede.strip()
+]
@@ -0,0 +1,44 @@
+"""Dependências FastAPI do escopo de conexão por requisição.
+
+Um endpoint que chama 3–5 repositórios tirava e devolvia uma conexão do pool
+a cada chamada. Com uma destas dependências, todas as chamadas da requisição
+usam uma conexão só (infra/database.escopo_conexao):
+
+    @router.get("/status/{turma_id}", dependencies=[RETRATO_UNICO])
+
+CONEXAO_UNICA — leitura e escrita; cada `get_db_cursor(commit=True)` continua
+                confirmando no fim do próprio `with`.
+RETRATO_UNICO — somente leitura, REPEATABLE READ: todas as consultas veem o
+                mesmo retrato do banco.
+
+Assíncronas de propósito: dependência síncrona roda numa cópia do contexto
+dentro do threadpool, e o ContextVar ajustado lá não chegaria ao endpoint.
+`scope="function"` devolve a conexão antes de a resposta sair — e antes das
+BackgroundTasks, que voltam a usar o pool normalmente. Não use em endpoints
+de streaming: a conexão ficaria presa pela duração do stream.
+"""
+from fastapi import Depends
+from starlette.concurrency import run_in_threadpool
+
+from infra.database import escopo_conexao
+
+
+async def uma_conexao():
+    with escopo_conexao() as escopo:
+        try:
+            yield
+        finally:
+            # O ROLLBACK final é ida ao banco: fora do event loop.
+            await run_in_threadpool(escopo.encerrar)
+
+
+async def uma_conexao_leitura():
+    with escopo_conexao(somente_leitura=True) as escopo:
+        try:
+            yield
+        finally:
+            await run_in_threadpool(escopo.encerrar)
+
+
+CONEXAO_UNICA = Depends(uma_conexao, scope="function")
+RETRATO_UNICO = Depends(uma_conexao_leitura, scope="function")
@@ -0,0 +1,67 @@
+"""Middleware que alimenta as métricas HTTP (infra/metricas.py).
+
+ASGI puro, e não BaseHTTPMiddleware: a latência para no `http.response.start`
+— para o stream SSE da chamada e os downloads de PDF, é o tempo até o
+primeiro byte, não a duração da conexão inteira.
+
+A rota é lida do scope depois do roteamento (`scope["route"]`, posto pelo
+Starlette), então sai o template registrado, não o caminho com ids.
+"""
+import time
+
+import anyio.to_thread
+
+from infra import metricas
+
+_SEM_ROTA = "sem_rota"
+
+
+def _rota(scope) -> str:
+    rota = scope.get("route")
+    return getattr(rota, "path", None) or _SEM_ROTA
+
+
+def _amostrar_threadpool() -> None:
+    try:
+        limitador = anyio.to_thread.current_default_thread_limiter()
+        estatisticas = limitador.statistics()
+    except Exception:
+        return
+    metricas.observar_threadpool(
+        estatisticas.borrowed_tokens, estatisticas.tasks_waiting, int(estatisticas.total_tokens)
+    )
+
+
+class MetricasMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Amostra na chegada: é quando a fila do threadpool importa. Cada
+        # worker atualiza a sua a cada requisição; o /metrics soma os vivos.
+        _amostrar_threadpool()
+        inicio = time.perf_counter()
+        registrado = False
+
+        def registrar(status: int) -> None:
+            nonlocal registrado
+            registrado = True
+            metodo, rota = scope["method"], _rota(scope)
+            metricas.HTTP_LATENCIA.labels(metodo, rota).observe(time.perf_counter() - inicio)
+            metricas.HTTP_RESPOSTAS.labels(metodo, rota, str(status)).inc()
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start" and not registrado:
+                registrar(mensagem["status"])
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        except BaseException:
+            if not registrado:
+                registrar(500)
+            raise
@@ -1,13 +1,21 @@
+import os
+
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-# Import com efeito colateral: registra o scheme "scpi-postgres://" no `limits`.
+# Import com efeito colateral: registra os schemes "scpi-hibrido://" e
+# "scpi-postgres://" no `limits`.
 import core.limiter_storage  # noqa: F401
 
-# Storage compartilhado em Postgres (M4). swallow_errors: backstop de fail-open —
-# erro no storage não pode bloquear o request.
+# Storage compartilhado em Postgres (M4), com o contador da janela na memória
+# do worker e descarregamento em lote (HibridaStorage). RATE_LIMIT_STORAGE=postgres
+# volta a uma escrita por request. swallow_errors: backstop de fail-open — erro
+# no storage não pode bloquear o request.
+_SO_POSTGRES = os.getenv("RATE_LIMIT_STORAGE", "").strip().lower() == "postgres"
+_STORAGE = "scpi-postgres://" if _SO_POSTGRES else "scpi-hibrido://"
+
 limiter = Limiter(
     key_func=get_remote_address,
-    storage_uri="scpi-postgres://",
+    storage_uri=_STORAGE,
     swallow_errors=True,
 )
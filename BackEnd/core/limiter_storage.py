@@ -1,12 +1,28 @@
 import logging
+import os
+import threading
 import time
 
 from limits.storage import Storage
 
-from infra.database import get_db_cursor
+from infra.database import _env_int, get_db_cursor
 
 logger = logging.getLogger("scpi.limiter")
 
+_SQL_INCR = """
+    INSERT INTO rate_limit_buckets (key, count, expires_at)
+    VALUES (%s, %s, now() + make_interval(secs => %s))
+    ON CONFLICT (key) DO UPDATE SET
+        count = CASE
+            WHEN rate_limit_buckets.expires_at < now() THEN %s
+            ELSE rate_limit_buckets.count + %s END,
+        expires_at = CASE
+            WHEN rate_limit_buckets.expires_at < now()
+                THEN now() + make_interval(secs => %s)
+            ELSE rate_limit_buckets.expires_at END
+    RETURNING count
+"""
+
 
 class PostgresStorage(Storage):
     """Storage fixed-window do slowapi/limits em Postgres, compartilhado entre workers.
@@ -30,24 +46,12 @@ class PostgresStorage(Storage):
         return Exception
 
     def incr(self, key, expiry, amount=1):
-        with get_db_cursor(commit=True) as cur:
+        with get_db_cursor(commit=True, preparar=True) as cur:
             if not cur:
                 return amount  # fail-open: início de janela
             try:
                 cur.execute(
-                    """
-                    INSERT INTO rate_limit_buckets (key, count, expires_at)
-                    VALUES (%s, %s, now() + make_interval(secs => %s))
-                    ON CONFLICT (key) DO UPDATE SET
-                        count = CASE
-                            WHEN rate_limit_buckets.expires_at < now() THEN %s
-                            ELSE rate_limit_buckets.count + %s END,
-                        expires_at = CASE
-                            WHEN rate_limit_buckets.expires_at < now()
-                                THEN now() + make_interval(secs => %s)
-                            ELSE rate_limit_buckets.expires_at END
-                    RETURNING count
-                    """,
+                    _SQL_INCR,
                     (key, amount, expiry, amount, amount, expiry),
                 )
                 row = cur.fetchone()
@@ -57,7 +61,7 @@ class PostgresStorage(Storage):
         return int(row["count"]) if row else amount
 
     def get(self, key):
-        with get_db_cursor() as cur:
+        with get_db_cursor(preparar=True) as cur:
             if not cur:
                 return 0
             try:
@@ -73,7 +77,7 @@ class PostgresStorage(Storage):
         return int(row["count"]) if row else 0
 
     def get_expiry(self, key):
-        with get_db_cursor() as cur:
+        with get_db_cursor(preparar=True) as cur:
             if not cur:
                 return time.time()
             try:
@@ -113,6 +117,170 @@ class PostgresStorage(Storage):
             cur.execute("DELETE FROM rate_limit_buckets WHERE key=%s", (key,))
 
 
+# Um comando para o lote inteiro: mesma regra de janela do _SQL_INCR, linha a
+# linha. As chaves vão ordenadas — dois workers descarregando ao mesmo tempo
+# travam as linhas na mesma ordem e não entram em deadlock.
+_SQL_INCR_LOTE = """
+    INSERT INTO rate_limit_buckets (key, count, expires_at)
+    SELECT chave, n, now() + make_interval(secs => expira_s)
+      FROM unnest(%s::text[], %s::int[], %s::int[]) AS lote(chave, n, expira_s)
+    ON CONFLICT (key) DO UPDATE SET
+        count = CASE
+            WHEN rate_limit_buckets.expires_at < now() THEN EXCLUDED.count
+            ELSE rate_limit_buckets.count + EXCLUDED.count END,
+        expires_at = CASE
+            WHEN rate_limit_buckets.expires_at < now() THEN EXCLUDED.expires_at
+            ELSE rate_limit_buckets.expires_at END
+    RETURNING key, count, EXTRACT(EPOCH FROM expires_at) AS exp
+"""
+
+
+class _JanelaLocal:
+    __slots__ = ("expira_em", "expira_s", "base", "em_voo", "pendente")
+
+    def __init__(self, expira_s: int, agora: float):
+        self.expira_s = expira_s
+        self.expira_em = agora + expira_s
+        self.base = 0       # total de todos os workers no último descarregamento
+        self.em_voo = 0     # incrementos deste worker no descarregamento em curso
+        self.pendente = 0   # incrementos deste worker ainda não enviados
+
+    @property
+    def total(self) -> int:
+        return self.base + self.em_voo + self.pendente
+
+
+class HibridaStorage(PostgresStorage):
+    """Contador na memória do worker, somado ao Postgres em lote.
+
+    O PostgresStorage faz um INSERT ... ON CONFLICT com commit por request
+    limitado (login, /health, cadastro de rosto), disputando o pool com a
+    aplicação. Aqui o `incr` só soma na memória e responde com o total
+    compartilhado mais recente que este worker conhece + o que ele somou desde
+    então. Uma thread por worker descarrega os incrementos a cada
+    RATE_LIMIT_FLUSH_MS (default 250) num comando só e traz de volta o total
+    de todos os workers e a expiração da janela no banco.
+
+    Admissão a mais é limitada: cada worker só não enxerga os incrementos dos
+    outros feitos desde o último descarregamento deles — com 4 workers, no
+    pior caso 3 × (requests da mesma chave num intervalo de flush), e nunca
+    mais que o limite por worker na primeira fração de uma janela nova.
+
+    Fail-open como o PostgresStorage: banco fora, o incremento volta a ficar
+    pendente e o worker segue decidindo pelo que tem na memória.
+    """
+
+    STORAGE_SCHEME = ["scpi-hibrido"]
+
+    def __init__(self, uri=None, intervalo_s=None, descarregar_em_segundo_plano=True, **options):
+        super().__init__(uri, **options)
+        self._intervalo_s = (
+            intervalo_s if intervalo_s is not None else _env_int("RATE_LIMIT_FLUSH_MS", 250) / 1000
+        )
+        self._em_segundo_plano = descarregar_em_segundo_plano
+        self._janelas: dict[str, _JanelaLocal] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+
+    def incr(self, key, expiry, amount=1):
+        self._garantir_thread()
+        agora = time.time()
+        with self._lock:
+            janela = self._janelas.get(key)
+            if janela is None or janela.expira_em <= agora:
+                janela = self._janelas[key] = _JanelaLocal(int(expiry), agora)
+            janela.pendente += amount
+            return janela.total
+
+    def get(self, key):
+        with self._lock:
+            janela = self._janelas.get(key)
+            if janela is not None and janela.expira_em > time.time():
+                return janela.total
+        return super().get(key)
+
+    def get_expiry(self, key):
+        with self._lock:
+            janela = self._janelas.get(key)
+            if janela is not None and janela.expira_em > time.time():
+                return janela.expira_em
+        return super().get_expiry(key)
+
+    def reset(self):
+        with self._lock:
+            self._janelas.clear()
+        return super().reset()
+
+    def clear(self, key):
+        with self._lock:
+            self._janelas.pop(key, None)
+        super().clear(key)
+
+    def descarregar(self) -> int:
+        """Envia os incrementos pendentes num comando só; devolve quantas
+        chaves foram. Chamado pela thread do worker (e pelos testes)."""
+        agora = time.time()
+        lote = {}
+        with self._lock:
+            for chave, janela in list(self._janelas.items()):
+                if janela.expira_em <= agora:
+                    # Janela acabou: o que não foi enviado não conta para a próxima.
+                    del self._janelas[chave]
+                elif janela.pendente:
+                    janela.em_voo, janela.pendente = janela.pendente, 0
+                    lote[chave] = janela
+        if not lote:
+            return 0
+
+        chaves = sorted(lote)
+        try:
+            with get_db_cursor(commit=True, preparar=True) as cur:
+                if not cur:
+                    raise RuntimeError("banco indisponível")
+                cur.execute(
+                    _SQL_INCR_LOTE,
+                    (chaves, [lote[c].em_voo for c in chaves], [lote[c].expira_s for c in chaves]),
+                )
+                linhas = cur.fetchall()
+        except Exception as e:
+            logger.warning("limiter descarregar fail-open (%d chaves): %s", len(chaves), e)
+            with self._lock:
+                for janela in lote.values():
+                    janela.pendente += janela.em_voo
+                    janela.em_voo = 0
+            return 0
+
+        with self._lock:
+            for linha in linhas:
+                janela = lote[linha["key"]]
+                janela.base = int(linha["count"])
+                janela.expira_em = float(linha["exp"])
+                janela.em_voo = 0
+        return len(chaves)
+
+    def _garantir_thread(self) -> None:
+        # Pelo pid: processo filho (fork) não herda a thread do pai.
+        if not self._em_segundo_plano or self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._laco, name="scpi-rate-limit-flush", daemon=True
+            )
+            self._thread.start()
+
+    def _laco(self) -> None:
+        while True:
+            time.sleep(self._intervalo_s)
+            try:
+                self.descarregar()
+            except Exception as e:
+                logger.warning("limiter: erro inesperado ao descarregar: %s", e)
+
+
 def purgar_rate_limit_buckets():
     """Remove janelas expiradas. Chamado no ciclo diário do agendador."""
     with get_db_cursor(commit=True) as cur:
@@ -1,11 +1,13 @@
+import ipaddress
 import logging
 
 from fastapi import Cookie, Depends, Header, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 
 from core.auth_utils import ACCESS_COOKIE_NAME, decode_access_token
+from core.config import METRICAS_IPS_PERMITIDOS
 from infra.database import DB_INDISPONIVEL
-from repositories.camera_tokens import buscar_sala_por_token
+from repositories.camera_tokens import buscar_sala_por_token, buscar_sala_por_token_async
 
 logger = logging.getLogger("scpi.security")
 audit_logger = logging.getLogger("scpi.audit")
@@ -92,7 +94,16 @@ def require_service_token(request: Request, x_service_token: str = Header(...))
     tentaria aquele aluno nesta chamada — um blip de banco não pode ter o
     mesmo efeito que um token revogado.
     """
-    sala = buscar_sala_por_token(x_service_token)
+    return _sala_ou_recusa(request, buscar_sala_por_token(x_service_token))
+
+
+async def require_service_token_async(request: Request, x_service_token: str = Header(...)) -> str:
+    """`require_service_token` pelo event loop, sem passar pelo threadpool
+    (DB_ASYNC=1, infra/database_async.py). Mesmas respostas."""
+    return _sala_ou_recusa(request, await buscar_sala_por_token_async(x_service_token))
+
+
+def _sala_ou_recusa(request: Request, sala) -> str:
     if sala is DB_INDISPONIVEL:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -106,6 +117,37 @@ def require_service_token(request: Request, x_service_token: str = Header(...))
     return sala
 
 
+def _redes(cidrs: list[str]) -> list:
+    redes = []
+    for cidr in cidrs:
+        try:
+            redes.append(ipaddress.ip_network(cidr, strict=False))
+        except ValueError:
+            logger.warning("METRICAS_IPS_PERMITIDOS: rede inválida ignorada: %r", cidr)
+    return redes
+
+
+_REDES_INTERNAS = _redes(METRICAS_IPS_PERMITIDOS)
+
+
+def require_ip_interno(request: Request) -> None:
+    """Libera só clientes de dentro da rede (METRICAS_IPS_PERMITIDOS).
+
+    Para endpoints operacionais sem usuário (pool, métricas): quem consulta é
+    scraper/operador, não o app. Fora da lista responde 404 — o endpoint não
+    se anuncia para a internet.
+    """
+    try:
+        ip = ipaddress.ip_address(_ip(request))
+    except ValueError:
+        ip = None
+    if ip is None or not any(ip in rede for rede in _REDES_INTERNAS):
+        audit_logger.warning(
+            "Acesso a endpoint interno recusado rota=%s ip=%s", request.url.path, _ip(request)
+        )
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
 def require_self_or_admin(usuario_id: str, current_user: dict) -> None:
     """Garante que o usuário autenticado é o dono do recurso ou um Admin.
 
@@ -0,0 +1,33 @@
+"""Ganchos do gunicorn para as métricas multiprocesso (infra/metricas.py).
+
+O gunicorn carrega ./gunicorn.conf.py sozinho: o comando do systemd
+(`gunicorn -w 4 -k uvicorn_worker.UvicornWorker api:app`, rodando em BackEnd/)
+não muda. Só configura os ganchos; workers, bind e o resto seguem na linha de
+comando.
+
+Com PROMETHEUS_MULTIPROC_DIR definido:
+  - no start do master, o diretório é esvaziado: arquivo de um processo
+    anterior somaria contadores de outra execução;
+  - quando um worker morre, o prometheus_client tira os gauges "livesum"
+    dele da conta (contadores e histogramas ficam: já aconteceram).
+"""
+import os
+import pathlib
+
+
+def on_starting(server):
+    diretorio = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not diretorio:
+        return
+    caminho = pathlib.Path(diretorio)
+    caminho.mkdir(parents=True, exist_ok=True)
+    for arquivo in caminho.glob("*.db"):
+        arquivo.unlink()
+
+
+def child_exit(server, worker):
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
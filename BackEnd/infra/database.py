@@ -1,22 +1,27 @@
 # database.py
+import contextvars
 import os
+import time
 import uuid
 import threading
+import weakref
 
 try:
     import psycopg2
+    import psycopg2.errors
     from psycopg2.extras import RealDictCursor
-    from psycopg2 import pool as _pgpool
     _IS_PSYCOPG2 = True
 except ImportError:
     import pg8000.dbapi as psycopg2  # type: ignore
-    _pgpool = None
     _IS_PSYCOPG2 = False
 
 from contextlib import contextmanager
 from dotenv import load_dotenv, find_dotenv
 import logging
 
+from infra import metricas, rastreio_consultas, sql_preparado
+from infra.pool_conexoes import PoolConexoes
+
 load_dotenv(find_dotenv())
 
 logger = logging.getLogger(__name__)
@@ -84,18 +89,31 @@ def _ensure_pool():
             minconn, maxconn = 1, 10
 
         try:
-            _pool = _pgpool.ThreadedConnectionPool(
-                minconn,
-                maxconn,
-                dsn=_build_database_url(),
-                options="-c timezone=America/Sao_Paulo",
-                connect_timeout=_env_int("DB_CONNECT_TIMEOUT", 3),
-            )
-            logger.info("Pool de conexão criado (min=%s, max=%s)", minconn, maxconn)
+            dsn = _build_database_url()
         except Exception as e:
             logger.error("Falha ao criar pool de conexão: %s", e)
-            _pool = None
+            return None
+
+        connect_timeout = _env_int("DB_CONNECT_TIMEOUT", 3)
 
+        def _conectar():
+            return psycopg2.connect(
+                dsn,
+                options="-c timezone=America/Sao_Paulo",
+                connect_timeout=connect_timeout,
+            )
+
+        pool = PoolConexoes(
+            _conectar,
+            minimo=minconn,
+            maximo=maxconn,
+            espera_s=_env_int("DB_POOL_TIMEOUT_S", 3),
+            idade_max_s=_env_int("DB_POOL_IDADE_MAX_S", 1800),
+            validar_apos_s=_env_int("DB_POOL_VALIDAR_APOS_S", 30),
+        )
+        pool.aquecer()
+        _pool = pool
+        logger.info("Pool de conexão criado (min=%s, max=%s)", minconn, maxconn)
         return _pool
 
 
@@ -112,6 +130,14 @@ def close_pool():
             _pool = None
 
 
+def estatisticas_pool() -> dict:
+    """Retrato do pool síncrono deste worker (GET /interno/pool)."""
+    pool = _pool
+    dados = {"ativo": True, **pool.estatisticas()} if pool is not None else {"ativo": False}
+    dados["pid"] = os.getpid()
+    return dados
+
+
 def get_db_connection():
     """Retorna uma conexão do pool, ou crua se pool indisponível.
 
@@ -184,59 +210,298 @@ class _DBIndisponivel:
 DB_INDISPONIVEL = _DBIndisponivel()
 
 
+class _DictCursorWrapper:
+    """pg8000 devolve tuplas: imita o RealDictCursor do psycopg2."""
+
+    def __init__(self, cur):
+        self.cur = cur
+
+    def execute(self, *args, **kwargs):
+        self.cur.execute(*args, **kwargs)
+        return self
+
+    def fetchone(self):
+        row = self.cur.fetchone()
+        if row is None:
+            return None
+        return self._to_dict(row)
+
+    def fetchall(self):
+        rows = self.cur.fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def _to_dict(self, row):
+        if not getattr(self.cur, "description", None):
+            return row
+        cols = [desc[0] for desc in self.cur.description]
+        return {cols[i]: (str(val) if isinstance(val, uuid.UUID) else val) for i, val in enumerate(row)}
+
+    @property
+    def rowcount(self):
+        return getattr(self.cur, "rowcount", -1)
+
+    def close(self):
+        self.cur.close()
+
+
+def _novo_cursor(conn):
+    if _IS_PSYCOPG2:
+        return conn.cursor(cursor_factory=RealDictCursor)
+    return _DictCursorWrapper(conn.cursor())
+
+
+def _com_preparo(cursor, conn, preparar: bool):
+    if preparar and _IS_PSYCOPG2 and sql_preparado.ligado():
+        cursor = _CursorPreparado(cursor, conn)
+    return _CursorMedido(cursor, conn)
+
+
+class _CursorMedido:
+    """Cursor entregue pelo `get_db_cursor`: cada `execute` vira uma amostra
+    de scpi_db_consulta_segundos com a função do repositório que o chamou
+    (infra/metricas.py) e, com DB_TRACE=1, passa pelo rastreio de consultas
+    (infra/rastreio_consultas.py). O resto é o cursor de baixo."""
+
+    def __init__(self, cursor, conn):
+        self._cursor = cursor
+        self._conn = conn
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def execute(self, sql, params=None):
+        return self._medir(self._cursor.execute, sql, params, explicavel=True)
+
+    def executemany(self, sql, params_seq):
+        return self._medir(self._cursor.executemany, sql, params_seq, explicavel=False)
+
+    def _medir(self, executar, sql, params, explicavel):
+        funcao = metricas.funcao_chamadora(2)
+        inicio = time.perf_counter()
+        try:
+            retorno = executar(sql, params)
+        finally:
+            duracao = time.perf_counter() - inicio
+            metricas.observar_consulta(funcao, duracao)
+        if rastreio_consultas.ligado():
+            rastreio_consultas.registrar(
+                sql, params if explicavel else None, funcao, duracao,
+                getattr(self._cursor, "rowcount", -1),
+                self._conn if explicavel and _IS_PSYCOPG2 else None,
+            )
+        return retorno
+
+
+# Statements preparados por conexão do pool: {sql: (nome, chaves) | None}.
+# Fraco: conexão fechada pelo pool leva o cache junto.
+_preparadas_por_conexao: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_preparadas_lock = threading.Lock()
+
+
+class _CursorPreparado:
+    """Cursor de `get_db_cursor(preparar=True)`: cada `execute` vira PREPARE
+    na primeira vez que a conexão vê aquele texto e EXECUTE daí em diante
+    (infra/sql_preparado.py). O resto do cursor é o RealDictCursor de sempre.
+
+    O PREPARE roda num SAVEPOINT: consulta que o Postgres não consegue
+    preparar (tipo de parâmetro que ele só infere com o valor) não aborta a
+    transação do repositório — fica marcada e segue pelo texto.
+    """
+
+    def __init__(self, cursor, conn):
+        self._cursor = cursor
+        with _preparadas_lock:
+            self._preparadas = _preparadas_por_conexao.setdefault(conn, {})
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def execute(self, sql, params=None):
+        preparada = self._preparar(sql)
+        if preparada is None:
+            return self._cursor.execute(sql, params)
+        nome, chaves = preparada
+        sql_execute, valores = sql_preparado.comando_execute(nome, chaves, params)
+        try:
+            return self._cursor.execute(sql_execute, valores)
+        except psycopg2.errors.FeatureNotSupported:
+            # "cached plan must not change result type": o schema mudou por
+            # baixo do plano. O próximo uso prepara de novo.
+            self._preparadas.pop(sql, None)
+            raise
+
+    def _preparar(self, sql):
+        if sql in self._preparadas:
+            return self._preparadas[sql]
+        if not sql_preparado.preparavel(sql):
+            self._preparadas[sql] = None
+            return None
+        nome = sql_preparado.nome_da_consulta(sql)
+        try:
+            texto, chaves = sql_preparado.converter(sql)
+        except ValueError as e:
+            logger.warning("Consulta não preparável (%s): %s", nome, e)
+            self._preparadas[sql] = None
+            return None
+        cursor = self._cursor
+        cursor.execute("SAVEPOINT scpi_preparar")
+        try:
+            try:
+                cursor.execute(f"PREPARE {nome} AS {texto}")
+            except psycopg2.errors.DuplicatePreparedStatement:
+                # Plano invalidado antes (ver `execute`): troca pelo novo.
+                cursor.execute("ROLLBACK TO SAVEPOINT scpi_preparar")
+                cursor.execute(f"DEALLOCATE {nome}")
+                cursor.execute(f"PREPARE {nome} AS {texto}")
+        except psycopg2.ProgrammingError as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT scpi_preparar")
+            cursor.execute("RELEASE SAVEPOINT scpi_preparar")
+            logger.warning("Consulta não preparável (%s): %s", nome, e)
+            self._preparadas[sql] = None
+            return None
+        cursor.execute("RELEASE SAVEPOINT scpi_preparar")
+        self._preparadas[sql] = (nome, chaves)
+        return self._preparadas[sql]
+
+
+# Escopo de conexão da requisição (ver `escopo_conexao`). ContextVar e não
+# threading.local: o endpoint síncrono roda numa thread do threadpool, as
+# dependências em outra, e o contexto é copiado para as duas.
+_escopo_atual: contextvars.ContextVar = contextvars.ContextVar("scpi_escopo_conexao", default=None)
+
+
+class EscopoConexao:
+    """Uma conexão do pool para a requisição inteira.
+
+    Cada `get_db_cursor` dentro do escopo reusa a mesma conexão em vez de
+    tirar e devolver uma do pool: um endpoint com 4 consultas ocupa 1 conexão,
+    não 4 checkouts em sequência disputando o pool com as outras threads.
+
+    `commit=True` continua confirmando no fim do `with`, como antes — o
+    contrato dos repositórios ("já está durável quando o `with` sai") não
+    muda. `somente_leitura` abre a transação em REPEATABLE READ READ ONLY: as
+    consultas da requisição enxergam um retrato só do banco (contador e lista
+    não divergem por uma presença gravada no meio), e escrita vira erro.
+
+    Uso aninhado ou concorrente (um repositório dentro do `with` de outro,
+    `gather` num endpoint assíncrono) não compartilha a conexão: o segundo
+    `get_db_cursor` segue o caminho normal com conexão própria.
+    """
+
+    def __init__(self, somente_leitura: bool = False):
+        self.somente_leitura = somente_leitura
+        self.conn = None
+        self._lock = threading.Lock()
+        self._ocupado = False
+
+    def tomar(self) -> bool:
+        with self._lock:
+            if self._ocupado:
+                return False
+            self._ocupado = True
+            return True
+
+    def soltar(self) -> None:
+        with self._lock:
+            self._ocupado = False
+
+    @contextmanager
+    def cursor(self, commit: bool = False, preparar: bool = False):
+        if self.conn is None:
+            self.conn = get_db_connection()
+        conn = self.conn
+        if conn is None:
+            yield None
+            return
+        cursor = _novo_cursor(conn)
+        try:
+            if self.somente_leitura:
+                _abrir_retrato(conn, cursor)
+            yield _com_preparo(cursor, conn, preparar)
+            if commit and not self.somente_leitura:
+                conn.commit()
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                self.conn = None
+                release_connection(conn, broken=True)
+            logger.error("Erro na transação: %s", e)
+            raise
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+    def encerrar(self) -> None:
+        """Desfaz o que não foi confirmado (leituras abertas) e devolve a conexão."""
+        conn, self.conn = self.conn, None
+        if conn is None:
+            return
+        broken = False
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True
+        release_connection(conn, broken=broken)
+
+
+def _abrir_retrato(conn, cursor) -> None:
+    # Só no início da transação: depois do primeiro comando o nível de
+    # isolamento não muda mais. pg8000 (sem pool) fica em READ COMMITTED.
+    if _IS_PSYCOPG2 and conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+
+
 @contextmanager
-def get_db_cursor(commit=False):
+def escopo_conexao(somente_leitura: bool = False):
+    """Todo `get_db_cursor` dentro do bloco (inclusive em threads do
+    threadpool que herdam o contexto) usa uma conexão só. Ver EscopoConexao."""
+    escopo = EscopoConexao(somente_leitura)
+    token = _escopo_atual.set(escopo)
+    try:
+        yield escopo
+    finally:
+        try:
+            _escopo_atual.reset(token)
+        except ValueError:
+            # Saída num contexto copiado (dependência do FastAPI): o escopo
+            # morre com a requisição de qualquer forma.
+            pass
+        escopo.encerrar()
+
+
+@contextmanager
+def get_db_cursor(commit=False, preparar=False):
     """Gerenciador de contexto para operações de banco.
 
     Uso:
         with get_db_cursor() as cur:
             cur.execute(...)
+
+    Dentro de `escopo_conexao`, reusa a conexão do escopo. `preparar=True`
+    executa as consultas do bloco como prepared statements da conexão
+    (ver _CursorPreparado) — para as consultas quentes de texto fixo.
     """
+    escopo = _escopo_atual.get()
+    if escopo is not None and escopo.tomar():
+        try:
+            with escopo.cursor(commit, preparar) as cur:
+                yield cur
+        finally:
+            escopo.soltar()
+        return
+
     conn = get_db_connection()
     if not conn:
         yield None
         return
 
-    if _IS_PSYCOPG2:
-        raw_cursor = conn.cursor(cursor_factory=RealDictCursor)
-    else:
-        raw_cursor = conn.cursor()
-
-    class DictCursorWrapper:
-        def __init__(self, cur):
-            self.cur = cur
-
-        def execute(self, *args, **kwargs):
-            self.cur.execute(*args, **kwargs)
-            return self
-
-        def fetchone(self):
-            row = self.cur.fetchone()
-            if row is None:
-                return None
-            return self._to_dict(row)
-
-        def fetchall(self):
-            rows = self.cur.fetchall()
-            return [self._to_dict(row) for row in rows]
-
-        def _to_dict(self, row):
-            if not getattr(self.cur, "description", None):
-                return row
-            cols = [desc[0] for desc in self.cur.description]
-            return {cols[i]: (str(val) if isinstance(val, uuid.UUID) else val) for i, val in enumerate(row)}
-
-        @property
-        def rowcount(self):
-            return getattr(self.cur, "rowcount", -1)
-
-        def close(self):
-            self.cur.close()
-
-    cursor = raw_cursor if _IS_PSYCOPG2 else DictCursorWrapper(raw_cursor)
+    cursor = _novo_cursor(conn)
     broken = False
     try:
-        yield cursor
+        yield _com_preparo(cursor, conn, preparar)
         if commit:
             conn.commit()
     except Exception as e:
@@ -0,0 +1,305 @@
+"""Acesso ao banco pelo event loop, para os endpoints async do caminho quente.
+
+Os endpoints async (câmera, long-poll, stream da chamada) chamavam os
+repositórios síncronos via `run_in_threadpool`: cada consulta é um salto para
+o threadpool do Starlette — 40 threads por worker, as mesmas dos endpoints
+síncronos. Com as câmeras de todas as salas batendo no mesmo minuto, o
+registro de presença esperava thread livre atrás de relatório e PDF.
+
+Aqui a consulta roda no próprio loop: psycopg2 em modo assíncrono
+(`async_=True`), com o socket da conexão no `add_reader`/`add_writer` do
+asyncio. Nenhuma dependência nova — asyncpg/psycopg 3 trariam um segundo
+driver, com outros tipos de retorno, só para este caminho.
+
+    async with conexao_async() as con:
+        if con is None:
+            return DB_INDISPONIVEL
+        linha = await con.buscar_um("SELECT ... WHERE x = %s", (x,), preparar=True)
+
+Mesmo contrato do `get_db_cursor`: `None` com o banco fora ou o pool
+esgotado, linhas como dict. Conexão assíncrona é autocommit — um comando é uma
+transação; vários comandos atômicos vão em `async with con.transacao():`.
+`preparar=True` usa prepared statement nomeado na conexão (infra/sql_preparado.py).
+
+Opcional: DB_ASYNC=1 liga. Desligado (default), os routers seguem no
+threadpool com os repositórios síncronos, como antes.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from infra import metricas, rastreio_consultas, sql_preparado
+from infra.database import _IS_PSYCOPG2, _build_database_url, _env_int, logger
+
+if _IS_PSYCOPG2:
+    import psycopg2
+    import psycopg2.errors
+    import psycopg2.extensions as _ext
+    from psycopg2.extras import RealDictCursor
+
+DB_ASSINCRONO = _IS_PSYCOPG2 and (os.getenv("DB_ASYNC") or "").strip().lower() in ("1", "true", "sim")
+
+_POOL_MAX = _env_int("DB_ASYNC_POOL_MAX", 10)
+# Espera por conexão livre antes de desistir (→ DB_INDISPONIVEL / 503).
+_ESPERA_POOL_S = _env_int("DB_ASYNC_POOL_TIMEOUT_S", 3)
+
+
+async def _aguardar(conn) -> None:
+    """Roda o `poll()` da conexão assíncrona até o comando terminar, esperando
+    o socket no loop. Erro do comando sai daqui (levantado pelo poll)."""
+    loop = asyncio.get_running_loop()
+    while True:
+        estado = conn.poll()
+        if estado == _ext.POLL_OK:
+            return
+        if estado == _ext.POLL_READ:
+            registrar, remover = loop.add_reader, loop.remove_reader
+        elif estado == _ext.POLL_WRITE:
+            registrar, remover = loop.add_writer, loop.remove_writer
+        else:
+            raise psycopg2.OperationalError(f"poll() devolveu estado inesperado: {estado}")
+        fd = conn.fileno()
+        pronto = loop.create_future()
+        registrar(fd, _marcar_pronto, pronto)
+        try:
+            await pronto
+        finally:
+            remover(fd)
+
+
+def _marcar_pronto(futuro) -> None:
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+class ConexaoAssincrona:
+    """Uma conexão psycopg2 assíncrona. Um comando por vez (não compartilhe
+    entre tarefas concorrentes — cada uma tira a sua do pool)."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        # sql -> (nome, chaves) preparado nesta conexão; None = não preparável.
+        self._preparadas: dict[str, tuple | None] = {}
+        # Comando interrompido no meio ou conexão caída: não volta ao pool.
+        self.quebrada = False
+
+    @property
+    def em_transacao(self) -> bool:
+        return self._conn.info.transaction_status != _ext.TRANSACTION_STATUS_IDLE
+
+    @property
+    def fechada(self) -> bool:
+        return bool(self._conn.closed)
+
+    def fechar(self) -> None:
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+
+    async def _executar(self, sql, params=None):
+        cur = self._conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cur.execute(sql, params)
+            await _aguardar(self._conn)
+        except asyncio.CancelledError:
+            # O comando segue no servidor e o protocolo ficou no meio.
+            self.quebrada = True
+            cur.close()
+            raise
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.quebrada = True
+            cur.close()
+            raise
+        except psycopg2.Error as e:
+            if isinstance(e, psycopg2.errors.FeatureNotSupported):
+                # Schema mudou por baixo de um plano preparado: conexão nova
+                # prepara de novo.
+                self.quebrada = True
+            cur.close()
+            raise
+        return cur
+
+    async def _preparada(self, sql):
+        """(nome, chaves) do statement já preparado nesta conexão, ou None
+        para executar o texto direto."""
+        if sql in self._preparadas:
+            return self._preparadas[sql]
+        if not sql_preparado.preparavel(sql):
+            self._preparadas[sql] = None
+            return None
+        nome = sql_preparado.nome_da_consulta(sql)
+        try:
+            texto, chaves = sql_preparado.converter(sql)
+            cur = await self._executar(f"PREPARE {nome} AS {texto}")
+            cur.close()
+        except (ValueError, psycopg2.ProgrammingError) as e:
+            # Tipo de parâmetro que o Postgres não infere sem o valor, por
+            # exemplo: a consulta segue sem preparar nesta conexão.
+            logger.warning("Consulta não preparável (%s): %s", nome, e)
+            self._preparadas[sql] = None
+            if self.em_transacao:
+                raise  # PREPARE que falha aborta a transação em curso
+            return None
+        self._preparadas[sql] = (nome, chaves)
+        return self._preparadas[sql]
+
+    async def _rodar(self, sql, params, preparar, funcao):
+        comando, valores = sql, params
+        inicio = time.perf_counter()
+        try:
+            if preparar and sql_preparado.ligado():
+                preparada = await self._preparada(sql)
+                if preparada is not None:
+                    nome, chaves = preparada
+                    comando, valores = sql_preparado.comando_execute(nome, chaves, params)
+            cur = await self._executar(comando, valores)
+        finally:
+            duracao = time.perf_counter() - inicio
+            metricas.observar_consulta(funcao, duracao)
+        if rastreio_consultas.ligado():
+            # Sem EXPLAIN: rodaria no loop, no caminho da câmera.
+            rastreio_consultas.registrar(sql, None, funcao, duracao, cur.rowcount)
+        return cur
+
+    async def buscar_um(self, sql, params=None, preparar=False):
+        cur = await self._rodar(sql, params, preparar, metricas.funcao_chamadora())
+        try:
+            return cur.fetchone() if cur.description else None
+        finally:
+            cur.close()
+
+    async def buscar_todos(self, sql, params=None, preparar=False):
+        cur = await self._rodar(sql, params, preparar, metricas.funcao_chamadora())
+        try:
+            return cur.fetchall() if cur.description else []
+        finally:
+            cur.close()
+
+    async def executar(self, sql, params=None, preparar=False) -> int:
+        """Comando sem resultado; devolve o rowcount."""
+        cur = await self._rodar(sql, params, preparar, metricas.funcao_chamadora())
+        try:
+            return cur.rowcount
+        finally:
+            cur.close()
+
+    @asynccontextmanager
+    async def transacao(self):
+        """BEGIN … COMMIT; ROLLBACK em qualquer erro (inclusive cancelamento)."""
+        await self.executar("BEGIN")
+        try:
+            yield self
+        except BaseException:
+            if not self.quebrada:
+                try:
+                    await self.executar("ROLLBACK")
+                except BaseException:
+                    self.quebrada = True
+            raise
+        await self.executar("COMMIT")
+
+
+async def _conectar():
+    conn = psycopg2.connect(
+        _build_database_url(),
+        async_=True,
+        options="-c timezone=America/Sao_Paulo",
+        connect_timeout=_env_int("DB_CONNECT_TIMEOUT", 3),
+    )
+    try:
+        await asyncio.wait_for(_aguardar(conn), _env_int("DB_CONNECT_TIMEOUT", 3))
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+class PoolAssincrono:
+    """Até `maximo` conexões por event loop, criadas sob demanda.
+
+    Sem mínimo nem conexão ociosa aquecida: o pool síncrono continua existindo
+    para o resto da API, e este só cresce com o tráfego do caminho quente.
+    """
+
+    def __init__(self, maximo: int, espera_s: float, conectar=None):
+        self._espera_s = espera_s
+        self._conectar = conectar or _conectar
+        self._livres: list[ConexaoAssincrona] = []
+        self._vagas = asyncio.Semaphore(maximo)
+
+    async def tirar(self):
+        """Conexão livre ou nova; None com o pool esgotado ou o banco fora."""
+        try:
+            await asyncio.wait_for(self._vagas.acquire(), self._espera_s)
+        except asyncio.TimeoutError:
+            logger.error("Pool assíncrono esgotado após %ss de espera.", self._espera_s)
+            return None
+        try:
+            while self._livres:
+                con = self._livres.pop()
+                if not con.fechada:
+                    return con
+            return ConexaoAssincrona(await self._conectar())
+        except Exception as e:
+            self._vagas.release()
+            logger.error("Erro de conexão PostgreSQL (assíncrona): %s", e)
+            return None
+        except BaseException:
+            self._vagas.release()
+            raise
+
+    def devolver(self, con: ConexaoAssincrona) -> None:
+        try:
+            if con.quebrada or con.fechada or con.em_transacao:
+                con.fechar()
+            else:
+                self._livres.append(con)
+        finally:
+            self._vagas.release()
+
+    def fechar(self) -> None:
+        livres, self._livres = self._livres, []
+        for con in livres:
+            con.fechar()
+
+
+# Pool do event loop do worker. O asyncio não deixa um socket servir dois
+# loops: outro loop (testes, script) ganha pool próprio.
+_pool: PoolAssincrono | None = None
+_pool_loop = None
+
+
+def _pool_do_loop() -> PoolAssincrono:
+    global _pool, _pool_loop
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool_loop is not loop:
+        if _pool is not None:
+            _pool.fechar()
+        _pool = PoolAssincrono(_POOL_MAX, _ESPERA_POOL_S)
+        _pool_loop = loop
+    return _pool
+
+
+@asynccontextmanager
+async def conexao_async():
+    """Conexão do pool assíncrono pelo tempo do bloco; None se indisponível."""
+    pool = _pool_do_loop()
+    con = await pool.tirar()
+    if con is None:
+        yield None
+        return
+    try:
+        yield con
+    finally:
+        pool.devolver(con)
+
+
+def fechar_pool_async() -> None:
+    """Fecha as conexões ociosas (chamar no shutdown da app)."""
+    global _pool, _pool_loop
+    if _pool is not None:
+        _pool.fechar()
+        logger.info("Pool assíncrono encerrado.")
+    _pool, _pool_loop = None, None
@@ -0,0 +1,147 @@
+"""LISTEN/NOTIFY do Postgres para invalidar caches em memória dos workers.
+
+Cada worker do gunicorn guarda caches próprios (token da câmera → sala, por
+exemplo). TTL sozinho deixa uma revogação valendo até o TTL vencer; com NOTIFY
+quem muda o dado avisa todos os processos — inclusive o CLI, que roda fora da
+API — e o cache cai em milissegundos.
+
+Uma thread por processo, com conexão PRÓPRIA fora do pool (LISTEN prende a
+sessão; uma conexão do pool devolvida com LISTEN ativo receberia notificações
+que ninguém lê). Na reconexão, os `ao_reconectar` inscritos rodam: notificação
+enviada enquanto a conexão estava caída se perdeu, e o cache tem que assumir
+que tudo pode ter mudado.
+
+Sem psycopg2 (fallback pg8000), a escuta não sobe: os caches ficam só com o
+TTL, que é o limite de atraso que eles já aceitam sem NOTIFY.
+"""
+import re
+import select
+import threading
+
+from infra.database import _IS_PSYCOPG2, _build_database_url, _env_int, logger, psycopg2
+
+_CANAL_VALIDO = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+def notificar(cur, canal: str, payload: str = "") -> None:
+    """Enfileira a notificação na transação do cursor: só sai no commit, e
+    some junto com um rollback — ninguém invalida cache por mudança desfeita."""
+    cur.execute("SELECT pg_notify(%s, %s)", (canal, payload))
+
+
+async def notificar_async(con, canal: str, payload: str = "") -> None:
+    """`notificar` numa conexão de infra/database_async.py: dentro de
+    `con.transacao()`, sai no COMMIT dela."""
+    await con.executar("SELECT pg_notify(%s, %s)", (canal, payload), preparar=True)
+
+
+class EscutaPostgres:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks: dict[str, list] = {}
+        self._ao_reconectar: list = []
+        # Canais inscritos depois que a conexão já escutava os anteriores.
+        self._novos: set[str] = set()
+        self._parar = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.conectado = False
+
+    def inscrever(self, canal: str, callback, ao_reconectar=None) -> None:
+        """`callback(payload)` a cada NOTIFY em `canal`; `ao_reconectar()` a
+        cada (re)conexão da escuta."""
+        if not _CANAL_VALIDO.match(canal):
+            raise ValueError(f"nome de canal inválido: {canal!r}")
+        with self._lock:
+            self._callbacks.setdefault(canal, []).append(callback)
+            if ao_reconectar is not None:
+                self._ao_reconectar.append(ao_reconectar)
+            self._novos.add(canal)
+
+    def iniciar(self) -> None:
+        if not _IS_PSYCOPG2:
+            logger.warning("LISTEN/NOTIFY indisponível sem psycopg2: caches só com TTL.")
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._rodar, name="escuta-pg", daemon=True)
+            self._thread.start()
+
+    def parar(self) -> None:
+        self._parar.set()
+        t = self._thread
+        if t is not None:
+            t.join(timeout=6)
+        self._thread = None
+
+    def _despachar(self, canal: str, payload: str) -> None:
+        with self._lock:
+            callbacks = list(self._callbacks.get(canal, ()))
+        for callback in callbacks:
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error("Erro no callback de NOTIFY %s: %s", canal, e)
+
+    def _reconectou(self) -> None:
+        with self._lock:
+            callbacks = list(self._ao_reconectar)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error("Erro ao invalidar cache na reconexão da escuta: %s", e)
+
+    def _escutar_novos(self, cur, todos: bool = False) -> None:
+        with self._lock:
+            canais = set(self._callbacks) if todos else set(self._novos)
+            self._novos.clear()
+        for canal in sorted(canais):
+            # Nome validado em inscrever(): LISTEN não aceita parâmetro.
+            cur.execute(f"LISTEN {canal}")
+
+    def _rodar(self) -> None:
+        espera = 1
+        while not self._parar.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(
+                    _build_database_url(),
+                    connect_timeout=_env_int("DB_CONNECT_TIMEOUT", 3),
+                    # Conexão que fica ociosa por horas: sem keepalive, uma
+                    # queda silenciosa de rede deixaria a escuta surda.
+                    keepalives=1, keepalives_idle=30, keepalives_interval=10,
+                    keepalives_count=3,
+                )
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    self._escutar_novos(cur, todos=True)
+                self.conectado = True
+                self._reconectou()
+                espera = 1
+                while not self._parar.is_set():
+                    if self._novos:
+                        with conn.cursor() as cur:
+                            self._escutar_novos(cur)
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        n = conn.notifies.pop(0)
+                        self._despachar(n.channel, n.payload)
+            except Exception as e:
+                logger.warning("Escuta LISTEN/NOTIFY caiu (%s); reconectando em %ss.", e, espera)
+            finally:
+                self.conectado = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._parar.wait(espera)
+            espera = min(60, espera * 2)
+
+
+# Uma escuta por processo; os módulos inscrevem seus canais no import.
+escuta = EscutaPostgres()
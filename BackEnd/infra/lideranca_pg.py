@@ -0,0 +1,86 @@
+"""Eleição de um líder entre os workers com advisory lock do Postgres.
+
+Com `gunicorn -w 4`, cada worker sobe o próprio agendador: quatro cópias de
+cada tarefa periódica batendo no banco ao mesmo tempo. Aqui cada worker tenta
+`pg_try_advisory_lock(chave)` numa conexão PRÓPRIA, fora do pool — o lock de
+sessão vive enquanto a conexão viver. Quem pegou é o líder; os outros tentam
+de novo a cada renovação.
+
+Failover: worker que morre (ou reinicia) fecha a conexão, o Postgres solta o
+lock, e o próximo `renovar()` de outro worker assume. Queda de rede sem FIN é
+coberta pelos keepalives TCP da conexão. O líder confirma a conexão a cada
+renovação (SELECT 1): se ela caiu, ele deixa de se considerar líder na hora,
+sem esperar o Postgres perceber.
+
+O lease NÃO é exclusão mútua perfeita: entre o Postgres soltar o lock de uma
+conexão morta e o antigo líder perceber, podem existir dois líderes por até um
+intervalo de renovação. Tarefa do líder tem que continuar idempotente — a
+eleição tira o trabalho repetido, não a garantia do SQL.
+
+Sem psycopg2 (fallback pg8000) não há eleição: todo worker é líder, como antes.
+"""
+import threading
+
+from infra.database import _IS_PSYCOPG2, _build_database_url, _env_int, logger, psycopg2
+
+
+def _conectar():
+    conn = psycopg2.connect(
+        _build_database_url(),
+        connect_timeout=_env_int("DB_CONNECT_TIMEOUT", 3),
+        application_name="scpi-lider",
+        keepalives=1, keepalives_idle=30, keepalives_interval=10,
+        keepalives_count=3,
+    )
+    conn.autocommit = True
+    return conn
+
+
+class LiderancaPg:
+    def __init__(self, chave: int, conectar=None):
+        self._chave = chave
+        self._conectar = conectar or _conectar
+        self._conn = None
+        self._lock = threading.Lock()
+        self.lider = not _IS_PSYCOPG2
+
+    def renovar(self) -> bool:
+        """Tenta assumir (ou confirma) a liderança. Bloqueante: rodar fora
+        do event loop."""
+        if not _IS_PSYCOPG2:
+            return True
+        with self._lock:
+            era_lider = self.lider
+            try:
+                if self._conn is None or self._conn.closed:
+                    self._conn = self._conectar()
+                    self.lider = False
+                with self._conn.cursor() as cur:
+                    if self.lider:
+                        cur.execute("SELECT 1")
+                    else:
+                        cur.execute("SELECT pg_try_advisory_lock(%s)", (self._chave,))
+                        self.lider = bool(cur.fetchone()[0])
+            except Exception as e:
+                logger.warning("Eleição de líder: conexão falhou (%s).", e)
+                self.lider = False
+                self._fechar()
+            if self.lider and not era_lider:
+                logger.info("Este worker assumiu a liderança (lock %s).", self._chave)
+            elif era_lider and not self.lider:
+                logger.warning("Este worker perdeu a liderança (lock %s).", self._chave)
+            return self.lider
+
+    def renunciar(self) -> None:
+        """Solta a liderança fechando a conexão (shutdown do worker)."""
+        with self._lock:
+            self._fechar()
+            self.lider = not _IS_PSYCOPG2
+
+    def _fechar(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
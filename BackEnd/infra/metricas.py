@@ -0,0 +1,138 @@
+"""Métricas no formato do Prometheus (GET /metrics, só rede interna).
+
+Até aqui a única visão da API era o Sentry (erros) e os arquivos de log; para
+achar endpoint lento era preciso adivinhar. Aqui ficam as séries:
+
+  scpi_http_requisicao_segundos{metodo,rota}      latência até o início da resposta
+  scpi_http_respostas_total{metodo,rota,status}
+  scpi_db_consulta_segundos{funcao}               uma amostra por execute()
+  scpi_threadpool_em_uso / _fila / _capacidade    threadpool do Starlette (anyio)
+  scpi_camera_presencas_total{resultado}
+  scpi_jobs_total{tipo,resultado}                 jobs da fila (services/fila_jobs.py)
+
+`rota` é o template (`/chamadas/{chamada_id}/presencas`), nunca o caminho
+cru: id na label explode o número de séries. Requisição que não casou com
+rota nenhuma (scanner, 404) vai para `rota="sem_rota"`.
+
+Multiprocesso: com o gunicorn (4 workers), cada worker tem seus contadores.
+Com PROMETHEUS_MULTIPROC_DIR definido, o prometheus_client grava os valores em
+arquivos mmap nesse diretório e o /metrics de qualquer worker soma todos.
+O diretório precisa ser limpo a cada start — gunicorn.conf.py faz isso e avisa
+o cliente quando um worker morre. Sem a variável (dev, testes), métricas do
+processo só.
+"""
+import os
+import sys
+
+from dotenv import find_dotenv, load_dotenv
+
+# Antes do import do prometheus_client: o modo multiprocesso é escolhido na
+# importação dele, a partir desta variável.
+load_dotenv(find_dotenv())
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+MULTIPROCESSO = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+TIPO_CONTEUDO = CONTENT_TYPE_LATEST
+
+HTTP_LATENCIA = Histogram(
+    "scpi_http_requisicao_segundos",
+    "Latência da requisição até o início da resposta, por rota.",
+    ["metodo", "rota"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+HTTP_RESPOSTAS = Counter(
+    "scpi_http_respostas",
+    "Respostas por rota e status HTTP.",
+    ["metodo", "rota", "status"],
+)
+DB_CONSULTA = Histogram(
+    "scpi_db_consulta_segundos",
+    "Duração de cada execute() no banco, pela função que o chamou.",
+    ["funcao"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+# livesum: soma dos workers vivos (worker morto sai da conta).
+THREADPOOL_EM_USO = Gauge(
+    "scpi_threadpool_em_uso",
+    "Threads do threadpool ocupadas (endpoints síncronos, run_in_threadpool).",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_FILA = Gauge(
+    "scpi_threadpool_fila",
+    "Tarefas esperando thread livre no threadpool.",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_CAPACIDADE = Gauge(
+    "scpi_threadpool_capacidade",
+    "Tamanho do threadpool.",
+    multiprocess_mode="livesum",
+)
+CAMERA_PRESENCAS = Counter(
+    "scpi_camera_presencas",
+    "Presenças enviadas pela câmera, por resultado (registrada, ja_registrado ou motivo da recusa).",
+    ["resultado"],
+)
+
+JOBS = Counter(
+    "scpi_jobs",
+    "Execuções de jobs da fila, por tipo e resultado (concluido, falha, morto).",
+    ["tipo", "resultado"],
+)
+
+
+# Helpers que executam pelo cursor do repositório (execute_values): a
+# consulta é de quem chamou o helper.
+_MODULOS_INTERMEDIARIOS = ("psycopg2",)
+
+
+def funcao_chamadora(profundidade: int = 1) -> str:
+    """`modulo.funcao` de quem chamou quem chamou isto (`profundidade` frames
+    acima), sem o prefixo `repositories.` — label de baixa cardinalidade: o
+    conjunto de funções é o do código."""
+    try:
+        frame = sys._getframe(profundidade + 1)
+    except ValueError:
+        return "desconhecida"
+    while frame.f_back is not None and frame.f_globals.get("__name__", "").startswith(_MODULOS_INTERMEDIARIOS):
+        frame = frame.f_back
+    modulo = frame.f_globals.get("__name__", "?")
+    return f"{modulo.removeprefix('repositories.')}.{frame.f_code.co_name}"
+
+
+def observar_consulta(funcao: str, segundos: float) -> None:
+    DB_CONSULTA.labels(funcao).observe(segundos)
+
+
+def contar_presenca_camera(motivo: str | None) -> None:
+    """`motivo` do repositório (usuarios.MOTIVO_*); None = gravada agora."""
+    CAMERA_PRESENCAS.labels(motivo or "registrada").inc()
+
+
+def contar_job(tipo: str, resultado: str) -> None:
+    JOBS.labels(tipo, resultado).inc()
+
+
+def observar_threadpool(em_uso: int, fila: int, capacidade: int) -> None:
+    THREADPOOL_EM_USO.set(em_uso)
+    THREADPOOL_FILA.set(fila)
+    THREADPOOL_CAPACIDADE.set(capacidade)
+
+
+def exportar() -> bytes:
+    """Texto do /metrics: de todos os workers em modo multiprocesso."""
+    if MULTIPROCESSO:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        return generate_latest(registro)
+    return generate_latest(REGISTRY)
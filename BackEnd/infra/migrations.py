@@ -273,6 +273,51 @@ def ensure_push_receipts_table():
         )
 
 
+def ensure_jobs_table():
+    """Fila de jobs em background (push, e-mail) com retry e dead-letter.
+
+    Job concluído é apagado; o que esgota as tentativas fica com
+    status='morto' e aparece em `jobs_mortos`. O índice parcial cobre só o
+    que a busca do consumidor lê (pendentes por tipo e horário).
+    """
+    with get_db_cursor(commit=True) as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id             BIGSERIAL PRIMARY KEY,
+                tipo           TEXT        NOT NULL,
+                payload        JSONB       NOT NULL,
+                status         TEXT        NOT NULL DEFAULT 'pendente'
+                    CHECK (status IN ('pendente', 'executando', 'morto')),
+                tentativas     INTEGER     NOT NULL DEFAULT 0,
+                max_tentativas INTEGER     NOT NULL DEFAULT 5,
+                executar_em    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                travado_em     TIMESTAMPTZ,
+                travado_por    TEXT,
+                ultimo_erro    TEXT,
+                criado_em      TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+            """
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_jobs_pendentes "
+            "ON jobs (tipo, executar_em) WHERE status = 'pendente'"
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_jobs_executando "
+            "ON jobs (travado_em) WHERE status = 'executando'"
+        )
+        cur.execute(
+            """
+            CREATE OR REPLACE VIEW jobs_mortos AS
+            SELECT id, tipo, payload, tentativas, ultimo_erro, criado_em,
+                   executar_em AS ultima_tentativa_em
+            FROM jobs
+            WHERE status = 'morto'
+            """
+        )
+
+
 def ensure_primeiro_acesso_column():
     with get_db_cursor(commit=True) as cur:
         cur.execute(
@@ -634,6 +679,7 @@ _ETAPAS = [
     "ensure_indices_filtros_alunos",
     "ensure_indices_performance",
     "ensure_consentimentos_table",
+    "ensure_jobs_table",
     # Por último: depende de todas as tabelas e colunas acima já existirem.
     "ensure_timestamptz_restante",
 ]
@@ -1,79 +1,138 @@
+import gzip
 import json
 import logging
 import os
+import random
+import threading
+import time
 import urllib.request
 import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+import urllib3
+
+from infra.database import _env_int
 
 logger = logging.getLogger("scpi.notificacoes")
 
 EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
 EXPO_RECEIPTS_URL = "https://exp.host/--/api/v2/push/getReceipts"
+# Limite da Expo por request de envio.
+EXPO_LOTE_MAX = 100
+# Lotes em voo ao mesmo tempo neste processo (somando todos os jobs de push).
+_EXPO_CONCORRENCIA = _env_int("EXPO_PUSH_CONCORRENCIA", 4)
+_EXPO_TENTATIVAS = _env_int("EXPO_PUSH_TENTATIVAS", 3)
+_EXPO_BACKOFF_S = 0.5
+_EXPO_ESPERA_MAX_S = 10.0
+
+# Sessão compartilhada: conexões TLS com a Expo ficam abertas entre envios
+# (keep-alive) em vez de um handshake por push. Retentativa é nossa, não do
+# urllib3, para respeitar o Retry-After e contar as tentativas por lote.
+_http = urllib3.PoolManager(
+    maxsize=_EXPO_CONCORRENCIA,
+    block=True,
+    retries=False,
+    timeout=urllib3.Timeout(connect=5.0, read=15.0),
+)
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _executor_expo() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_EXPO_CONCORRENCIA, thread_name_prefix="expo-push")
+        return _executor
+
+
+class FalhaEnvio(Exception):
+    """O envio não saiu por falha transitória (rede, timeout, 429/5xx):
+    repetir mais tarde pode dar certo."""
 
 
 def _resend_api_key() -> str:
     return os.getenv("RESEND_API_KEY", "")
 
 
+def resend_configurado() -> bool:
+    return bool(_resend_api_key())
+
+
 def _resend_from() -> str:
     return os.getenv("RESEND_FROM_EMAIL", "SCPI <onboarding@resend.dev>")
 
 
-def send_expo_push(expo_tokens: list, title: str, body: str, data: dict = None) -> dict:
-    """Envia push via Expo e lê os tickets da resposta.
-
-    Retorna {"ok": [tokens aceitos], "dead": [tokens DeviceNotRegistered],
-    "tickets": [{"id","token"} dos aceitos com id de ticket]}.
-    Em falha de transporte ou resposta malformada, retorna listas vazias
-    (não sabemos o estado real — nada é podado).
-    """
-    vazio = {"ok": [], "dead": [], "tickets": []}
-    valid = [t for t in expo_tokens if t and t.startswith("ExponentPushToken")]
-    if not valid:
-        logger.debug("Nenhum Expo push token válido para envio.")
-        return vazio
-
-    messages = [
-        {
-            "to": token,
-            "title": title,
-            "body": body,
-            "sound": "default",
-            **({"data": data} if data else {}),
-        }
-        for token in valid
-    ]
-
-    payload = json.dumps(messages).encode("utf-8")
-    req = urllib.request.Request(
+def _postar_expo(corpo: bytes) -> tuple[int, bytes, str | None]:
+    """POST de um lote na sessão do pool: (status, corpo da resposta,
+    Retry-After). Erro de rede/timeout sai como urllib3.exceptions.HTTPError."""
+    resp = _http.request(
+        "POST",
         EXPO_PUSH_URL,
-        data=payload,
+        body=gzip.compress(corpo),
         headers={
             "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
             "Accept": "application/json",
+            "Accept-Encoding": "gzip",
         },
-        method="POST",
     )
+    return resp.status, resp.data, resp.headers.get("Retry-After")
 
+
+def _espera_retentativa(tentativa: int, retry_after: str | None) -> float:
+    """Retry-After da Expo (em segundos) quando vier, senão backoff
+    exponencial com jitter; nunca mais que _EXPO_ESPERA_MAX_S."""
     try:
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            result = json.loads(resp.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        logger.error("Expo Push HTTP %s: %s", e.code, e.read().decode("utf-8", errors="replace"))
-        return vazio
-    except Exception as e:
-        logger.error("Erro ao enviar Expo push: %s", e)
-        return vazio
+        espera = float(retry_after)
+    except (TypeError, ValueError):
+        espera = _EXPO_BACKOFF_S * 2 ** tentativa * random.uniform(0.75, 1.25)
+    return min(max(espera, 0.0), _EXPO_ESPERA_MAX_S)
+
+
+def _enviar_lote_expo(mensagens: list) -> dict:
+    """Um lote (até EXPO_LOTE_MAX mensagens), com as retentativas dele.
 
-    tickets_resp = result.get("data", [])
-    if len(tickets_resp) != len(valid):
+    429/5xx e rede/timeout tentam de novo até _EXPO_TENTATIVAS vezes; se não
+    sair, o lote volta em "falhos". Erro permanente (4xx) ou resposta
+    malformada voltam vazios: não sabemos o estado real, nada é podado.
+    """
+    vazio = {"ok": [], "dead": [], "tickets": [], "falhos": []}
+    tokens = [m["to"] for m in mensagens]
+    corpo = json.dumps(mensagens).encode("utf-8")
+    for tentativa in range(_EXPO_TENTATIVAS):
+        retry_after = None
+        try:
+            status, dados, retry_after = _postar_expo(corpo)
+        except urllib3.exceptions.HTTPError as e:
+            logger.warning("Expo push: falha de rede (tentativa %d/%d): %s", tentativa + 1, _EXPO_TENTATIVAS, e)
+        else:
+            if status == 200:
+                break
+            texto = dados.decode("utf-8", errors="replace")
+            if status != 429 and status < 500:
+                logger.error("Expo Push HTTP %s: %s", status, texto)
+                return vazio
+            logger.warning("Expo Push HTTP %s (tentativa %d/%d): %s", status, tentativa + 1, _EXPO_TENTATIVAS, texto)
+        if tentativa + 1 < _EXPO_TENTATIVAS:
+            time.sleep(_espera_retentativa(tentativa, retry_after))
+    else:
+        logger.error("Expo push: lote de %d token(s) não saiu após %d tentativa(s).", len(tokens), _EXPO_TENTATIVAS)
+        return {**vazio, "falhos": list(tokens)}
+
+    try:
+        tickets_resp = json.loads(dados.decode("utf-8")).get("data", [])
+    except ValueError:
+        tickets_resp = None
+    if not isinstance(tickets_resp, list) or len(tickets_resp) != len(tokens):
         logger.error(
-            "Expo push: %d tickets para %d tokens — resposta inesperada, nada podado.",
-            len(tickets_resp), len(valid),
+            "Expo push: %s tickets para %d tokens — resposta inesperada, nada podado.",
+            len(tickets_resp) if isinstance(tickets_resp, list) else "sem", len(tokens),
         )
         return vazio
 
     ok, dead, tickets = [], [], []
-    for token, ticket in zip(valid, tickets_resp):
+    for token, ticket in zip(tokens, tickets_resp):
         if ticket.get("status") == "ok":
             ok.append(token)
             tid = ticket.get("id")
@@ -86,8 +145,65 @@ def send_expo_push(expo_tokens: list, title: str, body: str, data: dict = None)
             logger.info("Expo push: token morto (DeviceNotRegistered), será podado.")
         else:
             logger.warning("Expo push: ticket com erro %s (token mantido).", erro)
-    logger.info("Expo push: %d ok, %d mortos de %d tokens.", len(ok), len(dead), len(valid))
-    return {"ok": ok, "dead": dead, "tickets": tickets}
+    return {"ok": ok, "dead": dead, "tickets": tickets, "falhos": []}
+
+
+def send_expo_mensagens(mensagens: list, levantar_em_falha: bool = False) -> dict:
+    """Envia mensagens da Expo já montadas ({"to","title","body",...}, cada
+    uma com o seu texto) e lê os tickets da resposta.
+
+    A Expo aceita até 100 mensagens por request: vão em lotes de
+    EXPO_LOTE_MAX, enviados em paralelo (até EXPO_PUSH_CONCORRENCIA por
+    processo) numa sessão keep-alive com corpo gzip. Cada lote tenta de novo
+    sozinho em 429/5xx/rede, com backoff. Token inválido é descartado e token
+    repetido vai uma vez só (a primeira mensagem dele).
+
+    Retorna {"ok": [tokens aceitos], "dead": [tokens DeviceNotRegistered],
+    "tickets": [{"id","token"} dos aceitos com id de ticket],
+    "falhos": [tokens de lotes que não saíram]}, juntando os lotes. Com
+    `levantar_em_falha` (jobs da fila, que tentam de novo), levanta
+    FalhaEnvio quando nenhum lote saiu; se só parte saiu, devolve o
+    resultado e quem chamou decide o que fazer com "falhos" — repetir tudo
+    mandaria de novo para quem já recebeu.
+    """
+    validas, vistos = [], set()
+    for mensagem in mensagens:
+        token = mensagem.get("to")
+        # Mesmo token duas vezes = o aparelho recebe duas notificações.
+        if token and token.startswith("ExponentPushToken") and token not in vistos:
+            vistos.add(token)
+            validas.append({"sound": "default", **mensagem})
+    if not validas:
+        logger.debug("Nenhum Expo push token válido para envio.")
+        return {"ok": [], "dead": [], "tickets": [], "falhos": []}
+
+    lotes = [validas[i:i + EXPO_LOTE_MAX] for i in range(0, len(validas), EXPO_LOTE_MAX)]
+    if len(lotes) == 1:
+        resultados = [_enviar_lote_expo(lotes[0])]
+    else:
+        resultados = list(_executor_expo().map(_enviar_lote_expo, lotes))
+
+    out = {"ok": [], "dead": [], "tickets": [], "falhos": []}
+    for resultado in resultados:
+        for chave in out:
+            out[chave].extend(resultado[chave])
+    logger.info(
+        "Expo push: %d ok, %d mortos, %d falhos de %d tokens em %d lote(s).",
+        len(out["ok"]), len(out["dead"]), len(out["falhos"]), len(validas), len(lotes),
+    )
+    if levantar_em_falha and len(out["falhos"]) == len(validas):
+        raise FalhaEnvio(f"Expo push: nenhum dos {len(lotes)} lote(s) saiu")
+    return out
+
+
+def send_expo_push(expo_tokens: list, title: str, body: str, data: dict = None,
+                   levantar_em_falha: bool = False) -> dict:
+    """A mesma mensagem para todos os `expo_tokens` (ver send_expo_mensagens)."""
+    extra = {"data": data} if data else {}
+    return send_expo_mensagens(
+        [{"to": token, "title": title, "body": body, **extra} for token in expo_tokens],
+        levantar_em_falha=levantar_em_falha,
+    )
 
 
 def consultar_receipts(ticket_ids: list) -> dict:
@@ -0,0 +1,202 @@
+"""Pool de conexões psycopg2 com espera limitada, validação e idade máxima.
+
+Substitui o `ThreadedConnectionPool`, que tinha três problemas no nosso uso:
+
+  - esgotado, `getconn()` levantava na hora: um pico de 11 requests num pool
+    de 10 virava 503 (ou "lista vazia") para o 11º, mesmo que uma conexão
+    voltasse 5 ms depois. Aqui o pedido espera até DB_POOL_TIMEOUT_S;
+  - acima de `minconn`, a conexão devolvida era FECHADA: com DB_POOL_MIN=1,
+    todo request concorrente abria TCP + autenticação no Postgres e fechava
+    no fim. Aqui as devolvidas ficam ociosas até `maximo`;
+  - conexão morta (failover, restart do Postgres, idle timeout de firewall)
+    só aparecia no primeiro comando do repositório. Aqui a conexão ociosa há
+    mais de DB_POOL_VALIDAR_APOS_S passa por um SELECT 1 antes de sair, e a
+    com mais de DB_POOL_IDADE_MAX_S é trocada por uma nova.
+
+`estatisticas()` expõe espera de checkout (histograma), em uso/ociosas,
+timeouts e trocas — para dimensionar DB_POOL_MAX por worker com dado
+(GET /interno/pool).
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Limites (s) do histograma de espera por conexão, cumulativo como o do
+# Prometheus. Acima de 1 s já é pool pequeno demais para a carga.
+LIMITES_ESPERA_S = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class PoolEsgotado(Exception):
+    """Nenhuma conexão livre dentro do prazo de espera."""
+
+
+class PoolConexoes:
+    def __init__(self, conectar, minimo: int, maximo: int, espera_s: float,
+                 idade_max_s: float, validar_apos_s: float):
+        # conectar() -> conexão nova (psycopg2.connect com os parâmetros da app).
+        self._conectar = conectar
+        self.minimo = minimo
+        self.maximo = maximo
+        self._espera_s = espera_s
+        self._idade_max_s = idade_max_s
+        self._validar_apos_s = validar_apos_s
+        self._vagas = threading.BoundedSemaphore(maximo)
+        self._lock = threading.Lock()
+        self._ociosas: list = []  # (conn, criada_em, devolvida_em), LIFO
+        self._criada_em: dict[int, float] = {}  # id(conn) das que estão em uso
+        self._fechado = False
+        self._em_uso = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._criadas = 0
+        self._recicladas = 0
+        self._invalidas = 0
+        self._espera_total_s = 0.0
+        self._espera_max_s = 0.0
+        self._espera_buckets = [0] * len(LIMITES_ESPERA_S)
+
+    def aquecer(self) -> None:
+        """Abre `minimo` conexões de saída (falha vira log: o pool segue vivo
+        e conecta sob demanda)."""
+        novas = []
+        try:
+            for _ in range(self.minimo):
+                novas.append(self._conectar())
+        except Exception as e:
+            logger.warning("Pool: aquecimento parou em %d conexão(ões): %s", len(novas), e)
+        agora = time.monotonic()
+        with self._lock:
+            self._criadas += len(novas)
+            self._ociosas.extend((conn, agora, agora) for conn in novas)
+
+    def getconn(self):
+        inicio = time.monotonic()
+        if not self._vagas.acquire(timeout=self._espera_s):
+            with self._lock:
+                self._timeouts += 1
+                self._registrar_espera(time.monotonic() - inicio)
+            raise PoolEsgotado(
+                f"nenhuma conexão livre em {self._espera_s}s (max={self.maximo})"
+            )
+        try:
+            conn, criada_em = self._conexao_pronta()
+        except BaseException:
+            self._vagas.release()
+            raise
+        with self._lock:
+            self._em_uso += 1
+            self._checkouts += 1
+            self._criada_em[id(conn)] = criada_em
+            self._registrar_espera(time.monotonic() - inicio)
+        return conn
+
+    def putconn(self, conn, close: bool = False) -> None:
+        with self._lock:
+            criada_em = self._criada_em.pop(id(conn), None)
+            if criada_em is None:
+                # Não saiu deste pool (conexão crua do fallback, ou devolvida
+                # duas vezes): fecha sem mexer nas vagas.
+                logger.warning("Pool: devolução de conexão que não é do pool; fechando.")
+                _fechar(conn)
+                return
+            self._em_uso -= 1
+        try:
+            if close or self._fechado or conn.closed or not _limpa(conn):
+                _fechar(conn)
+            else:
+                with self._lock:
+                    self._ociosas.append((conn, criada_em, time.monotonic()))
+        finally:
+            self._vagas.release()
+
+    def closeall(self) -> None:
+        with self._lock:
+            self._fechado = True
+            ociosas, self._ociosas = self._ociosas, []
+        for conn, _criada, _devolvida in ociosas:
+            _fechar(conn)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            acumulado = 0
+            buckets = {}
+            for limite, n in zip(LIMITES_ESPERA_S, self._espera_buckets):
+                acumulado += n
+                buckets[str(limite)] = acumulado
+            buckets["+Inf"] = self._checkouts + self._timeouts
+            return {
+                "maximo": self.maximo,
+                "em_uso": self._em_uso,
+                "ociosas": len(self._ociosas),
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "criadas": self._criadas,
+                "recicladas": self._recicladas,
+                "invalidas": self._invalidas,
+                "espera": {
+                    "total_s": round(self._espera_total_s, 6),
+                    "max_s": round(self._espera_max_s, 6),
+                    "buckets": buckets,
+                },
+            }
+
+    def _conexao_pronta(self):
+        """(conn, criada_em): ociosa mais recente que ainda presta, ou nova."""
+        while True:
+            with self._lock:
+                if not self._ociosas:
+                    break
+                conn, criada_em, devolvida_em = self._ociosas.pop()
+            agora = time.monotonic()
+            if conn.closed:
+                motivo = "invalidas"
+            elif agora - criada_em > self._idade_max_s:
+                motivo = "recicladas"
+            elif agora - devolvida_em > self._validar_apos_s and not _responde(conn):
+                motivo = "invalidas"
+            else:
+                return conn, criada_em
+            with self._lock:
+                setattr(self, "_" + motivo, getattr(self, "_" + motivo) + 1)
+            _fechar(conn)
+        conn = self._conectar()
+        with self._lock:
+            self._criadas += 1
+        return conn, time.monotonic()
+
+    def _registrar_espera(self, espera_s: float) -> None:
+        # Chamado com o lock.
+        self._espera_total_s += espera_s
+        self._espera_max_s = max(self._espera_max_s, espera_s)
+        for i, limite in enumerate(LIMITES_ESPERA_S):
+            if espera_s <= limite:
+                self._espera_buckets[i] += 1
+                break
+
+
+def _responde(conn) -> bool:
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
+
+def _limpa(conn) -> bool:
+    """Devolve a conexão sem transação aberta; False se nem o rollback deu."""
+    try:
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
+
+def _fechar(conn) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
@@ -0,0 +1,240 @@
+"""Rastreio de consultas no `get_db_cursor` (opt-in, DB_TRACE=1).
+
+As consultas foram afinadas à mão — o LATERAL de `listar_relatorios_chamadas`,
+os índices de `ensure_indices_performance`, ops/sql/verificar_indices_p3.sql —
+sem nenhum tempo medido dentro da aplicação. Ligado, cada `execute` passa por
+`registrar()` com:
+
+  - impressão digital do SQL: texto normalizado (placeholders, literais e
+    listas de VALUES viram `?`, espaços colapsados) e o sha256 dele, para
+    juntar as execuções da mesma consulta;
+  - duração, linhas (rowcount) e a função do repositório que chamou.
+
+Acima de DB_TRACE_LENTA_MS vira log de consulta lenta (logger
+scpi.consultas → scpi.log), só com o texto — parâmetro não vai para log, que
+aqui pode ser RA, e-mail ou aluno_id. Uma fração DB_TRACE_EXPLAIN_AMOSTRA
+das lentas (só SELECT: EXPLAIN ANALYZE executa a consulta de novo) ganha o
+`EXPLAIN (ANALYZE, BUFFERS)` no log, no máximo uma vez a cada
+DB_TRACE_EXPLAIN_INTERVALO_S por consulta. A reexecução é sempre desfeita
+(ROLLBACK TO SAVEPOINT); SELECT que chama função com efeito fora da
+transação (nextval, advisory lock...) ganha só o EXPLAIN sem ANALYZE.
+
+`mais_lentas()` é a visão das N piores da última janela (DB_TRACE_JANELA_S),
+lida pelos admins em GET /admin/consultas-lentas. É por worker: cada processo
+do gunicorn vê as consultas que ele executou.
+"""
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger("scpi.consultas")
+
+
+def _env_num(nome: str, default, tipo=int):
+    # Sem importar infra.database (que importa este módulo).
+    bruto = (os.getenv(nome) or "").strip()
+    if not bruto:
+        return default
+    try:
+        return tipo(bruto)
+    except ValueError:
+        logger.warning("%s='%s' inválido — usando default %s", nome, bruto, default)
+        return default
+
+
+_LIGADO = (os.getenv("DB_TRACE") or "").strip().lower() in ("1", "true", "sim")
+LENTA_MS = _env_num("DB_TRACE_LENTA_MS", 200)
+JANELA_S = _env_num("DB_TRACE_JANELA_S", 3600)
+TOP_N = _env_num("DB_TRACE_TOP_N", 20)
+EXPLAIN_AMOSTRA = _env_num("DB_TRACE_EXPLAIN_AMOSTRA", 0.0, float)
+EXPLAIN_INTERVALO_S = _env_num("DB_TRACE_EXPLAIN_INTERVALO_S", 600)
+
+# Teto de consultas distintas guardadas: SQL montado com literal (não deveria
+# existir, mas existindo) não cresce a memória do worker sem limite.
+_MAX_CONSULTAS = 1000
+
+_COMENTARIOS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_ESPACOS = re.compile(r"\s+")
+_TUPLAS_REPETIDAS = re.compile(r"(\(\?(?:, \?)*\))(?:, \1)+")
+_SO_LEITURA = re.compile(r"^\s*(SELECT|WITH)\b", re.I)
+_ESCRITA = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b", re.I)
+# Efeitos que o ROLLBACK TO SAVEPOINT não desfaz: sequência, lock de sessão,
+# espera, sinal para outro backend, dblink, large object.
+_EFEITO_FORA_DA_TRANSACAO = re.compile(
+    r"\b(nextval|setval|pg_advisory_\w+|pg_try_advisory_\w+|pg_sleep\w*|pg_cancel_backend"
+    r"|pg_terminate_backend|pg_reload_conf|dblink\w*|lo_\w+)\s*\(",
+    re.I,
+)
+
+
+def ligado() -> bool:
+    return _LIGADO
+
+
+def normalizar(sql) -> str:
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    texto = _COMENTARIOS.sub(" ", str(sql))
+    texto = _PLACEHOLDERS.sub("?", texto)
+    texto = _LITERAIS.sub("?", texto)
+    texto = _ESPACOS.sub(" ", texto).strip()
+    return _TUPLAS_REPETIDAS.sub(r"\1, ...", texto)
+
+
+def impressao_digital(texto_normalizado: str) -> str:
+    return hashlib.sha256(texto_normalizado.encode()).hexdigest()[:16]
+
+
+class _Consulta:
+    __slots__ = ("digital", "sql", "funcao", "execucoes", "total_s", "max_s",
+                 "linhas", "lentas", "ultima_em", "plano", "explain_em")
+
+    def __init__(self, digital, sql, funcao):
+        self.digital = digital
+        self.sql = sql
+        self.funcao = funcao
+        self.execucoes = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.linhas = 0
+        self.lentas = 0
+        self.ultima_em = 0.0
+        self.plano = None
+        self.explain_em = 0.0
+
+    def como_dict(self) -> dict:
+        return {
+            "digital": self.digital,
+            "sql": self.sql,
+            "funcao": self.funcao,
+            "execucoes": self.execucoes,
+            "lentas": self.lentas,
+            "total_ms": round(self.total_s * 1000, 3),
+            "media_ms": round(self.total_s * 1000 / self.execucoes, 3),
+            "max_ms": round(self.max_s * 1000, 3),
+            "linhas_media": round(self.linhas / self.execucoes, 1),
+            "ultima_em": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.ultima_em)),
+            "plano": self.plano,
+        }
+
+
+_consultas: dict[str, _Consulta] = {}
+_lock = threading.Lock()
+
+
+def registrar(sql, params, funcao: str, duracao_s: float, linhas: int, conn=None) -> None:
+    """Uma execução. `conn` (síncrona, com a transação do repositório) permite
+    o EXPLAIN da amostra; None não explica (executemany, conexão assíncrona)."""
+    texto = normalizar(sql)
+    digital = impressao_digital(texto)
+    agora = time.time()
+    lenta = duracao_s * 1000 >= LENTA_MS
+    with _lock:
+        consulta = _consultas.get(digital)
+        if consulta is None:
+            if len(_consultas) >= _MAX_CONSULTAS:
+                _descartar_antigas(agora)
+            consulta = _consultas[digital] = _Consulta(digital, texto, funcao)
+        consulta.execucoes += 1
+        consulta.total_s += duracao_s
+        consulta.max_s = max(consulta.max_s, duracao_s)
+        consulta.linhas += max(linhas, 0)
+        consulta.funcao = funcao
+        consulta.ultima_em = agora
+        explicar = False
+        if lenta:
+            consulta.lentas += 1
+            explicar = (
+                conn is not None
+                and EXPLAIN_AMOSTRA > 0
+                and agora - consulta.explain_em >= EXPLAIN_INTERVALO_S
+                and _pode_explicar(sql)
+                and random.random() < EXPLAIN_AMOSTRA
+            )
+            if explicar:
+                consulta.explain_em = agora
+    if not lenta:
+        return
+
+    logger.warning(
+        "Consulta lenta %.1f ms digital=%s funcao=%s linhas=%s sql=%s",
+        duracao_s * 1000, digital, funcao, linhas, texto,
+    )
+    if explicar:
+        plano = _explicar(conn, sql, params)
+        if plano:
+            with _lock:
+                consulta.plano = plano
+            logger.warning("EXPLAIN (ANALYZE, BUFFERS) digital=%s\n%s", digital, plano)
+
+
+def mais_lentas(ordem: str = "max", limite: int | None = None) -> list[dict]:
+    """As `limite` (DB_TRACE_TOP_N) piores consultas vistas na janela, por
+    `max` (pior execução) ou `total` (tempo somado de banco)."""
+    chave = (lambda c: c.total_s) if ordem == "total" else (lambda c: c.max_s)
+    with _lock:
+        _descartar_antigas(time.time())
+        piores = sorted(_consultas.values(), key=chave, reverse=True)[: limite or TOP_N]
+        return [c.como_dict() for c in piores]
+
+
+def limpar() -> None:
+    with _lock:
+        _consultas.clear()
+
+
+def _descartar_antigas(agora: float) -> None:
+    # Chamado com o lock.
+    for digital in [d for d, c in _consultas.items() if agora - c.ultima_em > JANELA_S]:
+        del _consultas[digital]
+    if len(_consultas) >= _MAX_CONSULTAS:
+        mais_antiga = min(_consultas.values(), key=lambda c: c.ultima_em)
+        del _consultas[mais_antiga.digital]
+
+
+def _pode_explicar(sql) -> bool:
+    if not isinstance(sql, str):
+        return False
+    return bool(_SO_LEITURA.match(sql)) and not _ESCRITA.search(sql)
+
+
+def _comando_explain(sql: str) -> str:
+    if _EFEITO_FORA_DA_TRANSACAO.search(sql):
+        return "EXPLAIN " + sql
+    return "EXPLAIN (ANALYZE, BUFFERS) " + sql
+
+
+def _explicar(conn, sql, params) -> str | None:
+    """EXPLAIN na mesma transação do repositório (enxerga o mesmo retrato),
+    num SAVEPOINT sempre desfeito: o ANALYZE executa a consulta de verdade,
+    e o que ela fizer (pg_notify, função volátil que grava) não pode ser
+    confirmado junto com a transação de quem chamou."""
+    try:
+        cur = conn.cursor()
+    except Exception:
+        return None
+    try:
+        cur.execute("SAVEPOINT scpi_explain")
+        try:
+            cur.execute(_comando_explain(sql), params)
+            plano = "\n".join(linha[0] for linha in cur.fetchall())
+        except Exception as e:
+            logger.warning("EXPLAIN falhou: %s", e)
+            plano = None
+        cur.execute("ROLLBACK TO SAVEPOINT scpi_explain")
+        cur.execute("RELEASE SAVEPOINT scpi_explain")
+        return plano
+    except Exception as e:
+        logger.warning("EXPLAIN falhou: %s", e)
+        return None
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
@@ -0,0 +1,89 @@
+"""Prepared statements nomeados por conexão (PREPARE no primeiro uso, EXECUTE depois).
+
+Os repositórios escrevem SQL no formato do psycopg2 (`%s` / `%(nome)s`); o
+PREPARE do Postgres quer `$1, $2…`. `converter` faz a tradução uma vez por
+texto, e `comando_execute` monta o `EXECUTE nome (%s, …)` com os valores na
+ordem dos `$n` — quem interpola os valores continua sendo o psycopg2.
+
+O plano fica preso à conexão: uma migração que mude o formato do resultado faz
+o EXECUTE falhar com "cached plan must not change result type" (0A000). Quem
+usa trata esse erro descartando a conexão, que volta nova e prepara de novo.
+
+DB_PREPARED_STATEMENTS=0 desliga (PgBouncer em modo transação não mantém
+PREPARE entre transações).
+"""
+import hashlib
+import os
+
+_LIGADO = (os.getenv("DB_PREPARED_STATEMENTS") or "1").strip().lower() not in ("0", "false", "nao", "não")
+
+
+def ligado() -> bool:
+    return _LIGADO
+
+
+def preparavel(sql: str) -> bool:
+    """PREPARE só aceita SELECT/INSERT/UPDATE/DELETE/MERGE/VALUES (e WITH)."""
+    palavras = sql.lstrip(" \n\t(").split(None, 1)
+    return bool(palavras) and palavras[0].upper() in (
+        "SELECT", "INSERT", "UPDATE", "DELETE", "MERGE", "VALUES", "WITH",
+    )
+
+
+def nome_da_consulta(sql: str) -> str:
+    """Nome estável por texto: todos os workers e conexões chegam no mesmo."""
+    return "scpi_" + hashlib.sha256(sql.encode("utf-8")).hexdigest()[:16]
+
+
+def converter(sql: str):
+    """(texto com $n, chaves) — `chaves` é a lista de nomes na ordem dos `$n`
+    para `%(nome)s`, ou o número de parâmetros para `%s` posicional.
+
+    `%%` vira `%`, como o psycopg2 faria. Misturar os dois estilos é erro,
+    como no psycopg2.
+    """
+    saida = []
+    nomes: list[str] = []
+    posicionais = 0
+    i = 0
+    while i < len(sql):
+        c = sql[i]
+        if c != "%":
+            saida.append(c)
+            i += 1
+            continue
+        seguinte = sql[i + 1:i + 2]
+        if seguinte == "%":
+            saida.append("%")
+            i += 2
+        elif seguinte == "s":
+            posicionais += 1
+            saida.append(f"${posicionais}")
+            i += 2
+        elif seguinte == "(":
+            fim = sql.find(")s", i)
+            if fim < 0:
+                raise ValueError(f"Parâmetro nomeado malformado na posição {i}")
+            nome = sql[i + 2:fim]
+            if nome not in nomes:
+                nomes.append(nome)
+            saida.append(f"${nomes.index(nome) + 1}")
+            i = fim + 2
+        else:
+            raise ValueError(f"'%' solto na posição {i} (use '%%')")
+    if nomes and posicionais:
+        raise ValueError("SQL mistura %s e %(nome)s")
+    return "".join(saida), (nomes if nomes else posicionais)
+
+
+def comando_execute(nome: str, chaves, params):
+    """(sql, valores) do EXECUTE para os `params` da chamada original."""
+    if isinstance(chaves, list):
+        valores = [params[chave] for chave in chaves]
+    else:
+        valores = list(params or ())
+        if len(valores) != chaves:
+            raise ValueError(f"{nome}: {chaves} parâmetro(s) esperado(s), {len(valores)} recebido(s)")
+    if not valores:
+        return f"EXECUTE {nome}", None
+    return f"EXECUTE {nome} ({', '.join(['%s'] * len(valores))})", valores
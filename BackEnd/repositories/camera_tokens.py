@@ -3,11 +3,36 @@
 Persiste apenas o SHA-256 do token. O lookup é pelo hash do token apresentado,
 então não há comparação de segredo em texto — comparação constant-time não se
 aplica aqui.
+
+Cada request da câmera resolve token → sala. Antes isso era um UPDATE de
+`ultimo_uso_em` por request — uma transação de escrita a cada poucos segundos
+por sala, no caminho quente. Agora:
+
+  - cache em memória por hash, com TTL (CAMERA_TOKEN_CACHE_TTL_S). Só token
+    válido entra: token desconhecido sempre vai ao banco, então um token
+    recém-emitido funciona na hora;
+  - `ultimo_uso_em` é anotado em memória e gravado em lote por
+    `gravar_usos_pendentes` (services/agendador.py, a cada minuto) — no máximo
+    uma escrita por token por minuto, por worker;
+  - revogação avisa todos os processos por NOTIFY (infra/escuta_pg.py) e o
+    token para de valer em milissegundos. Sem a escuta, vale o TTL.
 """
 import hashlib
 import secrets
+import threading
+import time
+
+from core.tempo import agora_utc
+from infra.database import DB_INDISPONIVEL, _env_int, get_db_cursor, logger
+from infra.database_async import conexao_async
+from infra.escuta_pg import escuta, notificar
+
+CANAL_REVOGACAO = "camera_tokens_revogados"
+_CACHE_TTL_S = _env_int("CAMERA_TOKEN_CACHE_TTL_S", 60)
 
-from infra.database import DB_INDISPONIVEL, get_db_cursor
+_lock = threading.Lock()
+_cache: dict[str, tuple[str, float]] = {}  # hash -> (sala, expira_em monotonic)
+_usos_pendentes: dict = {}  # hash -> datetime do último uso ainda não gravado
 
 
 def hash_camera_token(token_plain: str) -> str:
@@ -15,26 +40,110 @@ def hash_camera_token(token_plain: str) -> str:
     return hashlib.sha256(token_plain.encode("utf-8")).hexdigest()
 
 
+def _invalidar(token_hash: str) -> None:
+    with _lock:
+        _cache.pop(token_hash, None)
+
+
+def limpar_cache_tokens() -> None:
+    """Esquece todas as salas em cache (reconexão da escuta, testes)."""
+    with _lock:
+        _cache.clear()
+
+
+escuta.inscrever(CANAL_REVOGACAO, _invalidar, ao_reconectar=limpar_cache_tokens)
+
+
+def _sala_em_cache(token_hash: str, agora: float):
+    with _lock:
+        em_cache = _cache.get(token_hash)
+        if em_cache is not None and em_cache[1] > agora:
+            _usos_pendentes[token_hash] = agora_utc()
+            return em_cache[0]
+    return None
+
+
+def _guardar_em_cache(token_hash: str, sala: str, agora: float) -> None:
+    with _lock:
+        _cache[token_hash] = (sala, agora + _CACHE_TTL_S)
+        _usos_pendentes[token_hash] = agora_utc()
+
+
+_SQL_SALA_DO_TOKEN = "SELECT sala FROM camera_tokens WHERE token_hash = %s AND revogado_em IS NULL"
+
+
 def buscar_sala_por_token(token_plain: str):
     """Devolve a sala do token ativo, None se desconhecido/revogado, ou
     DB_INDISPONIVEL se o banco não respondeu — os dois últimos casos têm
     semântica http diferente (403 vs 503) e não podem ser achatados juntos."""
     if not token_plain:
         return None
-    with get_db_cursor(commit=True) as cur:
+    token_hash = hash_camera_token(token_plain)
+    agora = time.monotonic()
+    sala = _sala_em_cache(token_hash, agora)
+    if sala is not None:
+        return sala
+
+    with get_db_cursor(preparar=True) as cur:
         if not cur:
             return DB_INDISPONIVEL
-        cur.execute(
-            """
-            UPDATE camera_tokens
-               SET ultimo_uso_em = NOW()
-             WHERE token_hash = %s AND revogado_em IS NULL
-            RETURNING sala
-            """,
-            (hash_camera_token(token_plain),),
-        )
+        cur.execute(_SQL_SALA_DO_TOKEN, (token_hash,))
         row = cur.fetchone()
-        return row["sala"] if row else None
+    if not row:
+        return None
+    _guardar_em_cache(token_hash, row["sala"], agora)
+    return row["sala"]
+
+
+async def buscar_sala_por_token_async(token_plain: str):
+    """`buscar_sala_por_token` pelo event loop (infra/database_async.py)."""
+    if not token_plain:
+        return None
+    token_hash = hash_camera_token(token_plain)
+    agora = time.monotonic()
+    sala = _sala_em_cache(token_hash, agora)
+    if sala is not None:
+        return sala
+
+    async with conexao_async() as con:
+        if con is None:
+            return DB_INDISPONIVEL
+        row = await con.buscar_um(_SQL_SALA_DO_TOKEN, (token_hash,), preparar=True)
+    if not row:
+        return None
+    _guardar_em_cache(token_hash, row["sala"], agora)
+    return row["sala"]
+
+
+def gravar_usos_pendentes() -> int:
+    """Grava num UPDATE só o último uso de cada token desde a gravação
+    anterior. Devolve quantos tokens foram gravados; em falha, os usos voltam
+    para a próxima rodada (sem sobrescrever um uso mais novo)."""
+    with _lock:
+        if not _usos_pendentes:
+            return 0
+        pendentes = dict(_usos_pendentes)
+        _usos_pendentes.clear()
+    try:
+        with get_db_cursor(commit=True) as cur:
+            if not cur:
+                raise RuntimeError("banco indisponível")
+            cur.execute(
+                """
+                UPDATE camera_tokens AS t
+                   SET ultimo_uso_em = GREATEST(t.ultimo_uso_em, v.uso)
+                  FROM unnest(%s::text[], %s::timestamptz[]) AS v(token_hash, uso)
+                 WHERE t.token_hash = v.token_hash
+                """,
+                (list(pendentes), list(pendentes.values())),
+            )
+    except Exception as e:
+        logger.warning("Uso de token da câmera não gravado, fica para a próxima: %s", e)
+        with _lock:
+            for token_hash, uso in pendentes.items():
+                _usos_pendentes.setdefault(token_hash, uso)
+        return 0
+    return len(pendentes)
 
 
 def emitir_token(sala: str, descricao: str | None = None) -> str:
@@ -82,7 +191,13 @@ def revogar_token(token_id: int):
             return DB_INDISPONIVEL
         cur.execute(
             "UPDATE camera_tokens SET revogado_em = NOW() "
-            "WHERE id = %s AND revogado_em IS NULL RETURNING id",
+            "WHERE id = %s AND revogado_em IS NULL RETURNING token_hash",
             (token_id,),
         )
-        return cur.fetchone() is not None
+        row = cur.fetchone()
+        if row is None:
+            return False
+        # Sai no commit: os workers da API derrubam o token do cache deles.
+        notificar(cur, CANAL_REVOGACAO, row["token_hash"])
+    _invalidar(row["token_hash"])
+    return True
@@ -3,9 +3,52 @@ import math
 from datetime import datetime as dt, date
 
 from infra.database import DB_INDISPONIVEL, get_db_cursor, logger
+from infra.database_async import conexao_async
+from infra.escuta_pg import escuta
+from repositories.eventos_chamada import avisar_fechamento
+from repositories.indice_salas import CANAL_CHAMADAS_SALA, IndiceChamadasPorSala, avisar_mudanca
+from repositories.jobs import enfileirar_jobs
+
+
+_SQL_CHAMADAS_ABERTAS = """
+    SELECT DISTINCT c.chamada_id, c.data_criacao, h.sala, h.dia_semana
+    FROM Chamadas c
+    JOIN horarios_aulas h ON h.turma_id = c.turma_id
+    WHERE c.status = 'Aberta'
+    ORDER BY c.data_criacao DESC NULLS LAST, c.chamada_id DESC
+"""
+
+
+def _carregar_chamadas_abertas():
+    """Todas as chamadas abertas com a sala/dia dos horários da turma, para o
+    índice por sala. Mesma ordem de preferência de obter_chamada_aberta_por_sala."""
+    with get_db_cursor(preparar=True) as cur:
+        if not cur:
+            return DB_INDISPONIVEL
+        cur.execute(_SQL_CHAMADAS_ABERTAS)
+        return cur.fetchall()
+
+
+async def _carregar_chamadas_abertas_async():
+    async with conexao_async() as con:
+        if con is None:
+            return DB_INDISPONIVEL
+        return await con.buscar_todos(_SQL_CHAMADAS_ABERTAS, preparar=True)
+
 
+indice_salas = IndiceChamadasPorSala(
+    _carregar_chamadas_abertas, carregar_async=_carregar_chamadas_abertas_async
+)
+escuta.inscrever(CANAL_CHAMADAS_SALA, indice_salas.invalidar, ao_reconectar=indice_salas.invalidar)
 
-def fechar_chamadas_abertas_por_turma(turma_id):
+
+def fechar_chamadas_abertas_por_turma(turma_id, jobs_encerramento=None):
+    """Fecha as chamadas abertas da turma; devolve quantas fechou.
+
+    `jobs_encerramento(chamada_ids) -> jobs` (services.notificacoes) recebe as
+    chamadas que ESTE UPDATE fechou, e os jobs de push vão para a fila no
+    mesmo commit: fechada sem aviso, ou aviso de chamada que não fechou, não
+    acontece."""
     with get_db_cursor(commit=True) as cur:
         if not cur:
             return 0
@@ -13,10 +56,21 @@ def fechar_chamadas_abertas_por_turma(turma_id):
             """
             UPDATE Chamadas SET status='Fechada', horario_fim=CURRENT_TIME
             WHERE turma_id=%s AND status='Aberta'
+            RETURNING chamada_id
             """,
             (turma_id,),
         )
-        return cur.rowcount
+        ids = [r["chamada_id"] for r in cur.fetchall()]
+        fechadas = len(ids)
+        if fechadas:
+            avisar_mudanca(cur)
+            avisar_fechamento(cur, ids)
+            if jobs_encerramento:
+                enfileirar_jobs(cur, jobs_encerramento(ids))
+    if fechadas:
+        # Este worker não espera o próprio NOTIFY voltar pela escuta.
+        indice_salas.invalidar()
+    return fechadas
 
 
 def abrir_chamada_para_turma(turma_id, professor_id):
@@ -71,7 +125,12 @@ def abrir_chamada_para_turma(turma_id, professor_id):
             (turma_id, professor_id, total_aulas),
         )
         nova = cur.fetchone()
-        return nova["chamada_id"] if nova else None
+        if nova:
+            avisar_mudanca(cur)
+    if not nova:
+        return None
+    indice_salas.invalidar()
+    return nova["chamada_id"]
 
 
 def obter_chamada_aberta_com_disciplina(turma_id):
@@ -129,40 +188,78 @@ def obter_chamada_aberta_por_sala(sala):
     Devolve DB_INDISPONIVEL (não None) se o banco não respondeu: os chamadores
     tratam essa recusa como transitória (503), não como "sem chamada aberta"
     (que resultaria em 403 definitivo na câmera durante um blip de banco).
+
+    Responde do índice em memória do worker (repositories/indice_salas.py),
+    sem consulta por request; cai na consulta direta só sem a escuta do NOTIFY.
     """
-    with get_db_cursor() as cur:
+    candidatas = indice_salas.candidatas(sala, _dia_semana_hoje())
+    if candidatas is None:
+        candidatas = _candidatas_por_sala_no_banco(sala)
+    return _escolher_candidata(sala, candidatas)
+
+
+async def obter_chamada_aberta_por_sala_async(sala):
+    """`obter_chamada_aberta_por_sala` pelo event loop (DB_ASYNC=1): mesmo
+    índice, e a recarga/consulta direta sem passar pelo threadpool."""
+    candidatas = await indice_salas.candidatas_async(sala, _dia_semana_hoje())
+    if candidatas is None:
+        async with conexao_async() as con:
+            if con is None:
+                candidatas = DB_INDISPONIVEL
+            else:
+                linhas = await con.buscar_todos(_SQL_CANDIDATAS_POR_SALA, (sala,), preparar=True)
+                candidatas = [linha["chamada_id"] for linha in linhas]
+    return _escolher_candidata(sala, candidatas)
+
+
+def _escolher_candidata(sala, candidatas):
+    if candidatas is DB_INDISPONIVEL:
+        return DB_INDISPONIVEL
+    if not candidatas:
+        return None
+    if len(candidatas) > 1:
+        logger.warning(
+            "Sala %s com %d chamadas abertas hoje (candidatas=%s); "
+            "usando a mais recente: %s. Provável chamada esquecida aberta.",
+            sala,
+            len(candidatas),
+            candidatas,
+            candidatas[0],
+        )
+    return {"chamada_id": candidatas[0]}
+
+
+def _dia_semana_hoje():
+    """Dia da semana de hoje (segunda=0) no fuso das sessões do banco — o
+    mesmo `(EXTRACT(DOW FROM CURRENT_DATE)::int + 6) % 7` da consulta direta."""
+    import zoneinfo
+
+    return datetime.datetime.now(zoneinfo.ZoneInfo("America/Sao_Paulo")).weekday()
+
+
+# Sem LIMIT de propósito: são poucas linhas (chamadas abertas de uma sala num
+# dia) e precisamos enxergar TODAS as candidatas para logar. NULLS LAST +
+# chamada_id como desempate: data_criacao é DEFAULT, não NOT NULL, e no DESC o
+# Postgres traria NULL primeiro — uma linha antiga sem data ganharia da
+# chamada de agora.
+_SQL_CANDIDATAS_POR_SALA = """
+    SELECT DISTINCT c.chamada_id, c.data_criacao
+    FROM Chamadas c
+    JOIN horarios_aulas h ON h.turma_id = c.turma_id
+    WHERE c.status = 'Aberta'
+    AND h.sala = %s
+    AND h.dia_semana = (EXTRACT(DOW FROM CURRENT_DATE)::int + 6) %% 7
+    ORDER BY c.data_criacao DESC NULLS LAST, c.chamada_id DESC
+"""
+
+
+def _candidatas_por_sala_no_banco(sala):
+    """Consulta direta, usada quando o índice está indisponível (sem escuta)."""
+    with get_db_cursor(preparar=True) as cur:
         if not cur:
             return DB_INDISPONIVEL
-        # Sem LIMIT de propósito: são poucas linhas (chamadas abertas de uma
-        # sala num dia) e precisamos enxergar TODAS as candidatas para logar.
-        # NULLS LAST + chamada_id como desempate: data_criacao é DEFAULT, não
-        # NOT NULL, e no DESC o Postgres traria NULL primeiro — uma linha
-        # antiga sem data ganharia da chamada de agora.
-        cur.execute(
-            """
-            SELECT DISTINCT c.chamada_id, c.data_criacao
-            FROM Chamadas c
-            JOIN horarios_aulas h ON h.turma_id = c.turma_id
-            WHERE c.status = 'Aberta'
-            AND h.sala = %s
-            AND h.dia_semana = (EXTRACT(DOW FROM CURRENT_DATE)::int + 6) %% 7
-            ORDER BY c.data_criacao DESC NULLS LAST, c.chamada_id DESC
-            """,
-            (sala,),
-        )
-        candidatas = cur.fetchall()
-        if not candidatas:
-            return None
-        if len(candidatas) > 1:
-            logger.warning(
-                "Sala %s com %d chamadas abertas hoje (candidatas=%s); "
-                "usando a mais recente: %s. Provável chamada esquecida aberta.",
-                sala,
-                len(candidatas),
-                [linha["chamada_id"] for linha in candidatas],
-                candidatas[0]["chamada_id"],
-            )
-        return {"chamada_id": candidatas[0]["chamada_id"]}
+        cur.execute(_SQL_CANDIDATAS_POR_SALA, (sala,))
+        return [linha["chamada_id"] for linha in cur.fetchall()]
 
 
 def listar_alunos_da_chamada(chamada_id):
@@ -229,15 +326,54 @@ def listar_historico_chamadas_aluno(aluno_id, turma_id):
         return cur.fetchall()
 
 
-def fechar_chamadas_expiradas(agora=None):
+def listar_prazos_chamadas_abertas(agora=None):
+    """{chamada_id: horario_fim} das chamadas abertas hoje que o fechamento
+    automático vai encerrar, ou DB_INDISPONIVEL.
+
+    O prazo é o mesmo critério de `fechar_chamadas_expiradas`: o menor
+    horario_fim da turma no dia da semana de hoje. Chamada sem horário no dia
+    não tem prazo (e nunca foi fechada por horário).
+    """
+    if agora is None:
+        import zoneinfo
+
+        agora = datetime.datetime.now(zoneinfo.ZoneInfo("America/Sao_Paulo"))
+
+    with get_db_cursor() as cur:
+        if not cur:
+            return DB_INDISPONIVEL
+        cur.execute(
+            """
+            SELECT c.chamada_id, MIN(h.horario_fim) AS horario_fim
+            FROM Chamadas c
+            JOIN horarios_aulas h ON h.turma_id = c.turma_id
+            WHERE c.status = 'Aberta'
+              AND c.data_chamada = CURRENT_DATE
+              AND h.dia_semana = %s
+            GROUP BY c.chamada_id
+            """,
+            (agora.weekday(),),
+        )
+        return {linha["chamada_id"]: linha["horario_fim"] for linha in cur.fetchall()}
+
+
+def fechar_chamadas_expiradas(agora=None, chamada_ids=None, jobs_encerramento=None):
     """Fecha chamadas abertas cujo horario_fim do horario_aula já passou.
 
-    Com -w 4, todos os workers do gunicorn correm este SELECT e disputam o
-    UPDATE das mesmas linhas; o retorno não é "todas as expiradas", é só as
-    que ESTE worker conseguiu marcar como 'Fechada' (rowcount == 1) — as que
-    outro worker já fechou primeiro ficam de fora. O chamador usa o retorno
-    para decidir quais chamadas notificar; devolver uma chamada que outro
-    worker já fechou duplicaria a notificação.
+    `chamada_ids` restringe às chamadas cujo prazo venceu na roda de
+    expiração (services/expiracao_chamadas.py); o critério de horário
+    continua valendo para elas.
+
+    Roda só no worker líder do agendador (services/agendador.py), mas o
+    professor pode finalizar a mesma chamada no mesmo instante, e numa troca
+    de líder dois workers podem rodar juntos por um ciclo. Por isso o retorno
+    não é "todas as expiradas": é só as que ESTE UPDATE marcou como 'Fechada'
+    (RETURNING). Devolver uma chamada que outro já fechou duplicaria a
+    notificação.
+
+    `jobs_encerramento(chamada_ids) -> jobs` recebe essas mesmas chamadas, e
+    os jobs de push vão para a fila no commit do UPDATE: o líder que cai
+    entre fechar e enfileirar não deixa mais chamada fechada sem aviso.
     """
     if agora is None:
         import zoneinfo
@@ -260,28 +396,30 @@ def fechar_chamadas_expiradas(agora=None):
                   AND c.data_chamada = CURRENT_DATE
                   AND h.dia_semana = %s
                   AND h.horario_fim < %s
+                  AND (%s::int[] IS NULL OR c.chamada_id = ANY(%s::int[]))
                 ORDER BY c.chamada_id
                 """,
-                (agora.weekday(), agora.time()),
+                (agora.weekday(), agora.time(), chamada_ids, chamada_ids),
             )
             expiradas = cur.fetchall()
 
             if not expiradas:
                 return []
 
+            # Um UPDATE para todas, e o claim continua no WHERE: em READ
+            # COMMITTED, quem perde a corrida re-avalia status='Aberta' após o
+            # commit do outro e não devolve a linha.
+            cur.execute(
+                """
+                UPDATE Chamadas SET status='Fechada', horario_fim=CURRENT_TIME
+                WHERE chamada_id = ANY(%s) AND status = 'Aberta'
+                RETURNING chamada_id
+                """,
+                ([row["chamada_id"] for row in expiradas],),
+            )
+            reivindicadas = {linha["chamada_id"] for linha in cur.fetchall()}
             for row in expiradas:
-                cur.execute(
-                    """
-                    UPDATE Chamadas SET status='Fechada', horario_fim=CURRENT_TIME
-                    WHERE chamada_id = %s AND status = 'Aberta'
-                    """,
-                    (row["chamada_id"],),
-                )
-                # O UPDATE é o claim: com -w 4 os quatro workers chegam aqui, mas
-                # em READ COMMITTED o perdedor re-avalia o WHERE após o commit do
-                # vencedor, vê 'Fechada' e afeta 0 linhas. Sem esta guarda todos
-                # devolviam a chamada e o aluno recebia 4 pushes.
-                if cur.rowcount != 1:
+                if row["chamada_id"] not in reivindicadas:
                     continue
                 fechadas.append(dict(row))
                 logger.info(
@@ -290,10 +428,18 @@ def fechar_chamadas_expiradas(agora=None):
                     row["turma_id"],
                     row["nome_disciplina"],
                 )
+            if fechadas:
+                ids = [f["chamada_id"] for f in fechadas]
+                avisar_mudanca(cur)
+                avisar_fechamento(cur, ids)
+                if jobs_encerramento:
+                    enfileirar_jobs(cur, jobs_encerramento(ids))
     except Exception as e:
         logger.error("Erro ao fechar chamadas expiradas: %s", e)
         return []
 
+    if fechadas:
+        indice_salas.invalidar()
     return fechadas
 
 
@@ -0,0 +1,134 @@
+"""Eventos de presença por chamada, para a tela do professor ao vivo.
+
+A tela da chamada aberta (app: lista-presencas) perguntava o status a cada 3 s
+— quatro conexões do pool por batida, por professor olhando. Agora quem grava
+presença (câmera, individual ou em lote; ajuste do professor) e quem fecha
+chamada manda NOTIFY `presencas_chamada` na mesma transação, com o estado
+final das aulas de cada aluno tocado. A escuta de infra/escuta_pg.py entrega o
+aviso a todos os workers, e a `CentralEventosChamada` de cada um repassa só
+para os streams abertos daquela chamada (GET /chamadas/{id}/eventos).
+
+O payload carrega o estado, não o delta ("aluno X tem as aulas [1, 2]"):
+aplicar o mesmo evento duas vezes dá o mesmo resultado. O NOTIFY aceita até
+8000 bytes; os alunos saem em blocos de `_ALUNOS_POR_AVISO`.
+
+Aviso perdido (escuta reconectando, fila do stream cheia) vira
+"ressincronizar": o stream relê o estado do banco uma vez.
+"""
+import asyncio
+import json
+import threading
+
+from infra.database import logger
+from infra.escuta_pg import escuta, notificar, notificar_async
+
+CANAL_PRESENCAS = "presencas_chamada"
+
+# ~75 bytes por aluno (uuid + aulas): 50 fica com folga abaixo de 8000.
+_ALUNOS_POR_AVISO = 50
+# Stream que não consome (cliente lento) não segura memória do worker.
+_FILA_MAX = 256
+
+EVENTO_PRESENCA = "presenca"
+EVENTO_FECHADA = "fechada"
+EVENTO_RESSINCRONIZAR = "ressincronizar"
+
+
+def avisar_presencas(cur, chamada_id, aulas_por_aluno: dict, tipo_registro: str) -> None:
+    """`aulas_por_aluno`: {aluno_id: aulas presentes após a transação}.
+    Lista vazia = aluno ficou ausente."""
+    for payload in _payloads_presencas(chamada_id, aulas_por_aluno, tipo_registro):
+        notificar(cur, CANAL_PRESENCAS, payload)
+
+
+async def avisar_presencas_async(con, chamada_id, aulas_por_aluno: dict, tipo_registro: str) -> None:
+    """`avisar_presencas` numa conexão de infra/database_async.py."""
+    for payload in _payloads_presencas(chamada_id, aulas_por_aluno, tipo_registro):
+        await notificar_async(con, CANAL_PRESENCAS, payload)
+
+
+def _payloads_presencas(chamada_id, aulas_por_aluno: dict, tipo_registro: str):
+    alunos = [(str(a), sorted(aulas)) for a, aulas in aulas_por_aluno.items()]
+    for i in range(0, len(alunos), _ALUNOS_POR_AVISO):
+        yield json.dumps({
+            "evento": EVENTO_PRESENCA,
+            "chamada_id": chamada_id,
+            "tipo_registro": tipo_registro,
+            "alunos": dict(alunos[i:i + _ALUNOS_POR_AVISO]),
+        }, separators=(",", ":"))
+
+
+def avisar_fechamento(cur, chamada_ids) -> None:
+    for chamada_id in chamada_ids:
+        notificar(cur, CANAL_PRESENCAS, json.dumps(
+            {"evento": EVENTO_FECHADA, "chamada_id": chamada_id}, separators=(",", ":")
+        ))
+
+
+class CentralEventosChamada:
+    def __init__(self, escuta_ativa=None):
+        self._escuta_ativa = escuta_ativa or (lambda: escuta.conectado)
+        self._lock = threading.Lock()
+        # chamada_id -> {(loop, fila)}
+        self._inscritos: dict[int, set] = {}
+
+    def ativo(self) -> bool:
+        """Escuta de pé: avisos de outros workers chegam a este."""
+        return bool(self._escuta_ativa())
+
+    def inscrever(self, chamada_id: int):
+        """Fila (asyncio) dos eventos da chamada. Chame no loop que vai lê-la
+        e devolva com `cancelar`."""
+        loop = asyncio.get_running_loop()
+        item = (loop, asyncio.Queue(maxsize=_FILA_MAX))
+        with self._lock:
+            self._inscritos.setdefault(int(chamada_id), set()).add(item)
+        return item
+
+    def cancelar(self, chamada_id: int, item) -> None:
+        with self._lock:
+            inscritos = self._inscritos.get(int(chamada_id))
+            if inscritos is not None:
+                inscritos.discard(item)
+                if not inscritos:
+                    del self._inscritos[int(chamada_id)]
+
+    def ao_notificar(self, payload: str) -> None:
+        try:
+            evento = json.loads(payload)
+            chamada_id = int(evento["chamada_id"])
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning("Aviso de presença malformado ignorado (%s): %r", e, payload[:200])
+            return
+        with self._lock:
+            inscritos = list(self._inscritos.get(chamada_id, ()))
+        self._entregar(inscritos, evento)
+
+    def ao_reconectar(self) -> None:
+        with self._lock:
+            inscritos = [i for itens in self._inscritos.values() for i in itens]
+        self._entregar(inscritos, {"evento": EVENTO_RESSINCRONIZAR})
+
+    @staticmethod
+    def _entregar(inscritos, evento) -> None:
+        # Chega pela thread da escuta: a fila só pode ser tocada no loop dela.
+        for loop, fila in inscritos:
+            try:
+                loop.call_soon_threadsafe(_enfileirar, fila, evento)
+            except RuntimeError:
+                pass  # loop já encerrado
+
+
+def _enfileirar(fila: asyncio.Queue, evento: dict) -> None:
+    try:
+        fila.put_nowait(evento)
+    except asyncio.QueueFull:
+        # Cliente não acompanha: descarta o atrasado e pede releitura.
+        while not fila.empty():
+            fila.get_nowait()
+        fila.put_nowait({"evento": EVENTO_RESSINCRONIZAR})
+
+
+# Uma central por processo, como a escuta.
+central_eventos = CentralEventosChamada()
+escuta.inscrever(CANAL_PRESENCAS, central_eventos.ao_notificar, ao_reconectar=central_eventos.ao_reconectar)
@@ -1,4 +1,5 @@
 from infra.database import get_db_cursor
+from repositories.indice_salas import avisar_mudanca
 
 
 def listar_horarios_completos():
@@ -29,6 +30,8 @@ def inserir_horario(turma_id, dia_semana, horario_inicio, horario_fim, sala):
             """,
             (turma_id, dia_semana, horario_inicio, horario_fim, sala),
         )
+        # Sala/dia da turma mudou: o índice de chamadas por sala recarrega.
+        avisar_mudanca(cur)
         return True
 
 
@@ -84,7 +87,10 @@ def excluir_horario(horario_id):
         if not cur:
             return 0
         cur.execute("DELETE FROM horarios_aulas WHERE horario_id = %s", (horario_id,))
-        return cur.rowcount
+        excluidos = cur.rowcount
+        if excluidos:
+            avisar_mudanca(cur)
+        return excluidos
 
 
 def existe_aula_no_horario_atual_para_turma(turma_id):
@@ -0,0 +1,174 @@
+"""Índice em memória das chamadas abertas por (sala, dia_semana).
+
+Cada câmera pergunta "qual a chamada aberta da minha sala?" a cada 5 s, e o
+registro de presença pergunta de novo a cada aluno. Eram um JOIN Chamadas ×
+horarios_aulas por request, para um dado que muda poucas vezes por hora
+(abrir, fechar, fechamento automático).
+
+Cada worker carrega o índice inteiro numa consulta e o mantém até alguém
+avisar que mudou: quem abre/fecha chamada ou mexe em horário manda NOTIFY
+(`avisar_mudanca`) na mesma transação, e a escuta de infra/escuta_pg.py
+invalida o índice de todos os workers. A recarga seguinte é uma consulta só.
+
+O índice só é usado enquanto a escuta está conectada: sem ela não há como
+saber que outro worker abriu uma chamada, e `candidatas` devolve None para o
+chamador cair na consulta direta — o comportamento de antes, nunca um dado
+velho. Na reconexão da escuta ele é invalidado (aviso perdido com a conexão
+caída). A geração evita que uma recarga que começou ANTES do aviso marque
+como atual um retrato já velho.
+
+A mesma invalidação acorda quem espera mudança (`aguardar_mudanca`): o
+long-poll da câmera em /chamadas/aberta/sala/aguardar fica parado no loop do
+asyncio, sem thread nem consulta, até um aviso chegar.
+"""
+import asyncio
+import threading
+import time
+
+from infra.database import DB_INDISPONIVEL
+from infra.escuta_pg import escuta, notificar
+
+CANAL_CHAMADAS_SALA = "chamadas_por_sala"
+
+
+def avisar_mudanca(cur) -> None:
+    """Chamada aberta/fechada ou horário alterado: sai no commit de `cur`."""
+    notificar(cur, CANAL_CHAMADAS_SALA)
+
+
+class IndiceChamadasPorSala:
+    def __init__(self, carregar, idade_max_s: float = 300.0, escuta_ativa=None, carregar_async=None):
+        # carregar() -> linhas {chamada_id, sala, dia_semana} já na ordem de
+        # preferência (mais recente primeiro), ou DB_INDISPONIVEL.
+        # carregar_async: o mesmo, como corrotina (candidatas_async).
+        self._carregar = carregar
+        self._carregar_async = carregar_async
+        self._idade_max_s = idade_max_s
+        self._escuta_ativa = escuta_ativa or (lambda: escuta.conectado)
+        self._lock = threading.Lock()
+        self._recarga = threading.Lock()
+        self._por_chave: dict[tuple[str, int], list] = {}
+        self._geracao = 0
+        self._geracao_carregada = -1
+        self._carregado_em = 0.0
+        # (loop, futuro) de cada `aguardar_mudanca` pendente.
+        self._esperando: set = set()
+        # loop -> (geração, tarefa) da recarga assíncrona em curso.
+        self._recargas_async: dict = {}
+
+    @property
+    def geracao(self) -> int:
+        with self._lock:
+            return self._geracao
+
+    def ativo(self) -> bool:
+        """Escuta de pé: avisos de mudança chegam a este worker."""
+        return bool(self._escuta_ativa())
+
+    def invalidar(self, _payload=None) -> None:
+        with self._lock:
+            self._geracao += 1
+            esperando, self._esperando = self._esperando, set()
+        # Chega pela thread da escuta: o futuro só pode ser tocado no loop dele.
+        for loop, futuro in esperando:
+            try:
+                loop.call_soon_threadsafe(_acordar, futuro)
+            except RuntimeError:
+                pass  # loop já encerrado
+
+    async def aguardar_mudanca(self, geracao: int, timeout: float) -> bool:
+        """Espera a geração passar de `geracao`. False = timeout sem aviso.
+
+        Leia `geracao` ANTES de consultar o estado que vai comparar: um aviso
+        que chegue entre a consulta e a espera faz esta voltar na hora.
+        """
+        loop = asyncio.get_running_loop()
+        item = (loop, loop.create_future())
+        with self._lock:
+            if self._geracao != geracao:
+                return True
+            self._esperando.add(item)
+        try:
+            await asyncio.wait_for(item[1], timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._esperando.discard(item)
+
+    def _consultar(self, sala, dia_semana):
+        with self._lock:
+            if (self._geracao_carregada == self._geracao
+                    and time.monotonic() - self._carregado_em < self._idade_max_s):
+                return list(self._por_chave.get((sala, dia_semana), ()))
+        return None
+
+    def candidatas(self, sala: str, dia_semana: int):
+        """chamada_ids abertos para a sala no dia, mais recente primeiro.
+
+        None = índice indisponível (sem escuta): consulte o banco direto.
+        DB_INDISPONIVEL = precisava recarregar e o banco não respondeu.
+        """
+        if not self._escuta_ativa():
+            return None
+        resultado = self._consultar(sala, dia_semana)
+        if resultado is not None:
+            return resultado
+        # Uma recarga por vez: os requests que chegam juntos esperam a dela.
+        with self._recarga:
+            resultado = self._consultar(sala, dia_semana)
+            if resultado is not None:
+                return resultado
+            with self._lock:
+                geracao = self._geracao
+            linhas = self._carregar()
+            if linhas is DB_INDISPONIVEL:
+                return DB_INDISPONIVEL
+            return self._instalar(linhas, geracao, sala, dia_semana)
+
+    async def candidatas_async(self, sala: str, dia_semana: int):
+        """`candidatas` com a recarga pelo event loop (DB_ASYNC=1).
+
+        Uma recarga por vez por loop: o aviso acorda todos os long-polls
+        juntos, e sem isso cada um recarregaria o índice inteiro.
+        """
+        if not self._escuta_ativa():
+            return None
+        resultado = self._consultar(sala, dia_semana)
+        if resultado is not None:
+            return resultado
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            geracao = self._geracao
+            recarga = self._recargas_async.get(loop)
+            if recarga is None or recarga[0] != geracao:
+                recarga = (geracao, loop.create_task(self._carregar_async()))
+                self._recargas_async[loop] = recarga
+        try:
+            # shield: o cancelamento de um request não derruba a recarga dos outros.
+            linhas = await asyncio.shield(recarga[1])
+        finally:
+            with self._lock:
+                if recarga[1].done() and self._recargas_async.get(loop) is recarga:
+                    del self._recargas_async[loop]
+        if linhas is DB_INDISPONIVEL:
+            return DB_INDISPONIVEL
+        return self._instalar(linhas, recarga[0], sala, dia_semana)
+
+    def _instalar(self, linhas, geracao, sala, dia_semana):
+        por_chave: dict[tuple[str, int], list] = {}
+        for linha in linhas:
+            por_chave.setdefault((linha["sala"], linha["dia_semana"]), []).append(
+                linha["chamada_id"]
+            )
+        with self._lock:
+            self._por_chave = por_chave
+            self._geracao_carregada = geracao
+            self._carregado_em = time.monotonic()
+        return list(por_chave.get((sala, dia_semana), ()))
+
+
+def _acordar(futuro) -> None:
+    if not futuro.done():
+        futuro.set_result(None)
@@ -0,0 +1,212 @@
+"""Fila de jobs no Postgres (tabela `jobs`, ver services/fila_jobs.py).
+
+Enfileirar roda no cursor da transação que gerou o job e manda NOTIFY `jobs`
+nela, com o tipo no payload: o job existe se e só se a mudança foi confirmada,
+e o consumidor acorda no commit em vez de esperar a próxima varredura.
+
+Busca por `FOR UPDATE SKIP LOCKED` e marca como 'executando' com um lease
+(`travado_em`), confirmando logo em seguida: o envio para a Expo/Resend roda
+sem transação aberta e sem conexão presa. Consumidor que morre no meio deixa
+o job 'executando'; `recuperar_jobs_travados` devolve à fila o que passou do
+lease.
+"""
+import json
+
+from infra.database import get_db_cursor
+from infra.escuta_pg import notificar, notificar_async
+
+CANAL_JOBS = "jobs"
+
+_SQL_ENFILEIRAR = """
+    INSERT INTO jobs (tipo, payload, max_tentativas)
+    SELECT * FROM unnest(%s::text[], %s::jsonb[], %s::int[])
+"""
+
+
+def _colunas(jobs):
+    """[(tipo, payload, max_tentativas)] -> os três arrays do unnest."""
+    return (
+        [j[0] for j in jobs],
+        [json.dumps(j[1], separators=(",", ":")) for j in jobs],
+        [j[2] for j in jobs],
+    )
+
+
+def enfileirar_jobs(cur, jobs) -> None:
+    """Grava `jobs` = [(tipo, payload dict, max_tentativas)] num INSERT só,
+    no cursor de quem chama: o job entra no mesmo commit da mudança que o
+    gerou (presença, fechamento). Rollback dela = nenhum job; commit = job
+    gravado, mesmo que o processo morra logo depois."""
+    if not jobs:
+        return
+    cur.execute(_SQL_ENFILEIRAR, _colunas(jobs))
+    for tipo in sorted({j[0] for j in jobs}):
+        notificar(cur, CANAL_JOBS, tipo)
+
+
+async def enfileirar_jobs_async(con, jobs) -> None:
+    """`enfileirar_jobs` na transação aberta de uma conexão do event loop
+    (infra/database_async.py)."""
+    if not jobs:
+        return
+    await con.executar(_SQL_ENFILEIRAR, _colunas(jobs), preparar=True)
+    for tipo in sorted({j[0] for j in jobs}):
+        await notificar_async(con, CANAL_JOBS, tipo)
+
+
+def enfileirar_jobs_avulsos(jobs) -> bool:
+    """`enfileirar_jobs` em transação própria, para job que não acompanha
+    mudança nenhuma (tokens reenfileirados por um executor). False com o
+    banco fora."""
+    if not jobs:
+        return True
+    with get_db_cursor(commit=True) as cur:
+        if not cur:
+            return False
+        enfileirar_jobs(cur, jobs)
+        return True
+
+
+def reivindicar_jobs(tipo: str, limite: int, dono: str):
+    """Até `limite` jobs vencidos de `tipo`, já marcados como deste `dono`.
+    Lista vazia com o banco fora."""
+    with get_db_cursor(commit=True) as cur:
+        if not cur:
+            return []
+        cur.execute(
+            """
+            UPDATE jobs
+               SET status = 'executando', tentativas = tentativas + 1,
+                   travado_em = NOW(), travado_por = %s
+             WHERE id IN (
+                SELECT id FROM jobs
+                 WHERE tipo = %s AND status = 'pendente' AND executar_em <= NOW()
+                 ORDER BY executar_em, id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+             )
+            RETURNING id, tipo, payload, tentativas, max_tentativas
+            """,
+            (dono, tipo, limite),
+        )
+        return cur.fetchall()
+
+
+def concluir_job(job_id) -> bool:
+    with get_db_cursor(commit=True) as cur:
+        if not cur:
+            return False
+        cur.execute("DELETE FROM jobs WHERE id = %s", (job_id,))
+        return True
+
+
+def falhar_job(job_id, erro: str, atraso_s: float) -> bool:
+    """Volta o job para a fila daqui a `atraso_s`, ou o marca como morto se
+    esta foi a última tentativa."""
+    with get_db_cursor(commit=True) as cur:
+        if not cur:
+            return False
+        cur.execute(
+            """
+            UPDATE jobs
+               SET status = CASE WHEN tentativas >= max_tentativas THEN 'morto' ELSE 'pendente' END,
+                   executar_em = CASE WHEN tentativas >= max_tentativas THEN NOW()
+                                      ELSE NOW() + (%s * INTERVAL '1 second') END,
+                   travado_em = NULL, travado_por = NULL,
+                   ultimo_erro = %s
+             WHERE id = %s
+            """,
+            (atraso_s, erro[:2000], job_id),
+        )
+        return True
+
+
+def recuperar_jobs_travados(lease_s: float) -> int:
+    """Jobs 'executando' há mais de `lease_s` (consumidor morreu): voltam à
+    fila, ou viram mortos se já gastaram as tentativas."""
+    with get_db_cursor(commit=True) as cur:
+        if not cur:
+            return 0
+        cur.execute(
+            """
+            UPDATE jobs
+               SET status = CASE WHEN tentativas >= max_tentativas THEN 'morto' ELSE 'pendente' END,
+                   executar_em = NOW(),
+                   ultimo_erro = 'lease expirado (consumidor ' || COALESCE(travado_por, '?') || ')',
+                   travado_em = NULL, travado_por = NULL
+             WHERE status = 'executando'
+               AND travado_em < NOW() - (%s * INTERVAL '1 second')
+            """,
+            (lease_s,),
+        )
+        return cur.rowcount
+
+
+def resumir_jobs():
+    """[{tipo, status, total, mais_antigo_em}] da fila inteira."""
+    with get_db_cursor() as cur:
+        if not cur:
+            return []
+        cur.execute(
+            """
+            SELECT tipo, status, COUNT(*) AS total, MIN(criado_em) AS mais_antigo_em
+            FROM jobs
+            GROUP BY tipo, status
+            ORDER BY tipo, status
+            """
+        )
+        return cur.fetchall()
+
+
+def listar_jobs_mortos(tipo=None, limite=100):
+    with get_db_cursor() as cur:
+        if not cur:
+            return []
+        cur.execute(
+            """
+            SELECT id, tipo, payload, tentativas, ultimo_erro, criado_em, ultima_tentativa_em
+            FROM jobs_mortos
+            WHERE (%s::text IS NULL OR tipo = %s)
+            ORDER BY ultima_tentativa_em DESC
+            LIMIT %s
+            """,
+            (tipo, tipo, limite),
+        )
+        return cur.fetchall()
+
+
+def reenfileirar_jobs_mortos(job_ids) -> int:
+    """Mortos voltam à fila com as tentativas zeradas (depois de corrigida a
+    causa: token da Expo, chave do Resend)."""
+    if not job_ids:
+        return 0
+    with get_db_cursor(commit=True) as cur:
+        if not cur:
+            return 0
+        cur.execute(
+            """
+            UPDATE jobs
+               SET status = 'pendente', tentativas = 0, executar_em = NOW()
+             WHERE id = ANY(%s) AND status = 'morto'
+            RETURNING tipo
+            """,
+            (list(job_ids),),
+        )
+        linhas = cur.fetchall()
+        for tipo in sorted({linha["tipo"] for linha in linhas}):
+            notificar(cur, CANAL_JOBS, tipo)
+        return len(linhas)
+
+
+def purgar_jobs_mortos(idade_dias: int) -> int:
+    """Apaga mortos mais velhos que `idade_dias`: o payload tem e-mail e nome
+    de aluno, e não fica para sempre."""
+    with get_db_cursor(commit=True) as cur:
+        if not cur:
+            return 0
+        cur.execute(
+            "DELETE FROM jobs WHERE status = 'morto' "
+            "AND executar_em < NOW() - (%s * INTERVAL '1 day')",
+            (idade_dias,),
+        )
+        return cur.rowcount
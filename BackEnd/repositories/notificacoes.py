@@ -1,4 +1,4 @@
-from infra.database import get_db_cursor
+from infra.database import DB_INDISPONIVEL, get_db_cursor
 from psycopg2.extras import execute_values
 
 
@@ -20,29 +20,33 @@ def upsert_push_token(usuario_id, expo_token):
 
 
 def obter_push_token_por_usuario(usuario_id):
+    """Linha com expo_token, None sem token, ou DB_INDISPONIVEL."""
     with get_db_cursor() as cur:
         if not cur:
-            return None
+            return DB_INDISPONIVEL
         cur.execute("SELECT expo_token FROM PushTokens WHERE usuario_id = %s", (usuario_id,))
         return cur.fetchone()
 
 
-def remover_push_token(expo_token):
-    """Apaga um push token morto (DeviceNotRegistered). Por token, não por
-    usuário: evita apagar um re-registro feito entre o envio e a poda.
+def remover_push_token(expo_tokens):
+    """Apaga push tokens mortos (DeviceNotRegistered) num DELETE só; retorna
+    quantos saíram. Por token, não por usuário: evita apagar um re-registro
+    feito entre o envio e a poda.
     Ressalva: se a reinstalação reemitir o MESMO token (string idêntica), a
     deleção por token ainda remove a linha recém-criada; a janela do receipt
     (minutos a horas) amplia essa lacuna em relação ao caminho síncrono."""
+    if not expo_tokens:
+        return 0
     with get_db_cursor(commit=True) as cur:
         if not cur:
-            return False
-        cur.execute("DELETE FROM PushTokens WHERE expo_token = %s", (expo_token,))
-        return True
+            return 0
+        cur.execute("DELETE FROM PushTokens WHERE expo_token = ANY(%s)", (list(expo_tokens),))
+        return cur.rowcount
 
 
 def registrar_tickets_pendentes(tickets):
     """Persiste tickets ok (id + token) para consulta de receipt depois.
-    tickets = [{"id","token"}]. Idempotente por ticket_id."""
+    tickets = [{"id","token"}], todos num INSERT só. Idempotente por ticket_id."""
     if not tickets:
         return False
     with get_db_cursor(commit=True) as cur:
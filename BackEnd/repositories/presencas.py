@@ -1,4 +1,6 @@
-from infra.database import get_db_cursor
+from infra.database import DB_INDISPONIVEL, get_db_cursor
+from infra.database_async import conexao_async
+from repositories.eventos_chamada import avisar_presencas
 
 
 def contar_presentes_por_chamada(chamada_id):
@@ -60,6 +62,7 @@ def ajustar_presencas_chamada(chamada_id, alunos_presencas):
     with get_db_cursor(commit=True) as cur:
         if not cur:
             return
+        alterados = {}
         for item in alunos_presencas:
             aluno_id = item["aluno_id"]
             novas = set(item.get("aulas_presentes", []))
@@ -86,3 +89,56 @@ def ajustar_presencas_chamada(chamada_id, alunos_presencas):
                     """,
                     (chamada_id, aluno_id, num_aula),
                 )
+
+            if remover or adicionar:
+                alterados[aluno_id] = novas
+        if alterados:
+            avisar_presencas(cur, chamada_id, alterados, "Manual")
+
+
+_SQL_ESTADO_CHAMADA = """
+    SELECT c.status,
+           (SELECT COUNT(*) FROM Turma_Alunos ta WHERE ta.turma_id = c.turma_id) AS total_alunos
+    FROM Chamadas c
+    WHERE c.chamada_id = %s
+"""
+
+_SQL_AULAS_POR_ALUNO = """
+    SELECT aluno_id::text AS aluno_id, array_agg(num_aula ORDER BY num_aula) AS aulas
+    FROM Presencas
+    WHERE chamada_id = %s
+    GROUP BY aluno_id
+"""
+
+
+def obter_estado_presencas_chamada(chamada_id):
+    """Retrato da chamada para o stream ao vivo: status, total de alunos da
+    turma e {aluno_id: aulas presentes}. None se a chamada não existe."""
+    with get_db_cursor(preparar=True) as cur:
+        if not cur:
+            return DB_INDISPONIVEL
+        cur.execute(_SQL_ESTADO_CHAMADA, (chamada_id,))
+        chamada = cur.fetchone()
+        if not chamada:
+            return None
+        cur.execute(_SQL_AULAS_POR_ALUNO, (chamada_id,))
+        return _estado(chamada, cur.fetchall())
+
+
+async def obter_estado_presencas_chamada_async(chamada_id):
+    """`obter_estado_presencas_chamada` pelo event loop (DB_ASYNC=1)."""
+    async with conexao_async() as con:
+        if con is None:
+            return DB_INDISPONIVEL
+        chamada = await con.buscar_um(_SQL_ESTADO_CHAMADA, (chamada_id,), preparar=True)
+        if not chamada:
+            return None
+        return _estado(chamada, await con.buscar_todos(_SQL_AULAS_POR_ALUNO, (chamada_id,), preparar=True))
+
+
+def _estado(chamada, linhas):
+    return {
+        "status": chamada["status"],
+        "total_alunos": chamada["total_alunos"],
+        "aulas_por_aluno": {r["aluno_id"]: list(r["aulas"]) for r in linhas},
+    }
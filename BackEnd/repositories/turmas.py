@@ -1,6 +1,7 @@
 from psycopg2.extras import execute_values
 
-from infra.database import get_db_cursor
+from infra.database import DB_INDISPONIVEL, get_db_cursor
+from repositories.indice_salas import avisar_mudanca
 
 
 def listar_turmas_completas():
@@ -53,6 +54,7 @@ def excluir_turma_em_cascata(turma_id):
         cur.execute("DELETE FROM horarios_aulas WHERE turma_id = %s", (turma_id,))
         cur.execute("DELETE FROM Turma_Alunos WHERE turma_id = %s", (turma_id,))
         cur.execute("DELETE FROM Turmas WHERE turma_id = %s", (turma_id,))
+        avisar_mudanca(cur)
         return True
 
 
@@ -182,18 +184,21 @@ def listar_alunos_da_turma(turma_id):
 
 
 def obter_turma_id_por_chamada(chamada_id):
+    """turma_id da chamada, None se ela não existe, ou DB_INDISPONIVEL."""
     with get_db_cursor() as cur:
         if not cur:
-            return None
+            return DB_INDISPONIVEL
         cur.execute("SELECT turma_id FROM Chamadas WHERE chamada_id = %s", (chamada_id,))
         row = cur.fetchone()
         return row["turma_id"] if row else None
 
 
 def listar_alunos_com_push_token_da_turma(turma_id):
+    """DB_INDISPONIVEL com o banco fora: o job de push tenta de novo em vez
+    de concluir como "turma sem ninguém para avisar"."""
     with get_db_cursor() as cur:
         if not cur:
-            return []
+            return DB_INDISPONIVEL
         cur.execute(
             """
             SELECT u.usuario_id, pt.expo_token
@@ -208,6 +213,32 @@ def listar_alunos_com_push_token_da_turma(turma_id):
         return cur.fetchall()
 
 
+def listar_destinatarios_encerramento(chamada_ids):
+    """Push de encerramento de várias chamadas numa consulta só:
+    [{expo_token, nome_disciplina}], um por par (aluno em duas das chamadas
+    aparece uma vez por disciplina), ou DB_INDISPONIVEL: o job de push
+    tenta de novo em vez de concluir como "ninguém para avisar"."""
+    if not chamada_ids:
+        return []
+    with get_db_cursor() as cur:
+        if not cur:
+            return DB_INDISPONIVEL
+        cur.execute(
+            """
+            SELECT DISTINCT pt.expo_token, t.nome_disciplina
+            FROM Chamadas c
+            JOIN Turmas t ON t.turma_id = c.turma_id
+            JOIN Turma_Alunos ta ON ta.turma_id = c.turma_id
+            JOIN Alunos a ON a.aluno_id = ta.aluno_id
+            JOIN PushTokens pt ON pt.usuario_id = a.usuario_id::text
+            WHERE c.chamada_id = ANY(%s::int[])
+            ORDER BY pt.expo_token, t.nome_disciplina
+            """,
+            (list(chamada_ids),),
+        )
+        return cur.fetchall()
+
+
 def mapear_codigos_turma():
     """Retorna {codigo_turma: turma_id} para resolver turmas de um CSV sem N queries."""
     with get_db_cursor() as cur:
@@ -1,6 +1,14 @@
 import uuid
 
 from infra.database import get_db_cursor, logger
+from infra.database_async import conexao_async
+from repositories.eventos_chamada import (
+    CANAL_PRESENCAS,
+    EVENTO_PRESENCA,
+    avisar_presencas,
+    avisar_presencas_async,
+)
+from repositories.jobs import enfileirar_jobs, enfileirar_jobs_async
 
 
 def buscar_usuario_por_email(email):
@@ -127,47 +135,84 @@ MOTIVO_JA_REGISTRADO = "ja_registrado"
 MOTIVO_ERRO_INTERNO = "erro_interno"
 
 
-def _buscar_dados_notificacao(turma_id, aluno_uuid):
-    """Busca nome/e-mail/turma para a notificação de presença (best-effort).
-
-    Roda em transação PRÓPRIA e SOMENTE DEPOIS que a transação de escrita já
-    confirmou. Antes esta consulta ficava dentro do `with` de escrita, e uma
-    falha dela deixava a transação ABORTADA no Postgres: o `conn.commit()` do
-    encerramento vira um ROLLBACK silencioso (psycopg2 não levanta nesse caso),
-    as presenças recém-inseridas sumiam, mas a função devolvia motivo=None, o
-    router respondia 200 e a câmera marcava o aluno como definitivo — o aluno
-    sumia da chamada inteira sem erro em lugar nenhum.
-
-    Buscar ANTES dos INSERT também isolaria as escritas, mas gastaria uma
-    consulta em todos os caminhos de recusa e, ainda dentro da mesma transação,
-    uma falha dela impediria o registro (viraria erro_interno) em vez de
-    continuar best-effort. Depois do commit, nada que esta leitura faça pode
-    desfazer a presença já gravada.
-
-    Devolve None em qualquer falha: os campos de notificação caem para os
-    defaults do chamador (aluno_nome = "Aluno").
-    """
-    try:
-        with get_db_cursor() as cur:
-            if not cur:
-                return None
-            cur.execute(
-                """
-                SELECT u.nome, u.email, u.usuario_id, t.nome_disciplina
-                FROM Alunos a
-                JOIN Usuarios u ON a.usuario_id = u.usuario_id
-                JOIN Turmas t ON t.turma_id = %s
-                WHERE a.aluno_id = %s
-                """,
-                (turma_id, aluno_uuid),
-            )
-            return cur.fetchone()
-    except Exception as e:
-        logger.warning("Não foi possível buscar dados de notificação: %s", e)
-        return None
-
-
-def registrar_presenca_por_face(external_image_id, chamada_id):
+# Registro de presença num comando só: rosto ativo, chamada aberta, matrícula,
+# INSERT das aulas via generate_series e os dados da notificação. Antes eram
+# 3 SELECTs + 1 INSERT por aula + a busca de notificação em transação própria
+# — 7 idas ao banco numa chamada de 4 aulas, segurando a conexão do pool.
+#
+# A busca de notificação ficava FORA da transação porque, como consulta
+# separada, uma falha dela abortava a transação e o commit virava ROLLBACK
+# silencioso (a presença sumia com 200 na resposta). Num comando só não há
+# esse meio-termo: ou o comando inteiro dá certo, ou ele levanta, o
+# get_db_cursor faz rollback e a função devolve MOTIVO_ERRO_INTERNO. E os
+# dados de notificação vêm por LEFT JOIN: aluno sem linha em Usuarios não
+# derruba a presença, só cai nos defaults.
+#
+# A ordem do CASE é a das recusas de sempre: rosto, chamada, matrícula. Os
+# `::text` dos parâmetros são para o PREPARE da versão assíncrona: sem o valor,
+# o Postgres não infere o tipo de um parâmetro solto no CASE/json_build_object.
+_SQL_REGISTRAR_PRESENCA = """
+    WITH rosto AS (
+        SELECT EXISTS (
+            SELECT 1 FROM Colecao_Rostos
+            WHERE aluno_id = %(aluno)s::uuid AND revogado_em IS NULL
+        ) AS ok
+    ),
+    chamada AS (
+        SELECT chamada_id, turma_id, COALESCE(NULLIF(total_aulas, 0), 1) AS total_aulas
+        FROM Chamadas
+        WHERE chamada_id = %(chamada)s AND status = 'Aberta'
+    ),
+    matricula AS (
+        SELECT EXISTS (
+            SELECT 1 FROM Turma_Alunos ta
+            JOIN chamada c ON c.turma_id = ta.turma_id
+            WHERE ta.aluno_id = %(aluno)s::uuid
+        ) AS ok
+    ),
+    inseridas AS (
+        INSERT INTO Presencas (chamada_id, aluno_id, num_aula, tipo_registro)
+        SELECT c.chamada_id, %(aluno)s::uuid, n.num_aula, 'Reconhecimento'
+        FROM chamada c
+        CROSS JOIN generate_series(1, c.total_aulas) AS n(num_aula)
+        WHERE (SELECT ok FROM rosto) AND (SELECT ok FROM matricula)
+        ON CONFLICT (chamada_id, aluno_id, num_aula) DO NOTHING
+        RETURNING 1
+    ),
+    -- Aviso da tela ao vivo no mesmo comando, no formato de
+    -- eventos_chamada.avisar_presencas: o aluno passa a ter todas as aulas.
+    aviso AS (
+        SELECT pg_notify(%(canal)s, json_build_object(
+            'evento', %(evento)s::text,
+            'chamada_id', c.chamada_id,
+            'tipo_registro', 'Reconhecimento',
+            'alunos', json_build_object(%(aluno)s::text, (
+                SELECT json_agg(n.num_aula ORDER BY n.num_aula)
+                FROM generate_series(1, c.total_aulas) AS n(num_aula)
+            ))
+        )::text)
+        FROM chamada c
+        WHERE EXISTS (SELECT 1 FROM inseridas)
+    )
+    SELECT
+        CASE
+            WHEN NOT r.ok THEN %(rosto_desconhecido)s::text
+            WHEN c.chamada_id IS NULL THEN %(chamada_fechada)s::text
+            WHEN NOT m.ok THEN %(nao_matriculado)s::text
+            WHEN NOT EXISTS (SELECT 1 FROM inseridas) THEN %(ja_registrado)s::text
+        END AS motivo,
+        u.usuario_id, u.nome, u.email, t.nome_disciplina,
+        (SELECT count(*) FROM aviso) AS avisos
+    FROM rosto r
+    CROSS JOIN matricula m
+    LEFT JOIN chamada c ON TRUE
+    LEFT JOIN Turmas t ON t.turma_id = c.turma_id
+    LEFT JOIN Alunos a ON a.aluno_id = %(aluno)s::uuid
+    LEFT JOIN Usuarios u ON u.usuario_id = a.usuario_id
+"""
+
+
+def registrar_presenca_por_face(external_image_id, chamada_id, jobs_notificacao=None):
     """Registra presença do aluno na chamada informada.
 
     `external_image_id` é o aluno_id (UUID) gravado como ExternalImageId na
@@ -179,13 +224,15 @@ def registrar_presenca_por_face(external_image_id, chamada_id):
     Devolve SEMPRE dict e nunca levanta: quem decide status HTTP é o router.
     Sucesso traz motivo=None mais os dados de notificação; recusa traz só o
     motivo.
+
+    `jobs_notificacao(dados) -> jobs` (services.notificacoes.jobs_presenca)
+    monta os jobs de push/e-mail de quem foi registrado, e eles entram na
+    fila (repositories/jobs.py) na MESMA transação das presenças: ou as duas
+    coisas ficam, ou nenhuma — e então a câmera recebe erro_interno e tenta
+    de novo.
     """
-    try:
-        aluno_uuid = str(uuid.UUID(str(external_image_id)))
-    except (ValueError, AttributeError, TypeError):
-        # Face legada (ExternalImageId derivado do nome) ou lixo. Recusa
-        # explícita em vez de um WHERE que silenciosamente não casa com nada.
-        logger.warning("ExternalImageId não é UUID: %r", external_image_id)
+    aluno_uuid = _aluno_uuid(external_image_id)
+    if aluno_uuid is None:
         return {"motivo": MOTIVO_ROSTO_DESCONHECIDO}
 
     # O try envolve o `with` INTEIRO, e não só o corpo dele: o commit roda no
@@ -198,85 +245,345 @@ def registrar_presenca_por_face(external_image_id, chamada_id):
     # tentando de novo no próximo burst; um 500 genérico seria tratado como
     # definitivo e a presença daquele aluno se perderia na aula inteira.
     try:
-        with get_db_cursor(commit=True) as cur:
+        with get_db_cursor(commit=True, preparar=True) as cur:
             if not cur:
                 # Banco fora: transitório. Não é "rosto desconhecido" — a câmera
                 # precisa distinguir para tentar de novo no próximo burst.
                 return {"motivo": MOTIVO_ERRO_INTERNO}
+            cur.execute(_SQL_REGISTRAR_PRESENCA, _parametros_registro(aluno_uuid, chamada_id))
+            linha = cur.fetchone()
+            if linha["motivo"] is None and jobs_notificacao:
+                enfileirar_jobs(cur, jobs_notificacao(_dados_notificacao(linha)))
+    except Exception as e:
+        # Erro real de banco (deadlock, conexão derrubada, query malformada) —
+        # inclusive a falha do commit no encerramento do `with` acima.
+        logger.error(
+            "Erro ao registrar presença: aluno=%s chamada=%s erro=%s",
+            aluno_uuid, chamada_id, e,
+        )
+        return {"motivo": MOTIVO_ERRO_INTERNO}
+    return _resultado_registro(linha, aluno_uuid, chamada_id)
 
-            # Resolve por aluno_id, não por external_image_id: aproveita o
-            # prefixo do unique(aluno_id, angulo) e dispensa índice novo. O
-            # revogado_em cobre o caso de um FaceId sobreviver a uma
-            # revogação LGPD.
-            cur.execute(
-                "SELECT 1 FROM Colecao_Rostos "
-                "WHERE aluno_id = %s AND revogado_em IS NULL LIMIT 1",
-                (aluno_uuid,),
-            )
-            if not cur.fetchone():
-                logger.warning("Rosto sem cadastro ativo: aluno=%s", aluno_uuid)
-                return {"motivo": MOTIVO_ROSTO_DESCONHECIDO}
-
-            cur.execute(
-                "SELECT chamada_id, turma_id, total_aulas FROM Chamadas "
-                "WHERE chamada_id = %s AND status = 'Aberta'",
-                (chamada_id,),
-            )
-            chamada = cur.fetchone()
-            if not chamada:
-                logger.warning("Chamada %s não está aberta.", chamada_id)
-                return {"motivo": MOTIVO_CHAMADA_FECHADA}
-
-            cur.execute(
-                "SELECT 1 FROM Turma_Alunos WHERE turma_id = %s AND aluno_id = %s",
-                (chamada["turma_id"], aluno_uuid),
-            )
-            if not cur.fetchone():
-                logger.warning(
-                    "Aluno %s não pertence à turma da chamada %s.", aluno_uuid, chamada_id
-                )
-                return {"motivo": MOTIVO_NAO_MATRICULADO}
-
-            total_aulas = chamada.get("total_aulas", 1) or 1
 
-            rows_inserted = 0
-            for num_aula in range(1, total_aulas + 1):
-                cur.execute(
-                    """
-                    INSERT INTO Presencas (chamada_id, aluno_id, num_aula, tipo_registro)
-                    VALUES (%s, %s, %s, 'Reconhecimento')
-                    ON CONFLICT (chamada_id, aluno_id, num_aula) DO NOTHING
-                    """,
-                    (chamada["chamada_id"], aluno_uuid, num_aula),
+async def registrar_presenca_por_face_async(external_image_id, chamada_id, jobs_notificacao=None):
+    """`registrar_presenca_por_face` pelo event loop (DB_ASYNC=1). Sem jobs o
+    comando é um só, e na conexão assíncrona (autocommit) ele já é a
+    transação; com jobs, CTE e INSERT na fila vão numa transação explícita."""
+    aluno_uuid = _aluno_uuid(external_image_id)
+    if aluno_uuid is None:
+        return {"motivo": MOTIVO_ROSTO_DESCONHECIDO}
+    try:
+        async with conexao_async() as con:
+            if con is None:
+                return {"motivo": MOTIVO_ERRO_INTERNO}
+            if jobs_notificacao is None:
+                linha = await con.buscar_um(
+                    _SQL_REGISTRAR_PRESENCA, _parametros_registro(aluno_uuid, chamada_id), preparar=True
                 )
-                rows_inserted += cur.rowcount
-
-            if rows_inserted == 0:
-                return {"motivo": MOTIVO_JA_REGISTRADO}
-
-            turma_id = chamada["turma_id"]
+            else:
+                async with con.transacao():
+                    linha = await con.buscar_um(
+                        _SQL_REGISTRAR_PRESENCA, _parametros_registro(aluno_uuid, chamada_id), preparar=True
+                    )
+                    if linha["motivo"] is None:
+                        await enfileirar_jobs_async(con, jobs_notificacao(_dados_notificacao(linha)))
     except Exception as e:
-        # Erro real de banco (deadlock, conexão derrubada, query malformada) —
-        # inclusive a falha do commit no encerramento do `with` acima, que antes
-        # ficava fora do alcance deste catch.
         logger.error(
             "Erro ao registrar presença: aluno=%s chamada=%s erro=%s",
             aluno_uuid, chamada_id, e,
         )
         return {"motivo": MOTIVO_ERRO_INTERNO}
+    return _resultado_registro(linha, aluno_uuid, chamada_id)
 
-    # Só o sucesso chega aqui: as recusas retornam de dentro do `with`. Neste
-    # ponto a transação já foi confirmada — as presenças estão duráveis.
+
+def _aluno_uuid(external_image_id):
+    try:
+        return str(uuid.UUID(str(external_image_id)))
+    except (ValueError, AttributeError, TypeError):
+        # Face legada (ExternalImageId derivado do nome) ou lixo. Recusa
+        # explícita em vez de um WHERE que silenciosamente não casa com nada.
+        logger.warning("ExternalImageId não é UUID: %r", external_image_id)
+        return None
+
+
+def _parametros_registro(aluno_uuid, chamada_id):
+    return {
+        "aluno": aluno_uuid,
+        "chamada": chamada_id,
+        "rosto_desconhecido": MOTIVO_ROSTO_DESCONHECIDO,
+        "chamada_fechada": MOTIVO_CHAMADA_FECHADA,
+        "nao_matriculado": MOTIVO_NAO_MATRICULADO,
+        "ja_registrado": MOTIVO_JA_REGISTRADO,
+        "canal": CANAL_PRESENCAS,
+        "evento": EVENTO_PRESENCA,
+    }
+
+
+def _resultado_registro(linha, aluno_uuid, chamada_id):
+    motivo = linha["motivo"]
+    if motivo == MOTIVO_ROSTO_DESCONHECIDO:
+        logger.warning("Rosto sem cadastro ativo: aluno=%s", aluno_uuid)
+    elif motivo == MOTIVO_CHAMADA_FECHADA:
+        logger.warning("Chamada %s não está aberta.", chamada_id)
+    elif motivo == MOTIVO_NAO_MATRICULADO:
+        logger.warning("Aluno %s não pertence à turma da chamada %s.", aluno_uuid, chamada_id)
+    if motivo is not None:
+        return {"motivo": motivo}
+
+    # Neste ponto a transação já foi confirmada — as presenças estão duráveis.
     logger.info("✅ Presença confirmada: aluno=%s chamada=%s", aluno_uuid, chamada_id)
 
-    info = _buscar_dados_notificacao(turma_id, aluno_uuid)
+    return {"motivo": None, **_dados_notificacao(linha)}
+
 
+def _dados_notificacao(linha):
+    """usuario_id, nome, e-mail e turma de um aluno registrado, a partir da
+    linha do CTE ou de _SQL_NOTIFICACAO_LOTE (None: aluno sem Usuarios)."""
+    linha = linha or {}
     return {
-        "motivo": None,
-        "usuario_id": info["usuario_id"] if info else None,
+        "usuario_id": linha.get("usuario_id"),
         # Fallback "Aluno" e não o external_image_id: com UUID, o antigo
         # fallback colocaria um UUID no corpo do e-mail ao titular.
-        "aluno_nome": info["nome"] if info else "Aluno",
-        "aluno_email": info["email"] if info else None,
-        "turma_nome": info["nome_disciplina"] if info else "Turma",
+        "aluno_nome": linha.get("nome") or "Aluno",
+        "aluno_email": linha.get("email"),
+        "turma_nome": linha.get("nome_disciplina") or "Turma",
     }
+
+# Teto do lote da câmera: uma sala inteira entrando cabe folgado, e o array
+# do unnest continua pequeno.
+LOTE_PRESENCAS_MAX = 100
+
+_SQL_CHAMADA_ABERTA_LOTE = (
+    "SELECT chamada_id, turma_id, total_aulas FROM Chamadas "
+    "WHERE chamada_id = %s AND status = 'Aberta'"
+)
+
+# `%s::text[]::uuid[]`: com PREPARE o `$n` ganha o tipo do cast, e o EXECUTE
+# recebe a lista como ARRAY['…'] (text[]). text[] -> uuid[] só vale com cast
+# explícito, então o parâmetro é text[] e a conversão fica dentro do SQL.
+_SQL_ELEGIBILIDADE_LOTE = """
+    SELECT a.aluno_id::text AS aluno_id,
+           EXISTS (
+               SELECT 1 FROM Colecao_Rostos cr
+               WHERE cr.aluno_id = a.aluno_id AND cr.revogado_em IS NULL
+           ) AS tem_rosto,
+           EXISTS (
+               SELECT 1 FROM Turma_Alunos ta
+               WHERE ta.turma_id = %s AND ta.aluno_id = a.aluno_id
+           ) AS matriculado
+    FROM unnest(%s::text[]::uuid[]) AS a(aluno_id)
+"""
+
+# `%s::int`: no PREPARE da versão assíncrona um parâmetro na lista do SELECT
+# não herda o tipo da coluna do INSERT.
+_SQL_INSERIR_LOTE = """
+    INSERT INTO Presencas (chamada_id, aluno_id, num_aula, tipo_registro)
+    SELECT %s::int, a.aluno_id, n.num_aula, 'Reconhecimento'
+    FROM unnest(%s::text[]::uuid[]) AS a(aluno_id)
+    CROSS JOIN generate_series(1, %s::int) AS n(num_aula)
+    ON CONFLICT (chamada_id, aluno_id, num_aula) DO NOTHING
+    RETURNING aluno_id::text AS aluno_id
+"""
+
+# Dentro da transação das presenças: os jobs de notificação são gravados no
+# mesmo commit. Falha daqui levanta, o `with` faz rollback e o lote inteiro
+# vira erro_interno — não há commit que vire ROLLBACK em silêncio.
+_SQL_NOTIFICACAO_LOTE = """
+    SELECT a.aluno_id::text AS aluno_id, u.nome, u.email, u.usuario_id,
+           t.nome_disciplina
+    FROM Alunos a
+    JOIN Usuarios u ON a.usuario_id = u.usuario_id
+    JOIN Turmas t ON t.turma_id = %s
+    WHERE a.aluno_id = ANY(%s::text[]::uuid[])
+"""
+
+
+def registrar_presencas_por_face_lote(external_image_ids, chamada_id, jobs_notificacao=None):
+    """Registra de uma vez as presenças de vários alunos na mesma chamada.
+
+    Mesmo contrato de `registrar_presenca_por_face`, aluno a aluno: devolve
+    {external_image_id: resultado} com os mesmos motivos e, no sucesso, os
+    mesmos dados de notificação; nunca levanta. A diferença é o custo: uma
+    transação com três comandos (chamada, elegibilidade de todos, INSERT
+    set-based das aulas × alunos) no lugar de uma transação com 3 + total_aulas
+    comandos por aluno — a turma que entra junto na sala virava dezenas de
+    idas ao banco.
+
+    A ordem das recusas é a mesma da versão unitária: rosto sem cadastro
+    ativo primeiro, depois chamada fechada, depois matrícula. Os dados de
+    notificação dos registrados e os jobs de `jobs_notificacao` saem na
+    mesma transação.
+    """
+    resultados, alunos = _normalizar_lote(external_image_ids)
+    if not alunos:
+        return resultados
+
+    uuids = sorted(set(alunos.values()))
+    motivos = {}
+    info = {}
+    # try em volta do `with` inteiro, como na versão unitária: a falha do
+    # commit no encerramento também tem que virar MOTIVO_ERRO_INTERNO.
+    try:
+        with get_db_cursor(commit=True, preparar=True) as cur:
+            if not cur:
+                motivos = dict.fromkeys(uuids, MOTIVO_ERRO_INTERNO)
+            else:
+                cur.execute(_SQL_CHAMADA_ABERTA_LOTE, (chamada_id,))
+                chamada = cur.fetchone()
+
+                cur.execute(
+                    _SQL_ELEGIBILIDADE_LOTE, (chamada["turma_id"] if chamada else None, uuids)
+                )
+                motivos, aptos = _classificar_lote(cur.fetchall(), chamada, chamada_id)
+
+                if aptos:
+                    cur.execute(_SQL_INSERIR_LOTE, _parametros_insercao_lote(chamada, aptos))
+                    inseridos = {r["aluno_id"] for r in cur.fetchall()}
+                    if inseridos:
+                        avisar_presencas(
+                            cur, chamada_id, dict.fromkeys(inseridos, _aulas(chamada)), "Reconhecimento"
+                        )
+                        cur.execute(_SQL_NOTIFICACAO_LOTE, (chamada["turma_id"], sorted(inseridos)))
+                        info = {r["aluno_id"]: r for r in cur.fetchall()}
+                        if jobs_notificacao:
+                            enfileirar_jobs(cur, _jobs_lote(jobs_notificacao, inseridos, info))
+                    for aluno_uuid in aptos:
+                        motivos[aluno_uuid] = None if aluno_uuid in inseridos else MOTIVO_JA_REGISTRADO
+    except Exception as e:
+        logger.error(
+            "Erro ao registrar presenças em lote: chamada=%s alunos=%d erro=%s",
+            chamada_id, len(uuids), e,
+        )
+        motivos = dict.fromkeys(uuids, MOTIVO_ERRO_INTERNO)
+
+    _registrados_lote(uuids, motivos, chamada_id)
+    return _resultados_lote(resultados, alunos, motivos, info)
+
+
+async def registrar_presencas_por_face_lote_async(external_image_ids, chamada_id, jobs_notificacao=None):
+    """`registrar_presencas_por_face_lote` pelo event loop (DB_ASYNC=1), com
+    os três comandos numa transação explícita da conexão assíncrona."""
+    resultados, alunos = _normalizar_lote(external_image_ids)
+    if not alunos:
+        return resultados
+
+    uuids = sorted(set(alunos.values()))
+    motivos = {}
+    info = {}
+    try:
+        async with conexao_async() as con:
+            if con is None:
+                motivos = dict.fromkeys(uuids, MOTIVO_ERRO_INTERNO)
+            else:
+                async with con.transacao():
+                    chamada = await con.buscar_um(
+                        _SQL_CHAMADA_ABERTA_LOTE, (chamada_id,), preparar=True
+                    )
+                    linhas = await con.buscar_todos(
+                        _SQL_ELEGIBILIDADE_LOTE,
+                        (chamada["turma_id"] if chamada else None, uuids),
+                        preparar=True,
+                    )
+                    motivos, aptos = _classificar_lote(linhas, chamada, chamada_id)
+
+                    if aptos:
+                        linhas = await con.buscar_todos(
+                            _SQL_INSERIR_LOTE, _parametros_insercao_lote(chamada, aptos), preparar=True
+                        )
+                        inseridos = {r["aluno_id"] for r in linhas}
+                        if inseridos:
+                            await avisar_presencas_async(
+                                con, chamada_id, dict.fromkeys(inseridos, _aulas(chamada)), "Reconhecimento"
+                            )
+                            linhas = await con.buscar_todos(
+                                _SQL_NOTIFICACAO_LOTE, (chamada["turma_id"], sorted(inseridos)),
+                                preparar=True,
+                            )
+                            info = {r["aluno_id"]: r for r in linhas}
+                            if jobs_notificacao:
+                                await enfileirar_jobs_async(
+                                    con, _jobs_lote(jobs_notificacao, inseridos, info)
+                                )
+                        for aluno_uuid in aptos:
+                            motivos[aluno_uuid] = None if aluno_uuid in inseridos else MOTIVO_JA_REGISTRADO
+    except Exception as e:
+        logger.error(
+            "Erro ao registrar presenças em lote: chamada=%s alunos=%d erro=%s",
+            chamada_id, len(uuids), e,
+        )
+        motivos = dict.fromkeys(uuids, MOTIVO_ERRO_INTERNO)
+
+    _registrados_lote(uuids, motivos, chamada_id)
+    return _resultados_lote(resultados, alunos, motivos, info)
+
+
+def _normalizar_lote(external_image_ids):
+    """(resultados já decididos, {external_image_id: aluno_id normalizado})."""
+    resultados = {}
+    alunos = {}
+    for external_image_id in external_image_ids:
+        aluno_uuid = _aluno_uuid(external_image_id)
+        if aluno_uuid is None:
+            resultados[external_image_id] = {"motivo": MOTIVO_ROSTO_DESCONHECIDO}
+        else:
+            alunos[external_image_id] = aluno_uuid
+    return resultados, alunos
+
+
+def _classificar_lote(linhas, chamada, chamada_id):
+    """(motivos das recusas, alunos aptos a inserir) a partir da elegibilidade."""
+    motivos = {}
+    aptos = []
+    for linha in linhas:
+        aluno_uuid = linha["aluno_id"]
+        if not linha["tem_rosto"]:
+            logger.warning("Rosto sem cadastro ativo: aluno=%s", aluno_uuid)
+            motivos[aluno_uuid] = MOTIVO_ROSTO_DESCONHECIDO
+        elif not chamada:
+            motivos[aluno_uuid] = MOTIVO_CHAMADA_FECHADA
+        elif not linha["matriculado"]:
+            logger.warning(
+                "Aluno %s não pertence à turma da chamada %s.", aluno_uuid, chamada_id
+            )
+            motivos[aluno_uuid] = MOTIVO_NAO_MATRICULADO
+        else:
+            aptos.append(aluno_uuid)
+    if not chamada:
+        logger.warning("Chamada %s não está aberta.", chamada_id)
+    return motivos, aptos
+
+
+def _aulas(chamada):
+    return range(1, (chamada.get("total_aulas", 1) or 1) + 1)
+
+
+def _parametros_insercao_lote(chamada, aptos):
+    return (chamada["chamada_id"], aptos, chamada.get("total_aulas", 1) or 1)
+
+
+def _registrados_lote(uuids, motivos, chamada_id):
+    # Só o sucesso tem motivo None; aluno sem linha (não deveria acontecer)
+    # cai em erro_interno e a câmera tenta de novo.
+    registrados = [u for u in uuids if u in motivos and motivos[u] is None]
+    if registrados:
+        logger.info(
+            "✅ Presença confirmada (lote): %d aluno(s) chamada=%s", len(registrados), chamada_id
+        )
+    return registrados
+
+
+def _resultados_lote(resultados, alunos, motivos, info):
+    for external_image_id, aluno_uuid in alunos.items():
+        motivo = motivos.get(aluno_uuid, MOTIVO_ERRO_INTERNO)
+        if motivo is not None:
+            resultados[external_image_id] = {"motivo": motivo}
+            continue
+        resultados[external_image_id] = {"motivo": None, **_dados_notificacao(info.get(aluno_uuid))}
+    return resultados
+
+
+def _jobs_lote(jobs_notificacao, inseridos, info):
+    return [
+        j for aluno_uuid in sorted(inseridos)
+        for j in jobs_notificacao(_dados_notificacao(info.get(aluno_uuid)))
+    ]
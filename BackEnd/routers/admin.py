@@ -1,4 +1,5 @@
 import logging
+import os
 import uuid
 from typing import List, Literal, Optional
 
@@ -11,6 +12,7 @@ from core.config import BUCKET_NAME, COLLECTION_ID
 from core.csv_utils import EMAIL_REGEX, MAX_CSV_BYTES, criar_leitor_csv, validar_celula_csv
 from core.helpers import audit, client_ip, gerar_senha_temporaria, internal_error
 from core.security import require_role
+from infra import rastreio_consultas
 from infra.aws_clientes import rekognition_client, s3_client
 from infra.rekognition_aws import deletar_rosto, listar_todas_faces
 from infra.s3_aws import listar_todos_objetos_s3
@@ -26,6 +28,7 @@ from repositories.alunos import (
     listar_alunos_para_admin,
     listar_alunos_por_ids,
 )
+from repositories.jobs import listar_jobs_mortos, reenfileirar_jobs_mortos, resumir_jobs
 from repositories.rostos import listar_inventario_biometrico, listar_rostos_ativos_por_aluno
 from repositories.horarios import (
     detectar_conflito_horario,
@@ -625,6 +628,65 @@ class S3KeyPayload(BaseModel):
     key: str
 
 
+@router.get("/consultas-lentas")
+def admin_consultas_lentas(
+    ordem: Literal["max", "total"] = "max",
+    limite: int = Query(rastreio_consultas.TOP_N, ge=1, le=200),
+):
+    """Piores consultas da última janela, do worker que atendeu (DB_TRACE=1).
+
+    `ordem=max` acha a consulta que às vezes trava; `ordem=total` acha a que
+    mais ocupa o banco somando todas as execuções. O plano, quando houver, é
+    o último EXPLAIN (ANALYZE, BUFFERS) amostrado.
+    """
+    return {
+        "rastreio_ligado": rastreio_consultas.ligado(),
+        "pid": os.getpid(),
+        "janela_s": rastreio_consultas.JANELA_S,
+        "lenta_ms": rastreio_consultas.LENTA_MS,
+        "consultas": rastreio_consultas.mais_lentas(ordem, limite),
+    }
+
+
+class JobIds(BaseModel):
+    ids: List[int]
+
+
+@router.get("/jobs")
+def admin_resumo_jobs():
+    """Fila de jobs (push, e-mail) por tipo e status."""
+    try:
+        return {"jobs": resumir_jobs()}
+    except Exception as e:
+        raise internal_error(e, "admin_resumo_jobs")
+
+
+@router.get("/jobs/mortos")
+def admin_jobs_mortos(
+    tipo: Optional[str] = None,
+    limite: int = Query(100, ge=1, le=500),
+):
+    """Dead-letter: jobs que esgotaram as tentativas, com o último erro."""
+    try:
+        return {"jobs": listar_jobs_mortos(tipo, limite)}
+    except Exception as e:
+        raise internal_error(e, "admin_jobs_mortos")
+
+
+@router.post("/jobs/mortos/reenfileirar")
+def admin_reenfileirar_jobs(payload: JobIds, request: Request, current_user: dict = Depends(require_role("Admin"))):
+    """Devolve jobs mortos à fila, com as tentativas zeradas."""
+    if not payload.ids:
+        raise HTTPException(status_code=400, detail="Nenhum job informado.")
+    try:
+        total = reenfileirar_jobs_mortos(payload.ids[:1000])
+        audit("Jobs mortos reenfileirados", admin=current_user.get("sub"),
+              total=total, ip=client_ip(request))
+        return {"reenfileirados": total}
+    except Exception as e:
+        raise internal_error(e, "admin_reenfileirar_jobs")
+
+
 @router.get("/rostos/inventario")
 def admin_inventario_biometrico():
     """Collection, bucket e banco cruzados para auditoria da aba Biometria.
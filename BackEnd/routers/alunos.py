@@ -14,6 +14,7 @@ from core.config import (
     POLITICA_PRIVACIDADE_VERSAO,
     SCPI_PRIVACY_URL,
 )
+from core.dependencias_db import RETRATO_UNICO
 from core.errors import ErrorCode, bad_request
 from core.helpers import client_ip, gerar_url_presigned, internal_error, validate_image_upload
 from core.limiter import limiter
@@ -50,7 +51,7 @@ audit_logger = logging.getLogger("scpi.audit")
 router = APIRouter(tags=["alunos"])
 
 
-@router.get("/aluno/dashboard/{usuario_id}")
+@router.get("/aluno/dashboard/{usuario_id}", dependencies=[RETRATO_UNICO])
 def get_dashboard_aluno(usuario_id: str, current_user: dict = Depends(get_current_user)):
     require_self_or_admin(usuario_id, current_user)
     try:
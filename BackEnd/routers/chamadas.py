@@ -1,25 +1,51 @@
+import asyncio
+import json
 import logging
+import time
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
 from starlette.concurrency import run_in_threadpool
 
+from core.dependencias_db import CONEXAO_UNICA, RETRATO_UNICO
 from core.helpers import internal_error
-from core.security import get_current_user, require_role, require_service_token
+from core.security import (
+    get_current_user,
+    require_role,
+    require_service_token,
+    require_service_token_async,
+)
+from infra import metricas
 from infra.database import DB_INDISPONIVEL
+from infra.database_async import DB_ASSINCRONO
 from repositories.chamadas import (
     abrir_chamada_para_turma,
+    indice_salas,
     fechar_chamadas_abertas_por_turma,
     listar_alunos_da_chamada,
-    obter_chamada_aberta_com_disciplina,
     obter_chamada_aberta_por_sala,
+    obter_chamada_aberta_por_sala_async,
     obter_chamada_aberta_por_turma,
     obter_chamada_por_id,
 )
+from repositories.eventos_chamada import (
+    EVENTO_FECHADA,
+    EVENTO_PRESENCA,
+    EVENTO_RESSINCRONIZAR,
+    central_eventos,
+)
 from repositories.horarios import existe_aula_no_horario_atual_para_turma
-from repositories.presencas import ajustar_presencas_chamada, contar_alunos_da_turma, contar_presentes_por_chamada
+from repositories.presencas import (
+    ajustar_presencas_chamada,
+    contar_alunos_da_turma,
+    contar_presentes_por_chamada,
+    obter_estado_presencas_chamada,
+    obter_estado_presencas_chamada_async,
+)
 from repositories.turmas import professor_responsavel_pela_turma
 from repositories.usuarios import (
+    LOTE_PRESENCAS_MAX,
     MOTIVO_CHAMADA_FECHADA,
     MOTIVO_ERRO_INTERNO,
     MOTIVO_JA_REGISTRADO,
@@ -27,15 +53,59 @@ from repositories.usuarios import (
     MOTIVO_ROSTO_DESCONHECIDO,
     obter_professor_id,
     registrar_presenca_por_face,
+    registrar_presenca_por_face_async,
+    registrar_presencas_por_face_lote,
+    registrar_presencas_por_face_lote_async,
 )
 from schemas.chamada import ChamadaAbrir, FinalizarChamadaPayload
-from services.notificacoes import enviar_notificacoes_presenca, notificar_alunos_presentes
+from services.notificacoes import jobs_encerramento, jobs_presenca
 
 logger = logging.getLogger(__name__)
 audit_logger = logging.getLogger("scpi.audit")
 
 router = APIRouter(prefix="/chamadas", tags=["chamadas"])
 
+# DB_ASYNC=1: os endpoints async da câmera e o stream consultam o banco pelo
+# event loop (infra/database_async.py). Desligado, os repositórios síncronos
+# rodam no threadpool, como sempre.
+_token_servico = require_service_token_async if DB_ASSINCRONO else require_service_token
+
+
+async def _chamada_aberta_da_sala(sala: str):
+    if DB_ASSINCRONO:
+        return await obter_chamada_aberta_por_sala_async(sala)
+    return await run_in_threadpool(obter_chamada_aberta_por_sala, sala)
+
+
+async def _estado_presencas(chamada_id: int):
+    if DB_ASSINCRONO:
+        return await obter_estado_presencas_chamada_async(chamada_id)
+    return await run_in_threadpool(obter_estado_presencas_chamada, chamada_id)
+
+
+# Push e e-mail saem pela fila de jobs (services/fila_jobs.py), gravados pelo
+# repositório na transação das presenças: a resposta não espera a Expo nem o
+# Resend, e presença confirmada sempre tem o aviso na fila.
+async def _registrar_presenca(external_image_id: str, chamada_id: int):
+    if DB_ASSINCRONO:
+        return await registrar_presenca_por_face_async(
+            external_image_id, chamada_id, jobs_notificacao=jobs_presenca
+        )
+    return await run_in_threadpool(
+        registrar_presenca_por_face, external_image_id, chamada_id, jobs_notificacao=jobs_presenca
+    )
+
+
+async def _registrar_presencas_lote(external_image_ids: list, chamada_id: int):
+    if DB_ASSINCRONO:
+        return await registrar_presencas_por_face_lote_async(
+            external_image_ids, chamada_id, jobs_notificacao=jobs_presenca
+        )
+    return await run_in_threadpool(
+        registrar_presencas_por_face_lote, external_image_ids, chamada_id,
+        jobs_notificacao=jobs_presenca,
+    )
+
 
 def _assert_professor_dono_ou_admin(turma_id, current_user: dict) -> None:
     """Garante que o solicitante é Admin ou o professor responsável pela turma.
@@ -54,7 +124,7 @@ def _assert_professor_dono_ou_admin(turma_id, current_user: dict) -> None:
         raise HTTPException(status_code=404, detail="Recurso não encontrado.")
 
 
-@router.post("/abrir")
+@router.post("/abrir", dependencies=[CONEXAO_UNICA])
 def abrir_chamada(dados: ChamadaAbrir, current_user: dict = Depends(require_role("Professor"))):
     usuario_id = current_user.get("sub")
     professor_id = obter_professor_id(usuario_id)
@@ -82,19 +152,11 @@ def abrir_chamada(dados: ChamadaAbrir, current_user: dict = Depends(require_role
         raise internal_error(e, "abrir_chamada")
 
 
-@router.post("/fechar/{turma_id}")
-def fechar_chamada(turma_id: str, background_tasks: BackgroundTasks, current_user: dict = Depends(require_role("Professor"))):
+@router.post("/fechar/{turma_id}", dependencies=[CONEXAO_UNICA])
+def fechar_chamada(turma_id: str, current_user: dict = Depends(require_role("Professor"))):
     try:
         _assert_professor_dono_ou_admin(turma_id, current_user)
-        chamada = obter_chamada_aberta_com_disciplina(turma_id)
-        fechar_chamadas_abertas_por_turma(turma_id)
-
-        if chamada:
-            background_tasks.add_task(
-                notificar_alunos_presentes,
-                chamada["chamada_id"],
-                chamada["nome_disciplina"],
-            )
+        fechar_chamadas_abertas_por_turma(turma_id, jobs_encerramento=jobs_encerramento)
 
         audit_logger.info(
             "Chamada encerrada turma=%s por=%s", turma_id, current_user.get("sub")
@@ -106,7 +168,7 @@ def fechar_chamada(turma_id: str, background_tasks: BackgroundTasks, current_use
         raise internal_error(e, "fechar_chamada")
 
 
-@router.get("/status/{turma_id}")
+@router.get("/status/{turma_id}", dependencies=[RETRATO_UNICO])
 def status_chamada(turma_id: str, current_user: dict = Depends(get_current_user)):
     try:
         _assert_professor_dono_ou_admin(turma_id, current_user)
@@ -135,7 +197,7 @@ def status_chamada(turma_id: str, current_user: dict = Depends(get_current_user)
         raise internal_error(e, "status_chamada")
 
 
-@router.get("/{chamada_id}/alunos")
+@router.get("/{chamada_id}/alunos", dependencies=[RETRATO_UNICO])
 def listar_alunos_chamada(chamada_id: str, current_user: dict = Depends(get_current_user)):
     try:
         chamada = obter_chamada_por_id(chamada_id)
@@ -163,7 +225,107 @@ def listar_alunos_chamada(chamada_id: str, current_user: dict = Depends(get_curr
         raise internal_error(e, "listar_alunos_chamada")
 
 
-@router.post("/{chamada_id}/ajustar")
+# Comentário SSE a cada batida: mantém proxies com a conexão aberta e revela
+# cliente que foi embora. Sem a escuta do NOTIFY, a batida relê o banco.
+_BATIDA_EVENTOS_S = 15
+
+
+def _sse(evento: str, dados: dict) -> str:
+    return f"event: {evento}\ndata: {json.dumps(dados, separators=(',', ':'))}\n\n"
+
+
+def _contadores(estado: dict) -> dict:
+    presentes = sum(1 for aulas in estado["aulas_por_aluno"].values() if aulas)
+    return {
+        "total_alunos": estado["total_alunos"],
+        "presentes": presentes,
+        "ausentes": estado["total_alunos"] - presentes,
+    }
+
+
+async def _stream_eventos(request: Request, chamada_id: int):
+    # Inscreve ANTES do retrato: presença gravada entre os dois chega como
+    # evento e é reaplicada (o evento traz estado, não delta).
+    inscricao = central_eventos.inscrever(chamada_id)
+    fila = inscricao[1]
+    try:
+        evento = {"evento": EVENTO_RESSINCRONIZAR}
+        estado = None
+        while True:
+            tipo = evento.get("evento")
+            if tipo == EVENTO_RESSINCRONIZAR:
+                estado = await _estado_presencas(chamada_id)
+                if estado is None or estado is DB_INDISPONIVEL:
+                    # Cliente reconecta (ou volta ao polling); nada a manter aqui.
+                    yield _sse("erro", {"detail": "Serviço temporariamente indisponível."})
+                    return
+                yield _sse("estado", {
+                    "chamada_id": chamada_id,
+                    "status": estado["status"],
+                    "alunos": estado["aulas_por_aluno"],
+                    **_contadores(estado),
+                })
+                if estado["status"] != "Aberta":
+                    return
+            elif tipo == EVENTO_FECHADA:
+                yield _sse(EVENTO_FECHADA, {"chamada_id": chamada_id})
+                return
+            elif tipo == EVENTO_PRESENCA:
+                for aluno_id, aulas in evento.get("alunos", {}).items():
+                    if estado["aulas_por_aluno"].get(aluno_id, []) == aulas:
+                        continue  # já refletido no retrato
+                    estado["aulas_por_aluno"][aluno_id] = aulas
+                    yield _sse(EVENTO_PRESENCA, {
+                        "aluno_id": aluno_id,
+                        "aulas_presentes": aulas,
+                        "tipo_registro": evento.get("tipo_registro"),
+                        **_contadores(estado),
+                    })
+            try:
+                evento = await asyncio.wait_for(fila.get(), _BATIDA_EVENTOS_S)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                if central_eventos.ativo():
+                    evento = {}
+                    yield ": batida\n\n"
+                else:
+                    evento = {"evento": EVENTO_RESSINCRONIZAR}
+    finally:
+        central_eventos.cancelar(chamada_id, inscricao)
+
+
+@router.get("/{chamada_id}/eventos")
+async def eventos_da_chamada(
+    chamada_id: int,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+):
+    """Stream SSE das presenças da chamada, para a tela ao vivo do professor.
+
+    Eventos: `estado` (retrato inicial: contadores e aulas por aluno),
+    `presenca` (um aluno mudou: aulas_presentes + contadores), `fechada` e
+    `erro` (o stream termina). Substitui o polling de /status + /alunos: o
+    banco é lido uma vez ao conectar, e os eventos chegam por NOTIFY.
+    """
+    try:
+        chamada = await run_in_threadpool(obter_chamada_por_id, chamada_id)
+        if not chamada:
+            raise HTTPException(status_code=404, detail="Chamada não encontrada.")
+        await run_in_threadpool(_assert_professor_dono_ou_admin, chamada["turma_id"], current_user)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise internal_error(e, "eventos_da_chamada")
+    return StreamingResponse(
+        _stream_eventos(request, chamada_id),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: sem ele o nginx segura os eventos no buffer.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/{chamada_id}/ajustar", dependencies=[CONEXAO_UNICA])
 def ajustar_chamada(
     chamada_id: int,
     payload: FinalizarChamadaPayload,
@@ -185,11 +347,10 @@ def ajustar_chamada(
         raise internal_error(e, "ajustar_chamada")
 
 
-@router.post("/{chamada_id}/finalizar")
+@router.post("/{chamada_id}/finalizar", dependencies=[CONEXAO_UNICA])
 def finalizar_chamada(
     chamada_id: int,
     payload: FinalizarChamadaPayload,
-    background_tasks: BackgroundTasks,
     current_user: dict = Depends(require_role("Professor")),
 ):
     try:
@@ -199,16 +360,10 @@ def finalizar_chamada(
         _assert_professor_dono_ou_admin(chamada["turma_id"], current_user)
 
         ajustar_presencas_chamada(chamada_id, [a.model_dump() for a in payload.alunos])
-        fechar_chamadas_abertas_por_turma(chamada["turma_id"])
+        fechar_chamadas_abertas_por_turma(chamada["turma_id"], jobs_encerramento=jobs_encerramento)
 
         audit_logger.info("Chamada %s finalizada com edições pelo professor.", chamada_id)
 
-        background_tasks.add_task(
-            notificar_alunos_presentes,
-            chamada_id,
-            chamada["nome_disciplina"],
-        )
-
         return {"mensagem": "Chamada finalizada com sucesso!"}
     except HTTPException:
         raise
@@ -238,6 +393,58 @@ def chamada_aberta_por_sala(
         raise internal_error(e, "chamada_aberta_por_sala")
 
 
+# Long-poll abaixo do timeout de leitura de proxies (60 s no nginx).
+_ESPERA_MAX_S = 25
+# Sem a escuta do NOTIFY este worker não fica sabendo de mudança: responde na
+# hora e pede à câmera o intervalo do polling antigo.
+_RETRY_SEM_ESCUTA_S = 5
+
+
+def _etag_chamada(chamada_id) -> str:
+    return f'"{chamada_id if chamada_id is not None else "-"}"'
+
+
+@router.get("/aberta/sala/aguardar")
+async def aguardar_chamada_da_sala(
+    sala: str = Depends(_token_servico),
+    if_none_match: str | None = Header(default=None),
+    espera: int = Query(default=_ESPERA_MAX_S, ge=1, le=_ESPERA_MAX_S),
+):
+    """Long-poll da chamada aberta na sala do token.
+
+    O ETag é o chamada_id. Com `If-None-Match` igual ao estado atual, segura a
+    resposta até abrir/fechar chamada (NOTIFY `chamadas_por_sala`, o mesmo que
+    invalida o índice) ou até `espera` segundos — aí 304. Estado diferente do
+    que o cliente tem sai na hora. A espera não prende thread nem conexão do
+    pool: o estado vem do índice em memória do worker.
+    """
+    try:
+        prazo = time.monotonic() + espera
+        while True:
+            geracao = indice_salas.geracao
+            aberta = await _chamada_aberta_da_sala(sala)
+            if aberta is DB_INDISPONIVEL:
+                raise HTTPException(
+                    status_code=503, detail="Serviço temporariamente indisponível."
+                )
+            chamada_id = aberta["chamada_id"] if aberta else None
+            etag = _etag_chamada(chamada_id)
+            if not indice_salas.ativo():
+                return JSONResponse(
+                    {"chamada_id": chamada_id},
+                    headers={"ETag": etag, "Retry-After": str(_RETRY_SEM_ESCUTA_S)},
+                )
+            if etag != if_none_match:
+                return JSONResponse({"chamada_id": chamada_id}, headers={"ETag": etag})
+            restante = prazo - time.monotonic()
+            if restante <= 0 or not await indice_salas.aguardar_mudanca(geracao, restante):
+                return Response(status_code=304, headers={"ETag": etag})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise internal_error(e, "aguardar_chamada_da_sala")
+
+
 class PresencaCameraPayload(BaseModel):
     external_image_id: str
     # Obrigatório: é o que amarra a presença à aula daquela sala. Sem ele o
@@ -263,23 +470,10 @@ _DETALHE_POR_MOTIVO = {
 }
 
 
-@router.post("/registrar_presenca_camera")
-async def registrar_presenca_camera(
-    payload: PresencaCameraPayload,
-    background_tasks: BackgroundTasks,
-    sala: str = Depends(require_service_token),
-):
-    """Registra presença a partir do reconhecimento feito pela câmera local.
-
-    Endpoint async com corpo síncrono (psycopg2 + boto3): sem threadpool, cada
-    rosto reconhecido bloqueia o event loop por duas queries mais a chamada ao
-    Rekognition — e numa sala com aula isso acontece a cada poucos segundos,
-    parando todos os outros requests do worker.
-    """
-    # Escopo de sala (A6): o token só registra presença na chamada aberta da
-    # própria sala. Reusa a consulta já validada em produção na branch de
-    # chamada por sala.
-    aberta = await run_in_threadpool(obter_chamada_aberta_por_sala, sala)
+async def _validar_chamada_da_sala(sala: str, chamada_id: int) -> None:
+    """Escopo de sala (A6): o token só registra presença na chamada aberta da
+    própria sala. Levanta 503 com o banco fora e 403 para chamada alheia."""
+    aberta = await _chamada_aberta_da_sala(sala)
     if aberta is DB_INDISPONIVEL:
         # Banco não respondeu — transitório. 403 aqui seria recusa definitiva
         # para a câmera (nunca mais tentaria este aluno nesta chamada); um
@@ -288,16 +482,31 @@ async def registrar_presenca_camera(
             status_code=503,
             detail="Serviço temporariamente indisponível.",
         )
-    if not aberta or aberta["chamada_id"] != payload.chamada_id:
+    if not aberta or aberta["chamada_id"] != chamada_id:
         raise HTTPException(
             status_code=403,
             detail="Chamada não pertence à sala deste token.",
         )
 
-    resultado = await run_in_threadpool(
-        registrar_presenca_por_face, payload.external_image_id, payload.chamada_id
-    )
+
+@router.post("/registrar_presenca_camera")
+async def registrar_presenca_camera(
+    payload: PresencaCameraPayload,
+    sala: str = Depends(_token_servico),
+):
+    """Registra presença a partir do reconhecimento feito pela câmera local.
+
+    Endpoint async com corpo síncrono (psycopg2 + boto3): sem threadpool, cada
+    rosto reconhecido bloqueia o event loop por duas queries mais a chamada ao
+    Rekognition — e numa sala com aula isso acontece a cada poucos segundos,
+    parando todos os outros requests do worker. Com DB_ASYNC=1 as consultas
+    vão pelo próprio loop, sem ocupar thread (infra/database_async.py).
+    """
+    await _validar_chamada_da_sala(sala, payload.chamada_id)
+
+    resultado = await _registrar_presenca(payload.external_image_id, payload.chamada_id)
     motivo = resultado["motivo"]
+    metricas.contar_presenca_camera(motivo)
 
     if motivo == MOTIVO_JA_REGISTRADO:
         # Idempotente: o servidor já tem o que a câmera queria gravar. Não é
@@ -315,12 +524,53 @@ async def registrar_presenca_camera(
         payload.external_image_id, payload.chamada_id,
     )
 
-    background_tasks.add_task(
-        enviar_notificacoes_presenca,
-        resultado.get("usuario_id"),
-        resultado.get("aluno_nome"),
-        resultado.get("aluno_email"),
-        resultado.get("turma_nome", "sua turma"),
-    )
-
     return {"mensagem": "Presença confirmada.", "ja_registrado": False}
+
+
+class PresencasCameraLotePayload(BaseModel):
+    external_image_ids: list[str] = Field(..., min_length=1, max_length=LOTE_PRESENCAS_MAX)
+    chamada_id: int
+
+
+@router.post("/registrar_presencas_camera/lote")
+async def registrar_presencas_camera_lote(
+    payload: PresencasCameraLotePayload,
+    sala: str = Depends(_token_servico),
+):
+    """Registra de uma vez as presenças que a câmera confirmou num burst.
+
+    Token e chamada validados UMA vez, um único INSERT para todos os alunos.
+    A resposta é sempre 200 com um resultado por aluno, e o `status` de cada
+    item é o que o endpoint unitário devolveria para ele: a câmera aplica a
+    mesma regra (5xx = tentar de novo, resto = decisão definitiva). Erro do
+    lote inteiro (token, chamada de outra sala, banco fora antes de começar)
+    continua saindo como status HTTP da requisição.
+    """
+    await _validar_chamada_da_sala(sala, payload.chamada_id)
+
+    # Repetido no lote vira um item só — e uma notificação só.
+    external_image_ids = list(dict.fromkeys(payload.external_image_ids))
+    por_aluno = await _registrar_presencas_lote(external_image_ids, payload.chamada_id)
+
+    resultados = []
+    for external_image_id in external_image_ids:
+        resultado = por_aluno[external_image_id]
+        motivo = resultado["motivo"]
+        metricas.contar_presenca_camera(motivo)
+        if motivo is None:
+            audit_logger.info(
+                "Presença via câmera registrada aluno=%s chamada=%s",
+                external_image_id, payload.chamada_id,
+            )
+            item = {"status": 200, "ja_registrado": False}
+        elif motivo == MOTIVO_JA_REGISTRADO:
+            item = {"status": 200, "ja_registrado": True}
+        else:
+            item = {
+                "status": _STATUS_POR_MOTIVO[motivo],
+                "error_code": motivo,
+                "detail": _DETALHE_POR_MOTIVO[motivo],
+            }
+        resultados.append({"external_image_id": external_image_id, **item})
+
+    return {"resultados": resultados}
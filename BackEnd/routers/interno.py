@@ -0,0 +1,37 @@
+"""Endpoints operacionais, só para a rede interna (require_ip_interno).
+
+Sem usuário nem rate limit: quem consulta é operador/scraper de dentro da VPC.
+/interno/pool e /interno/agendador respondem pelo worker que atendeu (o
+`pid` na resposta diz qual); /metrics soma todos os workers
+(infra/metricas.py).
+"""
+from fastapi import APIRouter, Depends, Response
+
+from core.security import require_ip_interno
+from infra import metricas
+from infra.database import estatisticas_pool
+from services.agendador import estado_agendador
+
+router = APIRouter(tags=["Interno"], dependencies=[Depends(require_ip_interno)], include_in_schema=False)
+
+
+@router.get("/metrics")
+def metrics():
+    """Formato texto do Prometheus."""
+    return Response(metricas.exportar(), media_type=metricas.TIPO_CONTEUDO)
+
+
+@router.get("/interno/pool")
+def pool():
+    """Pool síncrono deste worker: em uso/ociosas, espera por conexão
+    (histograma cumulativo em segundos), timeouts, conexões criadas,
+    recicladas por idade e descartadas na validação."""
+    return estatisticas_pool()
+
+
+@router.get("/interno/agendador")
+async def agendador():
+    """Se este worker é o líder e, por tarefa, última execução, duração,
+    último sucesso e último erro."""
+    # async: lê a roda de expiração no event loop, o mesmo do laço que a altera.
+    return estado_agendador()
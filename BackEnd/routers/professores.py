@@ -3,6 +3,7 @@ import zoneinfo
 
 from fastapi import APIRouter, Depends
 
+from core.dependencias_db import RETRATO_UNICO
 from core.helpers import internal_error
 from core.security import get_current_user, require_self_or_admin
 from repositories.horarios import listar_aulas_hoje_por_professor
@@ -11,7 +12,7 @@ from repositories.professores import obter_dashboard_professor
 router = APIRouter(prefix="/professor", tags=["professores"])
 
 
-@router.get("/dashboard/{usuario_id}")
+@router.get("/dashboard/{usuario_id}", dependencies=[RETRATO_UNICO])
 def get_dashboard(usuario_id: str, current_user: dict = Depends(get_current_user)):
     require_self_or_admin(usuario_id, current_user)
     try:
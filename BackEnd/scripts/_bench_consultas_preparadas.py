@@ -0,0 +1,87 @@
+"""Benchmark das consultas quentes: texto a cada vez × prepared statement.
+
+NÃO é código de produto. Roda contra o banco do .env (use o de homologação,
+com volume de dados parecido com o de produção) e mede, por consulta, a
+latência de cada ida ao banco com `get_db_cursor()` e com
+`get_db_cursor(preparar=True)` (infra/database.py, infra/sql_preparado.py).
+
+Tudo numa transação que é desfeita no fim: o registro de presença vai para
+uma chamada inexistente (não insere nada) e o incremento do rate limit usa
+uma chave própria que some no ROLLBACK.
+
+Uso:
+  python scripts/_bench_consultas_preparadas.py
+  python scripts/_bench_consultas_preparadas.py --repeticoes 2000 --sala "Sala 101"
+"""
+import argparse
+import pathlib
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from core.limiter_storage import _SQL_INCR
+from infra.database import close_pool, get_db_cursor
+from repositories.camera_tokens import _SQL_SALA_DO_TOKEN
+from repositories.chamadas import _SQL_CANDIDATAS_POR_SALA, _SQL_CHAMADAS_ABERTAS
+from repositories.presencas import _SQL_ESTADO_CHAMADA
+from repositories.usuarios import _SQL_REGISTRAR_PRESENCA, _parametros_registro
+
+
+def _consultas(sala: str):
+    chave = f"bench:{uuid.uuid4()}"
+    return [
+        ("token → sala", _SQL_SALA_DO_TOKEN, ("0" * 64,)),
+        ("candidatas da sala", _SQL_CANDIDATAS_POR_SALA, (sala,)),
+        ("índice de salas", _SQL_CHAMADAS_ABERTAS, None),
+        ("registro de presença", _SQL_REGISTRAR_PRESENCA, _parametros_registro(str(uuid.uuid4()), -1)),
+        ("estado da chamada", _SQL_ESTADO_CHAMADA, (-1,)),
+        ("rate limit incr", _SQL_INCR, (chave, 1, 60, 1, 1, 60)),
+    ]
+
+
+def _medir(preparar: bool, sql, params, repeticoes: int) -> list[float]:
+    tempos = []
+    with get_db_cursor(preparar=preparar) as cur:
+        if cur is None:
+            raise SystemExit("Banco indisponível: confira o .env.")
+        # Aquecimento fora da medida: o primeiro uso paga o PREPARE.
+        cur.execute(sql, params)
+        cur.fetchall()
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            cur.execute(sql, params)
+            cur.fetchall()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        cur.connection.rollback()
+    return tempos
+
+
+def _p99(tempos: list[float]) -> float:
+    return sorted(tempos)[max(0, int(len(tempos) * 0.99) - 1)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repeticoes", type=int, default=500)
+    parser.add_argument("--sala", default="Sala 101")
+    args = parser.parse_args()
+
+    print(f"{'consulta':<22} {'texto p50':>10} {'prep p50':>10} {'texto p99':>10} {'prep p99':>10}  ganho p50")
+    try:
+        for nome, sql, params in _consultas(args.sala):
+            texto = _medir(False, sql, params, args.repeticoes)
+            preparada = _medir(True, sql, params, args.repeticoes)
+            p50_t, p50_p = statistics.median(texto), statistics.median(preparada)
+            print(
+                f"{nome:<22} {p50_t:8.3f}ms {p50_p:8.3f}ms {_p99(texto):8.3f}ms "
+                f"{_p99(preparada):8.3f}ms  {100 * (1 - p50_p / p50_t):6.1f}%"
+            )
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
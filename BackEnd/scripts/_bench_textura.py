@@ -0,0 +1,92 @@
+"""Micro-benchmark do detector de textura: forward por rosto × forward em lote.
+
+NÃO é código de produto. Mede, na CPU onde rodar (rodar NO mini-PC da sala),
+quantos rostos/s cada caminho de scripts/anti_spoofing.py pontua:
+
+  - por rosto: `score(frame, bbox)` em loop — o caminho antigo, um
+    blobFromImage → setInput → forward por rosto;
+  - em lote:   `score_batch(frame, bboxes)` — crops empilhados num blob NCHW,
+    um forward por frame.
+
+Frame sintético 1280x720 com N rostos de 100px em grade: o custo do modelo não
+depende do conteúdo da imagem, só do número de crops. Confere também que os
+dois caminhos dão o mesmo score (tolerância de float32).
+
+Uso:
+  python scripts/_bench_textura.py
+  python scripts/_bench_textura.py --rostos 40 --repeticoes 50
+"""
+import argparse
+import os
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from scripts.anti_spoofing import DetectorTextura
+
+_AQUI = pathlib.Path(__file__).resolve().parent
+
+
+def _resolver_modelo() -> str:
+    """Mesma resolução do reconhecimento_tempo_real.py — mede o MESMO modelo."""
+    model_path = (os.getenv("TEXTURE_MODEL_PATH") or "").strip() or str(
+        _AQUI / "models" / "best_model.onnx"
+    )
+    if not os.path.exists(model_path):
+        raise SystemExit(
+            f"Modelo de textura não encontrado em {model_path}. Baixe o facenox "
+            "best_model.onnx NÃO-quantizado ou defina TEXTURE_MODEL_PATH."
+        )
+    return model_path
+
+
+def _cenario(n_rostos: int, lado: int = 100):
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=(720, 1280, 3), dtype=np.uint8)
+    por_linha = 1280 // (lado + 20)
+    bboxes = [
+        (10 + (i % por_linha) * (lado + 20), 10 + (i // por_linha) * (lado + 20), lado, lado)
+        for i in range(n_rostos)
+    ]
+    return frame, bboxes
+
+
+def _cronometrar(fn, repeticoes: int) -> float:
+    fn()  # aquecimento: a 1ª inferência aloca buffers do cv2.dnn
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        fn()
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rostos", type=int, default=30)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    detector = DetectorTextura(_resolver_modelo(), liveness_min=0.08, face_min_px=80)
+    frame, bboxes = _cenario(args.rostos)
+
+    por_rosto = [detector.score(frame, b) for b in bboxes]
+    em_lote = detector.score_batch(frame, bboxes)
+    if not detector.lote_suportado:
+        print("⚠️  O ONNX recusou batch > 1 (eixo fixo): score_batch caiu no "
+              "caminho por rosto. Os números abaixo serão iguais.")
+    divergencia = max(abs(a - b) for a, b in zip(por_rosto, em_lote))
+
+    t_rosto = _cronometrar(lambda: [detector.score(frame, b) for b in bboxes], args.repeticoes)
+    t_lote = _cronometrar(lambda: detector.score_batch(frame, bboxes), args.repeticoes)
+
+    print(f"{args.rostos} rostos/frame, {args.repeticoes} repetições")
+    print(f"  por rosto: {t_rosto * 1000:8.1f} ms/frame  {args.rostos / t_rosto:8.0f} rostos/s")
+    print(f"  em lote:   {t_lote * 1000:8.1f} ms/frame  {args.rostos / t_lote:8.0f} rostos/s")
+    print(f"  ganho: {t_rosto / t_lote:.2f}x   divergência máx. de score: {divergencia:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Teste de carga do caminho da câmera: N salas batendo na API ao mesmo tempo.
+
+NÃO é código de produto. Cada sala simulada faz o que o
+reconhecimento_tempo_real.py faz numa aula: mantém o long-poll da chamada
+aberta (/chamadas/aberta/sala/aguardar) e, a cada `--intervalo` segundos, manda
+um burst de presenças em lote. Mede a latência do lote e do long-poll que
+respondeu na hora (p50/p95/p99), que é o que a câmera sente.
+
+Para comparar o threadpool com o event loop (infra/database_async.py), rode a
+API duas vezes com o mesmo banco e a mesma carga:
+
+  DB_ASYNC=0 gunicorn -w 4 -k uvicorn_worker.UvicornWorker api:app
+  python scripts/_carga_camera.py --tokens tokens.txt --alunos alunos.txt
+
+  DB_ASYNC=1 gunicorn -w 4 -k uvicorn_worker.UvicornWorker api:app
+  python scripts/_carga_camera.py --tokens tokens.txt --alunos alunos.txt
+
+`tokens.txt`: um token de câmera por linha (scripts/camera_token.py emite), uma
+sala por token, cada sala com chamada aberta. `alunos.txt`: aluno_ids (UUID)
+sorteados para os bursts — de qualquer turma: recusa (403) também é resposta
+do mesmo caminho, e o que se mede é a latência, não o resultado.
+
+Para a carga ter o tráfego de fundo real (threadpool disputado), rode junto
+algo que exercite os endpoints síncronos (dashboard, relatórios).
+
+Uso:
+  python scripts/_carga_camera.py --tokens tokens.txt --alunos alunos.txt \\
+      --url http://localhost:8000 --duracao 120 --intervalo 3 --lote 5
+"""
+import argparse
+import asyncio
+import pathlib
+import random
+import statistics
+import time
+
+import httpx
+
+
+def _ler_linhas(caminho: str) -> list[str]:
+    linhas = [linha.strip() for linha in pathlib.Path(caminho).read_text().splitlines()]
+    return [linha for linha in linhas if linha and not linha.startswith("#")]
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+async def _sala(cliente, token, alunos, args, fim, medidas):
+    cabecalhos = {"X-Service-Token": token}
+    resposta = await cliente.get("/chamadas/aberta/sala", headers=cabecalhos)
+    chamada_id = resposta.json().get("chamada_id") if resposta.status_code == 200 else None
+    if chamada_id is None:
+        print(f"token ...{token[-6:]}: sem chamada aberta ({resposta.status_code}), sala ignorada")
+        return
+
+    async def long_poll():
+        etag = None
+        while time.monotonic() < fim:
+            cab = dict(cabecalhos)
+            if etag:
+                cab["If-None-Match"] = etag
+            inicio = time.perf_counter()
+            r = await cliente.get("/chamadas/aberta/sala/aguardar", headers=cab, params={"espera": 5})
+            if r.status_code == 200:
+                medidas["long_poll"].append(time.perf_counter() - inicio)
+            etag = r.headers.get("ETag", etag)
+
+    async def bursts():
+        # Salas fora de fase, como câmeras reais.
+        await asyncio.sleep(random.uniform(0, args.intervalo))
+        while time.monotonic() < fim:
+            ids = random.sample(alunos, min(args.lote, len(alunos)))
+            inicio = time.perf_counter()
+            r = await cliente.post(
+                "/chamadas/registrar_presencas_camera/lote",
+                headers=cabecalhos,
+                json={"external_image_ids": ids, "chamada_id": chamada_id},
+            )
+            medidas["lote"].append(time.perf_counter() - inicio)
+            if r.status_code >= 500:
+                medidas["erros"] += 1
+            await asyncio.sleep(args.intervalo)
+
+    await asyncio.gather(long_poll(), bursts())
+
+
+def _relatorio(nome: str, valores: list[float]) -> None:
+    if not valores:
+        print(f"{nome:>10}: sem amostras")
+        return
+    ms = [v * 1000 for v in valores]
+    print(
+        f"{nome:>10}: n={len(ms):5d}  p50={statistics.median(ms):7.1f} ms  "
+        f"p95={_percentil(ms, 95):7.1f} ms  p99={_percentil(ms, 99):7.1f} ms  "
+        f"max={max(ms):7.1f} ms"
+    )
+
+
+async def _main(args) -> None:
+    tokens = _ler_linhas(args.tokens)
+    alunos = _ler_linhas(args.alunos)
+    medidas = {"lote": [], "long_poll": [], "erros": 0}
+    fim = time.monotonic() + args.duracao
+    limites = httpx.Limits(max_connections=len(tokens) * 2 + 10)
+    async with httpx.AsyncClient(base_url=args.url, timeout=30, limits=limites) as cliente:
+        await asyncio.gather(*(_sala(cliente, t, alunos, args, fim, medidas) for t in tokens))
+    print(f"{len(tokens)} salas, {args.duracao}s, burst de {args.lote} a cada {args.intervalo}s")
+    _relatorio("lote", medidas["lote"])
+    _relatorio("long-poll", medidas["long_poll"])
+    print(f"{'5xx':>10}: {medidas['erros']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--tokens", required=True, help="arquivo com um token de câmera por linha")
+    parser.add_argument("--alunos", required=True, help="arquivo com aluno_ids (UUID), um por linha")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--duracao", type=int, default=60, help="segundos de carga")
+    parser.add_argument("--intervalo", type=float, default=3.0, help="segundos entre bursts por sala")
+    parser.add_argument("--lote", type=int, default=5, help="alunos por burst")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Agendamento adaptativo do burst: quando disparar e com quantos frames.
+
+Antes, qualquer rosto visível disparava um burst fixo de BURST_FRAMES e, sem
+rosto, o YuNet rodava de novo a cada 30 ms. Depois que a sala inteira estava
+resolvida no tracker, a câmera seguia fazendo exatamente o mesmo trabalho pelos
+~45 minutos quietos da aula: detecção contínua na CPU e bursts a cada 1.5 s.
+
+Dois sinais decidem:
+  - energia de movimento: média da diferença absoluta entre miniaturas em
+    cinza de frames consecutivos. Barata (160x90), roda a cada tick mesmo com
+    o agendador em repouso, e acorda a detecção quando alguém entra ou se mexe;
+  - rostos pendentes: rostos do frame que o pré-filtro por embedding NÃO
+    reconhece como aluno já tratado na chamada. Sem extrator de embedding,
+    todo rosto conta como pendente e o comportamento volta ao de antes.
+
+Com pendentes, dispara já: burst cheio se a cena se mexe (trilhas quebram,
+vale ter frame de sobra), burst curto (consenso + 1) se está parada. Sem
+pendentes, não dispara e dobra a espera até `espera_max` — a cena parada e
+resolvida cai para quase-repouso, e movimento acima do limiar derruba a espera
+na hora. O cooldown depois de um burst continua duro: movimento não o fura.
+
+Classe pura: sem rede, sem AWS, sem câmera, sem env — testável isoladamente.
+"""
+import cv2
+import numpy as np
+
+_LADO_MINIATURA = (160, 90)
+
+
+def miniatura(frame) -> np.ndarray:
+    """Cinza 160x90 do frame: o suficiente para medir movimento na sala."""
+    cinza = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(cinza, _LADO_MINIATURA, interpolation=cv2.INTER_AREA)
+
+
+def energia_movimento(anterior, atual) -> float:
+    """Média de |atual - anterior| em níveis de cinza (0..255)."""
+    return float(cv2.absdiff(anterior, atual).mean())
+
+
+class AgendadorBurst:
+    def __init__(self, frames_max: int, frames_min: int, cooldown: float,
+                 espera_max: float, limiar_movimento: float):
+        if not 1 <= frames_min <= frames_max:
+            raise ValueError("exige 1 <= frames_min <= frames_max")
+        if cooldown < 0 or espera_max < cooldown:
+            raise ValueError("exige 0 <= cooldown <= espera_max")
+        self.frames_max = frames_max
+        self.frames_min = frames_min
+        self.cooldown = cooldown
+        self.espera_max = espera_max
+        self.limiar_movimento = limiar_movimento
+        self._fim_cooldown = 0.0
+        self._espera = 0.0
+        self._proxima_verificacao = 0.0
+
+    def deve_verificar(self, movimento: float, agora: float) -> bool:
+        """Vale rodar o detector de rostos neste tick?"""
+        if agora < self._fim_cooldown:
+            return False
+        return movimento >= self.limiar_movimento or agora >= self._proxima_verificacao
+
+    def verificacao_completa_devida(self, agora: float) -> bool:
+        """O recuo venceu: a próxima verificação deve olhar a cena inteira,
+        não só as regiões com movimento."""
+        return agora >= self._proxima_verificacao
+
+    def planejar(self, pendentes: int, movimento: float, agora: float,
+                 parcial: bool = False) -> int:
+        """Frames do burst a disparar agora; 0 = não dispara (e recua).
+
+        `parcial`: a verificação olhou só as regiões com movimento. Sem
+        pendentes ali, nada se sabe do resto da cena — segura só o cooldown,
+        sem dobrar o recuo nem adiar a verificação completa já marcada.
+        """
+        if pendentes <= 0 and parcial:
+            self._fim_cooldown = min(agora + self.cooldown, self._proxima_verificacao)
+            return 0
+        if pendentes <= 0:
+            # Cena resolvida (ou vazia): recua em dobro até o teto.
+            self._espera = min(self.espera_max, max(self.cooldown, 2 * self._espera))
+            self._proxima_verificacao = agora + self._espera
+            return 0
+        self._espera = 0.0
+        return self.frames_max if movimento >= self.limiar_movimento else self.frames_min
+
+    def burst_concluido(self, agora: float) -> None:
+        self._fim_cooldown = agora + self.cooldown
+        self._proxima_verificacao = self._fim_cooldown
+
+    @property
+    def espera(self) -> float:
+        """Recuo atual sem movimento (0 = ativo), para log."""
+        return self._espera
@@ -51,6 +51,9 @@ class DetectorTextura:
             ) from e
         self.liveness_min = liveness_min
         self.face_min_px = face_min_px
+        # Vira False na primeira vez que o ONNX recusar batch > 1 (modelo
+        # exportado com eixo de batch fixo): daí em diante, um forward por rosto.
+        self.lote_suportado = True
 
     def score(self, frame, bbox) -> float | None:
         """Liveness score 0..1 (1 = rosto vivo), ou None se o rosto for pequeno
@@ -68,12 +71,51 @@ class DetectorTextura:
         p = _softmax(self.net.forward().flatten())
         return float(p[0])  # classe 0 = live (facenox)
 
+    def score_batch(self, frame, bboxes) -> list[float | None]:
+        """`score` de todos os rostos de um frame num forward só.
+
+        Mesma saída de `[score(frame, b) for b in bboxes]` — inclusive None
+        abaixo do piso —, mas os crops 128x128 vão empilhados num blob NCHW e a
+        rede roda uma vez. Numa sala cheia eram 30+ forwards sequenciais por
+        frame na CPU do mini-PC. Benchmark: scripts/_bench_textura.py.
+        """
+        avaliaveis = [i for i, b in enumerate(bboxes) if rosto_avaliavel(b, self.face_min_px)]
+        scores: list[float | None] = [None] * len(bboxes)
+        if not avaliaveis:
+            return scores
+        if not self.lote_suportado or len(avaliaveis) == 1:
+            for i in avaliaveis:
+                scores[i] = self.score(frame, bboxes[i])
+            return scores
+
+        crops = [_crop_scale(frame, bboxes[i], 1.4) for i in avaliaveis]
+        blob = cv2.dnn.blobFromImages(crops, 1 / 255.0, (128, 128), swapRB=True)
+        self.net.setInput(blob)
+        try:
+            logits = self.net.forward()
+        except cv2.error:
+            logits = None
+        if logits is None or logits.shape[0] != len(crops):
+            # Eixo de batch fixo em 1 no ONNX: forward levanta ou devolve uma
+            # linha só. Não é erro de modelo — cai para o caminho por rosto.
+            self.lote_suportado = False
+            return self.score_batch(frame, bboxes)
+        p = _softmax_linhas(logits.reshape(len(crops), -1))
+        for i, vivo in zip(avaliaveis, p[:, 0]):
+            scores[i] = float(vivo)  # classe 0 = live (facenox)
+        return scores
+
 
 def _softmax(v):
     e = np.exp(v - np.max(v))
     return e / e.sum()
 
 
+def _softmax_linhas(m):
+    e = np.exp(m - m.max(axis=1, keepdims=True))
+    return e / e.sum(axis=1, keepdims=True)
+
+
 def _crop_scale(frame, bbox, scale):
     """Recorte quadrado centrado no bbox, expandido por `scale`, com clamp.
     Idêntico ao usado na validação (scripts/_validar_liveness.py)."""
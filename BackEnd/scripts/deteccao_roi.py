@@ -0,0 +1,94 @@
+"""Detecção em resolução reduzida e por região de movimento.
+
+O YuNet rodava no frame inteiro de 1280x720 a cada verificação — e mais uma vez
+antes de cada burst. O custo dele cresce com a área da entrada; o que precisa
+de resolução cheia é o crop (textura exige rosto de ~80px, e o JPEG da AWS quer
+pixels), não a localização do rosto. Então:
+
+  - o YuNet roda numa cópia reduzida por `escala` (0.5 = 1/4 dos pixels) e os
+    bboxes/landmarks voltam para coordenadas do frame cheio, de onde saem os
+    crops de sempre;
+  - opcionalmente, só dentro das regiões onde houve movimento — ver
+    `regioes_de_movimento`.
+
+Limite conhecido: rosto que já é pequeno no frame cheio fica menor ainda na
+cópia, e o YuNet deixa de achar rosto abaixo de ~10px. Na escala 0.5 isso é
+rosto de <20px no frame cheio — longe do piso de 80px da textura, então não
+muda quem pode ser registrado. Escala 1.0 volta ao comportamento antigo.
+
+Funções puras: sem rede, sem AWS, sem câmera, sem env — testáveis isoladamente.
+"""
+import cv2
+import numpy as np
+
+
+def reescalar_faces(faces, sx: float, sy: float, dx: int = 0, dy: int = 0) -> np.ndarray:
+    """Linhas do YuNet (x, y, w, h, 5 landmarks, score) medidas numa imagem
+    reduzida por (sx, sy) e deslocada de (dx, dy) → coordenadas do frame cheio."""
+    faces = np.array(faces, dtype=np.float32, copy=True)
+    xs = np.r_[0, 4:14:2]  # x do bbox e dos landmarks
+    ys = np.r_[1, 5:14:2]
+    faces[:, xs] = faces[:, xs] / sx + dx
+    faces[:, ys] = faces[:, ys] / sy + dy
+    faces[:, 2] /= sx
+    faces[:, 3] /= sy
+    return faces
+
+
+def regioes_de_movimento(anterior, atual, forma_frame, limiar_pixel: int = 25,
+                         margem: float = 0.25, area_min: int = 4) -> list[tuple[int, int, int, int]]:
+    """Retângulos (x, y, w, h) do frame cheio onde as miniaturas diferem.
+
+    `anterior`/`atual` são as miniaturas em cinza do AgendadorBurst. Cada
+    mancha de movimento vira um retângulo com `margem` de folga (o rosto de
+    quem se mexe nem sempre é o que mais se mexe — ombro, braço), e
+    retângulos que se tocam são fundidos: sem isso o mesmo rosto sairia de
+    duas regiões e viraria duas detecções.
+    """
+    h_frame, w_frame = forma_frame[:2]
+    h_mini, w_mini = atual.shape[:2]
+    fx, fy = w_frame / w_mini, h_frame / h_mini
+
+    _, mascara = cv2.threshold(cv2.absdiff(anterior, atual), limiar_pixel, 255, cv2.THRESH_BINARY)
+    mascara = cv2.dilate(mascara, np.ones((3, 3), np.uint8), iterations=2)
+    contornos, _ = cv2.findContours(mascara, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    regioes = []
+    for c in contornos:
+        x, y, w, h = cv2.boundingRect(c)
+        if w * h < area_min:
+            continue
+        mx, my = margem * w, margem * h
+        x1 = int(max(0, (x - mx) * fx))
+        y1 = int(max(0, (y - my) * fy))
+        x2 = int(min(w_frame, (x + w + mx) * fx))
+        y2 = int(min(h_frame, (y + h + my) * fy))
+        regioes.append((x1, y1, x2 - x1, y2 - y1))
+    return _fundir(regioes)
+
+
+def _fundir(regioes):
+    """Une retângulos que se sobrepõem até não sobrar sobreposição."""
+    regioes = list(regioes)
+    fundiu = True
+    while fundiu:
+        fundiu = False
+        for i in range(len(regioes)):
+            for j in range(i + 1, len(regioes)):
+                if _tocam(regioes[i], regioes[j]):
+                    ax, ay, aw, ah = regioes[i]
+                    bx, by, bw, bh = regioes.pop(j)
+                    x1, y1 = min(ax, bx), min(ay, by)
+                    x2, y2 = max(ax + aw, bx + bw), max(ay + ah, by + bh)
+                    regioes[i] = (x1, y1, x2 - x1, y2 - y1)
+                    fundiu = True
+                    break
+            if fundiu:
+                break
+    return regioes
+
+
+def _tocam(a, b) -> bool:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ax <= bx + bw and bx <= ax + aw and ay <= by + bh and by <= ay + ah
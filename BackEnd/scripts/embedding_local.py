@@ -0,0 +1,118 @@
+"""Pré-filtro local por embedding facial — corta SearchFacesByImage repetido.
+
+Sem isto, todo crop de todo frame do burst vira um SearchFaces pago: o aluno
+que fica sentado parado é re-identificado a cada burst, 5 frames × N rostos,
+até o fim da aula. Numa sala de 60 são centenas de chamadas por minuto para
+responder uma pergunta que o Rekognition já respondeu.
+
+Modelo SFace (opencv_zoo, face_recognition_sface_2021dec.onnx, Apache-2.0)
+rodando em cv2.dnn, no mesmo molde de scripts/anti_spoofing.py. O crop é
+alinhado pelos 5 landmarks do YuNet para a pose canônica 112x112 do SFace —
+o mesmo que `cv2.FaceRecognizerSF.alignCrop` faz — e o embedding de 128
+dimensões sai L2-normalizado, então similaridade = produto escalar.
+
+O QUE O PRÉ-FILTRO PODE E NÃO PODE FAZER: ele só DESCARTA crop. A identidade
+memorizada vem sempre de um match do Rekognition (`memorizar` é chamado com o
+ExternalImageId que a AWS devolveu), e o crop só é descartado se casar com um
+aluno já resolvido no RegistroPresencaTracker. Um falso positivo local custa,
+no pior caso, um frame a menos para quem ainda não foi marcado — nunca uma
+presença registrada para a pessoa errada.
+"""
+import cv2
+import numpy as np
+
+# Landmarks de referência do SFace no crop 112x112, mesma ordem do YuNet:
+# olho direito, olho esquerdo, ponta do nariz, canto direito e esquerdo da boca.
+# Valores de modules/objdetect/src/face_recognize.cpp (OpenCV).
+_REFERENCIA_SFACE = np.array([
+    [38.2946, 51.6963],
+    [73.5318, 51.5014],
+    [56.0252, 71.7366],
+    [41.5493, 92.3655],
+    [70.7299, 92.2041],
+], dtype=np.float32)
+_LADO_SFACE = 112
+
+
+class ExtratorEmbedding:
+    """Carrega o ONNX 1× e extrai embeddings. Erro de load levanta."""
+
+    def __init__(self, model_path: str):
+        try:
+            self.net = cv2.dnn.readNetFromONNX(model_path)
+        except cv2.error as e:
+            raise RuntimeError(
+                f"Falha ao carregar modelo de embedding em {model_path}: {e}\n"
+                "Use o face_recognition_sface_2021dec.onnx do opencv_zoo."
+            ) from e
+
+    def embedding(self, frame, landmarks) -> np.ndarray | None:
+        """Embedding L2-normalizado (128,) do rosto, ou None se o alinhamento
+        não fechar (landmarks degenerados)."""
+        alinhado = _alinhar(frame, landmarks)
+        if alinhado is None:
+            return None
+        blob = cv2.dnn.blobFromImage(alinhado, 1.0, (_LADO_SFACE, _LADO_SFACE), swapRB=True)
+        self.net.setInput(blob)
+        return _normalizar(self.net.forward().flatten())
+
+
+class CacheIdentidades:
+    """Embeddings dos rostos que o Rekognition já identificou NESTA chamada.
+
+    Classe pura: sem rede, sem AWS, sem câmera, sem env — testável isoladamente.
+    Como o RegistroPresencaTracker, não é thread-safe por si só: o chamador
+    serializa os acessos sob o mesmo self.lock, e é `limpar()`ado junto com
+    ele na troca de chamada.
+
+    Guarda até `max_por_aluno` amostras por aluno (as mais recentes): o mesmo
+    rosto de frente e de perfil fica longe no espaço do embedding, e uma
+    amostra só faria o filtro falhar justamente em quem se mexe.
+    """
+
+    def __init__(self, limiar: float, max_por_aluno: int = 5):
+        if not -1.0 <= limiar <= 1.0:
+            raise ValueError("limiar deve estar em [-1, 1]")
+        if max_por_aluno < 1:
+            raise ValueError("max_por_aluno deve ser >= 1")
+        self.limiar = limiar
+        self.max_por_aluno = max_por_aluno
+        self._amostras: dict[str, list[np.ndarray]] = {}
+
+    def memorizar(self, embedding: np.ndarray, external_id: str) -> None:
+        amostras = self._amostras.setdefault(external_id, [])
+        amostras.append(embedding)
+        if len(amostras) > self.max_por_aluno:
+            del amostras[0]
+
+    def identificar(self, embedding: np.ndarray) -> str | None:
+        """Aluno mais parecido acima do limiar, ou None."""
+        melhor_id, melhor_sim = None, self.limiar
+        for external_id, amostras in self._amostras.items():
+            sim = float(np.max(np.stack(amostras) @ embedding))
+            if sim >= melhor_sim:
+                melhor_id, melhor_sim = external_id, sim
+        return melhor_id
+
+    def limpar(self) -> None:
+        """Troca de chamada: identidades da anterior não valem para a nova."""
+        self._amostras.clear()
+
+    def __len__(self) -> int:
+        return len(self._amostras)
+
+
+def _normalizar(v):
+    norma = np.linalg.norm(v)
+    if norma == 0:
+        return v
+    return v / norma
+
+
+def _alinhar(frame, landmarks):
+    """Transformação de similaridade landmarks → referência SFace, 112x112."""
+    origem = np.asarray(landmarks, dtype=np.float32).reshape(5, 2)
+    matriz, _ = cv2.estimateAffinePartial2D(origem, _REFERENCIA_SFACE, method=cv2.LMEDS)
+    if matriz is None:
+        return None
+    return cv2.warpAffine(frame, matriz, (_LADO_SFACE, _LADO_SFACE))
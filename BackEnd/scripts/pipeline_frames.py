@@ -0,0 +1,175 @@
+"""Peças do pipeline captura → detecção → decisão da câmera da sala.
+
+Antes, o loop principal lia a câmera com `time.sleep(0.01)` e guardava só
+`frame_atual` sob o lock; o burst dormia `intervalo` entre frames e podia pegar
+o MESMO frame duas vezes (a captura não tinha avançado), contando um frame
+repetido como "match independente" no consenso X-de-Y. E a decisão (espera do
+Rekognition) segurava a detecção parada.
+
+  captura ──► BufferCircular ──► detecção ──► FilaDescarte ──► decisão
+  (cap.read)  (anel de frames)   (YuNet,       (bursts)        (AWS, consenso,
+                                  rastreador)                   POST)
+
+- BufferCircular: anel de tamanho fixo, com os arrays numpy pré-alocados no
+  primeiro frame. A captura escreve sem nunca esperar ninguém (o anel
+  sobrescreve o mais antigo); a detecção pede "o primeiro frame depois do
+  instante T que eu ainda não usei" — amostras distintas em instantes exatos.
+- FilaDescarte: fila limitada com descarte do MAIS ANTIGO. Se a decisão ficar
+  para trás (AWS lenta), burst velho perde a vez para o novo, em vez de a fila
+  crescer ou a detecção travar esperando.
+- MetricasEstagio: latência por estágio, para o relatório periódico do log.
+
+Classes puras: sem rede, sem AWS, sem câmera, sem env — testáveis
+isoladamente. Ao contrário do RegistroPresencaTracker, estas SÃO thread-safe:
+existem justamente para ligar threads diferentes.
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class BufferCircular:
+    def __init__(self, capacidade: int):
+        if capacidade < 2:
+            raise ValueError("capacidade deve ser >= 2")
+        self.capacidade = capacidade
+        self._cond = threading.Condition()
+        self._frames: np.ndarray | None = None  # (capacidade, h, w, c), alocado 1×
+        self._ts = np.zeros(capacidade, dtype=np.float64)
+        self._seq = np.full(capacidade, -1, dtype=np.int64)
+        self._proximo_seq = 0
+        # (seq, ts) do último frame sobrescrito — o que vinha logo antes do
+        # mais antigo ainda no anel.
+        self._despejado = (-1, 0.0)
+        # Amostras cujo frame exato já tinha sido sobrescrito quando o leitor
+        # chegou (detecção mais lenta que o anel).
+        self.perdidos = 0
+
+    def escrever(self, frame: np.ndarray, ts: float) -> int:
+        """Copia o frame para o próximo slot. Devolve o número de sequência."""
+        with self._cond:
+            if self._frames is None or self._frames.shape[1:] != frame.shape:
+                # Primeiro frame, ou câmera reaberta com outra resolução: é a
+                # única alocação; daqui em diante é só cópia para o slot.
+                self._frames = np.empty((self.capacidade, *frame.shape), dtype=frame.dtype)
+                self._seq.fill(-1)
+                self._despejado = (-1, 0.0)
+            seq = self._proximo_seq
+            slot = seq % self.capacidade
+            if self._seq[slot] >= 0:
+                self._despejado = (int(self._seq[slot]), float(self._ts[slot]))
+            np.copyto(self._frames[slot], frame)
+            self._ts[slot] = ts
+            self._seq[slot] = seq
+            self._proximo_seq += 1
+            self._cond.notify_all()
+            return seq
+
+    def ultimo(self):
+        """(seq, ts, cópia do frame) mais recente, ou None se vazio."""
+        with self._cond:
+            if self._proximo_seq == 0 or self._frames is None:
+                return None
+            slot = int(np.argmax(self._seq))
+            if self._seq[slot] < 0:
+                return None
+            return int(self._seq[slot]), float(self._ts[slot]), self._frames[slot].copy()
+
+    def aguardar(self, seq_min: int, ts_alvo: float, timeout: float):
+        """Primeiro frame com seq > `seq_min` capturado em `ts_alvo` ou depois.
+
+        Bloqueia até ele existir ou o timeout vencer (None). Devolve
+        (seq, ts, cópia do frame): a cópia é do chamador, o slot pode ser
+        sobrescrito logo em seguida.
+        """
+        limite = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                escolhido = self._candidato(seq_min, ts_alvo)
+                if escolhido is not None:
+                    slot, perdeu = escolhido
+                    if perdeu:
+                        self.perdidos += 1
+                    return int(self._seq[slot]), float(self._ts[slot]), self._frames[slot].copy()
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return None
+                self._cond.wait(restante)
+
+    def limpar(self) -> None:
+        """Câmera desligada: nenhum frame antigo pode virar amostra depois."""
+        with self._cond:
+            self._seq.fill(-1)
+            self._despejado = (-1, 0.0)
+
+    def _candidato(self, seq_min, ts_alvo):
+        validos = (self._seq > seq_min) & (self._ts >= ts_alvo)
+        if not validos.any():
+            return None
+        seqs = np.where(validos, self._seq, np.iinfo(np.int64).max)
+        slot = int(np.argmin(seqs))
+        # O frame sobrescrito por último também servia e era mais antigo que o
+        # escolhido: a amostra exata se perdeu, o leitor pega a seguinte.
+        seq_despejado, ts_despejado = self._despejado
+        perdeu = (seq_min < seq_despejado < int(self._seq[slot])
+                  and ts_despejado >= ts_alvo)
+        return slot, perdeu
+
+
+class FilaDescarte:
+    """Fila limitada: cheia, `colocar` descarta o item MAIS ANTIGO."""
+
+    def __init__(self, capacidade: int):
+        if capacidade < 1:
+            raise ValueError("capacidade deve ser >= 1")
+        self._itens: deque = deque()
+        self._capacidade = capacidade
+        self._cond = threading.Condition()
+        self.descartados = 0
+
+    def colocar(self, item) -> None:
+        with self._cond:
+            if len(self._itens) >= self._capacidade:
+                self._itens.popleft()
+                self.descartados += 1
+            self._itens.append(item)
+            self._cond.notify()
+
+    def retirar(self, timeout: float):
+        """Próximo item, ou None se o timeout vencer com a fila vazia."""
+        with self._cond:
+            if not self._itens:
+                self._cond.wait(timeout)
+            if not self._itens:
+                return None
+            return self._itens.popleft()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._itens)
+
+
+class MetricasEstagio:
+    """Contagem, média e máximo de duração de um estágio desde o último resumo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._n = 0
+        self._soma = 0.0
+        self._max = 0.0
+
+    def registrar(self, segundos: float) -> None:
+        with self._lock:
+            self._n += 1
+            self._soma += segundos
+            self._max = max(self._max, segundos)
+
+    def resumo_e_zerar(self) -> tuple[int, float, float]:
+        """(n, média_ms, máximo_ms) da janela, e começa uma janela nova."""
+        with self._lock:
+            n, soma, maximo = self._n, self._soma, self._max
+            self._n, self._soma, self._max = 0, 0.0, 0.0
+        media = (soma / n * 1000) if n else 0.0
+        return n, media, maximo * 1000
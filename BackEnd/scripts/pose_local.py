@@ -0,0 +1,67 @@
+"""Pose da cabeça (yaw/pitch) a partir dos 5 landmarks do YuNet — sem rede.
+
+Antes, todo match novo custava um segundo round trip pago
+(`rekognition_client.detect_faces`) só para ler Yaw/Pitch, e um DetectFaces
+lento segurava o burst inteiro até o `fut.result(timeout=15)`. A pose só
+alimenta a `magnitude` do ConfirmadorBurst — ADVISORY com textura ligada,
+gate apenas no fallback ENABLE_TEXTURE=0 —, e o YuNet já entrega os pontos de
+que um solvePnP precisa.
+
+Modelo 3D genérico de rosto adulto (mm, origem na ponta do nariz, x para a
+direita da imagem, y para baixo, z para longe da câmera). Intrínsecos
+aproximados pelo tamanho do frame (foco = largura, centro óptico no meio, sem
+distorção): sem calibração da câmera da sala, o erro absoluto fica na casa de
+poucos graus, mas é o MESMO erro em todos os frames do burst — e a magnitude é
+desvio-padrão, que não enxerga deslocamento constante.
+
+CALIBRAÇÃO: LIVENESS_POSE_STD_MIN foi medido com a pose do Rekognition. A
+escala daqui é parecida (graus, ângulos pequenos), não idêntica; antes de usar
+o fallback de pose como gate, re-medir na câmera real.
+
+Funções puras: sem AWS, sem câmera, sem env — testáveis isoladamente.
+"""
+import math
+
+import cv2
+import numpy as np
+
+# Mesma ordem dos landmarks do YuNet: olho direito, olho esquerdo, ponta do
+# nariz, canto direito e canto esquerdo da boca (direito = da pessoa, que
+# aparece à ESQUERDA na imagem).
+_MODELO_3D = np.array([
+    [-32.0, -35.0, 30.0],
+    [32.0, -35.0, 30.0],
+    [0.0, 0.0, 0.0],
+    [-25.0, 30.0, 25.0],
+    [25.0, 30.0, 25.0],
+], dtype=np.float64)
+
+
+def estimar_pose(landmarks, largura: int, altura: int) -> tuple[float | None, float | None]:
+    """(yaw, pitch) em graus, ou (None, None) se o solvePnP não convergir.
+
+    None tem a mesma semântica do DetectFaces que falhava: o frame conta para o
+    consenso, só não entra no desvio-padrão da pose.
+    """
+    pontos = np.asarray(landmarks, dtype=np.float64).reshape(5, 2)
+    camera = np.array([
+        [largura, 0.0, largura / 2.0],
+        [0.0, largura, altura / 2.0],
+        [0.0, 0.0, 1.0],
+    ])
+    try:
+        # SQPnP: global, aceita 5 pontos não coplanares (o ITERATIVE exige 6).
+        ok, rvec, _tvec = cv2.solvePnP(_MODELO_3D, pontos, camera, None,
+                                       flags=cv2.SOLVEPNP_SQPNP)
+    except cv2.error:
+        return None, None
+    if not ok:
+        return None, None
+    return _angulos(cv2.Rodrigues(rvec)[0])
+
+
+def _angulos(r) -> tuple[float, float]:
+    """Decompõe R = Rx(pitch) · Ry(yaw): virar o rosto, depois inclinar."""
+    yaw = math.degrees(math.asin(max(-1.0, min(1.0, r[0, 2]))))
+    pitch = math.degrees(math.atan2(-r[1, 2], r[2, 2]))
+    return yaw, pitch
@@ -0,0 +1,40 @@
+"""Consumidor da fila de jobs (push, e-mail) como processo à parte.
+
+Alternativa ao consumidor dentro dos workers da API: com JOBS_EM_PROCESSO=0
+no .env da API, só este processo envia. Roda pelo systemd
+(ops/jobs/scpi-jobs.service). Bootstrap igual aos outros scripts de
+BackEnd/scripts/."""
+import asyncio
+import logging
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv(), override=True)
+
+from core.observabilidade import init_sentry
+from infra.escuta_pg import escuta
+from services.fila_jobs import iniciar_consumidor
+import services.notificacoes  # noqa: F401 — registra os tipos de job
+
+logger = logging.getLogger("scpi.jobs")
+
+
+def main():
+    init_sentry("processar_jobs")
+    # NOTIFY `jobs` acorda o consumidor na hora; sem a escuta, só o poll.
+    escuta.iniciar()
+    try:
+        asyncio.run(iniciar_consumidor())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        escuta.parar()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    main()
@@ -0,0 +1,102 @@
+"""Rastreamento de rostos entre os frames de UM burst (IoU + centroide).
+
+Sem isto, cada crop de cada frame ia para o SearchFaces por conta própria: uma
+pessoa em 5 frames custava 5 chamadas pagas para descobrir 5 vezes a mesma
+identidade. Com o rastreador, os bboxes do YuNet viram trilhas; o Rekognition
+é consultado uma vez por trilha e a identidade vale para todos os frames dela.
+
+O QUE MUDA NO CONSENSO X-de-Y: antes eram X matches independentes; agora é um
+match + o rosto seguido por X frames. O ConfirmadorBurst continua contando
+ResultadoFrame por aluno, só que a contagem passa a medir persistência da
+trilha. Falso positivo de frame único continua barrado pelo
+FACE_MATCH_THRESHOLD_SALA, e a textura segue pontuada por frame.
+
+Associação gulosa pela maior IoU contra o último bbox de cada trilha. Quando
+nenhuma trilha passa do `iou_min` (rosto que andou rápido entre frames
+espaçados de 0.4 s), cai para o centroide: distância menor que
+`fator_centroide` × o lado do bbox. Câmera fixa, poucos frames, rostos que não
+se cruzam — não há ganho em Kalman/Hungarian aqui.
+
+Classe pura: sem rede, sem AWS, sem câmera, sem env — testável isoladamente.
+Uma instância por burst: trilhas não atravessam bursts (o cache de embeddings
+é que carrega identidade de um burst para o outro).
+"""
+import math
+
+
+def iou(a, b) -> float:
+    """Intersection over Union de dois bboxes (x, y, w, h)."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    uniao = aw * ah + bw * bh - inter
+    return inter / uniao if uniao > 0 else 0.0
+
+
+def _distancia_centroides(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return math.hypot((ax + aw / 2) - (bx + bw / 2), (ay + ah / 2) - (by + bh / 2))
+
+
+class RastreadorRostos:
+    def __init__(self, iou_min: float = 0.3, fator_centroide: float = 0.5):
+        if not 0.0 < iou_min <= 1.0:
+            raise ValueError("iou_min deve estar em (0, 1]")
+        if fator_centroide < 0:
+            raise ValueError("fator_centroide deve ser >= 0")
+        self.iou_min = iou_min
+        self.fator_centroide = fator_centroide
+        # track_id -> último bbox visto
+        self._ultimo: dict[int, tuple] = {}
+        self._proximo_id = 0
+
+    def atribuir(self, bboxes: list[tuple]) -> list[int]:
+        """Track id de cada bbox DESTE frame, na mesma ordem da entrada.
+
+        Cada trilha recebe no máximo um bbox por frame. Bbox sem par abre
+        trilha nova; trilha sem bbox neste frame continua viva (o rosto pode
+        voltar no frame seguinte — piscou o detector, alguém passou na frente).
+        """
+        pares = []
+        for i, bbox in enumerate(bboxes):
+            for tid, anterior in self._ultimo.items():
+                v = iou(bbox, anterior)
+                if v >= self.iou_min:
+                    pares.append((v, i, tid))
+        pares.sort(reverse=True)
+
+        ids: list[int | None] = [None] * len(bboxes)
+        usadas: set[int] = set()
+        for _v, i, tid in pares:
+            if ids[i] is None and tid not in usadas:
+                ids[i] = tid
+                usadas.add(tid)
+
+        # Fallback por centroide para quem ficou sem par na IoU.
+        for i, bbox in enumerate(bboxes):
+            if ids[i] is not None:
+                continue
+            limite = self.fator_centroide * max(bbox[2], bbox[3])
+            melhor, melhor_d = None, limite
+            for tid, anterior in self._ultimo.items():
+                if tid in usadas:
+                    continue
+                d = _distancia_centroides(bbox, anterior)
+                if d <= melhor_d:
+                    melhor, melhor_d = tid, d
+            if melhor is not None:
+                ids[i] = melhor
+                usadas.add(melhor)
+
+        for i, bbox in enumerate(bboxes):
+            if ids[i] is None:
+                ids[i] = self._proximo_id
+                self._proximo_id += 1
+            self._ultimo[ids[i]] = bbox
+        return ids
+
+    def __len__(self) -> int:
+        return len(self._ultimo)
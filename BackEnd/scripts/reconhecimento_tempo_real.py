@@ -14,7 +14,13 @@ from dotenv import load_dotenv, find_dotenv
 from core.config import COLLECTION_ID, FACE_MATCH_THRESHOLD_SALA
 from infra.aws_clientes import rekognition_client
 from scripts.confirmacao_burst import ConfirmadorBurst, Decisao, ResultadoFrame
+from scripts.agendador_burst import AgendadorBurst, energia_movimento, miniatura
 from scripts.anti_spoofing import DetectorTextura
+from scripts.deteccao_roi import reescalar_faces, regioes_de_movimento
+from scripts.embedding_local import CacheIdentidades, ExtratorEmbedding
+from scripts.pipeline_frames import BufferCircular, FilaDescarte, MetricasEstagio
+from scripts.pose_local import estimar_pose
+from scripts.rastreador_rostos import RastreadorRostos
 from scripts.registro_tracker import RegistroPresencaTracker
 
 load_dotenv(find_dotenv())
@@ -42,6 +48,54 @@ _TEXTURE_LIVENESS_MIN = float(os.getenv("TEXTURE_LIVENESS_MIN", "0.08"))
 # 2026-08-06. Abaixo do piso a textura é None => PENDENTE (fail-closed).
 _TEXTURE_FACE_MIN_PX = int(os.getenv("TEXTURE_FACE_MIN_PX", "80"))
 
+# --- Pré-filtro local por embedding (SFace em cv2.dnn) ---
+# Otimização de custo, não gate de segurança: só descarta crop de aluno já
+# resolvido, nunca registra ninguém. Por isso modelo ausente é aviso, não erro.
+_ENABLE_EMBEDDING = (os.getenv("ENABLE_EMBEDDING", "1").strip().lower()
+                     not in ("0", "false", "no", ""))
+# Similaridade cosseno mínima para reaproveitar a identidade. 0.363 é o limiar
+# publicado do SFace para "mesma pessoa" (opencv_zoo).
+_EMBEDDING_LIMIAR = float(os.getenv("EMBEDDING_LIMIAR", "0.363"))
+
+# --- Sincronização da chamada da sala ---
+# Intervalo do polling de /chamadas/aberta/sala, usado só quando o long-poll
+# (/chamadas/aberta/sala/aguardar) não está disponível.
+_INTERVALO_SYNC_S = 5
+# Espera pedida ao long-poll (teto do servidor: 25 s) e de quanto em quanto
+# tempo, no polling, tentar voltar a ele.
+_LONG_POLL_ESPERA_S = 25
+_LONG_POLL_RETENTATIVA_S = 60
+
+# Teto do lote de presenças por POST (mesmo LOTE_PRESENCAS_MAX da API).
+_LOTE_PRESENCAS_MAX = 100
+
+# --- Pipeline captura → detecção → decisão ---
+# Frames no anel entre captura e detecção (~0.25 s a 30 fps). Só precisa cobrir
+# o atraso da detecção; cada slot 1280x720 custa ~2.7 MB.
+_BUFFER_FRAMES = int(os.getenv("BUFFER_FRAMES", "8"))
+# Janela do relatório de latência por estágio no log, em segundos.
+_INTERVALO_METRICAS_S = 60
+
+# --- Agendamento adaptativo do burst (scripts/agendador_burst.py) ---
+# Energia de movimento (média |Δ| em cinza 0..255, miniatura 160x90) que acorda
+# a detecção e pede burst cheio. Ruído de sensor parado fica em ~1.
+_MOVIMENTO_LIMIAR = float(os.getenv("MOVIMENTO_LIMIAR", "3.0"))
+# Teto do recuo com a cena parada e todos os rostos resolvidos, em segundos.
+_BURST_ESPERA_MAX_S = float(os.getenv("BURST_ESPERA_MAX_S", "30"))
+# Intervalo entre medições de movimento em repouso.
+_TICK_MOVIMENTO_S = 0.1
+
+# --- Detecção reduzida (scripts/deteccao_roi.py) ---
+# Fator aplicado ao frame antes do YuNet; bboxes e landmarks voltam para a
+# resolução cheia, de onde saem os crops. 0.5 = 1/4 dos pixels; 1.0 desliga.
+_DETECCAO_ESCALA = min(1.0, max(0.1, float(os.getenv("DETECCAO_ESCALA", "0.5"))))
+# Gatilho por movimento roda o YuNet só nas regiões que mudaram. O burst e a
+# verificação periódica sem movimento continuam olhando o frame inteiro.
+_DETECCAO_ROI = (os.getenv("DETECCAO_ROI", "0").strip().lower()
+                 in ("1", "true", "yes", "on"))
+# YuNet não acha rosto em entrada menor que isso (lado, em px).
+_DETECCAO_LADO_MIN = 16
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -52,9 +106,27 @@ class SistemaReconhecimento:
             raise ValueError("CAMERA_SERVICE_TOKEN não definido. Emita um token com scripts/camera_token.py e configure o .env.")
 
         self.rodando = False
-        self.frame_atual = None
+        # Captura → anel → detecção → fila → decisão (scripts/pipeline_frames.py).
+        self.buffer_frames = BufferCircular(_BUFFER_FRAMES)
+        # 1 burst na fila: se a decisão atrasar, o burst novo substitui o velho
+        # (mesmos rostos, frames mais recentes).
+        self.fila_bursts = FilaDescarte(1)
+        self.metricas = {
+            "captura": MetricasEstagio(),
+            "deteccao": MetricasEstagio(),
+            "fila": MetricasEstagio(),
+            "decisao": MetricasEstagio(),
+        }
 
         self.COOLDOWN_ENTRE_BURSTS = 1.5  # segundos entre bursts (era o intervalo de envio contínuo)
+        self.agendador = AgendadorBurst(
+            frames_max=_BURST_FRAMES,
+            # Consenso + 1 de folga para o detector piscar num frame.
+            frames_min=min(_BURST_FRAMES, _BURST_MIN_MATCHES + 1),
+            cooldown=self.COOLDOWN_ENTRE_BURSTS,
+            espera_max=max(self.COOLDOWN_ENTRE_BURSTS, _BURST_ESPERA_MAX_S),
+            limiar_movimento=_MOVIMENTO_LIMIAR,
+        )
         self.confirmador = ConfirmadorBurst(
             min_matches=_BURST_MIN_MATCHES,
             pose_std_min=_LIVENESS_POSE_STD_MIN,
@@ -64,7 +136,12 @@ class SistemaReconhecimento:
         self.CAM_INDEX = _CAMERA_INDEX
 
         self.chamada_id_atual = None
+        # ETag da última resposta do long-poll (None = força resposta imediata).
+        self._etag_chamada = None
         self.tracker = RegistroPresencaTracker()
+        # Embeddings de quem o Rekognition já identificou nesta chamada.
+        # Mesmo ciclo de vida do tracker: limpo junto na troca de chamada.
+        self.cache_identidades = CacheIdentidades(_EMBEDDING_LIMIAR)
 
         self.lock = threading.Lock()
         self._aws_pool = ThreadPoolExecutor(max_workers=4)
@@ -79,7 +156,7 @@ class SistemaReconhecimento:
                 f"Modelo YuNet não encontrado em {model_path}. "
                 "Baixe-o conforme ops de setup (opencv_zoo) ou defina FACE_MODEL_PATH."
             )
-        # input size é redefinido por frame em _crops_de_rostos
+        # input size é redefinido por frame em _detectar_rostos
         self.face_detector = cv2.FaceDetectorYN.create(model_path, "", (320, 320), 0.6)
 
         # Detector de textura (gate de vida). Fail-closed: se ENABLE_TEXTURE e o
@@ -116,13 +193,44 @@ class SistemaReconhecimento:
                 "não é um paliativo, é um gate aberto."
             )
 
-    def _sincronizar_chamada(self):
-        try:
-            resp = requests.get(
-                f"{_API_URL}/chamadas/aberta/sala",
-                headers={"x-service-token": _SERVICE_TOKEN},
-                timeout=5,
+        self.extrator_embedding = None
+        if _ENABLE_EMBEDDING:
+            embedding_path = (os.getenv("EMBEDDING_MODEL_PATH") or "").strip() or str(
+                pathlib.Path(__file__).resolve().parent / "models" / "face_recognition_sface_2021dec.onnx"
             )
+            if os.path.exists(embedding_path):
+                self.extrator_embedding = ExtratorEmbedding(embedding_path)
+                logger.info(f"🧠 Pré-filtro por embedding ativo (limiar={_EMBEDDING_LIMIAR}).")
+            else:
+                logger.warning(
+                    f"⚠️  Modelo de embedding não encontrado em {embedding_path} — "
+                    "sem pré-filtro local: todo crop vai para o SearchFaces. Baixe o "
+                    "face_recognition_sface_2021dec.onnx (opencv_zoo) ou defina "
+                    "EMBEDDING_MODEL_PATH. Para silenciar: ENABLE_EMBEDDING=0."
+                )
+
+    def _sincronizar_chamada(self, aguardar=False):
+        """Uma rodada de sincronização da chamada da sala.
+
+        `aguardar`: long-poll em /chamadas/aberta/sala/aguardar — o servidor
+        segura a resposta até a chamada mudar. Sem ele, o GET simples.
+        Devolve os segundos até a próxima rodada, ou None se o servidor não
+        respondeu (estado preservado; no long-poll, volte ao polling).
+        """
+        url = f"{_API_URL}/chamadas/aberta/sala"
+        headers = {"x-service-token": _SERVICE_TOKEN}
+        params = None
+        timeout = 5
+        if aguardar:
+            url += "/aguardar"
+            params = {"espera": _LONG_POLL_ESPERA_S}
+            if self._etag_chamada:
+                headers["If-None-Match"] = self._etag_chamada
+            timeout = (5, _LONG_POLL_ESPERA_S + 10)
+        else:
+            self._etag_chamada = None
+        try:
+            resp = requests.get(url, headers=headers, params=params, timeout=timeout)
             # 5xx é adiamento, não resposta: o servidor não sabe dizer qual é a
             # chamada. Achatá-lo em `chamada_id = None` fazia o bloco abaixo
             # entender "a chamada acabou" e dar limpar() no tracker — no ciclo
@@ -134,22 +242,67 @@ class SistemaReconhecimento:
                     "Sincronização adiada: API respondeu %s. Estado da chamada preservado.",
                     resp.status_code,
                 )
-                return
+                return None
+            if aguardar:
+                if resp.status_code in (404, 405):
+                    # API anterior ao long-poll: não é "sem chamada".
+                    return None
+                if resp.status_code == 304:
+                    return 0
             chamada_id = resp.json().get("chamada_id") if resp.status_code == 200 else None
         except Exception as e:
             logger.error(f"Erro ao sincronizar chamada: {e}")
-            return
+            return None
 
+        proxima = _INTERVALO_SYNC_S
+        if aguardar:
+            self._etag_chamada = None
+            if resp.status_code == 200:
+                # Retry-After: o servidor não consegue segurar a resposta
+                # (sem escuta do NOTIFY) e pede o ritmo do polling.
+                self._etag_chamada = resp.headers.get("ETag")
+                try:
+                    proxima = float(resp.headers.get("Retry-After") or 0)
+                except ValueError:
+                    proxima = _INTERVALO_SYNC_S
+        self._aplicar_chamada(chamada_id)
+        return proxima
+
+    def _aplicar_chamada(self, chamada_id):
         with self.lock:
             if chamada_id != self.chamada_id_atual:
                 anteriores = len(self.tracker)
                 self.chamada_id_atual = chamada_id
                 self.tracker.limpar()
+                self.cache_identidades.limpar()
                 if chamada_id:
                     logger.info(f"📋 Nova chamada detectada: {chamada_id} — {anteriores} presentes resetados.")
                 else:
                     logger.info(f"📋 Nenhuma chamada aberta na sala deste token — {anteriores} presentes resetados.")
 
+    def _thread_sincronizacao(self):
+        """Long-poll da chamada; polling de 5 s enquanto ele falha.
+
+        Com o long-poll, abrir/fechar a chamada chega em menos de 1 s e a sala
+        parada não consulta o banco. Qualquer falha dele (rede, 5xx, API sem a
+        rota) cai no polling antigo, que tenta voltar ao long-poll a cada
+        _LONG_POLL_RETENTATIVA_S.
+        """
+        retomar_long_poll = 0.0
+        while self.rodando:
+            if time.monotonic() >= retomar_long_poll:
+                proxima = self._sincronizar_chamada(aguardar=True)
+                if proxima is not None:
+                    if proxima:
+                        time.sleep(proxima)
+                    continue
+                logger.warning(
+                    "Long-poll da chamada indisponível; polling a cada %ss.", _INTERVALO_SYNC_S
+                )
+                retomar_long_poll = time.monotonic() + _LONG_POLL_RETENTATIVA_S
+            self._sincronizar_chamada()
+            time.sleep(_INTERVALO_SYNC_S)
+
     def _registrar_presenca(self, external_image_id, chamada_id):
         definitivo = False
         try:
@@ -179,28 +332,88 @@ class SistemaReconhecimento:
             # burst tenta de novo.
             logger.error(f"Erro ao registrar presença via API: {e}")
         finally:
-            with self.lock:
-                # A resposta pode chegar depois de `_sincronizar_chamada` já
-                # ter trocado de chamada e dado `limpar()` no tracker (POST
-                # atrasado por rede lenta, ou a chamada fechou no meio do
-                # burst). Se concluíssemos incondicionalmente, um 409 tardio
-                # marcaria X como "resolvido" na geração NOVA do tracker — e,
-                # se X também estiver matriculado na chamada B (sala
-                # compartilhada, período seguinte), ele nunca mais seria
-                # reavaliado ali: falta indevida silenciosa, o problema que
-                # esta task inteira existe para eliminar. Só concluímos se a
-                # chamada ainda for a mesma que originou este POST.
-                if self.chamada_id_atual == chamada_id:
-                    self.tracker.concluir(external_image_id, definitivo=definitivo)
-                else:
-                    logger.debug(
-                        "Resposta de %s (chamada %s) descartada: chamada atual já é %s.",
-                        external_image_id, chamada_id, self.chamada_id_atual,
+            self._concluir_envios({external_image_id: definitivo}, chamada_id)
+
+    def _registrar_presencas(self, external_image_ids, chamada_id):
+        """Todas as confirmações de um burst num POST só (endpoint em lote).
+
+        Cada item traz o status que o endpoint unitário daria ao aluno, e a
+        regra é a mesma: 5xx é transitório, o resto é definitivo. Erro do lote
+        inteiro vale para todos; aluno ausente da resposta fica transitório."""
+        definitivos = dict.fromkeys(external_image_ids, False)
+        try:
+            resp = requests.post(
+                f"{_API_URL}/chamadas/registrar_presencas_camera/lote",
+                json={"external_image_ids": list(external_image_ids), "chamada_id": chamada_id},
+                headers={"x-service-token": _SERVICE_TOKEN},
+                timeout=10,
+            )
+            if resp.status_code in (404, 405) and "resultados" not in resp.text:
+                # API anterior ao endpoint em lote (câmera atualizada antes do
+                # backend): um POST por aluno, como antes.
+                logger.warning("API sem endpoint de lote; registrando aluno a aluno.")
+                definitivos = {}
+                for external_image_id in external_image_ids:
+                    self._api_pool.submit(self._registrar_presenca, external_image_id, chamada_id)
+                return
+            if resp.status_code != 200:
+                logger.warning(
+                    "API retornou %s para o lote de %d aluno(s) (chamada %s): %s",
+                    resp.status_code, len(external_image_ids), chamada_id, resp.text,
+                )
+                definitivos = dict.fromkeys(external_image_ids, resp.status_code < 500)
+                return
+            for item in resp.json().get("resultados", []):
+                external_image_id = item.get("external_image_id")
+                if external_image_id not in definitivos:
+                    continue
+                status = int(item.get("status", 500))
+                definitivos[external_image_id] = status < 500
+                if status != 200:
+                    logger.warning(
+                        "API recusou %s (chamada %s): %s %s",
+                        external_image_id, chamada_id, status, item.get("error_code"),
                     )
+        except Exception as e:
+            logger.error(f"Erro ao registrar presenças via API (lote): {e}")
+        finally:
+            self._concluir_envios(definitivos, chamada_id)
 
-    def _analisar_crop(self, face_bytes, chamada_id_referencia, textura=None):
-        """SearchFaces + (se match novo) DetectFaces p/ pose. Retorna ResultadoFrame|None.
-        `textura` = score de vida do crop (calculado local antes do envio)."""
+    def _concluir_envios(self, definitivos, chamada_id):
+        """Fecha no tracker os envios de `chamada_id` ({external_id: definitivo})."""
+        with self.lock:
+            # A resposta pode chegar depois de `_sincronizar_chamada` já
+            # ter trocado de chamada e dado `limpar()` no tracker (POST
+            # atrasado por rede lenta, ou a chamada fechou no meio do
+            # burst). Se concluíssemos incondicionalmente, um 409 tardio
+            # marcaria X como "resolvido" na geração NOVA do tracker — e,
+            # se X também estiver matriculado na chamada B (sala
+            # compartilhada, período seguinte), ele nunca mais seria
+            # reavaliado ali: falta indevida silenciosa, o problema que
+            # esta task inteira existe para eliminar. Só concluímos se a
+            # chamada ainda for a mesma que originou este POST.
+            if self.chamada_id_atual != chamada_id:
+                logger.debug(
+                    "Resposta de %s (chamada %s) descartada: chamada atual já é %s.",
+                    ", ".join(definitivos), chamada_id, self.chamada_id_atual,
+                )
+                return
+            for external_image_id, definitivo in definitivos.items():
+                self.tracker.concluir(external_image_id, definitivo=definitivo)
+
+    def _analisar_trilha(self, observacoes, texturas, chamada_id_referencia):
+        """SearchFaces UMA vez por trilha; pose de cada frame vem dos landmarks
+        (local, sem DetectFaces). Retorna list[ResultadoFrame], um por frame da
+        trilha (vazia sem match).
+        `observacoes` = [(frame, bbox, landmarks, embedding)] da trilha, um por
+        frame do burst; `texturas` = score de vida de cada uma (calculado local
+        antes do envio). Com match, os embeddings ficam memorizados para o
+        pré-filtro reconhecer o mesmo rosto sem AWS nos próximos bursts."""
+        # Maior bbox da trilha: mais pixels, match mais confiável.
+        frame, bbox, _, _ = max(observacoes, key=lambda o: o[1][2] * o[1][3])
+        face_bytes = self._jpeg_do_crop(frame, bbox)
+        if face_bytes is None:
+            return []
         try:
             response = rekognition_client.search_faces_by_image(
                 CollectionId=COLLECTION_ID,
@@ -209,33 +422,29 @@ class SistemaReconhecimento:
                 FaceMatchThreshold=FACE_MATCH_THRESHOLD_SALA,
             )
             if not response['FaceMatches']:
-                return None
+                return []
             external_id = response['FaceMatches'][0]['Face']['ExternalImageId']
 
             with self.lock:
                 if self.chamada_id_atual != chamada_id_referencia:
-                    return None
+                    return []
+                for _, _, _, emb in observacoes:
+                    if emb is not None:
+                        self.cache_identidades.memorizar(emb, external_id)
                 if self.tracker.tratado(external_id):
-                    # Já resolvido ou com envio em andamento: não gasta
-                    # DetectFaces nem entra no burst.
-                    return None
-
-            yaw = pitch = None
-            try:
-                detalhe = rekognition_client.detect_faces(
-                    Image={'Bytes': face_bytes},
-                    Attributes=['DEFAULT'],
+                    # Já resolvido ou com envio em andamento: não entra no burst.
+                    return []
+
+            # A identidade vale para todos os frames da trilha; textura e pose
+            # continuam sendo de cada frame.
+            resultados = []
+            for (frame_i, _, landmarks, _), tex in zip(observacoes, texturas):
+                h_img, w_img = frame_i.shape[:2]
+                yaw, pitch = estimar_pose(landmarks, w_img, h_img)
+                resultados.append(
+                    ResultadoFrame(external_id=external_id, yaw=yaw, pitch=pitch, textura=tex)
                 )
-                if detalhe.get('FaceDetails'):
-                    pose = detalhe['FaceDetails'][0].get('Pose', {})
-                    yaw = pose.get('Yaw')
-                    pitch = pose.get('Pitch')
-            except Exception as e:
-                # Sem pose => frame conta só p/ consenso; decisão vira PENDENTE
-                # se nenhum frame do burst tiver pose (fail-safe, não fail-open).
-                logger.debug(f"DetectFaces falhou (segue sem pose): {e}")
-
-            return ResultadoFrame(external_id=external_id, yaw=yaw, pitch=pitch, textura=textura)
+            return resultados
 
         except botocore.exceptions.ClientError as e:
             code = e.response["Error"]["Code"]
@@ -244,134 +453,394 @@ class SistemaReconhecimento:
                 logger.debug("Detector local falso positivo: sem rosto válido no crop.")
             else:
                 logger.error(f"Erro AWS (crop): {code} - {msg}")
-            return None
+            return []
         except Exception as e:
             logger.error(f"Erro AWS (crop): {e}")
-            return None
+            return []
 
-    def _crops_de_rostos(self, frame):
-        """Detecta rostos (YuNet). Devolve lista de (bbox, jpeg_bytes):
-        bbox=(x,y,w,h) cru do YuNet (p/ o detector de textura), jpeg do crop
-        com margem 0.2 (p/ a AWS)."""
+    def _detectar_rostos(self, frame, regioes=None):
+        """Detecta rostos (YuNet). Devolve lista de (bbox, landmarks):
+        bbox=(x,y,w,h) do YuNet (p/ o detector de textura e o rastreador),
+        landmarks 5x2 do YuNet (p/ o alinhamento do embedding e a pose).
+
+        O YuNet roda numa cópia reduzida por DETECCAO_ESCALA — só de cada
+        região em `regioes` (x,y,w,h), se dada —, e bbox/landmarks voltam em
+        coordenadas do frame CHEIO: textura, embedding e o JPEG da AWS cortam
+        sempre da resolução original. O JPEG não sai daqui: com o rastreador
+        só o crop escolhido de cada trilha é codificado (ver _jpeg_do_crop)."""
         h_img, w_img = frame.shape[:2]
-        self.face_detector.setInputSize((w_img, h_img))
-        _, faces = self.face_detector.detect(frame)
-        if faces is None:
-            return []
-        crops = []
-        for f in faces:
-            x, y, w, h = (int(v) for v in f[:4])
-            margin = int(0.2 * max(w, h))
-            x1, y1 = max(0, x - margin), max(0, y - margin)
-            x2, y2 = min(w_img, x + w + margin), min(h_img, y + h + margin)
-            if x2 <= x1 or y2 <= y1:
+        if regioes is None:
+            regioes = [(0, 0, w_img, h_img)]
+        rostos = []
+        for rx, ry, rw, rh in regioes:
+            entrada = frame[ry:ry + rh, rx:rx + rw]
+            if _DETECCAO_ESCALA < 1.0:
+                entrada = cv2.resize(entrada, None, fx=_DETECCAO_ESCALA, fy=_DETECCAO_ESCALA,
+                                     interpolation=cv2.INTER_AREA)
+            h_in, w_in = entrada.shape[:2]
+            if min(h_in, w_in) < _DETECCAO_LADO_MIN:
                 continue
-            ret, buffer = cv2.imencode('.jpg', frame[y1:y2, x1:x2])
-            if ret:
-                crops.append(((x, y, w, h), buffer.tobytes()))
-        return crops
+            self.face_detector.setInputSize((w_in, h_in))
+            _, faces = self.face_detector.detect(entrada)
+            if faces is None:
+                continue
+            # Escala efetiva por eixo: o resize arredonda o tamanho.
+            faces = reescalar_faces(faces, w_in / rw, h_in / rh, rx, ry)
+            rostos.extend(
+                (tuple(int(v) for v in f[:4]), f[4:14].reshape(5, 2))
+                for f in faces
+            )
+        return rostos
+
+    @staticmethod
+    def _jpeg_do_crop(frame, bbox):
+        """JPEG do crop com margem 0.2 (p/ a AWS), ou None se degenerado."""
+        h_img, w_img = frame.shape[:2]
+        x, y, w, h = bbox
+        margin = int(0.2 * max(w, h))
+        x1, y1 = max(0, x - margin), max(0, y - margin)
+        x2, y2 = min(w_img, x + w + margin), min(h_img, y + h + margin)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        ret, buffer = cv2.imencode('.jpg', frame[y1:y2, x1:x2])
+        return buffer.tobytes() if ret else None
+
+    def _texturas(self, trilhas):
+        """Textura de cada observação de cada trilha, pontuada localmente (crop
+        no frame BGR, sem re-decode) com UM forward por frame do burst.
+
+        As trilhas de um mesmo frame compartilham o array da amostra (ver
+        _coletar_burst), então o agrupamento é pela identidade do frame."""
+        texturas = [[None] * len(observacoes) for observacoes in trilhas]
+        if self.detector_textura is None:
+            return texturas
+        por_frame: dict[int, tuple] = {}
+        for t, observacoes in enumerate(trilhas):
+            for i, (frame, bbox, _, _) in enumerate(observacoes):
+                _, posicoes, bboxes = por_frame.setdefault(id(frame), (frame, [], []))
+                posicoes.append((t, i))
+                bboxes.append(bbox)
+        for frame, posicoes, bboxes in por_frame.values():
+            try:
+                scores = self.detector_textura.score_batch(frame, bboxes)
+            except Exception as e:
+                logger.debug(f"Score de textura falhou (segue None): {e}")
+                continue
+            for (t, i), score in zip(posicoes, scores):
+                texturas[t][i] = score
+        return texturas
+
+    def _embedding(self, frame, landmarks):
+        """Embedding local do rosto, ou None (pré-filtro desligado ou falhou).
+        None só significa "vai para o SearchFaces como antes"."""
+        if self.extrator_embedding is None:
+            return None
+        try:
+            return self.extrator_embedding.embedding(frame, landmarks)
+        except Exception as e:
+            logger.debug(f"Embedding local falhou (segue sem pré-filtro): {e}")
+            return None
+
+    def _trilha_ja_resolvida(self, observacoes):
+        """A trilha é de um aluno já tratado nesta chamada?
+
+        Exige a MAIORIA dos frames com embedding casando com aluno tratado, não
+        um só: descartar a trilha inteira por um falso positivo local custaria
+        o burst todo de quem ainda não foi marcado."""
+        embeddings = [emb for _, _, _, emb in observacoes if emb is not None]
+        if not embeddings:
+            return False
+        with self.lock:
+            votos = 0
+            for emb in embeddings:
+                conhecido = self.cache_identidades.identificar(emb)
+                if conhecido is not None and self.tracker.tratado(conhecido):
+                    votos += 1
+        return 2 * votos > len(embeddings)
+
+    def _thread_captura(self):
+        """Produtor: dono da câmera. Liga com chamada aberta, desliga sem, e
+        escreve cada frame com timestamp no anel. Nunca espera os consumidores."""
+        cap = None
+        try:
+            while self.rodando:
+                with self.lock:
+                    chamada_atual = self.chamada_id_atual
+
+                if chamada_atual is None:
+                    # Câmera deve estar desligada
+                    if cap is not None:
+                        cap.release()
+                        cap = None
+                        self.buffer_frames.limpar()
+                        logger.info("📷 Câmera desligada — sem chamada aberta.")
+                    time.sleep(1)
+                    continue
 
-    def _thread_processamento_visual(self):
-        fim_cooldown = 0.0
+                # Câmera deve estar ligada
+                if cap is None or not cap.isOpened():
+                    cap = cv2.VideoCapture(self.CAM_INDEX, cv2.CAP_DSHOW)
+                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+                    if not cap.isOpened():
+                        logger.error(
+                            f"❌ Não foi possível abrir a câmera no índice {self.CAM_INDEX}. "
+                            f"Ajuste CAMERA_INDEX se o dispositivo estiver em outro índice."
+                        )
+                        time.sleep(5)
+                        continue
+                    logger.info("📷 Câmera ligada.")
+
+                # cap.read() bloqueia até o próximo frame: é ele que dita o ritmo.
+                inicio = time.monotonic()
+                ret, frame = cap.read()
+                if not ret:
+                    logger.error("Falha ao receber frame da câmera.")
+                    time.sleep(1)
+                    continue
+                agora = time.monotonic()
+                self.buffer_frames.escrever(frame, agora)
+                self.metricas["captura"].registrar(agora - inicio)
+        except Exception as e:
+            logger.error(f"Erro na thread de captura: {e}")
+        finally:
+            if cap is not None:
+                cap.release()
+
+    def _thread_deteccao(self):
+        """Estágio 2: gatilho + burst. A cada tick mede o movimento da cena; o
+        AgendadorBurst decide se vale rodar o YuNet e, com rostos pendentes,
+        quantos frames o burst leva. Amostra frames DISTINTOS do anel nos
+        instantes do burst, roda YuNet/rastreador/embedding e entrega as trilhas
+        para a decisão pela fila com descarte."""
+        seq_visto = -1
+        miniatura_anterior = None
 
         while self.rodando:
             try:
                 with self.lock:
                     chamada_atual = self.chamada_id_atual
-                    frame = self.frame_atual
 
                 if chamada_atual is None:
+                    miniatura_anterior = None
                     time.sleep(0.5)
                     continue
-                if frame is None or time.time() < fim_cooldown:
+                ultimo = self.buffer_frames.ultimo()
+                if ultimo is None or ultimo[0] == seq_visto:
                     time.sleep(0.03)
                     continue
 
-                # Gatilho do burst: existe rosto no frame atual?
-                if not self._crops_de_rostos(frame):
-                    time.sleep(0.03)
+                seq_visto, ts_gatilho, frame = ultimo
+                mini = miniatura(frame)
+                anterior = miniatura_anterior
+                movimento = (energia_movimento(anterior, mini)
+                             if anterior is not None else float("inf"))
+                miniatura_anterior = mini
+                agora = time.monotonic()
+                if not self.agendador.deve_verificar(movimento, agora):
+                    time.sleep(_TICK_MOVIMENTO_S)
                     continue
 
-                # ---- Burst: Y frames ao longo de BURST_DURACAO_S ----
-                intervalo = _BURST_DURACAO_S / max(1, _BURST_FRAMES)
-                futures = []
-                for _ in range(_BURST_FRAMES):
-                    with self.lock:
-                        frame_i = self.frame_atual
-                        chamada_i = self.chamada_id_atual
-                    if frame_i is None or chamada_i != chamada_atual:
-                        break
-                    for bbox, crop in self._crops_de_rostos(frame_i):
-                        # Textura pontuada localmente (crop no frame BGR, sem re-decode).
-                        tex = None
-                        if self.detector_textura is not None:
-                            try:
-                                tex = self.detector_textura.score(frame_i, bbox)
-                            except Exception as e:
-                                logger.debug(f"Score de textura falhou (segue None): {e}")
-                        futures.append(
-                            self._aws_pool.submit(self._analisar_crop, crop, chamada_atual, tex)
-                        )
-                    time.sleep(intervalo)
-
-                resultados = []
-                for fut in futures:
-                    try:
-                        r = fut.result(timeout=15)
-                        if r is not None:
-                            resultados.append(r)
-                    except Exception as e:
-                        logger.error(f"Erro aguardando análise de crop: {e}")
-
-                # ---- Decisão por aluno ----
-                for external_id, av in self.confirmador.avaliar_detalhado(resultados).items():
-                    if av.decisao is Decisao.REGISTRAR:
-                        with self.lock:
-                            if self.chamada_id_atual != chamada_atual:
-                                continue
-                            # Reivindica antes de submeter; só vira "resolvido"
-                            # quando o servidor responder.
-                            if not self.tracker.reivindicar(external_id):
-                                continue
-                        # Loga textura (gate) + magnitude (advisory) p/ calibração.
-                        gate = self.confirmador.gate
-                        logger.info(
-                            f"🎯 Confirmado ({gate}): {external_id} "
-                            f"[matches={av.matches}, texture_max={av.texture_max}, "
-                            f"tex_limiar={_TEXTURE_LIVENESS_MIN}, magnitude={av.magnitude}, "
-                            f"pose_limiar={_LIVENESS_POSE_STD_MIN}]"
-                        )
-                        self._api_pool.submit(
-                            self._registrar_presenca, external_id, chamada_atual
-                        )
-                    elif av.decisao is Decisao.PENDENTE:
-                        gate = self.confirmador.gate
-                        motivo = "textura baixa — possível foto" if gate == "textura" \
-                            else "magnitude baixa — possível foto ou pessoa parada"
-                        logger.info(
-                            f"⏳ Pendente (consenso ok, {motivo}): {external_id} "
-                            f"[matches={av.matches}, texture_max={av.texture_max}, "
-                            f"tex_limiar={_TEXTURE_LIVENESS_MIN}, magnitude={av.magnitude}, "
-                            f"pose_limiar={_LIVENESS_POSE_STD_MIN}]"
-                        )
-                    else:
-                        logger.info(
-                            f"Descartado (consenso insuficiente): {external_id} "
-                            f"[matches={av.matches} < {_BURST_MIN_MATCHES}]"
-                        )
+                # Gatilho do burst: existe rosto ainda não resolvido no frame?
+                # Acordado só por movimento, olha só onde a cena mudou.
+                regioes = None
+                if (_DETECCAO_ROI and anterior is not None
+                        and not self.agendador.verificacao_completa_devida(agora)):
+                    regioes = regioes_de_movimento(anterior, mini, frame.shape)
+                inicio = time.monotonic()
+                rostos = self._detectar_rostos(frame, regioes)
+                self.metricas["deteccao"].registrar(time.monotonic() - inicio)
+                embeddings = [self._embedding(frame, landmarks) for _, landmarks in rostos]
+                n_frames = self.agendador.planejar(
+                    self._pendentes(embeddings), movimento, time.monotonic(),
+                    parcial=regioes is not None,
+                )
+                if n_frames > 0 and regioes is not None:
+                    # O burst rastreia a sala toda desde o 1º frame.
+                    rostos = self._detectar_rostos(frame)
+                    embeddings = [self._embedding(frame, landmarks) for _, landmarks in rostos]
+                if n_frames == 0:
+                    logger.debug(
+                        f"Sem rosto pendente ({len(rostos)} visível(is)); próxima "
+                        f"verificação sem movimento em {self.agendador.espera:.1f}s."
+                    )
+                    continue
 
-                fim_cooldown = time.time() + self.COOLDOWN_ENTRE_BURSTS
+                trilhas = self._coletar_burst(
+                    chamada_atual, seq_visto, ts_gatilho, frame, rostos, embeddings, n_frames
+                )
+                if trilhas:
+                    self.fila_bursts.colocar((chamada_atual, trilhas, time.monotonic()))
+                self.agendador.burst_concluido(time.monotonic())
 
             except Exception as e:
-                logger.error(f"Erro no loop de processamento visual: {e}")
+                logger.error(f"Erro na thread de detecção: {e}")
                 time.sleep(0.1)
 
+    def _pendentes(self, embeddings):
+        """Quantos rostos o pré-filtro NÃO reconhece como aluno já tratado.
+        Sem embedding (pré-filtro desligado ou falhou), o rosto é pendente."""
+        with self.lock:
+            pendentes = 0
+            for emb in embeddings:
+                conhecido = (self.cache_identidades.identificar(emb)
+                             if emb is not None else None)
+                if conhecido is None or not self.tracker.tratado(conhecido):
+                    pendentes += 1
+        return pendentes
+
+    def _coletar_burst(self, chamada_atual, seq_gatilho, ts_gatilho, frame, rostos,
+                       embeddings, n_frames):
+        """`n_frames` frames a partir do frame do gatilho, no ritmo de
+        BURST_FRAMES em BURST_DURACAO_S (burst curto termina antes).
+
+        Cada amostra é o primeiro frame capturado no instante-alvo ou depois,
+        e nunca um frame já usado: sem isso, captura atrasada repetia frame e o
+        consenso contava a mesma imagem duas vezes. Só detecção + rastreamento
+        aqui; AWS depois, uma vez por trilha."""
+        intervalo = _BURST_DURACAO_S / max(1, _BURST_FRAMES)
+        rastreador = RastreadorRostos()
+        trilhas: dict[int, list] = {}
+        seq_i, frame_i = seq_gatilho, frame
+        for k in range(n_frames):
+            if k > 0:
+                lido = self.buffer_frames.aguardar(
+                    seq_i, ts_gatilho + k * intervalo, timeout=intervalo + 1.0
+                )
+                if lido is None:
+                    break  # câmera parou de entregar frames
+                seq_i, _, frame_i = lido
+                inicio = time.monotonic()
+                rostos = self._detectar_rostos(frame_i)
+                self.metricas["deteccao"].registrar(time.monotonic() - inicio)
+                embeddings = [self._embedding(frame_i, landmarks) for _, landmarks in rostos]
+            with self.lock:
+                if self.chamada_id_atual != chamada_atual:
+                    return {}
+            ids = rastreador.atribuir([bbox for bbox, _ in rostos])
+            for tid, (bbox, landmarks), emb in zip(ids, rostos, embeddings):
+                trilhas.setdefault(tid, []).append((frame_i, bbox, landmarks, emb))
+        return trilhas
+
+    def _thread_decisao(self):
+        """Estágio 3: consome bursts da fila — AWS por trilha, consenso, POST."""
+        while self.rodando:
+            try:
+                item = self.fila_bursts.retirar(timeout=0.5)
+                if item is None:
+                    continue
+                chamada_atual, trilhas, enfileirado_em = item
+                inicio = time.monotonic()
+                self.metricas["fila"].registrar(inicio - enfileirado_em)
+                with self.lock:
+                    if self.chamada_id_atual != chamada_atual:
+                        continue
+                self._decidir_burst(chamada_atual, trilhas)
+                self.metricas["decisao"].registrar(time.monotonic() - inicio)
+            except Exception as e:
+                logger.error(f"Erro na thread de decisão: {e}")
+                time.sleep(0.1)
+
+    def _decidir_burst(self, chamada_atual, trilhas):
+        vivas = []
+        curtas = pre_filtradas = 0
+        for observacoes in trilhas.values():
+            if len(observacoes) < _BURST_MIN_MATCHES:
+                # Consenso impossível: o ConfirmadorBurst descartaria
+                # de qualquer jeito, então nem se pergunta à AWS.
+                curtas += 1
+                continue
+            # Avaliado AQUI, não na detecção: o burst anterior pode ter
+            # resolvido o aluno enquanto este esperava na fila.
+            if self._trilha_ja_resolvida(observacoes):
+                # Rosto já resolvido nesta chamada: nem textura, nem
+                # SearchFaces.
+                pre_filtradas += 1
+                continue
+            vivas.append(observacoes)
+        futures = [
+            self._aws_pool.submit(self._analisar_trilha, observacoes, texturas, chamada_atual)
+            for observacoes, texturas in zip(vivas, self._texturas(vivas))
+        ]
+        if curtas or pre_filtradas:
+            logger.debug(
+                f"Burst: {len(trilhas)} trilha(s), {curtas} curta(s) demais para o "
+                f"consenso, {pre_filtradas} de alunos já resolvidos — "
+                f"{len(futures)} SearchFaces."
+            )
+
+        resultados = []
+        for fut in futures:
+            try:
+                resultados.extend(fut.result(timeout=15))
+            except Exception as e:
+                logger.error(f"Erro aguardando análise de trilha: {e}")
+
+        # ---- Decisão por aluno ----
+        confirmados = []
+        for external_id, av in self.confirmador.avaliar_detalhado(resultados).items():
+            if av.decisao is Decisao.REGISTRAR:
+                with self.lock:
+                    if self.chamada_id_atual != chamada_atual:
+                        continue
+                    # Reivindica antes de submeter; só vira "resolvido"
+                    # quando o servidor responder.
+                    if not self.tracker.reivindicar(external_id):
+                        continue
+                # Loga textura (gate) + magnitude (advisory) p/ calibração.
+                gate = self.confirmador.gate
+                logger.info(
+                    f"🎯 Confirmado ({gate}): {external_id} "
+                    f"[matches={av.matches}, texture_max={av.texture_max}, "
+                    f"tex_limiar={_TEXTURE_LIVENESS_MIN}, magnitude={av.magnitude}, "
+                    f"pose_limiar={_LIVENESS_POSE_STD_MIN}]"
+                )
+                confirmados.append(external_id)
+            elif av.decisao is Decisao.PENDENTE:
+                gate = self.confirmador.gate
+                motivo = "textura baixa — possível foto" if gate == "textura" \
+                    else "magnitude baixa — possível foto ou pessoa parada"
+                logger.info(
+                    f"⏳ Pendente (consenso ok, {motivo}): {external_id} "
+                    f"[matches={av.matches}, texture_max={av.texture_max}, "
+                    f"tex_limiar={_TEXTURE_LIVENESS_MIN}, magnitude={av.magnitude}, "
+                    f"pose_limiar={_LIVENESS_POSE_STD_MIN}]"
+                )
+            else:
+                logger.info(
+                    f"Descartado (consenso insuficiente): {external_id} "
+                    f"[matches={av.matches} < {_BURST_MIN_MATCHES}]"
+                )
+
+        # Confirmações do burst num POST só: a turma que entra junto era um
+        # POST (e uma validação de token) por aluno.
+        for i in range(0, len(confirmados), _LOTE_PRESENCAS_MAX):
+            self._api_pool.submit(
+                self._registrar_presencas, confirmados[i:i + _LOTE_PRESENCAS_MAX], chamada_atual
+            )
+
+    def _relatar_metricas(self):
+        """Uma linha de log por janela: latência por estágio + perdas."""
+        partes = []
+        for nome, metrica in self.metricas.items():
+            n, media_ms, max_ms = metrica.resumo_e_zerar()
+            partes.append(f"{nome} n={n} média={media_ms:.0f}ms máx={max_ms:.0f}ms")
+        logger.info(
+            "📊 Pipeline: " + "; ".join(partes)
+            + f"; amostras perdidas={self.buffer_frames.perdidos}"
+            + f", bursts descartados={self.fila_bursts.descartados}"
+        )
+
     def iniciar(self):
         self.rodando = True
-        cap = None
-        t_proc = None
-        ultima_sync = 0
-        INTERVALO_SYNC = 5
+        ultimo_relatorio = time.time()
+        estagios = {
+            "sincronizacao": self._thread_sincronizacao,
+            "captura": self._thread_captura,
+            "deteccao": self._thread_deteccao,
+            "decisao": self._thread_decisao,
+        }
+        threads: dict[str, threading.Thread] = {}
 
         logger.info("🔍 Monitorando chamadas na sala deste token. Câmera desligada até chamada aberta.")
 
@@ -379,64 +848,33 @@ class SistemaReconhecimento:
             while self.rodando:
                 agora = time.time()
 
-                if agora - ultima_sync >= INTERVALO_SYNC:
-                    self._sincronizar_chamada()
-                    ultima_sync = agora
-
-                if self.chamada_id_atual is not None:
-                    # Câmera deve estar ligada
-                    if cap is None or not cap.isOpened():
-                        cap = cv2.VideoCapture(self.CAM_INDEX, cv2.CAP_DSHOW)
-                        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-                        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-                        if not cap.isOpened():
-                            logger.error(
-                                f"❌ Não foi possível abrir a câmera no índice {self.CAM_INDEX}. "
-                                f"Ajuste CAMERA_INDEX se o dispositivo estiver em outro índice."
-                            )
-                            time.sleep(5)
-                            continue
-                        logger.info("📷 Câmera ligada.")
-
-                    # Nome da thread atualizado
-                    if t_proc is None or not t_proc.is_alive():
-                        t_proc = threading.Thread(target=self._thread_processamento_visual)
-                        t_proc.daemon = True
-                        t_proc.start()
-
-                    ret, frame = cap.read()
-                    if not ret:
-                        logger.error("Falha ao receber frame da câmera.")
-                        time.sleep(1)
-                        continue
-
-                    # Invariante: frame_atual é sempre REBIND de um array novo do
-                    # cap.read(); nunca mutar in-place — a thread de processamento
-                    # segura referências a ele sem copiar.
-                    with self.lock:
-                        self.frame_atual = frame
+                # Supervisor: estágio que morreu é recriado, como a antiga
+                # thread de processamento.
+                for nome, alvo in estagios.items():
+                    t = threads.get(nome)
+                    if t is None or not t.is_alive():
+                        t = threading.Thread(target=alvo, name=nome, daemon=True)
+                        t.start()
+                        threads[nome] = t
 
-                    time.sleep(0.01)
-                else:
-                    # Câmera deve estar desligada
-                    if cap is not None and cap.isOpened():
-                        cap.release()
-                        cap = None
-                        with self.lock:
-                            self.frame_atual = None
-                        logger.info("📷 Câmera desligada — sem chamada aberta.")
+                if agora - ultimo_relatorio >= _INTERVALO_METRICAS_S:
+                    if self.chamada_id_atual is not None:
+                        self._relatar_metricas()
+                    ultimo_relatorio = agora
 
-                    time.sleep(1)
+                time.sleep(0.5)
 
         finally:
             self.rodando = False
             self._aws_pool.shutdown(wait=False)
             self._api_pool.shutdown(wait=False)
-            if cap is not None:
-                cap.release()
+            # A captura solta a câmera no próprio finally; espera um pouco por
+            # ela para não deixar o dispositivo preso se o processo continuar.
+            t = threads.get("captura")
+            if t is not None:
+                t.join(timeout=2)
             logger.info("Sistema de reconhecimento encerrado.")
 
-
 if __name__ == "__main__":
     
     import faulthandler, signal, datetime, traceback
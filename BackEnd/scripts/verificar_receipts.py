@@ -70,8 +70,7 @@ def main():
     if pendentes:
         receipts = consultar_receipts([p["ticket_id"] for p in pendentes])
         tokens_a_podar, processados = processar(pendentes, receipts)
-        for token in tokens_a_podar:
-            remover_push_token(token)
+        remover_push_token(tokens_a_podar)
         remover_tickets_pendentes(processados)
         logger.info(
             "Receipts: %d pendentes, %d podados, %d processados.",
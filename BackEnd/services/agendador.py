@@ -1,26 +1,133 @@
+"""Tarefas periódicas da API, com um líder entre os workers.
+
+Cada worker do gunicorn sobe o agendador no lifespan. Tarefa que mexe em dado
+compartilhado (fechar chamada expirada, limpeza diária) só roda no worker que
+detém a liderança (infra/lideranca_pg.py); tarefa que descarrega estado da
+memória do próprio processo (uso dos tokens da câmera) roda em todos.
+
+Cada tarefa é registrada com intervalo e jitter — o jitter espalha os workers
+e evita que todas as tarefas acordem no mesmo segundo — e guarda quando rodou,
+quanto demorou e o último sucesso/erro (`estado_agendador()`, exposto em
+GET /interno/agendador).
+
+O fechamento de chamada expirada não tem intervalo: o líder dorme até o prazo
+da próxima chamada aberta (services/expiracao_chamadas.py) e acorda antes se
+chegar aviso de mudança pela escuta.
+"""
 import asyncio
+import datetime
 import logging
+import os
+import random
+import time
+
+from infra.database import DB_INDISPONIVEL, _env_int
+from infra.escuta_pg import escuta
+from infra.lideranca_pg import LiderancaPg
+from services.expiracao_chamadas import FUSO, RodaExpiracao, prazos_de_hoje
 
 logger = logging.getLogger("scpi.agendador")
 
+# Chave fixa arbitrária do advisory lock da liderança (a das migrações é
+# 4815162342; esta não pode colidir com ela).
+_LIDER_LOCK_KEY = 4815162343
+# A cada quantos segundos cada worker tenta assumir / o líder confirma a
+# conexão. É o tempo máximo sem líder depois que o líder morre.
+_RENOVACAO_S = _env_int("AGENDADOR_RENOVACAO_S", 15)
+# Sem a escuta (aviso de chamada aberta em outro worker não chega), a roda de
+# expiração é recarregada neste intervalo — o atraso máximo da varredura antiga.
+# Também é a espera para tentar de novo quando o banco falha.
+_RECARGA_SEM_ESCUTA_S = 60
 
-async def _ciclo_agendador() -> None:
-    from repositories.chamadas import fechar_chamadas_expiradas
-    from services.notificacoes import notificar_alunos_presentes
 
-    loop = asyncio.get_event_loop()
-    fechadas = await loop.run_in_executor(None, fechar_chamadas_expiradas)
+class Tarefa:
+    def __init__(self, nome: str, executar, intervalo_s: float | None, jitter_s: float = 0.0,
+                 atraso_inicial_s: float = 0.0, so_lider: bool = True):
+        # executar: função síncrona (roda no executor, fora do event loop).
+        # intervalo_s=None: sem laço periódico, quem dispara é outro laço.
+        self.nome = nome
+        self.executar = executar
+        self.intervalo_s = intervalo_s
+        self.jitter_s = jitter_s
+        self.atraso_inicial_s = atraso_inicial_s
+        self.so_lider = so_lider
+        self.execucoes = 0
+        self.falhas = 0
+        self.ultima_execucao_em: float | None = None
+        self.ultima_duracao_s: float | None = None
+        self.ultimo_sucesso_em: float | None = None
+        self.ultimo_erro: str | None = None
 
-    if not fechadas:
-        return
+    def proxima_espera(self) -> float:
+        return self.intervalo_s + random.uniform(0, self.jitter_s)
+
+    async def rodar_uma_vez(self, *args):
+        loop = asyncio.get_running_loop()
+        inicio = time.monotonic()
+        self.ultima_execucao_em = time.time()
+        self.execucoes += 1
+        try:
+            resultado = await loop.run_in_executor(None, self.executar, *args)
+        except Exception as e:
+            self.falhas += 1
+            self.ultimo_erro = f"{type(e).__name__}: {e}"
+            logger.error("Erro na tarefa %s: %s", self.nome, e)
+            return None
+        finally:
+            self.ultima_duracao_s = time.monotonic() - inicio
+        self.ultimo_sucesso_em = time.time()
+        return resultado
+
+    def estado(self) -> dict:
+        return {
+            "nome": self.nome,
+            "intervalo_s": self.intervalo_s,
+            "so_lider": self.so_lider,
+            "execucoes": self.execucoes,
+            "falhas": self.falhas,
+            "ultima_execucao_em": _iso(self.ultima_execucao_em),
+            "ultima_duracao_s": round(self.ultima_duracao_s, 3) if self.ultima_duracao_s is not None else None,
+            "ultimo_sucesso_em": _iso(self.ultimo_sucesso_em),
+            "ultimo_erro": self.ultimo_erro,
+        }
+
+
+def _iso(epoch: float | None) -> str | None:
+    if epoch is None:
+        return None
+    return time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(epoch))
+
+
+_lideranca = LiderancaPg(_LIDER_LOCK_KEY)
+_tarefas: list[Tarefa] = []
+_roda = RodaExpiracao()
 
-    for row in fechadas:
-        loop.run_in_executor(
-            None,
-            notificar_alunos_presentes,
-            row["chamada_id"],
-            row["nome_disciplina"],
-        )
+
+def registrar_tarefa(tarefa: Tarefa) -> Tarefa:
+    _tarefas.append(tarefa)
+    return tarefa
+
+
+def estado_agendador() -> dict:
+    return {
+        "pid": os.getpid(),
+        "lider": _lideranca.lider,
+        "tarefas": [t.estado() for t in _tarefas],
+        "expiracao": {
+            "prazos": len(_roda),
+            "proximo_prazo_em": _iso(_roda.proximo()),
+        },
+    }
+
+
+def _fechar_e_notificar(chamada_ids=None):
+    """Fecha as chamadas vencidas (só `chamada_ids`, se dado) e, no mesmo
+    commit, enfileira um job com o push de encerramento de todas elas
+    (services/fila_jobs.py)."""
+    from repositories.chamadas import fechar_chamadas_expiradas
+    from services.notificacoes import jobs_encerramento
+
+    return len(fechar_chamadas_expiradas(chamada_ids=chamada_ids, jobs_encerramento=jobs_encerramento))
 
 
 def _executar_limpeza():
@@ -39,22 +146,160 @@ def _executar_limpeza():
     return (deletados, rl, la)
 
 
-async def _ciclo_limpeza_tokens() -> None:
-    loop = asyncio.get_event_loop()
+def _purgar_jobs_mortos():
+    """Jobs mortos velhos (payload com e-mail e nome de aluno) saem da fila."""
+    from repositories.jobs import purgar_jobs_mortos
+
+    apagados = purgar_jobs_mortos(_env_int("JOBS_MORTOS_RETENCAO_DIAS", 30))
+    if apagados:
+        logger.info("Limpeza diária: %d job(s) morto(s) apagado(s).", apagados)
+    return apagados
+
+
+def _gravar_usos_tokens_camera():
+    """Uso dos tokens da câmera que estão na memória DESTE worker."""
+    from repositories.camera_tokens import gravar_usos_pendentes
+
+    return gravar_usos_pendentes()
+
+
+def _carregar_prazos():
+    """{chamada_id: epoch do prazo} das chamadas abertas hoje, ou DB_INDISPONIVEL."""
+    from repositories.chamadas import listar_prazos_chamadas_abertas
+
+    agora = datetime.datetime.now(FUSO)
+    horarios = listar_prazos_chamadas_abertas(agora)
+    if horarios is DB_INDISPONIVEL:
+        return DB_INDISPONIVEL
+    return prazos_de_hoje(horarios, agora.date())
+
+
+_fechar = registrar_tarefa(Tarefa("fechar_chamadas_expiradas", _fechar_e_notificar, intervalo_s=None))
+registrar_tarefa(Tarefa("limpeza_diaria", _executar_limpeza, intervalo_s=86400, jitter_s=600,
+                        atraso_inicial_s=86400))
+registrar_tarefa(Tarefa("purga_jobs_mortos", _purgar_jobs_mortos, intervalo_s=86400, jitter_s=600,
+                        atraso_inicial_s=3600))
+registrar_tarefa(Tarefa("uso_tokens_camera", _gravar_usos_tokens_camera, intervalo_s=60, jitter_s=10,
+                        atraso_inicial_s=60, so_lider=False))
+
+
+async def _laco_tarefa(tarefa: Tarefa) -> None:
+    await asyncio.sleep(tarefa.atraso_inicial_s + random.uniform(0, tarefa.jitter_s))
     while True:
-        await asyncio.sleep(86400)
+        if not tarefa.so_lider or _lideranca.lider:
+            await tarefa.rodar_uma_vez()
+        await asyncio.sleep(tarefa.proxima_espera())
+
+
+async def _recarregar_roda(loop) -> bool:
+    prazos = await loop.run_in_executor(None, _carregar_prazos)
+    if prazos is DB_INDISPONIVEL:
+        return False
+    _roda.definir(prazos)
+    return True
+
+
+def _segundos_ate_amanha(agora: float) -> float:
+    hoje = datetime.datetime.fromtimestamp(agora, FUSO).date()
+    amanha = datetime.datetime.combine(hoje + datetime.timedelta(days=1), datetime.time(), tzinfo=FUSO)
+    return amanha.timestamp() - agora
+
+
+async def _laco_expiracao() -> None:
+    """Fecha cada chamada no prazo dela (só no líder).
+
+    Recarrega a roda ao assumir a liderança, a cada aviso em
+    CANAL_CHAMADAS_SALA, na virada do dia e, com a escuta caída, a cada
+    _RECARGA_SEM_ESCUTA_S. Fora disso não consulta o banco: dorme até o
+    próximo prazo (acordando a cada _RENOVACAO_S só para conferir a
+    liderança, sem consulta).
+    """
+    from repositories.indice_salas import CANAL_CHAMADAS_SALA
+
+    loop = asyncio.get_running_loop()
+    aviso = asyncio.Event()
+
+    def acordar(_payload=None):
+        # Thread da escuta: o Event só pode ser tocado no loop dele.
         try:
-            await loop.run_in_executor(None, _executar_limpeza)
-        except Exception as e:
-            logger.error("Erro na limpeza diária: %s", e)
+            loop.call_soon_threadsafe(aviso.set)
+        except RuntimeError:
+            pass  # loop já encerrado
 
+    escuta.inscrever(CANAL_CHAMADAS_SALA, acordar, ao_reconectar=acordar)
 
-async def iniciar_agendador() -> None:
-    logger.info("Agendador de chamadas iniciado (intervalo: 60s).")
-    asyncio.ensure_future(_ciclo_limpeza_tokens())
+    recarregar = True
+    carregada_em = 0.0
+    dia_carregado = None
     while True:
+        if not _lideranca.lider:
+            _roda.limpar()
+            recarregar = True
+            await asyncio.sleep(_RENOVACAO_S)
+            continue
+
+        agora = time.time()
+        hoje = datetime.datetime.fromtimestamp(agora, FUSO).date()
+        if (recarregar or hoje != dia_carregado
+                or (not escuta.conectado and agora - carregada_em >= _RECARGA_SEM_ESCUTA_S)):
+            aviso.clear()
+            if await _recarregar_roda(loop):
+                recarregar = False
+                carregada_em = agora
+                dia_carregado = hoje
+            else:
+                await asyncio.sleep(_RECARGA_SEM_ESCUTA_S)
+                continue
+
+        vencidas = _roda.vencidas(time.time())
+        if vencidas:
+            await _fechar.rodar_uma_vez(vencidas)
+            # As que continuam abertas depois do fechamento (banco falhou,
+            # horário mudou no meio) voltam à roda só para daqui a pouco — nunca
+            # num laço apertado contra o banco.
+            aviso.clear()
+            if await _recarregar_roda(loop):
+                carregada_em = time.time()
+                for chamada_id in vencidas:
+                    if chamada_id in _roda:
+                        _roda.agendar(chamada_id, carregada_em + _RECARGA_SEM_ESCUTA_S)
+            else:
+                recarregar = True
+            continue
+
+        agora = time.time()
+        espera = min(_RENOVACAO_S, _segundos_ate_amanha(agora))
+        proximo = _roda.proximo()
+        if proximo is not None:
+            espera = min(espera, proximo - agora)
+        if not escuta.conectado:
+            espera = min(espera, carregada_em + _RECARGA_SEM_ESCUTA_S - agora)
         try:
-            await _ciclo_agendador()
-        except Exception as e:
-            logger.error("Erro no ciclo do agendador: %s", e)
-        await asyncio.sleep(60)
+            await asyncio.wait_for(aviso.wait(), timeout=max(espera, 0))
+            recarregar = True
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _laco_lideranca() -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        await loop.run_in_executor(None, _lideranca.renovar)
+        await asyncio.sleep(_RENOVACAO_S + random.uniform(0, _RENOVACAO_S / 5))
+
+
+async def iniciar_agendador() -> None:
+    logger.info("Agendador iniciado: %s.", ", ".join(t.nome for t in _tarefas))
+    loop = asyncio.get_running_loop()
+    # Primeira eleição antes das tarefas: o líder fecha as chamadas vencidas
+    # já no boot, como o agendador sempre fez.
+    await loop.run_in_executor(None, _lideranca.renovar)
+    try:
+        await asyncio.gather(
+            _laco_lideranca(),
+            _laco_expiracao(),
+            *(_laco_tarefa(t) for t in _tarefas if t.intervalo_s is not None),
+        )
+    finally:
+        # Cancelado no shutdown: solta o lock para outro worker assumir já.
+        _lideranca.renunciar()
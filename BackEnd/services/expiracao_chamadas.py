@@ -0,0 +1,92 @@
+"""Roda de expiração: um prazo por chamada aberta, em vez da varredura por minuto.
+
+O fechamento automático era `fechar_chamadas_expiradas()` a cada 60 s, o dia
+inteiro — o JOIN Chamadas × Turmas × horarios_aulas rodava de madrugada e no
+fim de semana, quando nada pode vencer, e a chamada fechava até um minuto
+depois do horário.
+
+Aqui o líder do agendador guarda o prazo de cada chamada aberta hoje (o menor
+horario_fim da turma no dia, o mesmo critério do fechamento) num heap, dorme
+até o mais próximo e fecha exatamente as vencidas. A roda é recarregada numa
+consulta só quando o líder assume, quando o dia vira e a cada aviso de mudança
+em CANAL_CHAMADAS_SALA (abrir/fechar chamada, horário alterado — o mesmo NOTIFY
+que invalida o índice de salas).
+"""
+import datetime
+import heapq
+import zoneinfo
+
+FUSO = zoneinfo.ZoneInfo("America/Sao_Paulo")
+
+# O fechamento compara horario_fim < agora (estrito): acordar um pouco depois
+# do horário garante que a chamada já conta como vencida.
+_MARGEM_S = 1.0
+
+
+def prazo_epoch(horario_fim: datetime.time, hoje: datetime.date) -> float:
+    """Instante (epoch) em que a chamada de `hoje` com esse horário vence."""
+    fim = datetime.datetime.combine(hoje, horario_fim.replace(tzinfo=None), tzinfo=FUSO)
+    return fim.timestamp() + _MARGEM_S
+
+
+def prazos_de_hoje(horarios: dict, hoje: datetime.date) -> dict:
+    """{chamada_id: horario_fim} do repositório -> {chamada_id: epoch}."""
+    return {chamada_id: prazo_epoch(fim, hoje) for chamada_id, fim in horarios.items()}
+
+
+class RodaExpiracao:
+    """Heap de (prazo, chamada_id) com remoção preguiçosa.
+
+    Reagendar ou remover só mexe no dicionário; a entrada velha fica no heap e
+    é descartada quando chega ao topo. Usada só pelo laço do agendador (uma
+    corrotina), sem lock.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int]] = []
+        self._prazos: dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._prazos)
+
+    def __contains__(self, chamada_id) -> bool:
+        return chamada_id in self._prazos
+
+    def definir(self, prazos: dict) -> None:
+        """Troca o conteúdo inteiro pelo retrato recém-carregado."""
+        self._prazos = dict(prazos)
+        self._heap = [(prazo, chamada_id) for chamada_id, prazo in self._prazos.items()]
+        heapq.heapify(self._heap)
+
+    def agendar(self, chamada_id: int, prazo: float) -> None:
+        self._prazos[chamada_id] = prazo
+        heapq.heappush(self._heap, (prazo, chamada_id))
+
+    def remover(self, chamada_id: int) -> None:
+        self._prazos.pop(chamada_id, None)
+
+    def limpar(self) -> None:
+        self.definir({})
+
+    def proximo(self) -> float | None:
+        """Prazo mais próximo, ou None com a roda vazia."""
+        self._descartar_obsoletas()
+        return self._heap[0][0] if self._heap else None
+
+    def vencidas(self, agora: float) -> list[int]:
+        """Tira da roda e devolve as chamadas com prazo até `agora`."""
+        ids = []
+        while True:
+            self._descartar_obsoletas()
+            if not self._heap or self._heap[0][0] > agora:
+                return ids
+            _prazo, chamada_id = heapq.heappop(self._heap)
+            del self._prazos[chamada_id]
+            ids.append(chamada_id)
+
+    def _descartar_obsoletas(self) -> None:
+        while self._heap:
+            prazo, chamada_id = self._heap[0]
+            if self._prazos.get(chamada_id) == prazo:
+                return
+            heapq.heappop(self._heap)
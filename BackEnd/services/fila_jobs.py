@@ -0,0 +1,218 @@
+"""Fila durável de jobs em background (push, e-mail), no Postgres.
+
+Push e e-mail saíam por `BackgroundTasks` e, no fechamento automático, direto
+no executor do agendador: rodavam nas threads do worker da API, disputando com
+os requests, e o que estava na fila sumia a cada deploy/restart.
+
+Agora quem quer notificar grava um job (repositories/jobs.py) na mesma
+transação da mudança que o motivou — presença registrada, chamada fechada — e
+responde: não há janela entre o commit e o enfileiramento em que um restart
+perca o aviso. O consumidor — em cada worker da API (JOBS_EM_PROCESSO=1, default) ou num
+processo à parte (scripts/processar_jobs.py, ops/jobs/) — pega os jobs por
+`FOR UPDATE SKIP LOCKED`, um laço por tipo, com threads próprias: no máximo
+`concorrencia` jobs de um tipo ao mesmo tempo por processo, fora do
+threadpool dos endpoints.
+
+Falha (exceção do executor) volta para a fila com backoff exponencial; depois
+de `max_tentativas` o job fica 'morto' (view `jobs_mortos`, GET
+/admin/jobs/mortos). Entrega é "pelo menos uma vez": consumidor que morre no
+meio de um envio tem o job devolvido quando o lease (JOBS_LEASE_S) vence, e o
+envio pode sair de novo.
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+from infra import metricas
+from infra.database import DB_INDISPONIVEL, _env_int
+from infra.escuta_pg import escuta
+from repositories.jobs import (
+    CANAL_JOBS,
+    concluir_job,
+    enfileirar_jobs_avulsos,
+    falhar_job,
+    recuperar_jobs_travados,
+    reivindicar_jobs,
+)
+
+logger = logging.getLogger("scpi.jobs")
+
+EM_PROCESSO = (os.getenv("JOBS_EM_PROCESSO") or "1").strip().lower() in ("1", "true", "sim")
+# Varredura de segurança quando nenhum NOTIFY chega (escuta caída, job cuja
+# hora de tentar de novo chegou em outro processo).
+_POLL_S = _env_int("JOBS_POLL_S", 30)
+# Tempo máximo de um job 'executando' antes de ser dado como abandonado.
+_LEASE_S = _env_int("JOBS_LEASE_S", 300)
+_RECUPERACAO_S = 60
+
+
+class BancoIndisponivel(Exception):
+    """O executor não conseguiu ler o banco (fora, pool esgotado): o job
+    volta para a fila com backoff em vez de concluir sem ter enviado."""
+
+
+def exigir_banco(valor, o_que: str):
+    """`valor` do repositório, ou BancoIndisponivel se ele veio DB_INDISPONIVEL.
+    Nos executores, "banco fora" não pode virar "nada a enviar"."""
+    if valor is DB_INDISPONIVEL:
+        raise BancoIndisponivel(f"banco indisponível ao buscar {o_que}")
+    return valor
+
+
+class TipoJob:
+    def __init__(self, nome: str, executar, concorrencia: int = 2, max_tentativas: int = 5,
+                 backoff_base_s: float = 10.0, backoff_max_s: float = 3600.0):
+        # executar(**payload): síncrona; exceção = tentar de novo.
+        self.nome = nome
+        self.executar = executar
+        self.concorrencia = concorrencia
+        self.max_tentativas = max_tentativas
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+
+    def atraso(self, tentativa: int) -> float:
+        """Espera antes da próxima tentativa: base·2^(n-1), até o teto, com
+        jitter para os jobs que falharam juntos não voltarem juntos."""
+        espera = min(self.backoff_max_s, self.backoff_base_s * 2 ** max(tentativa - 1, 0))
+        return espera * random.uniform(0.75, 1.25)
+
+
+_tipos: dict[str, TipoJob] = {}
+
+
+def registrar_tipo(tipo: TipoJob) -> TipoJob:
+    _tipos[tipo.nome] = tipo
+    return tipo
+
+
+def job(nome: str, **payload) -> tuple:
+    """(tipo, payload, max_tentativas) para `enfileirar`. Payload vai como
+    JSON: só str/int/float/bool/None/list/dict."""
+    return (nome, payload, _tipos[nome].max_tentativas)
+
+
+def enfileirar(jobs) -> bool:
+    """Grava jobs avulsos num INSERT só, em transação própria. Job que nasce
+    de uma mudança no banco não passa por aqui: vai no cursor dela
+    (repositories.jobs.enfileirar_jobs). False = banco fora."""
+    if enfileirar_jobs_avulsos(jobs):
+        return True
+    logger.error("Fila de jobs: banco indisponível, %d job(s) não gravado(s).", len(jobs))
+    return False
+
+
+def _processar(tipo: TipoJob, registro: dict) -> float | None:
+    """Roda um job reivindicado e grava o resultado. Devolve a espera até a
+    próxima tentativa, ou None (concluído ou morto). Roda na thread do tipo."""
+    try:
+        tipo.executar(**registro["payload"])
+    except Exception as e:
+        atraso = tipo.atraso(registro["tentativas"])
+        falhar_job(registro["id"], f"{type(e).__name__}: {e}", atraso)
+        if registro["tentativas"] >= registro["max_tentativas"]:
+            metricas.contar_job(tipo.nome, "morto")
+            logger.error(
+                "Job %s #%s morto após %d tentativa(s): %s",
+                tipo.nome, registro["id"], registro["tentativas"], e,
+            )
+            return None
+        metricas.contar_job(tipo.nome, "falha")
+        logger.warning(
+            "Job %s #%s falhou (tentativa %d/%d, de novo em %.0fs): %s",
+            tipo.nome, registro["id"], registro["tentativas"], registro["max_tentativas"], atraso, e,
+        )
+        return atraso
+    concluir_job(registro["id"])
+    metricas.contar_job(tipo.nome, "concluido")
+    return None
+
+
+class ConsumidorJobs:
+    def __init__(self, tipos: dict | None = None, dono: str | None = None):
+        self._tipos = dict(tipos if tipos is not None else _tipos)
+        self.dono = dono or f"{socket.gethostname()}:{os.getpid()}"
+
+    async def rodar(self) -> None:
+        loop = asyncio.get_running_loop()
+        avisos = {nome: asyncio.Event() for nome in self._tipos}
+
+        def acordar(tipo=None):
+            # Thread da escuta. Payload = tipo enfileirado; sem payload
+            # (reconexão: aviso pode ter se perdido), acorda todos.
+            alvos = [avisos[tipo]] if tipo in avisos else avisos.values()
+            for aviso in alvos:
+                try:
+                    loop.call_soon_threadsafe(aviso.set)
+                except RuntimeError:
+                    pass  # loop já encerrado
+
+        escuta.inscrever(CANAL_JOBS, acordar, ao_reconectar=acordar)
+        logger.info("Consumidor de jobs %s: %s.", self.dono, ", ".join(sorted(self._tipos)))
+        await asyncio.gather(
+            self._laco_recuperacao(loop),
+            *(self._laco_tipo(loop, tipo, avisos[nome]) for nome, tipo in self._tipos.items()),
+        )
+
+    async def _laco_tipo(self, loop, tipo: TipoJob, aviso: asyncio.Event) -> None:
+        executor = ThreadPoolExecutor(max_workers=tipo.concorrencia, thread_name_prefix=f"job-{tipo.nome}")
+        em_voo: set = set()
+
+        def terminou(tarefa):
+            em_voo.discard(tarefa)
+            aviso.set()  # vaga livre: pode haver mais na fila
+            if tarefa.cancelled():
+                return
+            if tarefa.exception() is not None:
+                # Nem o resultado foi gravado (banco caiu): o lease devolve.
+                logger.error("Fila de jobs: erro ao gravar resultado de %s: %s", tipo.nome, tarefa.exception())
+            elif tarefa.result() is not None:
+                # Acorda quando der a hora da nova tentativa, sem esperar o poll.
+                loop.call_later(tarefa.result(), aviso.set)
+
+        try:
+            while True:
+                aviso.clear()
+                livres = tipo.concorrencia - len(em_voo)
+                if livres > 0:
+                    try:
+                        registros = await loop.run_in_executor(
+                            executor, reivindicar_jobs, tipo.nome, livres, self.dono,
+                        )
+                    except Exception as e:
+                        logger.error("Fila de jobs: erro ao buscar %s: %s", tipo.nome, e)
+                        registros = []
+                    for registro in registros:
+                        tarefa = loop.run_in_executor(executor, _processar, tipo, registro)
+                        em_voo.add(tarefa)
+                        tarefa.add_done_callback(terminou)
+                    if registros and len(registros) == livres:
+                        continue  # lote cheio: pode haver mais esperando
+                try:
+                    await asyncio.wait_for(aviso.wait(), timeout=_POLL_S)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Envio em curso termina e grava o resultado; o que não terminar
+            # (processo saindo) volta pela recuperação do lease.
+            executor.shutdown(wait=False)
+
+    async def _laco_recuperacao(self, loop) -> None:
+        while True:
+            try:
+                devolvidos = await loop.run_in_executor(None, recuperar_jobs_travados, _LEASE_S)
+                if devolvidos:
+                    logger.warning("Fila de jobs: %d job(s) com lease vencido devolvido(s).", devolvidos)
+            except Exception as e:
+                logger.error("Fila de jobs: erro na recuperação de leases: %s", e)
+            await asyncio.sleep(_RECUPERACAO_S + random.uniform(0, 10))
+
+
+async def iniciar_consumidor() -> None:
+    """Consumidor com todos os tipos registrados (lifespan da API ou script)."""
+    if not _tipos:
+        logger.warning("Fila de jobs: nenhum tipo registrado, consumidor não sobe.")
+        return
+    await ConsumidorJobs().rodar()
@@ -1,8 +1,24 @@
+"""Push e e-mail de presença, entregues pela fila de jobs (services/fila_jobs.py).
+
+Os endpoints e o agendador só enfileiram: `jobs_presenca` e
+`jobs_encerramento` montam os jobs, e o repositório que registra a presença ou
+fecha a chamada os grava na mesma transação. As funções de envio abaixo são os executores dos
+jobs e rodam no consumidor. Falha transitória levanta (FalhaEnvio, erro de
+banco ou BancoIndisponivel quando o repositório devolve DB_INDISPONIVEL) e o
+job tenta de novo com backoff. A hora vai no payload: a mensagem
+diz quando a presença foi registrada, não quando o envio finalmente saiu.
+"""
 import datetime
 import logging
 import zoneinfo
 
-from infra.notificacoes import send_expo_push, send_email_resend
+from infra.notificacoes import (
+    FalhaEnvio,
+    resend_configurado,
+    send_email_resend,
+    send_expo_mensagens,
+    send_expo_push,
+)
 from repositories.notificacoes import (
     obter_push_token_por_usuario,
     remover_push_token,
@@ -10,61 +26,163 @@ from repositories.notificacoes import (
 )
 from repositories.turmas import (
     listar_alunos_com_push_token_da_turma,
+    listar_destinatarios_encerramento,
     obter_turma_id_por_chamada,
 )
+from services.fila_jobs import TipoJob, enfileirar, exigir_banco, job, registrar_tipo
 
 logger = logging.getLogger("scpi.services.notificacoes")
 
+JOB_PUSH_PRESENCA = "push_presenca"
+JOB_EMAIL_PRESENCA = "email_presenca"
+JOB_PUSH_ENCERRAMENTO = "push_encerramento"
+JOB_PUSH_ENCERRAMENTO_LOTE = "push_encerramento_lote"
+JOB_PUSH_TOKENS = "push_tokens"
+
+_TITULO_ENCERRAMENTO = "Chamada Encerrada"
+
+
+def _hora_agora() -> str:
+    return datetime.datetime.now(zoneinfo.ZoneInfo("America/Sao_Paulo")).strftime("%H:%M")
+
+
+def _tratar_resultado(res: dict, texto_de, reenfileirar_falhos: bool) -> None:
+    """Poda os mortos e registra os tickets num comando só cada.
+    `texto_de(token)` -> (título, corpo) da mensagem que o token recebeu."""
+    if res["dead"]:
+        remover_push_token(res["dead"])
+    if res.get("tickets"):
+        registrar_tickets_pendentes(res["tickets"])
+    falhos = res.get("falhos")
+    if not falhos:
+        return
+    # Parte dos lotes saiu: repetir o job inteiro mandaria de novo para quem
+    # já recebeu. Só os tokens que ficaram viram jobs próprios, um por texto.
+    if not reenfileirar_falhos:
+        raise FalhaEnvio(f"Expo push: {len(falhos)} token(s) não saíram")
+    por_texto: dict[tuple, list] = {}
+    for token in falhos:
+        por_texto.setdefault(texto_de(token), []).append(token)
+    if not enfileirar([
+        job(JOB_PUSH_TOKENS, tokens=tokens, titulo=titulo, corpo=corpo)
+        for (titulo, corpo), tokens in por_texto.items()
+    ]):
+        # Sem onde guardar os falhos, o job inteiro tenta de novo: quem já
+        # recebeu pode receber de novo, mas ninguém fica sem.
+        raise FalhaEnvio(f"Expo push: {len(falhos)} token(s) não saíram e não foram reenfileirados")
+
+
+def _enviar_push(tokens: list, titulo: str, corpo: str, reenfileirar_falhos: bool = True) -> None:
+    res = send_expo_push(tokens, titulo, corpo, levantar_em_falha=True)
+    _tratar_resultado(res, lambda _token: (titulo, corpo), reenfileirar_falhos)
+
+
+def enviar_push_tokens(tokens: list, titulo: str, corpo: str) -> None:
+    """Job: tokens cujo lote não saiu num envio maior. Falha aqui repete este
+    job (poucos tokens), sem gerar outro."""
+    _enviar_push(tokens, titulo, corpo, reenfileirar_falhos=False)
+
+
+def enviar_push_presenca(usuario_id: str, turma_nome: str, hora: str) -> None:
+    """Job: push de presença confirmada para o aluno."""
+    row = exigir_banco(obter_push_token_por_usuario(usuario_id), "push token")
+    if not row:
+        return
+    _enviar_push(
+        [row["expo_token"]],
+        "Presença Confirmada ✓",
+        f"Sua presença em {turma_nome} foi registrada às {hora}.",
+    )
+
 
-def enviar_notificacoes_presenca(usuario_id: str, aluno_nome: str, aluno_email: str, turma_nome: str) -> None:
-    """Tarefa de background: dispara push + email após confirmação de presença."""
-    hora = datetime.datetime.now(zoneinfo.ZoneInfo("America/Sao_Paulo")).strftime("%H:%M")
-
-    if usuario_id:
-        try:
-            row = obter_push_token_por_usuario(usuario_id)
-            if row:
-                res = send_expo_push(
-                    [row["expo_token"]],
-                    "Presença Confirmada ✓",
-                    f"Sua presença em {turma_nome} foi registrada às {hora}.",
-                )
-                for token in res["dead"]:
-                    remover_push_token(token)
-                if res.get("tickets"):
-                    registrar_tickets_pendentes(res["tickets"])
-        except Exception as e:
-            logger.error("Erro ao enviar push: %s", e)
-
-    if aluno_email:
-        send_email_resend(aluno_email, aluno_nome, turma_nome, hora)
-
-
-def notificar_alunos_presentes(chamada_id: str, turma_nome: str) -> None:
-    """Tarefa de background: ao fechar chamada, notifica via push todos os alunos matriculados."""
-    hora = datetime.datetime.now(zoneinfo.ZoneInfo("America/Sao_Paulo")).strftime("%H:%M")
-
-    try:
-        turma_id = obter_turma_id_por_chamada(chamada_id)
-        if not turma_id:
-            return
-        alunos = listar_alunos_com_push_token_da_turma(turma_id)
-    except Exception as e:
-        logger.error("Erro ao buscar alunos para notificação de encerramento: %s", e)
+def enviar_email_presenca(aluno_email: str, aluno_nome: str, turma_nome: str, hora: str) -> None:
+    """Job: e-mail de presença confirmada. Sem RESEND_API_KEY não há o que
+    tentar de novo: o job conclui sem enviar."""
+    if not resend_configurado():
+        logger.warning("RESEND_API_KEY não configurado — notificação por email ignorada.")
         return
+    if not send_email_resend(aluno_email, aluno_nome, turma_nome, hora):
+        raise FalhaEnvio("Resend não aceitou o e-mail de presença")
+
+
+def _corpo_encerramento(disciplinas: list, hora: str) -> str:
+    if len(disciplinas) == 1:
+        return f"A chamada de {disciplinas[0]} foi encerrada às {hora}."
+    nomes = ", ".join(disciplinas[:-1]) + f" e {disciplinas[-1]}"
+    return f"As chamadas de {nomes} foram encerradas às {hora}."
+
+
+def notificar_encerramentos(chamada_ids: list, hora: str) -> None:
+    """Job: push de encerramento de todas as chamadas fechadas juntas.
+
+    Uma consulta resolve os destinatários de todas as chamadas com o nome da
+    disciplina; cada token recebe uma mensagem só (aluno em duas turmas que
+    fecharam juntas recebe as duas disciplinas no mesmo texto), e tudo sai
+    num envio da Expo, em lotes de 100.
+    """
+    disciplinas: dict[str, list] = {}
+    destinatarios = exigir_banco(listar_destinatarios_encerramento(chamada_ids), "destinatários")
+    for row in destinatarios:
+        disciplinas.setdefault(row["expo_token"], []).append(row["nome_disciplina"])
+    if not disciplinas:
+        return
+    textos = {
+        token: (_TITULO_ENCERRAMENTO, _corpo_encerramento(nomes, hora))
+        for token, nomes in disciplinas.items()
+    }
+    res = send_expo_mensagens(
+        [{"to": token, "title": titulo, "body": corpo} for token, (titulo, corpo) in textos.items()],
+        levantar_em_falha=True,
+    )
+    _tratar_resultado(res, textos.__getitem__, reenfileirar_falhos=True)
+
+
+def notificar_alunos_presentes(chamada_id, turma_nome: str, hora: str | None = None) -> None:
+    """Job (uma chamada só): push para todos os alunos matriculados. Os
+    encerramentos agora saem por `notificar_encerramentos`; o tipo fica
+    registrado para esvaziar os jobs gravados antes."""
+    hora = hora or _hora_agora()
+    turma_id = exigir_banco(obter_turma_id_por_chamada(chamada_id), "turma da chamada")
+    if not turma_id:
+        return
+    alunos = exigir_banco(listar_alunos_com_push_token_da_turma(turma_id), "alunos da turma")
 
     tokens = [a["expo_token"] for a in alunos if a.get("expo_token")]
     if not tokens:
         return
-    try:
-        res = send_expo_push(
-            tokens,
-            "Chamada Encerrada",
-            f"A chamada de {turma_nome} foi encerrada às {hora}.",
-        )
-        for token in res["dead"]:
-            remover_push_token(token)
-        if res.get("tickets"):
-            registrar_tickets_pendentes(res["tickets"])
-    except Exception as e:
-        logger.error("Erro ao enviar push de encerramento da chamada %s: %s", chamada_id, e)
+    _enviar_push(tokens, _TITULO_ENCERRAMENTO, _corpo_encerramento([turma_nome], hora))
+
+
+registrar_tipo(TipoJob(JOB_PUSH_PRESENCA, enviar_push_presenca, concorrencia=4))
+registrar_tipo(TipoJob(JOB_EMAIL_PRESENCA, enviar_email_presenca, concorrencia=2, max_tentativas=3,
+                       backoff_base_s=30))
+registrar_tipo(TipoJob(JOB_PUSH_ENCERRAMENTO, notificar_alunos_presentes, concorrencia=2))
+registrar_tipo(TipoJob(JOB_PUSH_ENCERRAMENTO_LOTE, notificar_encerramentos, concorrencia=2))
+registrar_tipo(TipoJob(JOB_PUSH_TOKENS, enviar_push_tokens, concorrencia=2))
+
+
+def jobs_presenca(resultado: dict, hora: str | None = None) -> list:
+    """Jobs de notificação de uma presença registrada (dados do repositório:
+    usuario_id, aluno_nome, aluno_email, turma_nome). Vai como
+    `jobs_notificacao` para o registro, que grava os jobs na transação das
+    presenças."""
+    hora = hora or _hora_agora()
+    turma_nome = resultado.get("turma_nome") or "sua turma"
+    jobs = []
+    if resultado.get("usuario_id"):
+        jobs.append(job(JOB_PUSH_PRESENCA, usuario_id=str(resultado["usuario_id"]),
+                        turma_nome=turma_nome, hora=hora))
+    if resultado.get("aluno_email"):
+        jobs.append(job(JOB_EMAIL_PRESENCA, aluno_email=resultado["aluno_email"],
+                        aluno_nome=resultado.get("aluno_nome"), turma_nome=turma_nome, hora=hora))
+    return jobs
+
+
+def jobs_encerramento(chamada_ids) -> list:
+    """Um job de push para todas as chamadas fechadas de uma vez (o tick do
+    agendador que fecha N chamadas, ou o professor que fecha uma). Vai como
+    `jobs_encerramento` para o repositório que fecha, que grava o job no
+    mesmo commit."""
+    if not chamada_ids:
+        return []
+    return [job(JOB_PUSH_ENCERRAMENTO_LOTE, chamada_ids=list(chamada_ids), hora=_hora_agora())]
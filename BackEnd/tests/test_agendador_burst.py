@@ -0,0 +1,111 @@
+"""Agendamento adaptativo do burst — sem câmera, sem AWS.
+
+O contrato: rosto pendente dispara como antes; sala parada e resolvida recua
+até quase-repouso; movimento acorda na hora, mas não fura o cooldown.
+"""
+import numpy as np
+import pytest
+
+from scripts.agendador_burst import AgendadorBurst, energia_movimento, miniatura
+
+
+def _agendador(**kw):
+    params = dict(frames_max=5, frames_min=4, cooldown=1.5, espera_max=30.0,
+                  limiar_movimento=3.0)
+    params.update(kw)
+    return AgendadorBurst(**params)
+
+
+def test_primeira_verificacao_e_imediata():
+    assert _agendador().deve_verificar(movimento=0.0, agora=0.0) is True
+
+
+def test_pendente_com_movimento_pede_burst_cheio():
+    a = _agendador()
+    assert a.planejar(pendentes=2, movimento=10.0, agora=0.0) == 5
+
+
+def test_pendente_em_cena_parada_pede_burst_curto():
+    a = _agendador()
+    assert a.planejar(pendentes=1, movimento=0.5, agora=0.0) == 4
+
+
+def test_cooldown_depois_do_burst_nao_e_furado_por_movimento():
+    a = _agendador()
+    a.planejar(pendentes=1, movimento=10.0, agora=0.0)
+    a.burst_concluido(agora=2.0)
+
+    assert a.deve_verificar(movimento=50.0, agora=3.0) is False
+    assert a.deve_verificar(movimento=0.0, agora=3.5) is True
+
+
+def test_sala_resolvida_recua_em_dobro_ate_o_teto():
+    a = _agendador()
+    esperas = []
+    for _ in range(8):
+        assert a.planejar(pendentes=0, movimento=0.0, agora=0.0) == 0
+        esperas.append(a.espera)
+    assert esperas[:5] == [1.5, 3.0, 6.0, 12.0, 24.0]
+    assert esperas[-1] == 30.0
+
+
+def test_em_recuo_cena_parada_nao_verifica():
+    a = _agendador()
+    for _ in range(4):
+        a.planejar(pendentes=0, movimento=0.0, agora=100.0)
+
+    assert a.deve_verificar(movimento=0.5, agora=105.0) is False
+    assert a.deve_verificar(movimento=0.5, agora=112.0) is True
+
+
+def test_movimento_acorda_o_recuo_na_hora():
+    a = _agendador()
+    for _ in range(4):
+        a.planejar(pendentes=0, movimento=0.0, agora=100.0)
+
+    assert a.deve_verificar(movimento=8.0, agora=100.2) is True
+
+
+def test_rosto_pendente_zera_o_recuo():
+    a = _agendador()
+    for _ in range(4):
+        a.planejar(pendentes=0, movimento=0.0, agora=0.0)
+    a.planejar(pendentes=1, movimento=0.0, agora=0.0)
+    assert a.espera == 0.0
+    # E o próximo recuo recomeça do cooldown, não de onde parou.
+    a.planejar(pendentes=0, movimento=0.0, agora=0.0)
+    assert a.espera == 1.5
+
+
+def test_verificacao_parcial_vazia_nao_adia_a_completa():
+    # ROI sem pendente não diz nada do resto da sala: o recuo não dobra e a
+    # verificação completa marcada continua de pé.
+    a = _agendador()
+    a.planejar(pendentes=0, movimento=0.0, agora=0.0)  # completa em 1.5
+    assert a.planejar(pendentes=0, movimento=9.0, agora=0.5, parcial=True) == 0
+    assert a.espera == 1.5
+    assert a.deve_verificar(movimento=9.0, agora=1.0) is False
+    assert a.verificacao_completa_devida(agora=1.5) is True
+    assert a.deve_verificar(movimento=0.0, agora=1.5) is True
+
+
+@pytest.mark.parametrize("kw", [
+    {"frames_min": 0}, {"frames_min": 6}, {"cooldown": -1}, {"espera_max": 1.0},
+])
+def test_parametros_invalidos_levantam(kw):
+    with pytest.raises(ValueError):
+        _agendador(**kw)
+
+
+# ---- Energia de movimento ----
+
+def test_cena_identica_tem_energia_zero():
+    frame = np.full((720, 1280, 3), 90, dtype=np.uint8)
+    assert energia_movimento(miniatura(frame), miniatura(frame)) == 0.0
+
+
+def test_mudanca_grande_passa_do_limiar():
+    vazio = np.zeros((720, 1280, 3), dtype=np.uint8)
+    alguem = vazio.copy()
+    alguem[200:600, 400:800] = 200  # ~17% da cena mudou
+    assert energia_movimento(miniatura(vazio), miniatura(alguem)) > 3.0
@@ -0,0 +1,170 @@
+"""Agendador com líder eleito por advisory lock — sem banco."""
+import asyncio
+
+import pytest
+
+import infra.lideranca_pg as lideranca_pg
+import services.agendador as ag
+from infra.lideranca_pg import LiderancaPg
+
+
+class _Postgres:
+    """Advisory locks de sessão: o lock é da conexão que o pegou."""
+
+    def __init__(self):
+        self.dono = None
+
+    def conectar(self):
+        return _Conn(self)
+
+
+class _Conn:
+    def __init__(self, pg):
+        self.pg = pg
+        self.closed = 0
+        self.caiu = False
+
+    def cursor(self):
+        conn = self
+
+        class _Cur:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params=None):
+                if conn.caiu:
+                    raise RuntimeError("server closed the connection unexpectedly")
+                self.resultado = None
+                if "pg_try_advisory_lock" in sql:
+                    if conn.pg.dono is None or conn.pg.dono is conn:
+                        conn.pg.dono = conn
+                    self.resultado = (conn.pg.dono is conn,)
+
+            def fetchone(self):
+                return self.resultado
+
+        return _Cur()
+
+    def close(self):
+        self.closed = 1
+        if self.pg.dono is self:
+            self.pg.dono = None
+
+
+@pytest.fixture(autouse=True)
+def _com_psycopg2(monkeypatch):
+    monkeypatch.setattr(lideranca_pg, "_IS_PSYCOPG2", True)
+
+
+def test_so_um_worker_vira_lider():
+    pg = _Postgres()
+    workers = [LiderancaPg(1, pg.conectar) for _ in range(4)]
+
+    assert [w.renovar() for w in workers] == [True, False, False, False]
+    assert [w.renovar() for w in workers] == [True, False, False, False]
+
+
+def test_outro_assume_quando_o_lider_renuncia():
+    pg = _Postgres()
+    a, b = LiderancaPg(1, pg.conectar), LiderancaPg(1, pg.conectar)
+    a.renovar()
+    assert b.renovar() is False
+
+    a.renunciar()
+
+    assert b.renovar() is True
+    assert a.renovar() is False
+
+
+def test_lider_com_conexao_caida_deixa_de_ser_lider_na_hora():
+    pg = _Postgres()
+    a = LiderancaPg(1, pg.conectar)
+    a.renovar()
+    a._conn.caiu = True
+
+    assert a.renovar() is False
+    assert a.lider is False
+
+
+def test_banco_fora_ninguem_e_lider():
+    def conectar():
+        raise RuntimeError("could not connect")
+
+    assert LiderancaPg(1, conectar).renovar() is False
+
+
+def test_tarefa_registra_duracao_sucesso_e_erro():
+    chamadas = []
+
+    def falha_na_segunda():
+        chamadas.append(1)
+        if len(chamadas) == 2:
+            raise RuntimeError("deadlock detected")
+        return "ok"
+
+    tarefa = ag.Tarefa("teste", falha_na_segunda, intervalo_s=60)
+
+    assert asyncio.run(tarefa.rodar_uma_vez()) == "ok"
+    sucesso = tarefa.ultimo_sucesso_em
+    assert asyncio.run(tarefa.rodar_uma_vez()) is None
+
+    estado = tarefa.estado()
+    assert estado["execucoes"] == 2 and estado["falhas"] == 1
+    assert estado["ultimo_erro"] == "RuntimeError: deadlock detected"
+    assert tarefa.ultimo_sucesso_em == sucesso
+    assert estado["ultima_duracao_s"] is not None
+
+
+def test_jitter_fica_dentro_do_intervalo():
+    tarefa = ag.Tarefa("teste", lambda: None, intervalo_s=60, jitter_s=5)
+
+    esperas = [tarefa.proxima_espera() for _ in range(200)]
+
+    assert all(60 <= e <= 65 for e in esperas)
+
+
+def test_tarefa_de_lider_nao_roda_fora_do_lider(monkeypatch):
+    rodou = []
+    monkeypatch.setattr(ag._lideranca, "lider", False)
+    tarefa = ag.Tarefa("so_lider", lambda: rodou.append("lider"), intervalo_s=0)
+    local = ag.Tarefa("todos", lambda: rodou.append("todos"), intervalo_s=0, so_lider=False)
+
+    async def um_ciclo():
+        lacos = [asyncio.create_task(ag._laco_tarefa(t)) for t in (tarefa, local)]
+        await asyncio.sleep(0.05)
+        for laco in lacos:
+            laco.cancel()
+
+    asyncio.run(um_ciclo())
+
+    assert "todos" in rodou
+    assert "lider" not in rodou
+
+
+def test_tarefas_compartilhadas_sao_so_do_lider():
+    por_nome = {t.nome: t for t in ag._tarefas}
+
+    assert por_nome["fechar_chamadas_expiradas"].so_lider
+    assert por_nome["limpeza_diaria"].so_lider
+    # Estado na memória de cada worker: todos descarregam o seu.
+    assert not por_nome["uso_tokens_camera"].so_lider
+
+
+def test_fechar_e_notificar_entrega_os_jobs_ao_fechamento(monkeypatch):
+    import repositories.chamadas as chamadas
+    import services.notificacoes as notificacoes
+
+    recebidos = []
+
+    def _fechar(chamada_ids=None, jobs_encerramento=None):
+        recebidos.append((chamada_ids, jobs_encerramento))
+        return [{"chamada_id": 7, "nome_disciplina": "BD"}]
+
+    monkeypatch.setattr(chamadas, "fechar_chamadas_expiradas", _fechar)
+
+    assert ag._fechar_e_notificar([7]) == 1
+    # O job é gravado pelo repositório, no commit do UPDATE.
+    assert recebidos == [([7], notificacoes.jobs_encerramento)]
@@ -97,3 +97,68 @@ def test_vivo_foi_removida():
     # Tinha zero chamadores e semântica incompatível com None:
     # `None >= limiar` levanta TypeError para quem a usasse depois.
     assert not hasattr(DetectorTextura, "vivo")
+
+
+# ---- score_batch: um forward por frame, mesma saída de score() ----
+
+class _NetLoteFake(_NetFake):
+    """Aceita batch: devolve uma linha de logits por crop do blob."""
+
+    def __init__(self, batch_fixo=False):
+        super().__init__()
+        self.batch_fixo = batch_fixo
+        self.n = 1
+
+    def setInput(self, blob):
+        self.n = blob.shape[0]
+
+    def forward(self):
+        self.inferencias += 1
+        linhas = 1 if self.batch_fixo else self.n
+        return np.tile(np.array([[2.0, -2.0]], dtype=np.float32), (linhas, 1))
+
+
+def _detector_lote(face_min_px=80, batch_fixo=False):
+    d = _detector(face_min_px)
+    d.net = _NetLoteFake(batch_fixo)
+    d.lote_suportado = True
+    return d
+
+
+def test_score_batch_roda_um_forward_para_todos_os_rostos():
+    d = _detector_lote()
+    frame = np.zeros((400, 400, 3), dtype=np.uint8)
+    bboxes = [(10, 10, 100, 100), (200, 10, 100, 100), (10, 200, 100, 100)]
+
+    scores = d.score_batch(frame, bboxes)
+
+    assert scores == [pytest.approx(0.9820, abs=1e-3)] * 3
+    assert d.net.inferencias == 1
+
+
+def test_score_batch_preserva_none_abaixo_do_piso_na_posicao():
+    d = _detector_lote()
+    frame = np.zeros((400, 400, 3), dtype=np.uint8)
+
+    scores = d.score_batch(frame, [(10, 10, 100, 100), (200, 10, 40, 40), (10, 200, 100, 100)])
+
+    assert scores[1] is None
+    assert scores[0] is not None and scores[2] is not None
+
+
+def test_score_batch_sem_rosto_avaliavel_nao_roda_inferencia():
+    d = _detector_lote()
+    frame = np.zeros((400, 400, 3), dtype=np.uint8)
+    assert d.score_batch(frame, [(0, 0, 30, 30)]) == [None]
+    assert d.net.inferencias == 0
+
+
+def test_score_batch_cai_para_por_rosto_se_o_onnx_tem_batch_fixo():
+    d = _detector_lote(batch_fixo=True)
+    frame = np.zeros((400, 400, 3), dtype=np.uint8)
+    bboxes = [(10, 10, 100, 100), (200, 10, 100, 100)]
+
+    scores = d.score_batch(frame, bboxes)
+
+    assert scores == [pytest.approx(0.9820, abs=1e-3)] * 2
+    assert d.lote_suportado is False
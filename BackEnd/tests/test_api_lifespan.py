@@ -11,9 +11,24 @@ pool) trocadas por dublês.
 """
 from unittest.mock import patch
 
+import pytest
 from fastapi.testclient import TestClient
 
 
+@pytest.fixture(autouse=True)
+def _sem_escuta_pg():
+    """A escuta LISTEN/NOTIFY abre conexão própria ao banco: fora daqui."""
+    with patch("api._escuta_pg") as escuta:
+        yield escuta
+
+
+@pytest.fixture(autouse=True)
+def _sem_consumidor_jobs():
+    """O consumidor da fila de jobs consulta o banco em laço: fora daqui."""
+    with patch("api.iniciar_consumidor", _agendador_falso):
+        yield
+
+
 async def _agendador_falso():
     """O startup faz asyncio.create_task(iniciar_agendador()) — precisa de corrotina."""
     return None
@@ -81,3 +96,14 @@ def test_falha_no_startup_nao_sobe_a_aplicacao():
             assert "migration quebrada" in str(exc)
         else:
             raise AssertionError("o boot deveria ter propagado o erro da migration")
+
+
+def test_escuta_pg_sobe_no_startup_e_para_no_shutdown(_sem_escuta_pg):
+    from api import app
+
+    p_mig, p_agen, p_aws, p_pool = _dubles()
+    with p_mig, p_agen, p_aws, p_pool:
+        with TestClient(app):
+            _sem_escuta_pg.iniciar.assert_called_once()
+            _sem_escuta_pg.parar.assert_not_called()
+    _sem_escuta_pg.parar.assert_called_once()
@@ -0,0 +1,112 @@
+"""_analisar_trilha: um SearchFaces por trilha, identidade para todos os frames.
+
+Pose sai dos landmarks (scripts/pose_local.py): DetectFaces não é mais chamado.
+
+Mesma montagem de test_camera_sincronizacao.py: __new__ pula o __init__ real
+(YuNet, textura, CAMERA_SERVICE_TOKEN); o cliente Rekognition é trocado por um
+stub que conta as chamadas.
+"""
+import threading
+
+import numpy as np
+import pytest
+
+from scripts.embedding_local import CacheIdentidades, _normalizar
+from scripts.registro_tracker import RegistroPresencaTracker
+
+
+class _RekognitionFake:
+    def __init__(self, external_id="ana"):
+        self.external_id = external_id
+        self.searches = 0
+        self.detects = 0
+
+    def search_faces_by_image(self, **_k):
+        self.searches += 1
+        if self.external_id is None:
+            return {"FaceMatches": []}
+        return {"FaceMatches": [{"Face": {"ExternalImageId": self.external_id}}]}
+
+    def detect_faces(self, **_k):
+        self.detects += 1
+        return {"FaceDetails": [{"Pose": {"Yaw": 1.0, "Pitch": -2.0}}]}
+
+
+@pytest.fixture
+def sistema():
+    from scripts.reconhecimento_tempo_real import SistemaReconhecimento
+
+    obj = SistemaReconhecimento.__new__(SistemaReconhecimento)
+    obj.chamada_id_atual = 7
+    obj.tracker = RegistroPresencaTracker()
+    obj.cache_identidades = CacheIdentidades(0.363)
+    obj.lock = threading.Lock()
+    return obj
+
+
+@pytest.fixture
+def rekognition(monkeypatch):
+    import scripts.reconhecimento_tempo_real as mod
+
+    fake = _RekognitionFake()
+    monkeypatch.setattr(mod, "rekognition_client", fake)
+    return fake
+
+
+_LANDMARKS = np.array([[130, 140], [190, 140], [160, 170], [138, 195], [182, 195]],
+                      dtype=np.float32)
+
+
+def _trilha(n, embedding=None):
+    frame = np.full((480, 640, 3), 128, dtype=np.uint8)
+    return [(frame, (100 + i, 100, 120, 120), _LANDMARKS, embedding) for i in range(n)]
+
+
+def test_um_searchfaces_para_a_trilha_inteira(sistema, rekognition):
+    resultados = sistema._analisar_trilha(_trilha(5), [0.5] * 5, 7)
+
+    assert rekognition.searches == 1
+    assert [r.external_id for r in resultados] == ["ana"] * 5
+    assert [r.textura for r in resultados] == [0.5] * 5
+
+
+def test_pose_vem_dos_landmarks_sem_detectfaces(sistema, rekognition):
+    resultados = sistema._analisar_trilha(_trilha(3), [0.5] * 3, 7)
+
+    assert rekognition.detects == 0
+    assert all(r.yaw is not None and r.pitch is not None for r in resultados)
+
+
+def test_sem_match_devolve_lista_vazia(sistema, rekognition):
+    rekognition.external_id = None
+    assert sistema._analisar_trilha(_trilha(5), [0.5] * 5, 7) == []
+
+
+def test_aluno_ja_tratado_nao_entra_no_burst(sistema, rekognition):
+    sistema.tracker.concluir("ana", definitivo=True)
+
+    assert sistema._analisar_trilha(_trilha(5), [0.5] * 5, 7) == []
+
+
+def test_chamada_trocada_no_meio_descarta(sistema, rekognition):
+    assert sistema._analisar_trilha(_trilha(5), [0.5] * 5, 99) == []
+
+
+def test_match_memoriza_embeddings_para_o_pre_filtro(sistema, rekognition):
+    emb = _normalizar(np.ones(128, dtype=np.float32))
+    sistema._analisar_trilha(_trilha(3, emb), [0.5] * 3, 7)
+
+    assert sistema.cache_identidades.identificar(emb) == "ana"
+
+
+def test_trilha_resolvida_exige_maioria_dos_frames(sistema):
+    emb = _normalizar(np.ones(128, dtype=np.float32))
+    outro = _normalizar(np.arange(128, dtype=np.float32) * np.tile([1, -1], 64))
+    sistema.cache_identidades.memorizar(emb, "ana")
+    sistema.tracker.concluir("ana", definitivo=True)
+
+    maioria = _trilha(2, emb) + _trilha(1, outro)
+    minoria = _trilha(1, emb) + _trilha(2, outro)
+
+    assert sistema._trilha_ja_resolvida(maioria) is True
+    assert sistema._trilha_ja_resolvida(minoria) is False
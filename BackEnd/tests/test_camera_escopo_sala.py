@@ -6,16 +6,15 @@ furo que sobrava mesmo depois de a chamada virar explícita no payload.
 import asyncio
 
 import pytest
-from fastapi import BackgroundTasks, HTTPException
+from fastapi import HTTPException
 
 
-def _registrar(payload, sala, background_tasks=None):
+def _registrar(payload, sala):
     from routers.chamadas import registrar_presenca_camera
 
     return asyncio.run(
         registrar_presenca_camera(
             payload=payload,
-            background_tasks=background_tasks or BackgroundTasks(),
             sala=sala,
         )
     )
@@ -135,7 +134,7 @@ def test_obter_chamada_aberta_por_sala_devolve_sentinela_quando_cursor_indisponi
     from infra.database import DB_INDISPONIVEL
 
     @contextmanager
-    def _cursor_indisponivel():
+    def _cursor_indisponivel(commit=False, preparar=False):
         yield None
 
     monkeypatch.setattr(chamadas_repo, "get_db_cursor", _cursor_indisponivel)
@@ -0,0 +1,109 @@
+"""Cliente da câmera no endpoint em lote: mesma regra do POST unitário.
+
+5xx (ou rede) devolve o aluno para o próximo burst; qualquer outra resposta é
+decisão definitiva do servidor. Instância montada com __new__, como em
+test_camera_sincronizacao.py.
+"""
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from scripts.registro_tracker import RegistroPresencaTracker
+
+
+@pytest.fixture
+def sistema():
+    from scripts.reconhecimento_tempo_real import SistemaReconhecimento
+
+    obj = SistemaReconhecimento.__new__(SistemaReconhecimento)
+    obj.chamada_id_atual = 7
+    obj.tracker = RegistroPresencaTracker()
+    obj.lock = threading.Lock()
+    obj._api_pool = MagicMock()
+    for aluno in ("a", "b", "c"):
+        obj.tracker.reivindicar(aluno)
+    return obj
+
+
+def _post(monkeypatch, status, corpo=None, erro=None):
+    import scripts.reconhecimento_tempo_real as mod
+
+    resp = MagicMock()
+    resp.status_code = status
+    resp.json.return_value = corpo or {}
+    resp.text = str(corpo or {})
+    enviados = []
+
+    def _fake(url, json=None, **_k):
+        enviados.append((url, json))
+        if erro is not None:
+            raise erro
+        return resp
+
+    monkeypatch.setattr(mod.requests, "post", _fake)
+    return enviados
+
+
+def test_um_post_para_o_burst_e_conclusao_por_item(monkeypatch, sistema):
+    enviados = _post(monkeypatch, 200, {"resultados": [
+        {"external_image_id": "a", "status": 200, "ja_registrado": False},
+        {"external_image_id": "b", "status": 403, "error_code": "nao_matriculado"},
+        {"external_image_id": "c", "status": 503, "error_code": "erro_interno"},
+    ]})
+
+    sistema._registrar_presencas(["a", "b", "c"], 7)
+
+    assert len(enviados) == 1
+    assert enviados[0][0].endswith("/chamadas/registrar_presencas_camera/lote")
+    assert enviados[0][1] == {"external_image_ids": ["a", "b", "c"], "chamada_id": 7}
+    assert sistema.tracker.tratado("a") and sistema.tracker.tratado("b")
+    assert sistema.tracker.reivindicar("c") is True  # transitório: volta
+
+
+def test_aluno_ausente_da_resposta_fica_transitorio(monkeypatch, sistema):
+    _post(monkeypatch, 200, {"resultados": [{"external_image_id": "a", "status": 200}]})
+
+    sistema._registrar_presencas(["a", "b"], 7)
+
+    assert sistema.tracker.reivindicar("b") is True
+
+
+@pytest.mark.parametrize("status, definitivo", [(403, True), (422, True), (503, False)])
+def test_erro_do_lote_inteiro_vale_para_todos(monkeypatch, sistema, status, definitivo):
+    _post(monkeypatch, status, {"detail": "x"})
+
+    sistema._registrar_presencas(["a", "b"], 7)
+
+    assert sistema.tracker.reivindicar("a") is not definitivo
+    assert sistema.tracker.reivindicar("b") is not definitivo
+
+
+def test_rede_fora_devolve_todos(monkeypatch, sistema):
+    _post(monkeypatch, 0, erro=ConnectionError("sem rede"))
+
+    sistema._registrar_presencas(["a", "b"], 7)
+
+    assert sistema.tracker.reivindicar("a") is True
+    assert sistema.tracker.reivindicar("b") is True
+
+
+def test_api_sem_endpoint_de_lote_cai_no_post_por_aluno(monkeypatch, sistema):
+    _post(monkeypatch, 404, {"detail": "Not Found"})
+
+    sistema._registrar_presencas(["a", "b"], 7)
+
+    enviados = [c.args[1] for c in sistema._api_pool.submit.call_args_list]
+    assert enviados == ["a", "b"]
+    # Continuam em voo: quem conclui é o POST unitário.
+    assert sistema.tracker.tratado("a") and sistema.tracker.reivindicar("a") is False
+
+
+def test_resposta_de_chamada_antiga_e_descartada(monkeypatch, sistema):
+    _post(monkeypatch, 200, {"resultados": [{"external_image_id": "a", "status": 200}]})
+    sistema.chamada_id_atual = 8
+    sistema.tracker.limpar()
+
+    sistema._registrar_presencas(["a"], 7)
+
+    assert sistema.tracker.tratado("a") is False
@@ -5,7 +5,7 @@ limpar() indevido custa um SearchFaces por aluno da sala no burst seguinte —
 e é o Rekognition que domina o custo por aula.
 
 Os testes montam a instância com __new__: o __init__ real abre modelo YuNet,
-detector de textura e exige CAMERA_SERVICE_TOKEN. Só os três atributos que
+detector de textura e exige CAMERA_SERVICE_TOKEN. Só os atributos que
 _sincronizar_chamada toca são preenchidos.
 """
 import threading
@@ -13,6 +13,7 @@ from unittest.mock import MagicMock
 
 import pytest
 
+from scripts.embedding_local import CacheIdentidades
 from scripts.registro_tracker import RegistroPresencaTracker
 
 
@@ -22,7 +23,9 @@ def sistema():
 
     obj = SistemaReconhecimento.__new__(SistemaReconhecimento)
     obj.chamada_id_atual = 7
+    obj._etag_chamada = '"7"'
     obj.tracker = RegistroPresencaTracker()
+    obj.cache_identidades = CacheIdentidades(0.363)
     obj.lock = threading.Lock()
     # Dois alunos já marcados nesta chamada — é o que não pode se perder.
     obj.tracker.concluir("aluno-a", definitivo=True)
@@ -30,23 +33,27 @@ def sistema():
     return obj
 
 
-def _resposta(status, corpo=None):
+def _resposta(status, corpo=None, headers=None):
     resp = MagicMock()
     resp.status_code = status
     resp.json.return_value = corpo if corpo is not None else {}
+    resp.headers = headers or {}
     return resp
 
 
-def _sincronizar(monkeypatch, sistema, resposta=None, erro=None):
+def _sincronizar(monkeypatch, sistema, resposta=None, erro=None, aguardar=False):
     import scripts.reconhecimento_tempo_real as mod
 
-    def _get(*_a, **_k):
+    chamadas = []
+
+    def _get(*a, **k):
+        chamadas.append((a, k))
         if erro is not None:
             raise erro
         return resposta
 
     monkeypatch.setattr(mod.requests, "get", _get)
-    sistema._sincronizar_chamada()
+    return sistema._sincronizar_chamada(aguardar=aguardar), chamadas
 
 
 @pytest.mark.parametrize("status", [500, 502, 503, 504])
@@ -97,3 +104,77 @@ def test_403_reseta(monkeypatch, sistema):
 
     assert sistema.chamada_id_atual is None
     assert len(sistema.tracker) == 0
+
+
+# --- long-poll (/chamadas/aberta/sala/aguardar) ---
+
+
+def test_long_poll_manda_o_etag_e_304_nao_mexe_em_nada(monkeypatch, sistema):
+    proxima, chamadas = _sincronizar(monkeypatch, sistema, _resposta(304), aguardar=True)
+
+    (args, kwargs), = chamadas
+    assert args[0].endswith("/chamadas/aberta/sala/aguardar")
+    assert kwargs["headers"]["If-None-Match"] == '"7"'
+    assert proxima == 0
+    assert sistema.chamada_id_atual == 7
+    assert len(sistema.tracker) == 2
+
+
+def test_long_poll_com_mudanca_aplica_e_guarda_o_etag(monkeypatch, sistema):
+    proxima, _ = _sincronizar(
+        monkeypatch, sistema, _resposta(200, {"chamada_id": 9}, {"ETag": '"9"'}), aguardar=True
+    )
+
+    assert proxima == 0
+    assert sistema.chamada_id_atual == 9
+    assert sistema._etag_chamada == '"9"'
+    assert len(sistema.tracker) == 0
+
+
+def test_long_poll_sem_escuta_no_servidor_respeita_retry_after(monkeypatch, sistema):
+    proxima, _ = _sincronizar(
+        monkeypatch, sistema,
+        _resposta(200, {"chamada_id": 7}, {"ETag": '"7"', "Retry-After": "5"}),
+        aguardar=True,
+    )
+
+    assert proxima == 5.0
+    assert len(sistema.tracker) == 2
+
+
+@pytest.mark.parametrize("status", [404, 405, 503])
+def test_long_poll_indisponivel_cai_no_polling_sem_resetar(monkeypatch, sistema, status):
+    """404 de API sem a rota não é "sem chamada": volta ao polling, estado intacto."""
+    proxima, _ = _sincronizar(monkeypatch, sistema, _resposta(status), aguardar=True)
+
+    assert proxima is None
+    assert sistema.chamada_id_atual == 7
+    assert len(sistema.tracker) == 2
+
+
+def test_long_poll_403_reseta_e_nao_volta_em_loop(monkeypatch, sistema):
+    proxima, _ = _sincronizar(monkeypatch, sistema, _resposta(403), aguardar=True)
+
+    assert sistema.chamada_id_atual is None
+    assert proxima == 5
+
+
+def test_thread_cai_no_polling_quando_o_long_poll_falha(monkeypatch, sistema):
+    import scripts.reconhecimento_tempo_real as mod
+
+    rodadas = []
+
+    def _sincronizar_chamada(aguardar=False):
+        rodadas.append(aguardar)
+        if len(rodadas) >= 3:
+            sistema.rodando = False
+        return None if aguardar else 5
+
+    sistema.rodando = True
+    sistema._sincronizar_chamada = _sincronizar_chamada
+    monkeypatch.setattr(mod.time, "sleep", lambda _s: None)
+
+    sistema._thread_sincronizacao()
+
+    # Long-poll falhou → polling; a volta ao long-poll só após a retentativa.
+    assert rodadas == [True, False, False]
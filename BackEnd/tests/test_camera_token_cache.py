@@ -0,0 +1,138 @@
+"""Cache token → sala: o caminho quente da câmera sem escrita por request.
+
+Antes cada request da câmera era um UPDATE de `ultimo_uso_em`. O cache não
+pode custar segurança: revogação derruba o token na hora, e token
+desconhecido nunca fica "lembrado".
+"""
+from contextlib import contextmanager
+
+import pytest
+
+import repositories.camera_tokens as camera_tokens
+from infra.database import DB_INDISPONIVEL
+from repositories.camera_tokens import hash_camera_token
+
+
+class _Cursor:
+    def __init__(self, salas):
+        self.salas = salas  # hash -> sala
+        self.comandos = []
+        self._linha = None
+
+    def execute(self, sql, params=None):
+        self.comandos.append((sql, params))
+        if "SELECT sala" in sql:
+            sala = self.salas.get(params[0])
+            self._linha = {"sala": sala} if sala else None
+        elif "RETURNING token_hash" in sql:
+            self._linha = {"token_hash": hash_camera_token("token-bom")}
+
+    def fetchone(self):
+        return self._linha
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    cursor = _Cursor({hash_camera_token("token-bom"): "Sala 101"})
+
+    @contextmanager
+    def _get_db_cursor(commit=False, preparar=False):
+        yield cursor
+
+    monkeypatch.setattr(camera_tokens, "get_db_cursor", _get_db_cursor)
+    camera_tokens.limpar_cache_tokens()
+    camera_tokens._usos_pendentes.clear()
+    yield cursor
+    camera_tokens.limpar_cache_tokens()
+    camera_tokens._usos_pendentes.clear()
+
+
+def _selects(cursor):
+    return [c for c in cursor.comandos if "SELECT sala" in c[0]]
+
+
+def test_segundo_request_nao_vai_ao_banco(banco):
+    assert camera_tokens.buscar_sala_por_token("token-bom") == "Sala 101"
+    assert camera_tokens.buscar_sala_por_token("token-bom") == "Sala 101"
+
+    assert len(_selects(banco)) == 1
+    # E nenhuma escrita no caminho quente.
+    assert not any("UPDATE" in sql for sql, _ in banco.comandos)
+
+
+def test_token_desconhecido_nao_fica_em_cache(banco):
+    assert camera_tokens.buscar_sala_por_token("token-ruim") is None
+    assert camera_tokens.buscar_sala_por_token("token-ruim") is None
+
+    assert len(_selects(banco)) == 2
+
+
+def test_ttl_vencido_volta_ao_banco(banco, monkeypatch):
+    camera_tokens.buscar_sala_por_token("token-bom")
+    monkeypatch.setattr(camera_tokens, "_CACHE_TTL_S", -1)
+    camera_tokens.limpar_cache_tokens()
+    camera_tokens.buscar_sala_por_token("token-bom")  # entra já vencido
+    camera_tokens.buscar_sala_por_token("token-bom")
+
+    assert len(_selects(banco)) == 3
+
+
+def test_notify_de_revogacao_derruba_o_cache(banco):
+    camera_tokens.buscar_sala_por_token("token-bom")
+    # O que a escuta faz ao receber o NOTIFY de outro processo (CLI).
+    camera_tokens.escuta._despachar(camera_tokens.CANAL_REVOGACAO, hash_camera_token("token-bom"))
+    banco.salas.clear()  # revogado no banco
+
+    assert camera_tokens.buscar_sala_por_token("token-bom") is None
+
+
+def test_reconexao_da_escuta_esquece_tudo(banco):
+    camera_tokens.buscar_sala_por_token("token-bom")
+    camera_tokens.escuta._reconectou()
+
+    assert camera_tokens._cache == {}
+
+
+def test_revogar_notifica_e_derruba_o_cache_local(banco):
+    camera_tokens.buscar_sala_por_token("token-bom")
+
+    assert camera_tokens.revogar_token(1) is True
+
+    notify = [p for sql, p in banco.comandos if "pg_notify" in sql]
+    assert notify == [(camera_tokens.CANAL_REVOGACAO, hash_camera_token("token-bom"))]
+    assert camera_tokens._cache == {}
+
+
+def test_usos_gravados_em_um_update_so(banco):
+    camera_tokens.buscar_sala_por_token("token-bom")
+    camera_tokens.buscar_sala_por_token("token-bom")
+
+    assert camera_tokens.gravar_usos_pendentes() == 1
+    updates = [p for sql, p in banco.comandos if "UPDATE camera_tokens" in sql]
+    assert len(updates) == 1
+    assert updates[0][0] == [hash_camera_token("token-bom")]
+    # Nada pendente: a rodada seguinte nem abre transação.
+    assert camera_tokens.gravar_usos_pendentes() == 0
+
+
+def test_uso_nao_gravado_volta_para_a_proxima_rodada(banco, monkeypatch):
+    camera_tokens.buscar_sala_por_token("token-bom")
+
+    @contextmanager
+    def _sem_banco(commit=False, preparar=False):
+        yield None
+
+    monkeypatch.setattr(camera_tokens, "get_db_cursor", _sem_banco)
+    assert camera_tokens.gravar_usos_pendentes() == 0
+    assert hash_camera_token("token-bom") in camera_tokens._usos_pendentes
+
+
+def test_banco_fora_no_miss_e_sentinela_e_nao_entra_no_cache(banco, monkeypatch):
+    @contextmanager
+    def _sem_banco(commit=False, preparar=False):
+        yield None
+
+    monkeypatch.setattr(camera_tokens, "get_db_cursor", _sem_banco)
+
+    assert camera_tokens.buscar_sala_por_token("token-bom") is DB_INDISPONIVEL
+    assert camera_tokens._cache == {}
@@ -90,7 +90,7 @@ def test_buscar_sala_devolve_sentinela_quando_cursor_indisponivel(monkeypatch):
     from infra.database import DB_INDISPONIVEL
 
     @contextmanager
-    def _cursor_indisponivel(commit=False):
+    def _cursor_indisponivel(commit=False, preparar=False):
         yield None
 
     monkeypatch.setattr(camera_tokens, "get_db_cursor", _cursor_indisponivel)
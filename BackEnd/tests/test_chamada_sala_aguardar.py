@@ -0,0 +1,95 @@
+"""Long-poll da chamada aberta na sala (GET /chamadas/aberta/sala/aguardar).
+
+Contrato com a câmera: estado diferente do ETag dela sai na hora; igual,
+espera o aviso de mudança ou devolve 304. Sem escuta do NOTIFY o servidor não
+fica sabendo de mudança — responde já, com Retry-After do polling antigo.
+"""
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from infra.database import DB_INDISPONIVEL
+from repositories.indice_salas import IndiceChamadasPorSala
+
+
+@pytest.fixture
+def ambiente(monkeypatch):
+    import routers.chamadas as mod
+
+    estado = {"chamada": {"chamada_id": 7}, "escuta": True, "consultas": 0}
+    indice = IndiceChamadasPorSala(lambda: [], escuta_ativa=lambda: estado["escuta"])
+
+    def _obter(_sala):
+        estado["consultas"] += 1
+        return estado["chamada"]
+
+    monkeypatch.setattr(mod, "indice_salas", indice)
+    monkeypatch.setattr(mod, "obter_chamada_aberta_por_sala", _obter)
+    estado["indice"] = indice
+    return estado
+
+
+def _aguardar(if_none_match=None, espera=1):
+    from routers.chamadas import aguardar_chamada_da_sala
+
+    return asyncio.run(
+        aguardar_chamada_da_sala(sala="Sala 101", if_none_match=if_none_match, espera=espera)
+    )
+
+
+def test_sem_etag_responde_na_hora(ambiente):
+    resp = _aguardar()
+
+    assert resp.status_code == 200
+    assert resp.body == b'{"chamada_id":7}'
+    assert resp.headers["ETag"] == '"7"'
+    assert "Retry-After" not in resp.headers
+
+
+def test_mesmo_estado_sem_mudanca_e_304(ambiente):
+    resp = _aguardar('"7"', espera=1)
+
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == '"7"'
+
+
+def test_mudanca_durante_a_espera_responde_o_estado_novo(ambiente):
+    def fechar():
+        ambiente["chamada"] = None
+        ambiente["indice"].invalidar()
+
+    threading.Timer(0.05, fechar).start()
+    resp = _aguardar('"7"', espera=5)
+
+    assert resp.status_code == 200
+    assert resp.body == b'{"chamada_id":null}'
+    assert resp.headers["ETag"] == '"-"'
+
+
+def test_aviso_de_outra_sala_nao_encerra_a_espera(ambiente):
+    """Um NOTIFY acorda todo mundo; quem não mudou volta a esperar."""
+    threading.Timer(0.05, ambiente["indice"].invalidar).start()
+    resp = _aguardar('"7"', espera=1)
+
+    assert resp.status_code == 304
+    assert ambiente["consultas"] == 2
+
+
+def test_sem_escuta_responde_na_hora_com_retry_after(ambiente):
+    ambiente["escuta"] = False
+
+    resp = _aguardar('"7"', espera=5)
+
+    assert resp.status_code == 200
+    assert resp.headers["Retry-After"] == "5"
+
+
+def test_banco_indisponivel_e_503(ambiente):
+    ambiente["chamada"] = DB_INDISPONIVEL
+
+    with pytest.raises(HTTPException) as exc:
+        _aguardar()
+
+    assert exc.value.status_code == 503
@@ -0,0 +1,191 @@
+"""Prepared statements por conexão no `get_db_cursor(preparar=True)` — sem banco.
+
+Contrato: PREPARE na primeira vez que a conexão vê o texto, EXECUTE depois;
+consulta que o Postgres não prepara segue pelo texto sem abortar a transação
+(SAVEPOINT); plano invalidado por mudança de schema é trocado no uso seguinte.
+"""
+import re
+from types import SimpleNamespace
+
+import psycopg2
+import psycopg2.extensions as ext
+import pytest
+
+import infra.database as database
+from infra import sql_preparado
+
+SQL = "SELECT sala FROM camera_tokens WHERE token_hash = %s AND revogado_em IS NULL"
+NOME = sql_preparado.nome_da_consulta(SQL)
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        for prefixo, erros in self.conn.falhas.items():
+            if sql.startswith(prefixo) and erros:
+                raise erros.pop(0)
+        self.conn.comandos.append((sql, params))
+
+    def fetchone(self):
+        return {"sala": "Sala 101"}
+
+    def close(self):
+        pass
+
+
+class _Conn:
+    closed = 0
+
+    def __init__(self):
+        self.comandos = []
+        self.falhas = {}
+        self.info = SimpleNamespace(transaction_status=ext.TRANSACTION_STATUS_INTRANS)
+
+    def cursor(self, cursor_factory=None):
+        return _Cursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def conexoes(monkeypatch):
+    abertas = []
+
+    def _tirar():
+        conn = _Conn()
+        abertas.append(conn)
+        return conn
+
+    livres = []
+    monkeypatch.setattr(database, "get_db_connection", lambda: livres.pop() if livres else _tirar())
+    monkeypatch.setattr(database, "release_connection", lambda conn, broken=False: livres.append(conn))
+    return abertas
+
+
+def _buscar(sql=SQL, params=("h",)):
+    with database.get_db_cursor(preparar=True) as cur:
+        cur.execute(sql, params)
+        return cur.fetchone()
+
+
+def test_prepara_na_primeira_vez_e_executa_depois(conexoes):
+    assert _buscar() == {"sala": "Sala 101"}
+    _buscar(params=("outro",))
+
+    (conn,) = conexoes
+    assert conn.comandos == [
+        ("SAVEPOINT scpi_preparar", None),
+        (f"PREPARE {NOME} AS " + SQL.replace("%s", "$1"), None),
+        ("RELEASE SAVEPOINT scpi_preparar", None),
+        (f"EXECUTE {NOME} (%s)", ["h"]),
+        (f"EXECUTE {NOME} (%s)", ["outro"]),
+    ]
+
+
+def test_cada_conexao_prepara_o_seu(conexoes):
+    with database.get_db_cursor(preparar=True) as cur1:
+        with database.get_db_cursor(preparar=True) as cur2:
+            cur1.execute(SQL, ("a",))
+            cur2.execute(SQL, ("b",))
+
+    assert len(conexoes) == 2
+    assert all(any(c[0].startswith("PREPARE") for c in conn.comandos) for conn in conexoes)
+
+
+def test_consulta_nao_preparavel_segue_pelo_texto_sem_abortar(conexoes):
+    _buscar()  # abre a conexão
+    conn = conexoes[0]
+    conn.falhas["PREPARE"] = [psycopg2.errors.IndeterminateDatatype("could not determine data type")]
+    conn.comandos.clear()
+
+    _buscar("SELECT %s", (1,))
+    _buscar("SELECT %s", (2,))
+
+    assert conn.comandos[:3] == [
+        ("SAVEPOINT scpi_preparar", None),
+        ("ROLLBACK TO SAVEPOINT scpi_preparar", None),
+        ("RELEASE SAVEPOINT scpi_preparar", None),
+    ]
+    assert conn.comandos[3:] == [("SELECT %s", (1,)), ("SELECT %s", (2,))]
+
+
+def test_plano_invalidado_e_trocado_no_uso_seguinte(conexoes):
+    _buscar()
+    conn = conexoes[0]
+    conn.falhas["EXECUTE"] = [psycopg2.errors.FeatureNotSupported("cached plan must not change result type")]
+    conn.falhas["PREPARE"] = [psycopg2.errors.DuplicatePreparedStatement("already exists")]
+
+    with pytest.raises(psycopg2.errors.FeatureNotSupported):
+        _buscar()
+    conn.comandos.clear()
+    _buscar()
+
+    assert [c[0] for c in conn.comandos] == [
+        "SAVEPOINT scpi_preparar",
+        "ROLLBACK TO SAVEPOINT scpi_preparar",
+        f"DEALLOCATE {NOME}",
+        f"PREPARE {NOME} AS " + SQL.replace("%s", "$1"),
+        "RELEASE SAVEPOINT scpi_preparar",
+        f"EXECUTE {NOME} (%s)",
+    ]
+
+
+def test_comando_que_nao_e_consulta_nao_e_preparado(conexoes):
+    _buscar("SET LOCAL statement_timeout = 1000", None)
+
+    assert conexoes[0].comandos == [("SET LOCAL statement_timeout = 1000", None)]
+
+
+def test_desligado_usa_o_cursor_de_sempre(conexoes, monkeypatch):
+    monkeypatch.setattr(sql_preparado, "_LIGADO", False)
+
+    _buscar()
+
+    assert conexoes[0].comandos == [(SQL, ("h",))]
+
+
+def test_escopo_somente_leitura_abre_o_retrato_antes_de_preparar(conexoes):
+    conn = _Conn()
+    conn.info.transaction_status = ext.TRANSACTION_STATUS_IDLE
+    conexoes.append(conn)
+
+    with database.escopo_conexao(somente_leitura=True) as escopo:
+        escopo.conn = conn
+        _buscar()
+
+    assert conn.comandos[0][0] == "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY"
+    assert conn.comandos[1][0] == "SAVEPOINT scpi_preparar"
+
+
+def _tipo_declarado(prepare: str, n: int):
+    """Tipo que o PREPARE dá ao `$n` pelo primeiro cast (None sem cast)."""
+    achado = re.search(rf"\${n}::(\w+(?:\[\])?)", prepare)
+    return achado.group(1) if achado else None
+
+
+@pytest.mark.parametrize("nome", ["_SQL_ELEGIBILIDADE_LOTE", "_SQL_INSERIR_LOTE", "_SQL_NOTIFICACAO_LOTE"])
+def test_lista_de_uuid_chega_ao_execute_como_text_array(conexoes, nome):
+    # O psycopg2 manda lista de str como ARRAY['…'], que é text[]; o Postgres
+    # não converte text[] em uuid[] sem cast explícito. Parâmetro preparado
+    # como uuid[] falha em todo EXECUTE — tem que ser declarado text[].
+    import repositories.usuarios as usuarios
+
+    sql = getattr(usuarios, nome)
+    uuids = ["00000000-0000-0000-0000-000000000001", "00000000-0000-0000-0000-000000000002"]
+    params = (1, uuids, 2) if nome == "_SQL_INSERIR_LOTE" else ("t1", uuids)
+    with database.get_db_cursor(preparar=True) as cur:
+        cur.execute(sql, params)
+
+    (conn,) = conexoes
+    prepare = next(c[0] for c in conn.comandos if c[0].startswith("PREPARE"))
+    execute, valores = next(c for c in conn.comandos if c[0].startswith("EXECUTE"))
+    for n, valor in enumerate(valores, start=1):
+        if isinstance(valor, list):
+            assert ext.adapt(valor).getquoted().startswith(b"ARRAY['")
+            assert _tipo_declarado(prepare, n) == "text[]", prepare
@@ -0,0 +1,409 @@
+"""Camada assíncrona de banco (infra/database_async.py, DB_ASYNC=1) — sem banco.
+
+Contrato: a espera pelo Postgres acontece no event loop (socket no
+add_reader), nunca numa thread; cada consulta com `preparar=True` faz PREPARE
+uma vez por conexão e EXECUTE depois; conexão com comando interrompido não
+volta ao pool; pool esgotado vira None, como o `get_db_cursor`.
+"""
+import asyncio
+import contextlib
+import socket
+import threading
+from types import SimpleNamespace
+
+import psycopg2
+import psycopg2.extensions as ext
+import pytest
+
+import infra.database_async as dba
+from infra import sql_preparado
+
+# --- tradução %s → $n ---
+
+
+def test_converter_parametros_nomeados_repetidos():
+    texto, chaves = sql_preparado.converter(
+        "SELECT %(a)s::uuid, %(b)s, %(a)s::text WHERE x %% 7 = 1"
+    )
+
+    assert texto == "SELECT $1::uuid, $2, $1::text WHERE x % 7 = 1"
+    assert chaves == ["a", "b"]
+
+
+def test_converter_posicionais():
+    assert sql_preparado.converter("WHERE a = %s AND b = %s") == ("WHERE a = $1 AND b = $2", 2)
+
+
+def test_converter_recusa_estilos_misturados():
+    with pytest.raises(ValueError):
+        sql_preparado.converter("WHERE a = %s AND b = %(b)s")
+
+
+def test_execute_leva_os_valores_na_ordem_dos_parametros():
+    sql, valores = sql_preparado.comando_execute("scpi_x", ["a", "b"], {"b": 2, "a": 1, "c": 3})
+
+    assert sql == "EXECUTE scpi_x (%s, %s)"
+    assert valores == [1, 2]
+    assert sql_preparado.comando_execute("scpi_y", 0, None) == ("EXECUTE scpi_y", None)
+
+
+# --- conexão ---
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self.rowcount = 1
+
+    def execute(self, sql, params=None):
+        if self.conn.falhar_em and self.conn.falhar_em in sql:
+            self.conn.erro_pendente = self.conn.erro
+        self.conn.comandos.append((sql, params))
+        if sql == "BEGIN":
+            self.conn.info.transaction_status = ext.TRANSACTION_STATUS_INTRANS
+        elif sql in ("COMMIT", "ROLLBACK"):
+            self.conn.info.transaction_status = ext.TRANSACTION_STATUS_IDLE
+        self.description = [("x",)]
+
+    def fetchone(self):
+        return {"x": 1}
+
+    def fetchall(self):
+        return [{"x": 1}]
+
+    def close(self):
+        pass
+
+
+class _Conn:
+    def __init__(self):
+        self.comandos = []
+        self.falhar_em = None
+        self.erro = psycopg2.ProgrammingError("could not determine data type of parameter $1")
+        self.erro_pendente = None
+        self.closed = 0
+        self.info = SimpleNamespace(transaction_status=ext.TRANSACTION_STATUS_IDLE)
+
+    def cursor(self, cursor_factory=None):
+        return _Cursor(self)
+
+    def poll(self):
+        erro, self.erro_pendente = self.erro_pendente, None
+        if erro is not None:
+            raise erro
+        return ext.POLL_OK
+
+    def close(self):
+        self.closed = 1
+
+
+def _rodar(corrotina):
+    return asyncio.run(asyncio.wait_for(corrotina, 5))
+
+
+def test_aguardar_espera_o_socket_no_proprio_loop():
+    """O poll só fica pronto quando o servidor "responde" (outra ponta do
+    socket escreve); até lá o loop segue livre para outras tarefas."""
+    servidor, cliente = socket.socketpair()
+    threads = []
+
+    class _ConnSocket:
+        def poll(self):
+            threads.append(threading.get_ident())
+            try:
+                cliente.recv(1, socket.MSG_DONTWAIT)
+                return ext.POLL_OK
+            except BlockingIOError:
+                return ext.POLL_READ
+
+        def fileno(self):
+            return cliente.fileno()
+
+    async def cenario():
+        asyncio.get_running_loop().call_later(0.05, servidor.send, b"x")
+        outras = []
+
+        async def outra_tarefa():
+            outras.append(True)
+
+        await asyncio.gather(dba._aguardar(_ConnSocket()), outra_tarefa())
+        return outras, threading.get_ident()
+
+    try:
+        outras, thread_loop = _rodar(cenario())
+    finally:
+        servidor.close()
+        cliente.close()
+
+    assert outras == [True]
+    assert set(threads) == {thread_loop}
+    assert len(threads) == 2  # POLL_READ, e POLL_OK depois do socket pronto
+
+
+def test_prepara_uma_vez_e_executa_depois():
+    conn = _Conn()
+    con = dba.ConexaoAssincrona(conn)
+    sql = "SELECT sala FROM camera_tokens WHERE token_hash = %s"
+
+    async def cenario():
+        await con.buscar_um(sql, ("h1",), preparar=True)
+        await con.buscar_um(sql, ("h2",), preparar=True)
+
+    _rodar(cenario())
+
+    nome = sql_preparado.nome_da_consulta(sql)
+    assert conn.comandos == [
+        (f"PREPARE {nome} AS SELECT sala FROM camera_tokens WHERE token_hash = $1", None),
+        (f"EXECUTE {nome} (%s)", ["h1"]),
+        (f"EXECUTE {nome} (%s)", ["h2"]),
+    ]
+
+
+def test_consulta_nao_preparavel_segue_pelo_texto():
+    conn = _Conn()
+    conn.falhar_em = "PREPARE"
+    con = dba.ConexaoAssincrona(conn)
+
+    async def cenario():
+        await con.buscar_um("SELECT %s", (1,), preparar=True)
+        await con.buscar_um("SELECT %s", (2,), preparar=True)
+
+    _rodar(cenario())
+
+    assert [c for c in conn.comandos if not c[0].startswith("PREPARE")] == [
+        ("SELECT %s", (1,)),
+        ("SELECT %s", (2,)),
+    ]
+    assert sum(c[0].startswith("PREPARE") for c in conn.comandos) == 1
+
+
+def test_transacao_desfaz_no_erro():
+    conn = _Conn()
+    con = dba.ConexaoAssincrona(conn)
+
+    async def cenario():
+        async with con.transacao():
+            await con.executar("INSERT 1")
+            raise RuntimeError("quebrou")
+
+    with pytest.raises(RuntimeError):
+        _rodar(cenario())
+
+    assert [c[0] for c in conn.comandos] == ["BEGIN", "INSERT 1", "ROLLBACK"]
+    assert not con.em_transacao
+
+
+def test_plano_invalidado_descarta_a_conexao():
+    conn = _Conn()
+    conn.falhar_em = "EXECUTE"
+    conn.erro = psycopg2.errors.FeatureNotSupported("cached plan must not change result type")
+    con = dba.ConexaoAssincrona(conn)
+
+    with pytest.raises(psycopg2.Error):
+        _rodar(con.buscar_um("SELECT 1", preparar=True))
+
+    assert con.quebrada
+
+
+# --- pool ---
+
+
+def _pool(maximo=2, espera_s=0.05):
+    abertas = []
+
+    async def _conectar():
+        conn = _Conn()
+        abertas.append(conn)
+        return conn
+
+    return dba.PoolAssincrono(maximo, espera_s, conectar=_conectar), abertas
+
+
+def test_pool_reusa_conexao_devolvida():
+    async def cenario():
+        pool, abertas = _pool()
+        pool.devolver(await pool.tirar())
+        pool.devolver(await pool.tirar())
+        return abertas
+
+    assert len(_rodar(cenario())) == 1
+
+
+def test_pool_esgotado_devolve_none():
+    async def cenario():
+        pool, _abertas = _pool(maximo=1)
+        primeira = await pool.tirar()
+        segunda = await pool.tirar()
+        pool.devolver(primeira)
+        terceira = await pool.tirar()
+        return segunda, terceira
+
+    segunda, terceira = _rodar(cenario())
+
+    assert segunda is None
+    assert terceira is not None
+
+
+def test_conexao_quebrada_nao_volta_ao_pool():
+    async def cenario():
+        pool, abertas = _pool()
+        con = await pool.tirar()
+        con.quebrada = True
+        pool.devolver(con)
+        pool.devolver(await pool.tirar())
+        return abertas
+
+    abertas = _rodar(cenario())
+
+    assert len(abertas) == 2
+    assert abertas[0].closed
+
+
+def test_banco_fora_devolve_none_e_libera_a_vaga():
+    async def _recusar():
+        raise psycopg2.OperationalError("connection refused")
+
+    async def cenario():
+        pool = dba.PoolAssincrono(1, 0.05, conectar=_recusar)
+        return [await pool.tirar(), await pool.tirar()]
+
+    assert _rodar(cenario()) == [None, None]
+
+
+def test_cada_event_loop_tem_seu_pool():
+    async def pool_atual():
+        return dba._pool_do_loop()
+
+    try:
+        assert _rodar(pool_atual()) is not _rodar(pool_atual())
+    finally:
+        dba.fechar_pool_async()
+
+
+# --- índice de salas pelo loop ---
+
+
+def test_indice_recarrega_uma_vez_para_varios_pedidos_juntos():
+    from repositories.indice_salas import IndiceChamadasPorSala
+
+    cargas = []
+
+    async def _carregar():
+        cargas.append(1)
+        await asyncio.sleep(0.01)
+        return [{"chamada_id": 7, "sala": "Sala 101", "dia_semana": 0}]
+
+    indice = IndiceChamadasPorSala(lambda: [], escuta_ativa=lambda: True, carregar_async=_carregar)
+
+    async def cenario():
+        return await asyncio.gather(*(indice.candidatas_async("Sala 101", 0) for _ in range(10)))
+
+    resultados = _rodar(cenario())
+
+    assert cargas == [1]
+    assert resultados == [[7]] * 10
+
+
+# --- router ---
+
+
+def test_com_db_async_a_camera_nao_usa_o_threadpool(monkeypatch):
+    """Inverso de test_event_loop_nao_bloqueia: com DB_ASYNC=1 a consulta é
+    corrotina e roda na thread do loop."""
+    import routers.chamadas as mod
+    from routers.chamadas import PresencaCameraPayload
+
+    threads = {}
+
+    async def _chamada_aberta(_sala):
+        threads["obter_chamada"] = threading.get_ident()
+        return {"chamada_id": 1}
+
+    async def _registrar(_eid, _cid, jobs_notificacao=None):
+        threads["registrar_presenca"] = threading.get_ident()
+        return {"motivo": None}
+
+    monkeypatch.setattr(mod, "DB_ASSINCRONO", True)
+    monkeypatch.setattr(mod, "obter_chamada_aberta_por_sala_async", _chamada_aberta)
+    monkeypatch.setattr(mod, "registrar_presenca_por_face_async", _registrar)
+
+    async def _executar():
+        threads["loop"] = threading.get_ident()
+        return await mod.registrar_presenca_camera(
+            payload=PresencaCameraPayload(external_image_id="x", chamada_id=1),
+            sala="Sala 101",
+        )
+
+    resposta = _rodar(_executar())
+
+    assert resposta["ja_registrado"] is False
+    assert threads["obter_chamada"] == threads["loop"]
+    assert threads["registrar_presenca"] == threads["loop"]
+
+
+def test_lote_de_presencas_prepara_lista_de_uuid_como_text_array():
+    # O EXECUTE manda a lista de str como ARRAY['…'] (text[]); parâmetro
+    # preparado como uuid[] falharia em todo lote com DB_ASYNC=1 (o Postgres
+    # não converte text[] em uuid[] sem cast explícito).
+    import repositories.usuarios as usuarios
+
+    conn = _Conn()
+    con = dba.ConexaoAssincrona(conn)
+    uuids = ["00000000-0000-0000-0000-000000000001"]
+
+    async def cenario():
+        await con.buscar_todos(usuarios._SQL_ELEGIBILIDADE_LOTE, ("t1", uuids), preparar=True)
+        await con.buscar_todos(usuarios._SQL_INSERIR_LOTE, (1, uuids, 2), preparar=True)
+        await con.buscar_todos(usuarios._SQL_NOTIFICACAO_LOTE, ("t1", uuids), preparar=True)
+
+    _rodar(cenario())
+
+    prepares = [c[0] for c in conn.comandos if c[0].startswith("PREPARE")]
+    assert len(prepares) == 3
+    for prepare in prepares:
+        assert "$2::text[]::uuid[]" in prepare
+        assert "$2::uuid[]" not in prepare
+    assert all(c[1][1] == uuids for c in conn.comandos if c[0].startswith("EXECUTE"))
+
+
+class _ConPresenca:
+    """Conexão falsa que só anota a ordem: BEGIN, registro, fila, COMMIT."""
+
+    def __init__(self):
+        self.comandos = []
+
+    async def buscar_um(self, sql, params=None, preparar=False):
+        self.comandos.append("registro")
+        return {"motivo": None, "usuario_id": "u1", "nome": "Ana", "email": None,
+                "nome_disciplina": "BD"}
+
+    async def executar(self, sql, params=None, preparar=False):
+        self.comandos.append("fila" if "INSERT INTO jobs" in sql else "aviso")
+        return 1
+
+    @contextlib.asynccontextmanager
+    async def transacao(self):
+        self.comandos.append("BEGIN")
+        yield self
+        self.comandos.append("COMMIT")
+
+
+def test_presenca_assincrona_grava_os_jobs_na_mesma_transacao(monkeypatch):
+    import repositories.usuarios as usuarios
+
+    con = _ConPresenca()
+
+    @contextlib.asynccontextmanager
+    async def _conexao():
+        yield con
+
+    monkeypatch.setattr(usuarios, "conexao_async", _conexao)
+
+    resultado = _rodar(usuarios.registrar_presenca_por_face_async(
+        "00000000-0000-0000-0000-000000000001", 1,
+        jobs_notificacao=lambda dados: [("push_presenca", {"usuario_id": dados["usuario_id"]}, 5)],
+    ))
+
+    assert resultado["motivo"] is None
+    assert con.comandos == ["BEGIN", "registro", "fila", "aviso", "COMMIT"]
@@ -0,0 +1,71 @@
+"""Detecção reduzida e por região de movimento — sem câmera, sem modelo.
+
+O que importa: bbox e landmarks medidos na cópia reduzida (ou num recorte)
+voltam para as coordenadas do frame cheio, de onde saem os crops.
+"""
+import numpy as np
+
+from scripts.deteccao_roi import reescalar_faces, regioes_de_movimento
+
+
+def _linha(x, y, w, h):
+    # 5 landmarks nos cantos + centro do bbox, score no fim.
+    pontos = [x, y, x + w, y, x + w / 2, y + h / 2, x, y + h, x + w, y + h]
+    return [x, y, w, h, *pontos, 0.9]
+
+
+def test_reescala_bbox_e_landmarks_para_o_frame_cheio():
+    faces = np.array([_linha(50, 40, 30, 20)], dtype=np.float32)
+    cheio = reescalar_faces(faces, 0.5, 0.5)
+    np.testing.assert_allclose(cheio[0, :4], [100, 80, 60, 40])
+    np.testing.assert_allclose(cheio[0, 4:14], _linha(100, 80, 60, 40)[4:14])
+    assert cheio[0, 14] == np.float32(0.9)  # score intacto
+
+
+def test_reescala_soma_o_deslocamento_do_recorte():
+    faces = np.array([_linha(10, 10, 20, 20)], dtype=np.float32)
+    cheio = reescalar_faces(faces, 0.5, 0.25, dx=300, dy=200)
+    np.testing.assert_allclose(cheio[0, :4], [320, 240, 40, 80])
+    np.testing.assert_allclose(cheio[0, 4:6], [320, 240])
+
+
+def test_reescala_nao_altera_a_entrada():
+    faces = np.array([_linha(10, 10, 20, 20)], dtype=np.float32)
+    reescalar_faces(faces, 0.5, 0.5)
+    assert faces[0, 0] == 10
+
+
+def _minis():
+    anterior = np.zeros((90, 160), dtype=np.uint8)
+    return anterior, anterior.copy()
+
+
+def test_cena_parada_nao_tem_regiao():
+    anterior, atual = _minis()
+    assert regioes_de_movimento(anterior, atual, (720, 1280)) == []
+
+
+def test_mancha_vira_regiao_no_frame_cheio_com_folga():
+    anterior, atual = _minis()
+    atual[40:50, 80:90] = 200  # 10x10 na miniatura = 80x80 no frame cheio
+    [(x, y, w, h)] = regioes_de_movimento(anterior, atual, (720, 1280))
+    assert x < 640 and y < 320
+    assert x + w > 720 and y + h > 400
+    assert w < 400 and h < 400
+
+
+def test_manchas_vizinhas_se_fundem_e_distantes_nao():
+    anterior, atual = _minis()
+    atual[40:50, 20:30] = 200
+    atual[40:50, 33:43] = 200   # encosta na primeira depois da folga
+    atual[10:20, 140:150] = 200  # outro canto da sala
+    regioes = regioes_de_movimento(anterior, atual, (720, 1280))
+    assert len(regioes) == 2
+
+
+def test_regiao_respeita_a_borda_do_frame():
+    anterior, atual = _minis()
+    atual[0:10, 150:160] = 200
+    [(x, y, w, h)] = regioes_de_movimento(anterior, atual, (720, 1280))
+    assert x >= 0 and y == 0
+    assert x + w <= 1280 and y + h <= 720
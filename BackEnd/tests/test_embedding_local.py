@@ -0,0 +1,104 @@
+"""Pré-filtro local por embedding — sem AWS, sem câmera, sem ONNX.
+
+O que importa fixar: o cache só reconhece o que foi memorizado, respeita o
+limiar e esquece tudo na troca de chamada. Quem decide DESCARTAR é o chamador
+(só para aluno já tratado no RegistroPresencaTracker).
+"""
+import numpy as np
+import pytest
+
+from scripts.embedding_local import CacheIdentidades, ExtratorEmbedding, _normalizar
+
+
+def _vetor(*componentes):
+    v = np.zeros(128, dtype=np.float32)
+    v[:len(componentes)] = componentes
+    return _normalizar(v)
+
+
+def test_cache_vazio_nao_identifica():
+    assert CacheIdentidades(0.363).identificar(_vetor(1, 0)) is None
+
+
+def test_identifica_o_mesmo_rosto():
+    c = CacheIdentidades(0.363)
+    c.memorizar(_vetor(1, 0), "ana")
+    assert c.identificar(_vetor(1, 0.1)) == "ana"
+
+
+def test_abaixo_do_limiar_nao_identifica():
+    c = CacheIdentidades(0.363)
+    c.memorizar(_vetor(1, 0), "ana")
+    # Ortogonal: similaridade 0.
+    assert c.identificar(_vetor(0, 1)) is None
+
+
+def test_escolhe_o_mais_parecido():
+    c = CacheIdentidades(0.3)
+    c.memorizar(_vetor(1, 0), "ana")
+    c.memorizar(_vetor(0, 1), "bruno")
+    assert c.identificar(_vetor(0.2, 1)) == "bruno"
+
+
+def test_varias_amostras_cobrem_poses_diferentes():
+    # Frente e perfil do mesmo aluno ficam longe entre si: basta casar uma.
+    c = CacheIdentidades(0.9)
+    c.memorizar(_vetor(1, 0), "ana")
+    c.memorizar(_vetor(0, 1), "ana")
+    assert c.identificar(_vetor(0, 1)) == "ana"
+    assert len(c) == 1
+
+
+def test_descarta_a_amostra_mais_antiga():
+    c = CacheIdentidades(0.9, max_por_aluno=2)
+    c.memorizar(_vetor(1, 0, 0), "ana")
+    c.memorizar(_vetor(0, 1, 0), "ana")
+    c.memorizar(_vetor(0, 0, 1), "ana")
+    assert c.identificar(_vetor(1, 0, 0)) is None
+    assert c.identificar(_vetor(0, 0, 1)) == "ana"
+
+
+def test_limpar_esquece_a_chamada_anterior():
+    c = CacheIdentidades(0.363)
+    c.memorizar(_vetor(1, 0), "ana")
+    c.limpar()
+    assert len(c) == 0
+    assert c.identificar(_vetor(1, 0)) is None
+
+
+@pytest.mark.parametrize("kwargs", [{"limiar": 1.5}, {"limiar": 0.3, "max_por_aluno": 0}])
+def test_parametros_invalidos_levantam(kwargs):
+    with pytest.raises(ValueError):
+        CacheIdentidades(**kwargs)
+
+
+# ---- ExtratorEmbedding: alinhamento + normalização, sem carregar ONNX ----
+
+class _NetFake:
+    def __init__(self):
+        self.blob = None
+
+    def setInput(self, blob):
+        self.blob = blob
+
+    def forward(self):
+        return np.full((1, 128), 3.0, dtype=np.float32)
+
+
+def _extrator():
+    e = ExtratorEmbedding.__new__(ExtratorEmbedding)
+    e.net = _NetFake()
+    return e
+
+
+def test_embedding_sai_normalizado_no_formato_do_sface():
+    e = _extrator()
+    frame = np.zeros((400, 400, 3), dtype=np.uint8)
+    landmarks = np.array([[150, 160], [250, 160], [200, 210], [160, 260], [240, 260]],
+                         dtype=np.float32)
+
+    v = e.embedding(frame, landmarks)
+
+    assert v.shape == (128,)
+    assert np.linalg.norm(v) == pytest.approx(1.0)
+    assert e.net.blob.shape == (1, 3, 112, 112)
@@ -0,0 +1,202 @@
+"""Escopo de conexão por requisição (infra/database.escopo_conexao) — sem banco.
+
+Contrato: dentro do escopo, N chamadas a `get_db_cursor` tiram UMA conexão do
+pool; `commit=True` continua confirmando no fim do próprio `with`; o escopo
+somente leitura abre um retrato REPEATABLE READ; fora do escopo nada muda.
+"""
+from types import SimpleNamespace
+
+import psycopg2.extensions as ext
+import pytest
+
+import infra.database as database
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        if self.conn.falhar_em and self.conn.falhar_em in sql:
+            raise RuntimeError("consulta quebrou")
+        self.conn.comandos.append(sql)
+        self.conn.info.transaction_status = ext.TRANSACTION_STATUS_INTRANS
+
+    def close(self):
+        pass
+
+
+class _Conn:
+    def __init__(self, n):
+        self.n = n
+        self.comandos = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.falhar_em = None
+        self.rollback_quebra = False
+        self.info = SimpleNamespace(transaction_status=ext.TRANSACTION_STATUS_IDLE)
+
+    def cursor(self, cursor_factory=None):
+        return _Cursor(self)
+
+    def commit(self):
+        self.commits += 1
+        self.info.transaction_status = ext.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        if self.rollback_quebra:
+            raise RuntimeError("conexão morta")
+        self.rollbacks += 1
+        self.info.transaction_status = ext.TRANSACTION_STATUS_IDLE
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    estado = SimpleNamespace(tiradas=[], devolvidas=[])
+
+    def _tirar():
+        conn = _Conn(len(estado.tiradas) + 1)
+        estado.tiradas.append(conn)
+        return conn
+
+    monkeypatch.setattr(database, "get_db_connection", _tirar)
+    monkeypatch.setattr(
+        database, "release_connection", lambda conn, broken=False: estado.devolvidas.append((conn.n, broken))
+    )
+    return estado
+
+
+def _consultar(sql="SELECT 1", commit=False):
+    with database.get_db_cursor(commit=commit) as cur:
+        cur.execute(sql)
+
+
+def test_fora_do_escopo_cada_chamada_tira_uma_conexao(pool):
+    _consultar()
+    _consultar()
+
+    assert len(pool.tiradas) == 2
+    assert pool.devolvidas == [(1, False), (2, False)]
+
+
+def test_dentro_do_escopo_as_chamadas_dividem_uma_conexao(pool):
+    with database.escopo_conexao():
+        _consultar("SELECT a")
+        _consultar("SELECT b")
+        _consultar("SELECT c")
+        assert pool.devolvidas == []
+
+    assert len(pool.tiradas) == 1
+    assert pool.tiradas[0].comandos == ["SELECT a", "SELECT b", "SELECT c"]
+    assert pool.devolvidas == [(1, False)]
+
+
+def test_commit_continua_no_fim_do_proprio_with(pool):
+    with database.escopo_conexao():
+        _consultar("INSERT x", commit=True)
+        assert pool.tiradas[0].commits == 1
+        _consultar("SELECT y")
+
+    assert pool.tiradas[0].commits == 1
+    # A leitura que sobrou aberta é desfeita ao devolver a conexão.
+    assert pool.tiradas[0].rollbacks == 1
+
+
+def test_somente_leitura_abre_um_retrato_so(pool):
+    with database.escopo_conexao(somente_leitura=True):
+        _consultar("SELECT a")
+        _consultar("SELECT b")
+
+    assert pool.tiradas[0].comandos == [
+        "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY",
+        "SELECT a",
+        "SELECT b",
+    ]
+
+
+def test_somente_leitura_nao_confirma(pool):
+    with database.escopo_conexao(somente_leitura=True):
+        _consultar("SELECT a", commit=True)
+
+    assert pool.tiradas[0].commits == 0
+
+
+def test_uso_aninhado_nao_divide_a_conexao(pool):
+    with database.escopo_conexao():
+        with database.get_db_cursor() as externo:
+            externo.execute("SELECT externo")
+            _consultar("SELECT interno")
+
+    assert len(pool.tiradas) == 2
+    assert pool.tiradas[1].comandos == ["SELECT interno"]
+
+
+def test_erro_desfaz_e_a_conexao_segue_no_escopo(pool):
+    with database.escopo_conexao():
+        _consultar("SELECT a")
+        pool.tiradas[0].falhar_em = "quebra"
+        with pytest.raises(RuntimeError):
+            _consultar("SELECT quebra")
+        _consultar("SELECT depois")
+
+    assert len(pool.tiradas) == 1
+    assert pool.tiradas[0].rollbacks == 2  # o do erro e o da devolução
+    assert pool.tiradas[0].comandos == ["SELECT a", "SELECT depois"]
+
+
+def test_conexao_morta_e_trocada(pool):
+    with database.escopo_conexao():
+        _consultar("SELECT a")
+        pool.tiradas[0].falhar_em = "quebra"
+        pool.tiradas[0].rollback_quebra = True
+        with pytest.raises(RuntimeError):
+            _consultar("SELECT quebra")
+        _consultar("SELECT b")
+
+    assert len(pool.tiradas) == 2
+    assert pool.devolvidas == [(1, True), (2, False)]
+
+
+def test_banco_fora_no_escopo_e_cursor_none(monkeypatch):
+    monkeypatch.setattr(database, "get_db_connection", lambda: None)
+
+    with database.escopo_conexao():
+        with database.get_db_cursor() as cur:
+            assert cur is None
+
+
+def test_dependencia_fastapi_cobre_o_endpoint_sincrono(pool):
+    """O ContextVar ajustado na dependência assíncrona chega ao endpoint que
+    roda no threadpool, e a conexão volta antes das BackgroundTasks."""
+    from fastapi import BackgroundTasks, FastAPI
+    from fastapi.testclient import TestClient
+
+    from core.dependencias_db import RETRATO_UNICO
+
+    app = FastAPI()
+    devolvidas_na_tarefa = []
+
+    @app.get("/x", dependencies=[RETRATO_UNICO])
+    def endpoint(background_tasks: BackgroundTasks):
+        _consultar("SELECT a")
+        _consultar("SELECT b")
+        background_tasks.add_task(lambda: devolvidas_na_tarefa.extend(pool.devolvidas))
+        return {}
+
+    assert TestClient(app).get("/x").status_code == 200
+    assert len(pool.tiradas) == 1
+    assert devolvidas_na_tarefa == [(1, False)]
+
+
+def test_rotas_da_chamada_usam_o_escopo():
+    from core.dependencias_db import uma_conexao, uma_conexao_leitura
+    from routers.chamadas import router
+
+    por_rota = {
+        rota.path: {d.dependency for d in rota.dependencies} for rota in router.routes
+    }
+    assert uma_conexao_leitura in por_rota["/chamadas/status/{turma_id}"]
+    assert uma_conexao_leitura in por_rota["/chamadas/{chamada_id}/alunos"]
+    assert uma_conexao in por_rota["/chamadas/{chamada_id}/finalizar"]
+    # Streaming prenderia a conexão pela duração do stream.
+    assert not por_rota["/chamadas/{chamada_id}/eventos"]
@@ -0,0 +1,47 @@
+"""Escuta LISTEN/NOTIFY: despacho por canal, sem banco."""
+import pytest
+
+from infra.escuta_pg import EscutaPostgres
+
+
+def test_despacha_so_para_o_canal_inscrito():
+    e = EscutaPostgres()
+    recebidos = []
+    e.inscrever("canal_a", lambda p: recebidos.append(("a", p)))
+    e.inscrever("canal_b", lambda p: recebidos.append(("b", p)))
+
+    e._despachar("canal_a", "x")
+
+    assert recebidos == [("a", "x")]
+
+
+def test_callback_que_levanta_nao_derruba_os_outros():
+    e = EscutaPostgres()
+    recebidos = []
+
+    def _quebrado(_p):
+        raise RuntimeError("bug no cache")
+
+    e.inscrever("canal", _quebrado)
+    e.inscrever("canal", recebidos.append)
+
+    e._despachar("canal", "x")
+
+    assert recebidos == ["x"]
+
+
+def test_reconexao_chama_as_invalidacoes():
+    e = EscutaPostgres()
+    chamadas = []
+    e.inscrever("canal", lambda _p: None, ao_reconectar=lambda: chamadas.append(1))
+
+    e._reconectou()
+
+    assert chamadas == [1]
+
+
+@pytest.mark.parametrize("canal", ["Canal", "a;DROP TABLE x", "1canal", ""])
+def test_nome_de_canal_invalido_e_recusado(canal):
+    # LISTEN não aceita parâmetro: o nome vai interpolado no SQL.
+    with pytest.raises(ValueError):
+        EscutaPostgres().inscrever(canal, lambda _p: None)
@@ -14,8 +14,6 @@ from unittest.mock import MagicMock
 
 
 def test_camera_nao_bloqueia_event_loop(monkeypatch):
-    from fastapi import BackgroundTasks
-
     import routers.chamadas as mod
     from routers.chamadas import PresencaCameraPayload
 
@@ -25,7 +23,7 @@ def test_camera_nao_bloqueia_event_loop(monkeypatch):
         threads["obter_chamada"] = threading.get_ident()
         return {"chamada_id": 1}
 
-    def _registrar(_eid, _cid):
+    def _registrar(_eid, _cid, jobs_notificacao=None):
         threads["registrar_presenca"] = threading.get_ident()
         return {"motivo": None}
 
@@ -36,7 +34,6 @@ def test_camera_nao_bloqueia_event_loop(monkeypatch):
         threads["loop"] = threading.get_ident()
         return await mod.registrar_presenca_camera(
             payload=PresencaCameraPayload(external_image_id="x", chamada_id=1),
-            background_tasks=BackgroundTasks(),
             sala="Sala 101",
         )
 
@@ -0,0 +1,250 @@
+"""Stream ao vivo da chamada (GET /chamadas/{id}/eventos) — sem banco.
+
+Contrato: o banco é lido uma vez ao conectar (retrato) e de novo só quando um
+aviso pode ter se perdido; o resto chega por NOTIFY `presencas_chamada`.
+"""
+import asyncio
+import json
+import threading
+
+import pytest
+
+from infra.database import DB_INDISPONIVEL
+from repositories.eventos_chamada import (
+    EVENTO_RESSINCRONIZAR,
+    CentralEventosChamada,
+    avisar_fechamento,
+    avisar_presencas,
+)
+
+ALUNO_A = "11111111-1111-1111-1111-111111111111"
+ALUNO_B = "22222222-2222-2222-2222-222222222222"
+
+
+class _CursorNotify:
+    def __init__(self):
+        self.avisos = []
+
+    def execute(self, sql, params=None):
+        assert "pg_notify" in sql
+        self.avisos.append(params)
+
+
+def _aviso_presenca(chamada_id, alunos, tipo="Reconhecimento"):
+    return json.dumps({
+        "evento": "presenca", "chamada_id": chamada_id, "tipo_registro": tipo, "alunos": alunos,
+    })
+
+
+# --- avisos (escrita) ---
+
+
+def test_aviso_leva_o_estado_final_das_aulas():
+    cur = _CursorNotify()
+
+    avisar_presencas(cur, 7, {ALUNO_A: {2, 1}, ALUNO_B: set()}, "Manual")
+
+    (canal, payload), = cur.avisos
+    assert canal == "presencas_chamada"
+    assert json.loads(payload) == {
+        "evento": "presenca", "chamada_id": 7, "tipo_registro": "Manual",
+        "alunos": {ALUNO_A: [1, 2], ALUNO_B: []},
+    }
+
+
+def test_lote_grande_e_quebrado_abaixo_do_limite_do_notify():
+    cur = _CursorNotify()
+    alunos = {f"{i:08d}-1111-1111-1111-111111111111": range(1, 5) for i in range(100)}
+
+    avisar_presencas(cur, 7, alunos, "Reconhecimento")
+
+    assert len(cur.avisos) == 2
+    assert all(len(payload.encode()) < 8000 for _canal, payload in cur.avisos)
+    recebidos = {}
+    for _canal, payload in cur.avisos:
+        recebidos.update(json.loads(payload)["alunos"])
+    assert len(recebidos) == 100
+
+
+def test_fechamento_avisa_cada_chamada():
+    cur = _CursorNotify()
+
+    avisar_fechamento(cur, [7, 9])
+
+    assert [json.loads(p)["chamada_id"] for _c, p in cur.avisos] == [7, 9]
+
+
+# --- central (entrega por worker) ---
+
+
+def test_aviso_da_thread_da_escuta_chega_so_a_chamada_certa():
+    central = CentralEventosChamada(escuta_ativa=lambda: True)
+
+    async def cenario():
+        _l, fila7 = central.inscrever(7)
+        _l, fila9 = central.inscrever(9)
+        threading.Thread(
+            target=central.ao_notificar, args=(_aviso_presenca(7, {ALUNO_A: [1]}),)
+        ).start()
+        evento = await asyncio.wait_for(fila7.get(), 5)
+        return evento, fila9.qsize()
+
+    evento, outros = asyncio.run(cenario())
+
+    assert evento["alunos"] == {ALUNO_A: [1]}
+    assert outros == 0
+
+
+def test_aviso_malformado_e_ignorado():
+    central = CentralEventosChamada(escuta_ativa=lambda: True)
+
+    central.ao_notificar("não é json")
+    central.ao_notificar('{"evento": "presenca"}')
+
+
+def test_reconexao_da_escuta_pede_releitura_a_todos():
+    central = CentralEventosChamada(escuta_ativa=lambda: True)
+
+    async def cenario():
+        _l, fila = central.inscrever(7)
+        central.ao_reconectar()
+        return await asyncio.wait_for(fila.get(), 5)
+
+    assert asyncio.run(cenario()) == {"evento": EVENTO_RESSINCRONIZAR}
+
+
+def test_fila_cheia_descarta_e_pede_releitura(monkeypatch):
+    import repositories.eventos_chamada as mod
+
+    monkeypatch.setattr(mod, "_FILA_MAX", 2)
+    central = CentralEventosChamada(escuta_ativa=lambda: True)
+
+    async def cenario():
+        _l, fila = central.inscrever(7)
+        for i in range(3):
+            central.ao_notificar(_aviso_presenca(7, {ALUNO_A: [i]}))
+        await asyncio.sleep(0.01)
+        return [fila.get_nowait() for _ in range(fila.qsize())]
+
+    assert asyncio.run(cenario()) == [{"evento": EVENTO_RESSINCRONIZAR}]
+
+
+def test_cancelar_remove_a_inscricao():
+    central = CentralEventosChamada(escuta_ativa=lambda: True)
+
+    async def cenario():
+        item = central.inscrever(7)
+        central.cancelar(7, item)
+
+    asyncio.run(cenario())
+
+    assert central._inscritos == {}
+
+
+# --- stream (router) ---
+
+
+class _Request:
+    async def is_disconnected(self):
+        return False
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    import routers.chamadas as mod
+
+    central = CentralEventosChamada(escuta_ativa=lambda: True)
+    leituras = []
+    estado = {
+        "status": "Aberta", "total_alunos": 3, "aulas_por_aluno": {ALUNO_A: [1, 2]},
+    }
+
+    def _obter(chamada_id):
+        leituras.append(chamada_id)
+        return estado
+
+    monkeypatch.setattr(mod, "central_eventos", central)
+    monkeypatch.setattr(mod, "obter_estado_presencas_chamada", _obter)
+    return central, leituras, estado
+
+
+def _consumir(central, avisos, n_eventos=None):
+    """Roda o stream, injeta `avisos` depois do retrato e devolve os eventos."""
+    from routers.chamadas import _stream_eventos
+
+    async def cenario():
+        eventos = []
+        gerador = _stream_eventos(_Request(), 7)
+        eventos.append(await gerador.__anext__())
+        for aviso in avisos:
+            central.ao_notificar(aviso)
+        async for bloco in gerador:
+            eventos.append(bloco)
+            if n_eventos is not None and len(eventos) >= n_eventos:
+                await gerador.aclose()
+                break
+        return eventos
+
+    blocos = asyncio.run(asyncio.wait_for(cenario(), 5))
+    saida = []
+    for bloco in blocos:
+        linhas = bloco.strip().split("\n")
+        saida.append((linhas[0].removeprefix("event: "), json.loads(linhas[1].removeprefix("data: "))))
+    return saida
+
+
+def test_retrato_inicial_e_presenca_nova(stream):
+    central, leituras, _estado = stream
+
+    eventos = _consumir(central, [_aviso_presenca(7, {ALUNO_B: [1, 2]})], n_eventos=2)
+
+    assert eventos[0] == ("estado", {
+        "chamada_id": 7, "status": "Aberta", "alunos": {ALUNO_A: [1, 2]},
+        "total_alunos": 3, "presentes": 1, "ausentes": 2,
+    })
+    assert eventos[1] == ("presenca", {
+        "aluno_id": ALUNO_B, "aulas_presentes": [1, 2], "tipo_registro": "Reconhecimento",
+        "total_alunos": 3, "presentes": 2, "ausentes": 1,
+    })
+    assert leituras == [7]  # banco lido só no retrato
+
+
+def test_evento_ja_refletido_no_retrato_nao_sai_de_novo(stream):
+    central, _leituras, _estado = stream
+
+    eventos = _consumir(central, [
+        _aviso_presenca(7, {ALUNO_A: [1, 2]}),
+        json.dumps({"evento": "fechada", "chamada_id": 7}),
+    ])
+
+    assert [nome for nome, _ in eventos] == ["estado", "fechada"]
+
+
+def test_ajuste_manual_para_ausente_desconta(stream):
+    central, _leituras, _estado = stream
+
+    eventos = _consumir(central, [_aviso_presenca(7, {ALUNO_A: []}, tipo="Manual")], n_eventos=2)
+
+    assert eventos[1][1]["presentes"] == 0
+    assert eventos[1][1]["tipo_registro"] == "Manual"
+
+
+def test_banco_indisponivel_no_retrato_encerra_com_erro(monkeypatch, stream):
+    import routers.chamadas as mod
+
+    central, _leituras, _estado = stream
+    monkeypatch.setattr(mod, "obter_estado_presencas_chamada", lambda _c: DB_INDISPONIVEL)
+
+    eventos = _consumir(central, [])
+
+    assert [nome for nome, _ in eventos] == ["erro"]
+    assert central._inscritos == {}
+
+
+def test_chamada_ja_fechada_manda_o_retrato_e_encerra(stream):
+    central, _leituras, estado = stream
+    estado["status"] = "Fechada"
+
+    eventos = _consumir(central, [])
+
+    assert [nome for nome, _ in eventos] == ["estado"]
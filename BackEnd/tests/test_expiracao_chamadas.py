@@ -0,0 +1,159 @@
+"""Roda de expiração das chamadas e o laço do líder que fecha no prazo — sem banco."""
+import asyncio
+import datetime
+
+import pytest
+
+import services.agendador as ag
+from infra.database import DB_INDISPONIVEL
+from services.expiracao_chamadas import FUSO, RodaExpiracao, prazo_epoch
+
+
+def test_vencidas_sai_em_ordem_de_prazo():
+    roda = RodaExpiracao()
+    roda.definir({1: 30.0, 2: 10.0, 3: 20.0})
+
+    assert roda.proximo() == 10.0
+    assert roda.vencidas(25.0) == [2, 3]
+    assert len(roda) == 1 and 1 in roda
+    assert roda.vencidas(25.0) == []
+
+
+def test_reagendar_e_remover_descartam_a_entrada_velha():
+    roda = RodaExpiracao()
+    roda.definir({1: 10.0, 2: 20.0})
+    roda.agendar(1, 50.0)
+    roda.remover(2)
+
+    assert roda.proximo() == 50.0
+    assert roda.vencidas(40.0) == []
+    assert roda.vencidas(50.0) == [1]
+    assert roda.proximo() is None
+
+
+def test_prazo_e_o_horario_fim_de_hoje_em_sao_paulo_com_margem():
+    hoje = datetime.date(2026, 7, 29)
+    fim = datetime.datetime(2026, 7, 29, 10, 0, tzinfo=FUSO).timestamp()
+
+    assert prazo_epoch(datetime.time(10, 0), hoje) == fim + 1.0
+
+
+class _Repositorio:
+    """prazos: {chamada_id: epoch}; fechar tira do 'banco' o que fechou."""
+
+    def __init__(self, prazos):
+        self.prazos = dict(prazos)
+        self.cargas = 0
+        self.fechamentos = []
+
+    def carregar(self):
+        self.cargas += 1
+        return dict(self.prazos)
+
+    def fechar(self, chamada_ids=None):
+        self.fechamentos.append(sorted(chamada_ids))
+        for chamada_id in chamada_ids:
+            self.prazos.pop(chamada_id, None)
+        return len(chamada_ids)
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    def instalar(prazos):
+        r = _Repositorio(prazos)
+        monkeypatch.setattr(ag, "_carregar_prazos", r.carregar)
+        monkeypatch.setattr(ag._fechar, "executar", r.fechar)
+        monkeypatch.setattr(ag._lideranca, "lider", True)
+        monkeypatch.setattr(ag.escuta, "conectado", True)
+        monkeypatch.setattr(ag.escuta, "inscrever", lambda *a, **k: None)
+        ag._roda.limpar()
+        return r
+
+    yield instalar
+    ag._roda.limpar()
+
+
+def _rodar_por(segundos):
+    async def laco():
+        tarefa = asyncio.create_task(ag._laco_expiracao())
+        await asyncio.sleep(segundos)
+        tarefa.cancel()
+
+    asyncio.run(laco())
+
+
+def test_fecha_exatamente_as_vencidas_no_prazo(repo):
+    import time
+
+    agora = time.time()
+    r = repo({1: agora - 5, 2: agora + 0.1, 3: agora + 3600})
+
+    _rodar_por(0.4)
+
+    assert r.fechamentos == [[1], [2]]
+    assert 3 in ag._roda and len(ag._roda) == 1
+
+
+def test_sem_chamada_aberta_nao_consulta_o_banco_de_novo(repo):
+    r = repo({})
+
+    _rodar_por(0.2)
+
+    assert r.cargas == 1
+    assert r.fechamentos == []
+
+
+def test_chamada_que_nao_fechou_volta_para_depois(repo, monkeypatch):
+    import time
+
+    r = repo({1: time.time() - 1})
+    # Banco falhou no UPDATE: nada fecha e a chamada continua aberta.
+    monkeypatch.setattr(ag._fechar, "executar", lambda chamada_ids=None: r.fechamentos.append(chamada_ids))
+
+    _rodar_por(0.2)
+
+    assert r.fechamentos == [[1]]
+    assert ag._roda.proximo() >= time.time() + ag._RECARGA_SEM_ESCUTA_S - 1
+
+
+def test_fora_da_lideranca_nao_carrega_nem_fecha(repo, monkeypatch):
+    import time
+
+    r = repo({1: time.time() - 1})
+    monkeypatch.setattr(ag._lideranca, "lider", False)
+
+    _rodar_por(0.1)
+
+    assert r.cargas == 0 and r.fechamentos == []
+
+
+def test_banco_fora_na_carga_nao_fecha_nada(repo, monkeypatch):
+    r = repo({})
+    monkeypatch.setattr(ag, "_carregar_prazos", lambda: DB_INDISPONIVEL)
+
+    _rodar_por(0.1)
+
+    assert r.fechamentos == []
+    assert len(ag._roda) == 0
+
+
+def test_aviso_de_chamada_aberta_recarrega_a_roda(repo, monkeypatch):
+    import time
+
+    r = repo({})
+    inscritos = []
+    monkeypatch.setattr(ag.escuta, "inscrever", lambda canal, cb, ao_reconectar=None: inscritos.append(cb))
+
+    async def laco():
+        tarefa = asyncio.create_task(ag._laco_expiracao())
+        await asyncio.sleep(0.05)
+        # Outro worker abriu a chamada 9 e o NOTIFY chegou pela escuta.
+        r.prazos[9] = time.time() + 0.05
+        inscritos[0]("")
+        await asyncio.sleep(0.3)
+        tarefa.cancel()
+
+    asyncio.run(laco())
+
+    assert r.cargas >= 2
+    assert r.fechamentos == [[9]]
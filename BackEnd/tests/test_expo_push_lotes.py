@@ -0,0 +1,143 @@
+"""Envio de push em lotes de 100: paralelo, gzip, retentativa e junção dos lotes."""
+import gzip
+import json
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+def _tokens(n):
+    return [f"ExponentPushToken[{i}]" for i in range(n)]
+
+
+def _ok_para(corpo: bytes):
+    mensagens = json.loads(corpo)
+    data = [{"status": "ok", "id": f"tk-{m['to']}"} for m in mensagens]
+    return (200, json.dumps({"data": data}).encode("utf-8"), None)
+
+
+def test_quebra_em_lotes_de_100_e_junta_os_tickets():
+    vistos = []
+    lock = threading.Lock()
+
+    def postar(corpo):
+        with lock:
+            vistos.append(len(json.loads(corpo)))
+        return _ok_para(corpo)
+
+    tokens = _tokens(250)
+    with patch("infra.notificacoes._postar_expo", side_effect=postar):
+        from infra.notificacoes import send_expo_push
+        out = send_expo_push(tokens, "t", "b")
+
+    assert sorted(vistos) == [50, 100, 100]
+    assert out["ok"] == tokens  # ordem dos lotes preservada
+    assert [t["token"] for t in out["tickets"]] == tokens
+    assert out["dead"] == [] and out["falhos"] == []
+
+
+def test_lotes_saem_em_paralelo():
+    # Os 3 lotes só passam da barreira se estiverem em voo ao mesmo tempo.
+    barreira = threading.Barrier(3, timeout=5)
+
+    def postar(corpo):
+        barreira.wait()
+        return _ok_para(corpo)
+
+    with patch("infra.notificacoes._postar_expo", side_effect=postar):
+        from infra.notificacoes import send_expo_push
+        out = send_expo_push(_tokens(300), "t", "b")
+    assert len(out["ok"]) == 300
+
+
+def test_token_repetido_vai_uma_vez():
+    with patch("infra.notificacoes._postar_expo", side_effect=_ok_para) as m:
+        from infra.notificacoes import send_expo_push
+        out = send_expo_push(["ExponentPushToken[a]", "ExponentPushToken[a]"], "t", "b")
+    assert len(json.loads(m.call_args[0][0])) == 1
+    assert out["ok"] == ["ExponentPushToken[a]"]
+
+
+def test_429_tenta_de_novo_respeitando_retry_after():
+    respostas = iter([(429, b"devagar", "2"), None])
+
+    def postar(corpo):
+        r = next(respostas)
+        return r or _ok_para(corpo)
+
+    with patch("infra.notificacoes._postar_expo", side_effect=postar), \
+         patch("infra.notificacoes.time.sleep") as dormir:
+        from infra.notificacoes import send_expo_push
+        out = send_expo_push(["ExponentPushToken[a]"], "t", "b")
+    dormir.assert_called_once_with(2.0)
+    assert out["ok"] == ["ExponentPushToken[a]"]
+
+
+def test_retry_after_absurdo_tem_teto():
+    from infra.notificacoes import _EXPO_ESPERA_MAX_S, _espera_retentativa
+    assert _espera_retentativa(0, "3600") == _EXPO_ESPERA_MAX_S
+
+
+def test_lote_que_nao_sai_fica_em_falhos_e_os_outros_valem():
+    tokens = _tokens(150)
+
+    def postar(corpo):
+        if len(json.loads(corpo)) == 50:
+            return (503, b"fora", None)
+        return _ok_para(corpo)
+
+    with patch("infra.notificacoes._postar_expo", side_effect=postar), \
+         patch("infra.notificacoes.time.sleep"):
+        from infra.notificacoes import send_expo_push
+        out = send_expo_push(tokens, "t", "b", levantar_em_falha=True)
+    assert out["ok"] == tokens[:100]
+    assert out["falhos"] == tokens[100:]
+
+
+def test_levanta_so_quando_nenhum_lote_sai():
+    from infra.notificacoes import FalhaEnvio, send_expo_push
+
+    with patch("infra.notificacoes._postar_expo", return_value=(502, b"x", None)), \
+         patch("infra.notificacoes.time.sleep"):
+        with pytest.raises(FalhaEnvio):
+            send_expo_push(_tokens(150), "t", "b", levantar_em_falha=True)
+
+
+def test_corpo_vai_em_gzip_na_sessao_do_pool():
+    resp = MagicMock(status=200, data=b'{"data": []}', headers={})
+    with patch("infra.notificacoes._http") as http:
+        http.request.return_value = resp
+        from infra.notificacoes import _postar_expo
+        status, dados, retry_after = _postar_expo(b'[{"to": "x"}]')
+    metodo, url = http.request.call_args[0]
+    kwargs = http.request.call_args[1]
+    assert (metodo, status, retry_after) == ("POST", 200, None)
+    assert kwargs["headers"]["Content-Encoding"] == "gzip"
+    assert kwargs["headers"]["Accept-Encoding"] == "gzip"
+    assert gzip.decompress(kwargs["body"]) == b'[{"to": "x"}]'
+
+
+def test_service_reenfileira_so_os_tokens_que_falharam():
+    import services.notificacoes as notif
+
+    res = {"ok": ["ExponentPushToken[a]"], "dead": [], "tickets": [],
+           "falhos": ["ExponentPushToken[b]"]}
+    with patch.object(notif, "send_expo_push", return_value=res), \
+         patch.object(notif, "enfileirar") as enf:
+        notif._enviar_push(["ExponentPushToken[a]", "ExponentPushToken[b]"], "T", "C")
+    (jobs,), _ = enf.call_args
+    assert jobs == [(notif.JOB_PUSH_TOKENS,
+                     {"tokens": ["ExponentPushToken[b]"], "titulo": "T", "corpo": "C"}, 5)]
+
+
+def test_job_de_tokens_falhos_levanta_em_vez_de_gerar_outro():
+    import services.notificacoes as notif
+    from infra.notificacoes import FalhaEnvio
+
+    res = {"ok": [], "dead": [], "tickets": [], "falhos": ["ExponentPushToken[b]"]}
+    with patch.object(notif, "send_expo_push", return_value=res), \
+         patch.object(notif, "enfileirar") as enf:
+        with pytest.raises(FalhaEnvio):
+            notif.enviar_push_tokens(["ExponentPushToken[b]"], "T", "C")
+    enf.assert_not_called()
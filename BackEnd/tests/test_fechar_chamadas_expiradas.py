@@ -1,11 +1,12 @@
 """O fechamento automático só notifica quem realmente fechou a chamada.
 
-Com gunicorn -w 4 os quatro workers rodam o agendador ao mesmo tempo. O UPDATE
-guardado por status='Aberta' é o claim: quem perde a corrida afeta 0 linhas e
-não pode devolver a chamada para o agendador notificar.
+O agendador roda no worker líder, mas o professor pode finalizar a mesma
+chamada no mesmo instante (e numa troca de líder dois workers rodam juntos por
+um ciclo). O UPDATE guardado por status='Aberta' é o claim: a chamada que ele
+não devolve no RETURNING não pode voltar para o agendador notificar.
 """
 import datetime
-from unittest.mock import MagicMock, PropertyMock, patch
+from unittest.mock import MagicMock, patch
 
 # quarta-feira 10:00 — weekday() e time() são os únicos campos usados na query
 AGORA = datetime.datetime(2026, 7, 29, 10, 0)
@@ -19,44 +20,86 @@ def _linha(chamada_id):
     }
 
 
-def _mock_cursor(rows):
+def _mock_cursor(expiradas, reivindicadas):
     cur = MagicMock()
-    cur.fetchall.return_value = rows
+    # 1º fetchall: SELECT das expiradas; 2º: RETURNING do UPDATE.
+    cur.fetchall.side_effect = [expiradas, [{"chamada_id": c} for c in reivindicadas]]
     cm = MagicMock()
     cm.__enter__.return_value = cur
     cm.__exit__.return_value = False
     return cm, cur
 
 
-def test_nao_devolve_chamada_quando_update_nao_afetou_linha():
-    cm, cur = _mock_cursor([_linha("c1")])
-    cur.rowcount = 0  # outro worker fechou primeiro
+def _fechar(cm):
+    with patch("repositories.chamadas.get_db_cursor", return_value=cm):
+        from repositories.chamadas import fechar_chamadas_expiradas
+        return fechar_chamadas_expiradas(agora=AGORA)
+
+
+def test_nao_devolve_chamada_que_o_update_nao_reivindicou():
+    cm, _ = _mock_cursor([_linha("c1")], reivindicadas=[])  # fechada por outro antes
+
+    assert _fechar(cm) == []
+
+
+def test_devolve_chamada_que_o_update_reivindicou():
+    cm, _ = _mock_cursor([_linha("c1")], reivindicadas=["c1"])
+
+    assert [f["chamada_id"] for f in _fechar(cm)] == ["c1"]
+
+
+def test_devolve_apenas_as_linhas_reivindicadas():
+    cm, _ = _mock_cursor([_linha("c1"), _linha("c2")], reivindicadas=["c1"])
+
+    assert [f["chamada_id"] for f in _fechar(cm)] == ["c1"]
+
+
+def test_um_update_so_para_todas_as_expiradas():
+    cm, cur = _mock_cursor([_linha("c1"), _linha("c2"), _linha("c3")], reivindicadas=["c1", "c2", "c3"])
+
+    _fechar(cm)
+
+    updates = [c for c in cur.execute.call_args_list if "UPDATE Chamadas" in c.args[0]]
+    assert len(updates) == 1
+    assert updates[0].args[1] == (["c1", "c2", "c3"],)
+
+
+def test_chamada_ids_restringe_o_select():
+    cm, cur = _mock_cursor([_linha(5)], reivindicadas=[5])
 
     with patch("repositories.chamadas.get_db_cursor", return_value=cm):
         from repositories.chamadas import fechar_chamadas_expiradas
-        fechadas = fechar_chamadas_expiradas(agora=AGORA)
+        fechar_chamadas_expiradas(agora=AGORA, chamada_ids=[5])
 
-    assert fechadas == []
+    select = cur.execute.call_args_list[0]
+    assert "ANY(%s::int[])" in select.args[0]
+    assert select.args[1] == (AGORA.weekday(), AGORA.time(), [5], [5])
 
 
-def test_devolve_chamada_quando_update_afetou_linha():
-    cm, cur = _mock_cursor([_linha("c1")])
-    cur.rowcount = 1  # este worker ganhou o claim
+def test_jobs_so_das_reivindicadas_no_cursor_do_update():
+    cm, cur = _mock_cursor([_linha("c1"), _linha("c2")], reivindicadas=["c1"])
+    pedidos = []
+
+    def _jobs(ids):
+        pedidos.append(ids)
+        return [("push_encerramento_lote", {"chamada_ids": ids, "hora": "10:00"}, 5)]
 
     with patch("repositories.chamadas.get_db_cursor", return_value=cm):
         from repositories.chamadas import fechar_chamadas_expiradas
-        fechadas = fechar_chamadas_expiradas(agora=AGORA)
+        fechar_chamadas_expiradas(agora=AGORA, jobs_encerramento=_jobs)
 
-    assert [f["chamada_id"] for f in fechadas] == ["c1"]
+    assert pedidos == [["c1"]]
+    sqls = [c.args[0] for c in cur.execute.call_args_list]
+    assert any("INSERT INTO jobs" in sql for sql in sqls)
+    cm.__exit__.assert_called_once()
 
 
-def test_devolve_apenas_as_linhas_reivindicadas():
-    cm, cur = _mock_cursor([_linha("c1"), _linha("c2")])
-    # rowcount é lido uma vez por UPDATE, na ordem das linhas
-    type(cur).rowcount = PropertyMock(side_effect=[1, 0])
+def test_sem_reivindicadas_nao_pede_jobs():
+    cm, _ = _mock_cursor([_linha("c1")], reivindicadas=[])
+    pedidos = []
 
     with patch("repositories.chamadas.get_db_cursor", return_value=cm):
         from repositories.chamadas import fechar_chamadas_expiradas
-        fechadas = fechar_chamadas_expiradas(agora=AGORA)
+        fechar_chamadas_expiradas(agora=AGORA, jobs_encerramento=pedidos.append)
 
-    assert [f["chamada_id"] for f in fechadas] == ["c1"]
+    assert pedidos == []
@@ -0,0 +1,259 @@
+"""Fila de jobs no Postgres: SQL do repositório, retry/dead-letter e o
+consumidor com limite de concorrência — sem banco."""
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import services.fila_jobs as fila
+from services.fila_jobs import ConsumidorJobs, TipoJob, _processar
+
+
+def _mock_cursor():
+    cur = MagicMock()
+    cur.fetchall.return_value = []
+    cm = MagicMock()
+    cm.__enter__.return_value = cur
+    cm.__exit__.return_value = False
+    return cm, cur
+
+
+# ---- repositório ----
+
+def test_reivindicar_usa_skip_locked_e_marca_o_dono():
+    cm, cur = _mock_cursor()
+    with patch("repositories.jobs.get_db_cursor", return_value=cm):
+        from repositories.jobs import reivindicar_jobs
+        reivindicar_jobs("push_presenca", 3, "vm:123")
+    sql, params = cur.execute.call_args[0]
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "tentativas = tentativas + 1" in sql
+    assert params == ("vm:123", "push_presenca", 3)
+
+
+def test_enfileirar_grava_tudo_num_insert_e_avisa_cada_tipo_uma_vez():
+    from repositories.jobs import enfileirar_jobs
+
+    cur = MagicMock()
+    jobs = [("push_presenca", {"usuario_id": "u1"}, 5), ("email_presenca", {"aluno_email": "a@x"}, 3),
+            ("push_presenca", {"usuario_id": "u2"}, 5)]
+    enfileirar_jobs(cur, jobs)
+    inserts = [c for c in cur.execute.call_args_list if "INSERT INTO jobs" in c.args[0]]
+    assert len(inserts) == 1
+    tipos, payloads, maximos = inserts[0].args[1]
+    assert tipos == ["push_presenca", "email_presenca", "push_presenca"]
+    assert payloads[0] == '{"usuario_id":"u1"}'
+    assert maximos == [5, 3, 5]
+    avisos = [c.args[1] for c in cur.execute.call_args_list if "pg_notify" in c.args[0]]
+    assert avisos == [("jobs", "email_presenca"), ("jobs", "push_presenca")]
+    # No cursor de quem chama: o commit é dele.
+    cur.connection.commit.assert_not_called()
+
+
+def test_enfileirar_avulsos_com_banco_fora_devolve_false():
+    @contextmanager
+    def sem_banco(commit=False):
+        yield None
+
+    with patch("repositories.jobs.get_db_cursor", sem_banco):
+        from repositories.jobs import enfileirar_jobs_avulsos
+        assert enfileirar_jobs_avulsos([("push_presenca", {}, 5)]) is False
+
+
+def test_falha_na_ultima_tentativa_vira_morto_no_sql():
+    cm, cur = _mock_cursor()
+    with patch("repositories.jobs.get_db_cursor", return_value=cm):
+        from repositories.jobs import falhar_job
+        falhar_job(9, "FalhaEnvio: Expo push HTTP 503", 40.0)
+    sql, params = cur.execute.call_args[0]
+    assert "WHEN tentativas >= max_tentativas THEN 'morto'" in sql
+    assert params == (40.0, "FalhaEnvio: Expo push HTTP 503", 9)
+
+
+def test_migration_cria_tabela_indice_parcial_e_view_de_mortos():
+    executados = []
+    cur = MagicMock()
+    cur.execute.side_effect = lambda sql, *a: executados.append(sql)
+
+    @contextmanager
+    def fake_cursor(commit=False):
+        yield cur
+
+    with patch("infra.migrations.get_db_cursor", fake_cursor):
+        from infra.migrations import _ETAPAS, ensure_jobs_table
+        ensure_jobs_table()
+    sql = " ".join(executados)
+    assert "CREATE TABLE IF NOT EXISTS jobs" in sql
+    assert "WHERE status = 'pendente'" in sql
+    assert "CREATE OR REPLACE VIEW jobs_mortos" in sql
+    assert "ensure_jobs_table" in _ETAPAS
+
+
+# ---- retry e dead-letter ----
+
+def test_backoff_dobra_ate_o_teto_com_jitter():
+    tipo = TipoJob("t", lambda: None, backoff_base_s=10, backoff_max_s=100)
+
+    assert 7.5 <= tipo.atraso(1) <= 12.5
+    assert 30 <= tipo.atraso(3) <= 50
+    assert all(tipo.atraso(20) <= 125 for _ in range(50))
+
+
+def _registro(tentativas=1, max_tentativas=5, **payload):
+    return {"id": 1, "tipo": "t", "payload": payload, "tentativas": tentativas,
+            "max_tentativas": max_tentativas}
+
+
+def test_processar_sucesso_conclui(monkeypatch):
+    feitos = []
+    monkeypatch.setattr(fila, "concluir_job", feitos.append)
+    monkeypatch.setattr(fila, "falhar_job", lambda *a: pytest.fail("não falhou"))
+    recebidos = []
+    tipo = TipoJob("t", lambda **p: recebidos.append(p))
+
+    assert _processar(tipo, _registro(usuario_id="u1")) is None
+    assert feitos == [1]
+    assert recebidos == [{"usuario_id": "u1"}]
+
+
+def test_processar_falha_volta_com_atraso(monkeypatch):
+    falhas = []
+    monkeypatch.setattr(fila, "falhar_job", lambda *a: falhas.append(a))
+    monkeypatch.setattr(fila, "concluir_job", lambda *_: pytest.fail("não concluiu"))
+
+    def quebra():
+        raise RuntimeError("timeout")
+
+    atraso = _processar(TipoJob("t", quebra, backoff_base_s=10), _registro(tentativas=2))
+
+    assert 15 <= atraso <= 25
+    assert falhas[0][0] == 1 and falhas[0][1] == "RuntimeError: timeout"
+
+
+def test_processar_falha_na_ultima_tentativa_nao_agenda_mais(monkeypatch):
+    monkeypatch.setattr(fila, "falhar_job", lambda *a: None)
+
+    def quebra():
+        raise RuntimeError("timeout")
+
+    assert _processar(TipoJob("t", quebra), _registro(tentativas=5, max_tentativas=5)) is None
+
+
+# ---- consumidor ----
+
+class _Fila:
+    """Tabela jobs em memória, com o mesmo contrato do repositório."""
+
+    def __init__(self, n):
+        self.pendentes = [_registro(i=i) | {"id": i} for i in range(n)]
+        self.concluidos = []
+        self.lock = threading.Lock()
+
+    def reivindicar(self, tipo, limite, dono):
+        with self.lock:
+            pegos, self.pendentes = self.pendentes[:limite], self.pendentes[limite:]
+            return pegos
+
+    def concluir(self, job_id):
+        with self.lock:
+            self.concluidos.append(job_id)
+
+
+def test_consumidor_respeita_a_concorrencia_do_tipo(monkeypatch):
+    f = _Fila(12)
+    monkeypatch.setattr(fila, "reivindicar_jobs", f.reivindicar)
+    monkeypatch.setattr(fila, "concluir_job", f.concluir)
+    monkeypatch.setattr(fila, "recuperar_jobs_travados", lambda _l: 0)
+    monkeypatch.setattr(fila.escuta, "inscrever", lambda *a, **k: None)
+
+    ativos, pico = [0], [0]
+    trava = threading.Lock()
+
+    def envio(i):
+        with trava:
+            ativos[0] += 1
+            pico[0] = max(pico[0], ativos[0])
+        time.sleep(0.01)
+        with trava:
+            ativos[0] -= 1
+
+    consumidor = ConsumidorJobs({"t": TipoJob("t", envio, concorrencia=3)}, dono="teste")
+
+    async def rodar():
+        tarefa = asyncio.create_task(consumidor.rodar())
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if len(f.concluidos) == 12:
+                break
+        tarefa.cancel()
+
+    asyncio.run(rodar())
+
+    assert sorted(f.concluidos) == list(range(12))
+    assert pico[0] == 3
+
+
+# ---- envio ----
+
+def test_email_sem_resend_configurado_conclui_sem_tentar(monkeypatch):
+    import services.notificacoes as notif
+
+    monkeypatch.setattr(notif, "resend_configurado", lambda: False)
+    monkeypatch.setattr(notif, "send_email_resend", lambda *a: pytest.fail("não envia"))
+
+    notif.enviar_email_presenca("a@x.com", "Ana", "BD", "10:00")
+
+
+def test_email_recusado_levanta_para_tentar_de_novo(monkeypatch):
+    import services.notificacoes as notif
+    from infra.notificacoes import FalhaEnvio
+
+    monkeypatch.setattr(notif, "resend_configurado", lambda: True)
+    monkeypatch.setattr(notif, "send_email_resend", lambda *a: False)
+
+    with pytest.raises(FalhaEnvio):
+        notif.enviar_email_presenca("a@x.com", "Ana", "BD", "10:00")
+
+
+def test_push_presenca_com_banco_fora_volta_para_a_fila(monkeypatch):
+    import services.notificacoes as notif
+    from infra.database import DB_INDISPONIVEL
+
+    monkeypatch.setattr(notif, "obter_push_token_por_usuario", lambda _u: DB_INDISPONIVEL)
+    monkeypatch.setattr(notif, "send_expo_push", lambda *a, **k: pytest.fail("não envia"))
+    falhas = []
+    monkeypatch.setattr(fila, "falhar_job", lambda *a: falhas.append(a))
+    monkeypatch.setattr(fila, "concluir_job", lambda *_: pytest.fail("não concluiu"))
+
+    tipo = fila._tipos[notif.JOB_PUSH_PRESENCA]
+    atraso = _processar(tipo, _registro(usuario_id="u1", turma_nome="BD", hora="10:00"))
+
+    assert atraso is not None
+    assert falhas[0][1].startswith("BancoIndisponivel")
+
+
+def test_push_legado_com_banco_fora_levanta(monkeypatch):
+    import services.notificacoes as notif
+    from infra.database import DB_INDISPONIVEL
+
+    monkeypatch.setattr(notif, "obter_turma_id_por_chamada", lambda _c: 7)
+    monkeypatch.setattr(notif, "listar_alunos_com_push_token_da_turma", lambda _t: DB_INDISPONIVEL)
+
+    with pytest.raises(fila.BancoIndisponivel):
+        notif.notificar_alunos_presentes(1, "BD", "10:00")
+
+
+@pytest.mark.parametrize("codigo, levanta", [(503, True), (429, True), (400, False)])
+def test_push_so_levanta_em_falha_transitoria(codigo, levanta):
+    from infra.notificacoes import FalhaEnvio, send_expo_push
+
+    with patch("infra.notificacoes._postar_expo", return_value=(codigo, b"x", None)), \
+         patch("infra.notificacoes.time.sleep"):
+        if levanta:
+            with pytest.raises(FalhaEnvio):
+                send_expo_push(["ExponentPushToken[a]"], "t", "b", levantar_em_falha=True)
+        else:
+            assert send_expo_push(["ExponentPushToken[a]"], "t", "b", levantar_em_falha=True)["ok"] == []
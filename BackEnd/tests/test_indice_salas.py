@@ -0,0 +1,185 @@
+"""Índice de chamadas abertas por sala — sem banco.
+
+Contrato: com a escuta do NOTIFY de pé, uma consulta por mudança (não por
+request); sem ela, nunca responde do cache.
+"""
+import threading
+
+from infra.database import DB_INDISPONIVEL
+from repositories.indice_salas import IndiceChamadasPorSala
+
+
+class _Banco:
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.cargas = 0
+
+    def __call__(self):
+        self.cargas += 1
+        return self.linhas if self.linhas is DB_INDISPONIVEL else list(self.linhas)
+
+
+def _linha(chamada_id, sala="Sala 101", dia=0):
+    return {"chamada_id": chamada_id, "sala": sala, "dia_semana": dia}
+
+
+def _indice(banco, escuta=True, **kw):
+    return IndiceChamadasPorSala(banco, escuta_ativa=lambda: escuta, **kw)
+
+
+def test_requests_seguidos_carregam_uma_vez(monkeypatch):
+    banco = _Banco([_linha(7), _linha(9, sala="Sala 202")])
+    indice = _indice(banco)
+
+    assert indice.candidatas("Sala 101", 0) == [7]
+    assert indice.candidatas("Sala 202", 0) == [9]
+    assert indice.candidatas("Sala 303", 0) == []
+    assert banco.cargas == 1
+
+
+def test_dia_da_semana_faz_parte_da_chave():
+    indice = _indice(_Banco([_linha(7, dia=2)]))
+
+    assert indice.candidatas("Sala 101", 0) == []
+    assert indice.candidatas("Sala 101", 2) == [7]
+
+
+def test_ordem_de_preferencia_do_banco_e_mantida():
+    indice = _indice(_Banco([_linha(12), _linha(7)]))
+
+    assert indice.candidatas("Sala 101", 0) == [12, 7]
+
+
+def test_aviso_de_mudanca_recarrega():
+    banco = _Banco([_linha(7)])
+    indice = _indice(banco)
+    indice.candidatas("Sala 101", 0)
+
+    banco.linhas = []  # chamada fechada em outro worker
+    indice.invalidar("")
+
+    assert indice.candidatas("Sala 101", 0) == []
+    assert banco.cargas == 2
+
+
+def test_sem_escuta_nao_responde_do_cache():
+    banco = _Banco([_linha(7)])
+    indice = _indice(banco, escuta=False)
+
+    assert indice.candidatas("Sala 101", 0) is None
+    assert banco.cargas == 0
+
+
+def test_banco_fora_na_recarga_e_sentinela_e_tenta_de_novo():
+    banco = _Banco(DB_INDISPONIVEL)
+    indice = _indice(banco)
+
+    assert indice.candidatas("Sala 101", 0) is DB_INDISPONIVEL
+    banco.linhas = [_linha(7)]
+    assert indice.candidatas("Sala 101", 0) == [7]
+
+
+def test_idade_maxima_forca_recarga():
+    banco = _Banco([_linha(7)])
+    indice = _indice(banco, idade_max_s=0)
+
+    indice.candidatas("Sala 101", 0)
+    indice.candidatas("Sala 101", 0)
+
+    assert banco.cargas == 2
+
+
+def test_aviso_durante_a_recarga_nao_deixa_retrato_velho_valendo():
+    """A recarga leu o banco ANTES do commit que gerou o aviso: o retrato
+    dela não pode ser dado como atual."""
+    linhas = [[_linha(7)], []]
+    indice = None
+
+    def _carregar():
+        retrato = linhas.pop(0)
+        if retrato:  # primeira carga: o aviso chega no meio dela
+            indice.invalidar("")
+        return retrato
+
+    indice = _indice(_carregar)
+
+    assert indice.candidatas("Sala 101", 0) == [7]
+    assert indice.candidatas("Sala 101", 0) == []
+
+
+def test_requests_concorrentes_fazem_uma_recarga_so():
+    liberar = threading.Event()
+    cargas = []
+
+    def _carregar():
+        cargas.append(1)
+        liberar.wait(2)
+        return [_linha(7)]
+
+    indice = _indice(_carregar)
+    respostas = []
+    threads = [
+        threading.Thread(target=lambda: respostas.append(indice.candidatas("Sala 101", 0)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    liberar.set()
+    for t in threads:
+        t.join()
+
+    assert respostas == [[7]] * 5
+    assert len(cargas) == 1
+
+
+def test_obter_chamada_aberta_por_sala_responde_do_indice_sem_consulta(monkeypatch):
+    from contextlib import contextmanager
+
+    import repositories.chamadas as chamadas_repo
+
+    @contextmanager
+    def _sem_consulta(commit=False, preparar=False):
+        raise AssertionError("não deveria consultar o banco por request")
+        yield
+
+    indice = _indice(_Banco([_linha(7, dia=3)]))
+    indice.candidatas("Sala 101", 3)  # carga inicial
+    monkeypatch.setattr(chamadas_repo, "indice_salas", indice)
+    monkeypatch.setattr(chamadas_repo, "_dia_semana_hoje", lambda: 3)
+    monkeypatch.setattr(chamadas_repo, "get_db_cursor", _sem_consulta)
+
+    assert chamadas_repo.obter_chamada_aberta_por_sala("Sala 101") == {"chamada_id": 7}
+    assert chamadas_repo.obter_chamada_aberta_por_sala("Sala 202") is None
+
+
+def test_aguardar_mudanca_acorda_com_aviso_de_outra_thread():
+    """O aviso vem da thread da escuta; quem espera está no loop do asyncio."""
+    import asyncio
+
+    indice = _indice(_Banco([]))
+
+    async def cenario():
+        geracao = indice.geracao
+        threading.Timer(0.05, indice.invalidar).start()
+        return await indice.aguardar_mudanca(geracao, timeout=5)
+
+    assert asyncio.run(cenario()) is True
+
+
+def test_aguardar_mudanca_sem_aviso_expira():
+    import asyncio
+
+    indice = _indice(_Banco([]))
+
+    assert asyncio.run(indice.aguardar_mudanca(indice.geracao, timeout=0.05)) is False
+    assert not indice._esperando
+
+
+def test_aviso_entre_a_leitura_e_a_espera_nao_se_perde():
+    import asyncio
+
+    indice = _indice(_Banco([]))
+    geracao = indice.geracao
+    indice.invalidar()
+
+    assert asyncio.run(indice.aguardar_mudanca(geracao, timeout=5)) is True
@@ -5,7 +5,7 @@ from core.limiter_storage import PostgresStorage
 
 
 @contextmanager
-def _cursor_none(commit=False):
+def _cursor_none(commit=False, preparar=False):
     yield None
 
 
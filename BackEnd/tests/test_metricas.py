@@ -0,0 +1,125 @@
+"""Métricas Prometheus (infra/metricas.py, core/instrumentacao.py) — sem banco.
+
+O registro do prometheus_client é global ao processo: os testes comparam o
+valor antes e depois em vez de assumir contador zerado.
+"""
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import core.security as security
+import infra.database as database
+from core.instrumentacao import MetricasMiddleware
+from infra import metricas
+
+
+def _valor(nome, **labels):
+    return REGISTRY.get_sample_value(nome, labels) or 0
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(MetricasMiddleware)
+
+    @app.get("/turmas/{turma_id}")
+    def turma(turma_id: int):
+        if turma_id == 0:
+            raise HTTPException(status_code=404)
+        return {"turma_id": turma_id}
+
+    return TestClient(app)
+
+
+def test_latencia_e_status_pelo_template_da_rota():
+    cliente = _app()
+    antes = _valor("scpi_http_requisicao_segundos_count", metodo="GET", rota="/turmas/{turma_id}")
+    ok = _valor("scpi_http_respostas_total", metodo="GET", rota="/turmas/{turma_id}", status="200")
+    nao_achou = _valor("scpi_http_respostas_total", metodo="GET", rota="/turmas/{turma_id}", status="404")
+
+    cliente.get("/turmas/7")
+    cliente.get("/turmas/8")
+    cliente.get("/turmas/0")
+
+    assert _valor("scpi_http_requisicao_segundos_count", metodo="GET", rota="/turmas/{turma_id}") == antes + 3
+    assert _valor("scpi_http_respostas_total", metodo="GET", rota="/turmas/{turma_id}", status="200") == ok + 2
+    assert _valor("scpi_http_respostas_total", metodo="GET", rota="/turmas/{turma_id}", status="404") == nao_achou + 1
+
+
+def test_caminho_sem_rota_nao_vira_label():
+    cliente = _app()
+    antes = _valor("scpi_http_respostas_total", metodo="GET", rota="sem_rota", status="404")
+
+    cliente.get("/wp-login.php")
+
+    assert _valor("scpi_http_respostas_total", metodo="GET", rota="sem_rota", status="404") == antes + 1
+
+
+def test_consulta_e_atribuida_a_funcao_do_repositorio(monkeypatch):
+    class _Cur:
+        def execute(self, sql, params=None):
+            pass
+
+        def close(self):
+            pass
+
+    class _Conn:
+        def cursor(self, cursor_factory=None):
+            return _Cur()
+
+        def commit(self):
+            pass
+
+    monkeypatch.setattr(database, "get_db_connection", lambda: _Conn())
+    monkeypatch.setattr(database, "release_connection", lambda conn, broken=False: None)
+
+    def buscar_algo():
+        with database.get_db_cursor() as cur:
+            cur.execute("SELECT 1")
+            cur.execute("SELECT 2")
+
+    funcao = f"{__name__}.buscar_algo"
+    antes = _valor("scpi_db_consulta_segundos_count", funcao=funcao)
+    buscar_algo()
+
+    assert _valor("scpi_db_consulta_segundos_count", funcao=funcao) == antes + 2
+
+
+def test_presencas_da_camera_por_resultado():
+    antes = _valor("scpi_camera_presencas_total", resultado="registrada")
+    recusas = _valor("scpi_camera_presencas_total", resultado="nao_matriculado")
+
+    metricas.contar_presenca_camera(None)
+    metricas.contar_presenca_camera("nao_matriculado")
+
+    assert _valor("scpi_camera_presencas_total", resultado="registrada") == antes + 1
+    assert _valor("scpi_camera_presencas_total", resultado="nao_matriculado") == recusas + 1
+
+
+def test_threadpool_amostrado_na_requisicao():
+    _app().get("/turmas/1")
+
+    assert _valor("scpi_threadpool_capacidade") > 0
+
+
+def _cliente_interno(monkeypatch, ip):
+    from routers import interno
+
+    monkeypatch.setattr(security, "_REDES_INTERNAS", security._redes(["10.0.0.0/8"]))
+    monkeypatch.setattr(security, "_ip", lambda request: ip)
+    app = FastAPI()
+    app.include_router(interno.router)
+    return TestClient(app)
+
+
+def test_metrics_expoe_formato_texto_para_a_rede_interna(monkeypatch):
+    metricas.contar_presenca_camera(None)
+
+    resposta = _cliente_interno(monkeypatch, "10.1.2.3").get("/metrics")
+
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"].startswith("text/plain")
+    assert "scpi_camera_presencas_total" in resposta.text
+
+
+def test_metrics_fora_da_rede_e_404(monkeypatch):
+    assert _cliente_interno(monkeypatch, "198.51.100.4").get("/metrics").status_code == 404
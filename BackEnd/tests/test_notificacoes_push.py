@@ -1,5 +1,4 @@
 """Testes de push: repositório, infra (tickets) e wiring de service — sem DB/rede real."""
-import io
 import json
 from unittest.mock import MagicMock, patch
 
@@ -14,13 +13,9 @@ def _mock_cursor():
     return cm, cur
 
 
-def _mock_urlopen_data(data):
-    resp = MagicMock()
-    resp.read.return_value = json.dumps({"data": data}).encode("utf-8")
-    cm = MagicMock()
-    cm.__enter__.return_value = resp
-    cm.__exit__.return_value = False
-    return cm
+def _resposta_expo(data, status=200):
+    """Retorno de infra.notificacoes._postar_expo: (status, corpo, Retry-After)."""
+    return (status, json.dumps({"data": data}).encode("utf-8"), None)
 
 
 A = "ExponentPushToken[a]"
@@ -32,68 +27,85 @@ def test_remover_push_token_faz_delete_por_token():
     cm, cur = _mock_cursor()
     with patch("repositories.notificacoes.get_db_cursor", return_value=cm):
         from repositories.notificacoes import remover_push_token
-        remover_push_token("ExponentPushToken[a]")
+        remover_push_token(["ExponentPushToken[a]", "ExponentPushToken[b]"])
+    cur.execute.assert_called_once()
     sql, params = cur.execute.call_args[0]
     assert "DELETE FROM PushTokens" in sql
-    assert "expo_token = %s" in sql
-    assert params == ("ExponentPushToken[a]",)
+    assert "expo_token = ANY(%s)" in sql
+    assert params == (["ExponentPushToken[a]", "ExponentPushToken[b]"],)
+
+
+def test_remover_push_token_vazio_nao_executa():
+    cm, cur = _mock_cursor()
+    with patch("repositories.notificacoes.get_db_cursor", return_value=cm) as m:
+        from repositories.notificacoes import remover_push_token
+        assert remover_push_token([]) == 0
+    m.assert_not_called()
 
 
 def test_send_todos_ok():
-    cm = _mock_urlopen_data([{"status": "ok", "id": "1"}, {"status": "ok", "id": "2"}])
-    with patch("infra.notificacoes.urllib.request.urlopen", return_value=cm):
+    resp = _resposta_expo([{"status": "ok", "id": "1"}, {"status": "ok", "id": "2"}])
+    with patch("infra.notificacoes._postar_expo", return_value=resp):
         from infra.notificacoes import send_expo_push
         out = send_expo_push([A, B], "t", "b")
     assert out == {
         "ok": [A, B],
         "dead": [],
         "tickets": [{"id": "1", "token": A}, {"id": "2", "token": B}],
+        "falhos": [],
     }
 
 
 def test_send_device_not_registered_vai_para_dead():
-    cm = _mock_urlopen_data([
+    resp = _resposta_expo([
         {"status": "ok", "id": "1"},
         {"status": "error", "message": "x", "details": {"error": "DeviceNotRegistered"}},
     ])
-    with patch("infra.notificacoes.urllib.request.urlopen", return_value=cm):
+    with patch("infra.notificacoes._postar_expo", return_value=resp):
         from infra.notificacoes import send_expo_push
         out = send_expo_push([A, B], "t", "b")
-    assert out == {"ok": [A], "dead": [B], "tickets": [{"id": "1", "token": A}]}
+    assert out == {"ok": [A], "dead": [B], "tickets": [{"id": "1", "token": A}], "falhos": []}
 
 
 def test_send_erro_transitorio_nao_poda():
-    cm = _mock_urlopen_data([
+    resp = _resposta_expo([
         {"status": "error", "message": "x", "details": {"error": "MessageRateExceeded"}},
     ])
-    with patch("infra.notificacoes.urllib.request.urlopen", return_value=cm):
+    with patch("infra.notificacoes._postar_expo", return_value=resp):
+        from infra.notificacoes import send_expo_push
+        out = send_expo_push([A], "t", "b")
+    assert out == {"ok": [], "dead": [], "tickets": [], "falhos": []}
+
+
+def test_send_5xx_persistente_volta_em_falhos():
+    with patch("infra.notificacoes._postar_expo", return_value=(500, b"boom", None)), \
+         patch("infra.notificacoes.time.sleep"):
         from infra.notificacoes import send_expo_push
         out = send_expo_push([A], "t", "b")
-    assert out == {"ok": [], "dead": [], "tickets": []}
+    assert out == {"ok": [], "dead": [], "tickets": [], "falhos": [A]}
 
 
-def test_send_httperror_retorno_vazio():
-    import urllib.error
-    err = urllib.error.HTTPError("u", 500, "erro", {}, io.BytesIO(b"boom"))
-    with patch("infra.notificacoes.urllib.request.urlopen", side_effect=err):
+def test_send_4xx_retorno_vazio_sem_tentar_de_novo():
+    with patch("infra.notificacoes._postar_expo", return_value=(400, b"ruim", None)) as m:
         from infra.notificacoes import send_expo_push
         out = send_expo_push([A], "t", "b")
-    assert out == {"ok": [], "dead": [], "tickets": []}
+    assert out == {"ok": [], "dead": [], "tickets": [], "falhos": []}
+    assert m.call_count == 1
 
 
 def test_send_contagem_divergente_nao_poda():
-    cm = _mock_urlopen_data([{"status": "ok", "id": "1"}])  # 1 ticket p/ 2 tokens
-    with patch("infra.notificacoes.urllib.request.urlopen", return_value=cm):
+    resp = _resposta_expo([{"status": "ok", "id": "1"}])  # 1 ticket p/ 2 tokens
+    with patch("infra.notificacoes._postar_expo", return_value=resp):
         from infra.notificacoes import send_expo_push
         out = send_expo_push([A, B], "t", "b")
-    assert out == {"ok": [], "dead": [], "tickets": []}
+    assert out == {"ok": [], "dead": [], "tickets": [], "falhos": []}
 
 
 def test_send_sem_token_valido_nao_faz_request():
-    with patch("infra.notificacoes.urllib.request.urlopen") as m:
+    with patch("infra.notificacoes._postar_expo") as m:
         from infra.notificacoes import send_expo_push
         out = send_expo_push(["lixo", None, ""], "t", "b")
-    assert out == {"ok": [], "dead": [], "tickets": []}
+    assert out == {"ok": [], "dead": [], "tickets": [], "falhos": []}
     m.assert_not_called()
 
 
@@ -104,9 +116,9 @@ def test_presenca_poda_token_morto():
                return_value={"ok": [], "dead": [A]}), \
          patch("services.notificacoes.remover_push_token") as rm, \
          patch("services.notificacoes.send_email_resend"):
-        from services.notificacoes import enviar_notificacoes_presenca
-        enviar_notificacoes_presenca("u1", "Ana", "", "Turma X")
-    rm.assert_called_once_with(A)
+        from services.notificacoes import enviar_push_presenca
+        enviar_push_presenca("u1", "Turma X", "10:00")
+    rm.assert_called_once_with([A])
 
 
 def test_notificar_alunos_um_unico_request_com_todos_tokens():
@@ -139,4 +151,4 @@ def test_notificar_alunos_poda_os_mortos():
          patch("services.notificacoes.remover_push_token") as rm:
         from services.notificacoes import notificar_alunos_presentes
         notificar_alunos_presentes("c1", "Turma X")
-    rm.assert_called_once_with(C)
+    rm.assert_called_once_with([C])
@@ -0,0 +1,147 @@
+"""Peças do pipeline da câmera — sem câmera, sem AWS.
+
+O que o anel precisa garantir ao burst: amostras DISTINTAS (nunca o mesmo frame
+duas vezes no consenso), no primeiro frame a partir do instante-alvo, e a
+contagem honesta de quando esse frame já tinha sido sobrescrito.
+"""
+import threading
+
+import numpy as np
+import pytest
+
+from scripts.pipeline_frames import BufferCircular, FilaDescarte, MetricasEstagio
+
+
+def _frame(valor):
+    return np.full((4, 6, 3), valor, dtype=np.uint8)
+
+
+# ---- BufferCircular ----
+
+def test_buffer_vazio_nao_tem_ultimo():
+    assert BufferCircular(4).ultimo() is None
+
+
+def test_ultimo_devolve_o_mais_recente():
+    b = BufferCircular(4)
+    for i in range(6):
+        b.escrever(_frame(i), ts=float(i))
+    seq, ts, frame = b.ultimo()
+    assert (seq, ts) == (5, 5.0)
+    assert frame[0, 0, 0] == 5
+
+
+def test_leitura_e_copia_independente_do_slot():
+    b = BufferCircular(2)
+    b.escrever(_frame(1), ts=0.0)
+    _, _, frame = b.ultimo()
+    b.escrever(_frame(2), ts=1.0)
+    b.escrever(_frame(3), ts=2.0)  # sobrescreve o slot do primeiro
+    assert frame[0, 0, 0] == 1
+
+
+def test_aloca_uma_vez_e_reaproveita():
+    b = BufferCircular(3)
+    b.escrever(_frame(0), ts=0.0)
+    anel = b._frames
+    for i in range(1, 10):
+        b.escrever(_frame(i), ts=float(i))
+    assert b._frames is anel
+
+
+def test_aguardar_pega_o_primeiro_frame_no_alvo():
+    b = BufferCircular(8)
+    for i in range(5):
+        b.escrever(_frame(i), ts=i * 0.1)
+    seq, ts, _ = b.aguardar(seq_min=-1, ts_alvo=0.25, timeout=0)
+    assert (seq, ts) == (3, pytest.approx(0.3))
+
+
+def test_aguardar_nunca_repete_frame():
+    # O bug antigo: captura atrasada, o burst relia o mesmo frame.
+    b = BufferCircular(8)
+    b.escrever(_frame(0), ts=1.0)
+    seq, _, _ = b.aguardar(seq_min=-1, ts_alvo=0.0, timeout=0)
+    assert b.aguardar(seq_min=seq, ts_alvo=0.0, timeout=0.01) is None
+
+
+def test_aguardar_bloqueia_ate_a_captura_entregar():
+    b = BufferCircular(4)
+    b.escrever(_frame(0), ts=0.0)
+
+    def _captura():
+        b.escrever(_frame(1), ts=1.0)
+
+    t = threading.Timer(0.05, _captura)
+    t.start()
+    seq, ts, _ = b.aguardar(seq_min=0, ts_alvo=0.5, timeout=2)
+    t.join()
+    assert (seq, ts) == (1, 1.0)
+
+
+def test_amostra_sobrescrita_conta_como_perdida():
+    b = BufferCircular(2)
+    for i in range(4):
+        b.escrever(_frame(i), ts=float(i))
+    # Alvo 1.0: o frame 1 já saiu do anel, sobra o 2.
+    seq, _, _ = b.aguardar(seq_min=0, ts_alvo=1.0, timeout=0)
+    assert seq == 2
+    assert b.perdidos == 1
+
+
+def test_frames_pulados_de_proposito_nao_contam_como_perda():
+    # Entre amostras do burst a detecção pula frames anteriores ao alvo.
+    b = BufferCircular(2)
+    for i in range(4):
+        b.escrever(_frame(i), ts=float(i))
+    seq, _, _ = b.aguardar(seq_min=0, ts_alvo=2.0, timeout=0)
+    assert seq == 2
+    assert b.perdidos == 0
+
+
+def test_limpar_impede_frame_velho_de_virar_amostra():
+    b = BufferCircular(4)
+    b.escrever(_frame(0), ts=0.0)
+    b.limpar()
+    assert b.ultimo() is None
+    assert b.aguardar(seq_min=-1, ts_alvo=0.0, timeout=0) is None
+
+
+def test_capacidade_minima():
+    with pytest.raises(ValueError):
+        BufferCircular(1)
+
+
+# ---- FilaDescarte ----
+
+def test_fila_cheia_descarta_o_mais_antigo():
+    f = FilaDescarte(2)
+    for item in ("a", "b", "c"):
+        f.colocar(item)
+    assert f.descartados == 1
+    assert [f.retirar(0), f.retirar(0)] == ["b", "c"]
+
+
+def test_fila_vazia_devolve_none_no_timeout():
+    assert FilaDescarte(1).retirar(timeout=0.01) is None
+
+
+def test_retirar_acorda_quando_chega_item():
+    f = FilaDescarte(1)
+    t = threading.Timer(0.05, f.colocar, args=("burst",))
+    t.start()
+    assert f.retirar(timeout=2) == "burst"
+    t.join()
+
+
+# ---- MetricasEstagio ----
+
+def test_resumo_em_ms_e_zera_a_janela():
+    m = MetricasEstagio()
+    m.registrar(0.010)
+    m.registrar(0.030)
+    n, media, maximo = m.resumo_e_zerar()
+    assert n == 2
+    assert media == pytest.approx(20.0)
+    assert maximo == pytest.approx(30.0)
+    assert m.resumo_e_zerar() == (0, 0.0, 0.0)
@@ -0,0 +1,181 @@
+"""Pool síncrono (infra/pool_conexoes.py) e GET /interno/pool — sem banco."""
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import core.security as security
+from infra.pool_conexoes import PoolConexoes, PoolEsgotado
+
+
+class _Conn:
+    def __init__(self, viva=True):
+        self.closed = 0
+        self.viva = viva
+        self.rollbacks = 0
+
+    def cursor(self):
+        conn = self
+
+        class _Cur:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql):
+                if not conn.viva:
+                    raise RuntimeError("server closed the connection unexpectedly")
+
+        return _Cur()
+
+    def rollback(self):
+        if not self.viva:
+            raise RuntimeError("connection already closed")
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+def _pool(minimo=1, maximo=2, espera_s=0.05, idade_max_s=1800, validar_apos_s=30):
+    criadas = []
+
+    def conectar():
+        criadas.append(_Conn())
+        return criadas[-1]
+
+    pool = PoolConexoes(conectar, minimo, maximo, espera_s, idade_max_s, validar_apos_s)
+    return pool, criadas
+
+
+def test_aquece_o_minimo_e_reusa_a_devolvida():
+    pool, criadas = _pool(minimo=1)
+    pool.aquecer()
+    assert len(criadas) == 1
+
+    conn = pool.getconn()
+    pool.putconn(conn)
+
+    assert pool.getconn() is conn
+    assert len(criadas) == 1
+
+
+def test_devolvidas_acima_do_minimo_ficam_ociosas():
+    # O ThreadedConnectionPool fechava tudo acima do minconn.
+    pool, criadas = _pool(minimo=1, maximo=3)
+    conns = [pool.getconn() for _ in range(3)]
+    for conn in conns:
+        pool.putconn(conn)
+
+    assert not any(c.closed for c in criadas)
+    assert pool.estatisticas()["ociosas"] == 3
+
+
+def test_pool_cheio_espera_a_devolucao_em_vez_de_falhar():
+    pool, _ = _pool(maximo=1, espera_s=2)
+    conn = pool.getconn()
+    threading.Timer(0.05, pool.putconn, args=(conn,)).start()
+
+    assert pool.getconn() is conn
+    assert pool.estatisticas()["espera"]["max_s"] >= 0.04
+
+
+def test_pool_cheio_ate_o_prazo_levanta_e_conta_timeout():
+    pool, _ = _pool(maximo=1, espera_s=0.01)
+    pool.getconn()
+
+    with pytest.raises(PoolEsgotado):
+        pool.getconn()
+    assert pool.estatisticas()["timeouts"] == 1
+
+
+def test_ociosa_morta_e_descartada_na_validacao():
+    pool, criadas = _pool(validar_apos_s=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.viva = False
+
+    nova = pool.getconn()
+
+    assert nova is not conn and conn.closed
+    assert pool.estatisticas()["invalidas"] == 1
+
+
+def test_conexao_velha_e_reciclada():
+    pool, _ = _pool(idade_max_s=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    time.sleep(0.001)
+
+    assert pool.getconn() is not conn
+    assert conn.closed
+    assert pool.estatisticas()["recicladas"] == 1
+
+
+def test_quebrada_ou_estranha_e_fechada_sem_liberar_vaga_a_mais():
+    pool, _ = _pool(maximo=1)
+    conn = pool.getconn()
+    pool.putconn(conn, close=True)
+    assert conn.closed
+
+    intrusa = _Conn()
+    pool.putconn(intrusa)  # não saiu do pool: fecha e não conta vaga
+    assert intrusa.closed
+    pool.getconn()
+    with pytest.raises(PoolEsgotado):
+        pool.getconn()
+
+
+def test_falha_ao_conectar_devolve_a_vaga():
+    def conectar():
+        raise RuntimeError("could not connect")
+
+    pool = PoolConexoes(conectar, 1, 1, 0.01, 1800, 30)
+    pool.aquecer()  # só loga
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            pool.getconn()
+    assert pool.estatisticas()["timeouts"] == 0
+
+
+def test_histograma_de_espera_e_cumulativo():
+    pool, _ = _pool(maximo=2)
+    for _ in range(2):
+        pool.getconn()
+
+    buckets = pool.estatisticas()["espera"]["buckets"]
+    assert buckets["+Inf"] == 2
+    valores = list(buckets.values())
+    assert valores == sorted(valores)
+
+
+def _cliente(monkeypatch, redes):
+    from routers import interno
+
+    monkeypatch.setattr(security, "_REDES_INTERNAS", security._redes(redes))
+    monkeypatch.setattr(interno, "estatisticas_pool", lambda: {"ativo": True, "em_uso": 0})
+    app = FastAPI()
+    app.include_router(interno.router)
+    return TestClient(app)
+
+
+def test_interno_pool_responde_para_rede_permitida(monkeypatch):
+    # TestClient chega como "testclient": sem IP válido nunca é interno.
+    cliente = _cliente(monkeypatch, ["0.0.0.0/0"])
+    monkeypatch.setattr(security, "_ip", lambda request: "10.0.0.5")
+
+    resposta = cliente.get("/interno/pool")
+
+    assert resposta.status_code == 200
+    assert resposta.json()["ativo"] is True
+
+
+def test_interno_pool_e_404_fora_da_rede(monkeypatch):
+    cliente = _cliente(monkeypatch, ["10.0.0.0/8"])
+    monkeypatch.setattr(security, "_ip", lambda request: "203.0.113.9")
+
+    assert cliente.get("/interno/pool").status_code == 404
@@ -0,0 +1,45 @@
+"""Pose local pelos 5 landmarks do YuNet — substitui o DetectFaces pago.
+
+Os landmarks são gerados projetando o próprio modelo 3D com uma rotação
+conhecida: o teste mede se o solvePnP devolve a rotação que entrou, não a
+qualidade do modelo genérico frente a um rosto real.
+"""
+import math
+
+import cv2
+import numpy as np
+import pytest
+
+from scripts.pose_local import _MODELO_3D, estimar_pose
+
+_W, _H = 1280, 720
+
+
+def _landmarks(yaw, pitch, deslocamento=(50.0, 20.0, 1500.0)):
+    y, p = math.radians(yaw), math.radians(pitch)
+    ry = np.array([[math.cos(y), 0, math.sin(y)], [0, 1, 0], [-math.sin(y), 0, math.cos(y)]])
+    rx = np.array([[1, 0, 0], [0, math.cos(p), -math.sin(p)], [0, math.sin(p), math.cos(p)]])
+    rvec, _ = cv2.Rodrigues(rx @ ry)
+    camera = np.array([[_W, 0, _W / 2], [0, _W, _H / 2], [0, 0, 1]], dtype=np.float64)
+    pontos, _ = cv2.projectPoints(_MODELO_3D, rvec, np.array(deslocamento), camera, None)
+    return pontos.reshape(5, 2)
+
+
+@pytest.mark.parametrize("yaw,pitch", [(0, 0), (20, -10), (-30, 15), (10, 25)])
+def test_recupera_a_rotacao_projetada(yaw, pitch):
+    y, p = estimar_pose(_landmarks(yaw, pitch), _W, _H)
+    assert y == pytest.approx(yaw, abs=0.5)
+    assert p == pytest.approx(pitch, abs=0.5)
+
+
+def test_variacao_entre_frames_e_preservada():
+    # O que a magnitude do ConfirmadorBurst mede é a VARIAÇÃO no burst.
+    parado = [estimar_pose(_landmarks(5, 0), _W, _H)[0] for _ in range(3)]
+    mexendo = [estimar_pose(_landmarks(a, 0), _W, _H)[0] for a in (-10, 0, 10)]
+    assert np.std(parado) < 0.1
+    assert np.std(mexendo) > 5
+
+
+def test_landmarks_degenerados_nao_levantam():
+    yaw, pitch = estimar_pose(np.zeros((5, 2)), _W, _H)
+    assert (yaw is None) == (pitch is None)
@@ -10,17 +10,10 @@ from fastapi import HTTPException
 from pydantic import ValidationError
 
 
-def _chamar(payload, background_tasks=None, sala="Sala 101"):
+def _chamar(payload, sala="Sala 101"):
     from routers.chamadas import registrar_presenca_camera
-    from fastapi import BackgroundTasks
 
-    return asyncio.run(
-        registrar_presenca_camera(
-            payload=payload,
-            background_tasks=background_tasks or BackgroundTasks(),
-            sala=sala,
-        )
-    )
+    return asyncio.run(registrar_presenca_camera(payload=payload, sala=sala))
 
 
 def test_payload_exige_chamada_id():
@@ -39,44 +32,43 @@ def test_endpoint_selfie_nao_existe_mais():
     assert "/chamadas/registrar_rosto" not in caminhos
 
 
-def test_sucesso_responde_200_e_agenda_notificacao_com_argumentos_na_ordem(monkeypatch):
+def test_sucesso_responde_200_e_enfileira_notificacao_com_argumentos_no_lugar(monkeypatch):
     """Afirma o wiring da notificação, não só o status.
 
-    A assinatura é enviar_notificacoes_presenca(usuario_id, aluno_nome,
-    aluno_email, turma_nome): trocar nome e e-mail de lugar mandaria o e-mail
-    para lugar nenhum e imprimiria o endereço no corpo da mensagem, sem nenhum
-    sinal — o BackgroundTask engole o resultado e o endpoint continua 200.
+    O job de e-mail leva aluno_email e aluno_nome em campos separados: trocar
+    os dois mandaria o e-mail para lugar nenhum e imprimiria o endereço no
+    corpo da mensagem, sem nenhum sinal — o job roda longe do request e o
+    endpoint continua 200. Os jobs saem do `jobs_notificacao` que o endpoint
+    entrega ao repositório (que os grava na transação das presenças).
     """
-    from fastapi import BackgroundTasks
-
     from routers.chamadas import PresencaCameraPayload
     import routers.chamadas as mod
-    from services.notificacoes import enviar_notificacoes_presenca
 
-    monkeypatch.setattr(
-        mod,
-        "registrar_presenca_por_face",
-        lambda eid, cid: {
-            "motivo": None, "usuario_id": "u1", "aluno_nome": "Ana",
-            "aluno_email": "ana@x.com", "turma_nome": "Cálculo I",
-        },
-    )
+    dados = {"usuario_id": "u1", "aluno_nome": "Ana", "aluno_email": "ana@x.com",
+             "turma_nome": "Cálculo I"}
+    enfileirados = []
+
+    def _registrar(eid, cid, jobs_notificacao=None):
+        enfileirados.extend(jobs_notificacao(dados))
+        return {"motivo": None, **dados}
+
+    monkeypatch.setattr(mod, "registrar_presenca_por_face", _registrar)
     monkeypatch.setattr(
         mod, "obter_chamada_aberta_por_sala",
         lambda _s: {"chamada_id": 1},
     )
-    background_tasks = BackgroundTasks()
 
-    resp = _chamar(
-        PresencaCameraPayload(external_image_id="x", chamada_id=1),
-        background_tasks=background_tasks,
-    )
+    resp = _chamar(PresencaCameraPayload(external_image_id="x", chamada_id=1))
 
     assert resp["ja_registrado"] is False
-    assert len(background_tasks.tasks) == 1
-    tarefa = background_tasks.tasks[0]
-    assert tarefa.func is enviar_notificacoes_presenca
-    assert tarefa.args == ("u1", "Ana", "ana@x.com", "Cálculo I")
+    por_tipo = {tipo: payload for tipo, payload, _max in enfileirados}
+    assert set(por_tipo) == {"push_presenca", "email_presenca"}
+    assert por_tipo["push_presenca"]["usuario_id"] == "u1"
+    assert por_tipo["push_presenca"]["turma_nome"] == "Cálculo I"
+    email = por_tipo["email_presenca"]
+    assert (email["aluno_email"], email["aluno_nome"], email["turma_nome"]) == (
+        "ana@x.com", "Ana", "Cálculo I",
+    )
 
 
 def test_ja_registrado_responde_200_idempotente(monkeypatch):
@@ -86,7 +78,7 @@ def test_ja_registrado_responde_200_idempotente(monkeypatch):
 
     monkeypatch.setattr(
         mod, "registrar_presenca_por_face",
-        lambda eid, cid: {"motivo": MOTIVO_JA_REGISTRADO},
+        lambda eid, cid, jobs_notificacao=None: {"motivo": MOTIVO_JA_REGISTRADO},
     )
     monkeypatch.setattr(
         mod, "obter_chamada_aberta_por_sala",
@@ -112,7 +104,8 @@ def test_recusa_mapeia_para_status_e_error_code(monkeypatch, motivo_attr, status
 
     motivo = getattr(repo, motivo_attr)
     monkeypatch.setattr(
-        mod, "registrar_presenca_por_face", lambda eid, cid: {"motivo": motivo}
+        mod, "registrar_presenca_por_face",
+        lambda eid, cid, jobs_notificacao=None: {"motivo": motivo},
     )
     monkeypatch.setattr(
         mod, "obter_chamada_aberta_por_sala",
@@ -124,3 +117,98 @@ def test_recusa_mapeia_para_status_e_error_code(monkeypatch, motivo_attr, status
 
     assert exc.value.status_code == status
     assert exc.value.detail["error_code"] == motivo
+
+
+# ---- Lote ----
+
+def _chamar_lote(payload, sala="Sala 101"):
+    from routers.chamadas import registrar_presencas_camera_lote
+
+    return asyncio.run(
+        registrar_presencas_camera_lote(
+            payload=payload,
+            sala=sala,
+        )
+    )
+
+
+def test_lote_devolve_por_aluno_o_status_do_endpoint_unitario(monkeypatch):
+    import routers.chamadas as mod
+    from repositories.usuarios import MOTIVO_ERRO_INTERNO, MOTIVO_JA_REGISTRADO, MOTIVO_NAO_MATRICULADO
+    from routers.chamadas import PresencasCameraLotePayload
+
+    chamadas_repo = []
+    lotes = []
+    dados = {"usuario_id": "u1", "aluno_nome": "Ana", "aluno_email": "ana@x.com",
+             "turma_nome": "Cálculo I"}
+
+    def _lote(ids, cid, jobs_notificacao=None):
+        chamadas_repo.append((ids, cid))
+        # O repositório chama jobs_notificacao só para quem foi inserido.
+        lotes.append(jobs_notificacao(dados))
+        return {
+            "a": {"motivo": None, **dados},
+            "b": {"motivo": MOTIVO_JA_REGISTRADO},
+            "c": {"motivo": MOTIVO_NAO_MATRICULADO},
+            "d": {"motivo": MOTIVO_ERRO_INTERNO},
+        }
+
+    monkeypatch.setattr(mod, "registrar_presencas_por_face_lote", _lote)
+    monkeypatch.setattr(mod, "obter_chamada_aberta_por_sala", lambda _s: {"chamada_id": 1})
+
+    resp = _chamar_lote(
+        PresencasCameraLotePayload(external_image_ids=["a", "b", "c", "d", "a"], chamada_id=1),
+    )
+
+    # Repetido no payload vai uma vez ao banco e sai uma vez na resposta.
+    assert chamadas_repo == [(["a", "b", "c", "d"], 1)]
+    por_id = {r["external_image_id"]: r for r in resp["resultados"]}
+    assert por_id["a"]["status"] == 200 and por_id["a"]["ja_registrado"] is False
+    assert por_id["b"]["status"] == 200 and por_id["b"]["ja_registrado"] is True
+    assert por_id["c"]["status"] == 403 and por_id["c"]["error_code"] == MOTIVO_NAO_MATRICULADO
+    assert por_id["d"]["status"] == 503
+    # Os jobs saem com cada campo no lugar.
+    assert len(lotes) == 1
+    email = [p for tipo, p, _max in lotes[0] if tipo == "email_presenca"]
+    push = [p for tipo, p, _max in lotes[0] if tipo == "push_presenca"]
+    assert [(e["aluno_email"], e["aluno_nome"], e["turma_nome"]) for e in email] == [
+        ("ana@x.com", "Ana", "Cálculo I"),
+    ]
+    assert [p["usuario_id"] for p in push] == ["u1"]
+
+
+def test_lote_de_chamada_de_outra_sala_e_403_sem_tocar_no_banco(monkeypatch):
+    import routers.chamadas as mod
+    from routers.chamadas import PresencasCameraLotePayload
+
+    monkeypatch.setattr(mod, "obter_chamada_aberta_por_sala", lambda _s: {"chamada_id": 10})
+    monkeypatch.setattr(
+        mod, "registrar_presencas_por_face_lote",
+        lambda *a: pytest.fail("não pode registrar em chamada de outra sala"),
+    )
+
+    with pytest.raises(HTTPException) as exc:
+        _chamar_lote(PresencasCameraLotePayload(external_image_ids=["a"], chamada_id=99))
+
+    assert exc.value.status_code == 403
+
+
+def test_lote_com_banco_fora_e_503(monkeypatch):
+    import routers.chamadas as mod
+    from infra.database import DB_INDISPONIVEL
+    from routers.chamadas import PresencasCameraLotePayload
+
+    monkeypatch.setattr(mod, "obter_chamada_aberta_por_sala", lambda _s: DB_INDISPONIVEL)
+
+    with pytest.raises(HTTPException) as exc:
+        _chamar_lote(PresencasCameraLotePayload(external_image_ids=["a"], chamada_id=1))
+
+    assert exc.value.status_code == 503
+
+
+@pytest.mark.parametrize("ids", [[], ["x"] * 101])
+def test_lote_vazio_ou_grande_demais_e_recusado(ids):
+    from routers.chamadas import PresencasCameraLotePayload
+
+    with pytest.raises(ValidationError):
+        PresencasCameraLotePayload(external_image_ids=ids, chamada_id=1)
@@ -7,6 +7,8 @@ de outra sala. Estes testes travam a resolução explícita por chamada_id.
 from core.tempo import agora_utc
 from contextlib import contextmanager
 
+import pytest
+
 from infra.database import get_db_cursor
 
 
@@ -67,6 +69,8 @@ def test_grava_na_chamada_informada_mesmo_com_outra_aberta(pg_academico):
     )
 
     assert resultado["motivo"] is None
+    # Dados de notificação vêm do mesmo comando do INSERT.
+    assert resultado["usuario_id"] is not None
     assert _alunos_com_presenca(chamada_a) == [str(pg_academico["mat_s3"])]
     assert _alunos_com_presenca(chamada_b) == []
 
@@ -176,30 +180,27 @@ class _CursorQuebrado:
 
 
 class _CursorOk:
-    """Cursor falso que responde o bastante para o fluxo chegar ao commit.
+    """Cursor falso: o comando único de registro devolve sucesso.
 
-    Responde por trecho do SQL em vez de por ordem de chamada: assim o teste
-    não quebra quando as consultas mudam de posição dentro da função.
+    `linha` permite simular o LEFT JOIN dos dados de notificação vazio.
     """
 
     rowcount = 1
 
-    def __init__(self):
-        self._ultimo_sql = ""
+    def __init__(self, linha=None):
+        self.comandos = 0
+        self.sqls = []
+        self._linha = linha or {
+            "motivo": None, "usuario_id": "usuario-1", "nome": "Ana Souza",
+            "email": "ana@teste.local", "nome_disciplina": "Cálculo I",
+        }
 
     def execute(self, sql, params=None):
-        self._ultimo_sql = sql
+        self.comandos += 1
+        self.sqls.append(sql)
 
     def fetchone(self):
-        if "FROM Chamadas" in self._ultimo_sql:
-            return {"chamada_id": 1, "turma_id": "turma-1", "total_aulas": 1}
-        if "FROM Alunos" in self._ultimo_sql:
-            return {
-                "nome": "Ana Souza", "email": "ana@teste.local",
-                "usuario_id": "usuario-1", "nome_disciplina": "Cálculo I",
-            }
-        # Colecao_Rostos / Turma_Alunos: basta ser verdadeiro.
-        return {"?column?": 1}
+        return self._linha
 
 
 def _fabricar_get_db_cursor(cursor, ao_commitar=None):
@@ -215,7 +216,7 @@ def _fabricar_get_db_cursor(cursor, ao_commitar=None):
     """
 
     @contextmanager
-    def _fake_get_db_cursor(commit=False):
+    def _fake_get_db_cursor(commit=False, preparar=False):
         yield cursor
         if commit and ao_commitar is not None:
             ao_commitar()
@@ -247,43 +248,42 @@ def test_erro_de_banco_devolve_motivo_erro_interno_sem_levantar(monkeypatch):
     assert resultado["motivo"] == MOTIVO_ERRO_INTERNO
 
 
-def test_falha_na_busca_de_notificacao_nao_ameaca_a_presenca(monkeypatch):
-    """A busca de dados de notificação é best-effort e não pode derrubar a
-    presença já gravada.
-
-    Enquanto essa consulta rodava dentro do `with` de escrita, uma falha dela
-    deixava a transação ABORTADA no Postgres — e o `conn.commit()` do
-    encerramento virava um ROLLBACK silencioso (psycopg2 não levanta nesse
-    caso). As presenças sumiam, mas a função devolvia motivo=None, o router
-    respondia 200 e a câmera marcava o aluno como definitivo: o aluno
-    desaparecia da chamada inteira sem erro em lugar nenhum.
+def test_registro_e_notificacao_saem_de_um_comando_so(monkeypatch):
+    """Um round trip: verificações, INSERT das aulas e dados da notificação.
 
-    A ordem dos eventos é o coração do teste: o commit da escrita tem que
-    acontecer ANTES da leitura de notificação, em transação separada.
+    Eram 3 SELECTs + 1 INSERT por aula + a busca de notificação numa segunda
+    transação. A busca ficava fora porque, como consulta separada, a falha
+    dela abortava a transação e o commit virava ROLLBACK silencioso; num
+    comando só a falha levanta e vira erro_interno (teste acima).
     """
     import repositories.usuarios as usuarios_mod
     from repositories.usuarios import registrar_presenca_por_face
 
-    eventos = []
+    cursor = _CursorOk()
+    monkeypatch.setattr(usuarios_mod, "get_db_cursor", _fabricar_get_db_cursor(cursor))
 
-    @contextmanager
-    def _get_db_cursor_leitura_quebrada(commit=False):
-        if commit:
-            yield _CursorOk()
-            eventos.append("commit_da_escrita")
-        else:
-            eventos.append("leitura_de_notificacao")
-            yield _CursorQuebrado()
+    resultado = registrar_presenca_por_face(ALUNO_UUID_FALSO, 1)
 
-    monkeypatch.setattr(
-        usuarios_mod, "get_db_cursor", _get_db_cursor_leitura_quebrada
-    )
+    assert cursor.comandos == 1
+    assert resultado == {
+        "motivo": None, "usuario_id": "usuario-1", "aluno_nome": "Ana Souza",
+        "aluno_email": "ana@teste.local", "turma_nome": "Cálculo I",
+    }
+
+
+def test_sem_dados_de_notificacao_a_presenca_vale_com_defaults(monkeypatch):
+    import repositories.usuarios as usuarios_mod
+    from repositories.usuarios import registrar_presenca_por_face
+
+    cursor = _CursorOk({
+        "motivo": None, "usuario_id": None, "nome": None, "email": None,
+        "nome_disciplina": None,
+    })
+    monkeypatch.setattr(usuarios_mod, "get_db_cursor", _fabricar_get_db_cursor(cursor))
 
     resultado = registrar_presenca_por_face(ALUNO_UUID_FALSO, 1)
 
     assert resultado["motivo"] is None
-    assert eventos == ["commit_da_escrita", "leitura_de_notificacao"]
-    # Defaults: o e-mail simplesmente não sai, mas a presença está gravada.
     assert resultado["aluno_nome"] == "Aluno"
     assert resultado["aluno_email"] is None
     assert resultado["usuario_id"] is None
@@ -317,3 +317,64 @@ def test_falha_no_commit_de_encerramento_tambem_vira_erro_interno(monkeypatch):
     resultado = registrar_presenca_por_face(ALUNO_UUID_FALSO, 1)
 
     assert resultado["motivo"] == MOTIVO_ERRO_INTERNO
+
+
+def _jobs_de_teste(dados):
+    return [("push_presenca", {"usuario_id": dados["usuario_id"]}, 5)]
+
+
+def test_jobs_de_notificacao_entram_antes_do_commit_no_mesmo_cursor(monkeypatch):
+    """Presença e job no mesmo commit: um restart entre os dois não perde
+    mais o aviso de uma presença confirmada."""
+    import repositories.usuarios as usuarios_mod
+    from repositories.usuarios import registrar_presenca_por_face
+
+    cursor = _CursorOk()
+    no_commit = []
+    monkeypatch.setattr(
+        usuarios_mod, "get_db_cursor",
+        _fabricar_get_db_cursor(cursor, ao_commitar=lambda: no_commit.extend(cursor.sqls)),
+    )
+
+    resultado = registrar_presenca_por_face(ALUNO_UUID_FALSO, 1, jobs_notificacao=_jobs_de_teste)
+
+    assert resultado["motivo"] is None
+    assert "INSERT INTO jobs" in no_commit[1]
+    assert "pg_notify" in no_commit[2]
+
+
+def test_recusa_nao_grava_job(monkeypatch):
+    import repositories.usuarios as usuarios_mod
+    from repositories.usuarios import MOTIVO_NAO_MATRICULADO, registrar_presenca_por_face
+
+    cursor = _CursorOk({"motivo": MOTIVO_NAO_MATRICULADO})
+    monkeypatch.setattr(usuarios_mod, "get_db_cursor", _fabricar_get_db_cursor(cursor))
+
+    resultado = registrar_presenca_por_face(
+        ALUNO_UUID_FALSO, 1, jobs_notificacao=lambda _d: pytest.fail("recusa não notifica"),
+    )
+
+    assert resultado == {"motivo": MOTIVO_NAO_MATRICULADO}
+    assert cursor.comandos == 1
+
+
+def test_falha_ao_gravar_o_job_desfaz_a_presenca(monkeypatch):
+    """Sem o job não há commit: a câmera recebe erro_interno e tenta de novo,
+    em vez de uma presença confirmada que ninguém vai avisar."""
+    import repositories.usuarios as usuarios_mod
+    from repositories.usuarios import MOTIVO_ERRO_INTERNO, registrar_presenca_por_face
+
+    class _FilaQuebrada(_CursorOk):
+        def execute(self, sql, params=None):
+            super().execute(sql, params)
+            if "INSERT INTO jobs" in sql:
+                raise Exception("disco cheio")
+
+    monkeypatch.setattr(
+        usuarios_mod, "get_db_cursor",
+        _fabricar_get_db_cursor(_FilaQuebrada(), ao_commitar=lambda: pytest.fail("não confirma")),
+    )
+
+    resultado = registrar_presenca_por_face(ALUNO_UUID_FALSO, 1, jobs_notificacao=_jobs_de_teste)
+
+    assert resultado["motivo"] == MOTIVO_ERRO_INTERNO
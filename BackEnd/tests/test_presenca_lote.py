@@ -0,0 +1,201 @@
+"""Registro de presenças em lote (gate SCPI_RUN_DB_TESTS=1 nos testes com banco).
+
+O lote precisa dar, aluno a aluno, o mesmo motivo que a versão unitária daria —
+a câmera decide repetir ou não a partir dele.
+"""
+from contextlib import contextmanager
+
+from tests.test_presenca_chamada_explicita import (
+    _abrir_chamada,
+    _alunos_com_presenca,
+    _cadastrar_rosto,
+    _fechar_chamada,
+)
+
+
+def test_lote_mistura_sucesso_e_recusas_com_os_motivos_da_versao_unitaria(pg_academico):
+    from repositories.usuarios import (
+        MOTIVO_NAO_MATRICULADO,
+        MOTIVO_ROSTO_DESCONHECIDO,
+        registrar_presencas_por_face_lote,
+    )
+
+    _cadastrar_rosto(pg_academico["mat_s3"])
+    _cadastrar_rosto(pg_academico["mat_s5"])
+    chamada = _abrir_chamada(pg_academico["turma3"], total_aulas=2)
+    ids = [
+        str(pg_academico["mat_s3"]),     # matriculado, com rosto
+        str(pg_academico["mat_s5"]),     # com rosto, outra turma
+        str(pg_academico["sem_turma"]),  # sem rosto
+        "Joao_da_Silva",                 # legado, não-UUID
+    ]
+
+    resultados = registrar_presencas_por_face_lote(ids, chamada)
+
+    assert resultados[ids[0]]["motivo"] is None
+    assert resultados[ids[0]]["turma_nome"] != "Turma"  # dados de notificação vieram
+    assert resultados[ids[1]]["motivo"] == MOTIVO_NAO_MATRICULADO
+    assert resultados[ids[2]]["motivo"] == MOTIVO_ROSTO_DESCONHECIDO
+    assert resultados[ids[3]]["motivo"] == MOTIVO_ROSTO_DESCONHECIDO
+    # total_aulas=2: duas linhas, só do aluno aceito.
+    assert _alunos_com_presenca(chamada) == [ids[0], ids[0]]
+
+
+def test_lote_reenviado_devolve_ja_registrado(pg_academico):
+    from repositories.usuarios import MOTIVO_JA_REGISTRADO, registrar_presencas_por_face_lote
+
+    _cadastrar_rosto(pg_academico["mat_s3"])
+    chamada = _abrir_chamada(pg_academico["turma3"])
+    aluno = str(pg_academico["mat_s3"])
+
+    registrar_presencas_por_face_lote([aluno], chamada)
+    segundo = registrar_presencas_por_face_lote([aluno], chamada)
+
+    assert segundo[aluno]["motivo"] == MOTIVO_JA_REGISTRADO
+    assert len(_alunos_com_presenca(chamada)) == 1
+
+
+def test_lote_em_chamada_fechada_recusa_todos(pg_academico):
+    from repositories.usuarios import (
+        MOTIVO_CHAMADA_FECHADA,
+        MOTIVO_ROSTO_DESCONHECIDO,
+        registrar_presencas_por_face_lote,
+    )
+
+    _cadastrar_rosto(pg_academico["mat_s3"])
+    chamada = _abrir_chamada(pg_academico["turma3"])
+    _fechar_chamada(chamada)
+    com_rosto, sem_rosto = str(pg_academico["mat_s3"]), str(pg_academico["sem_turma"])
+
+    resultados = registrar_presencas_por_face_lote([com_rosto, sem_rosto], chamada)
+
+    # Mesma ordem de recusas da versão unitária: rosto antes de chamada.
+    assert resultados[com_rosto]["motivo"] == MOTIVO_CHAMADA_FECHADA
+    assert resultados[sem_rosto]["motivo"] == MOTIVO_ROSTO_DESCONHECIDO
+    assert _alunos_com_presenca(chamada) == []
+
+
+def test_lote_assincrono_com_consultas_preparadas(pg_academico, monkeypatch):
+    """O caminho DB_ASYNC=1 roda as consultas do lote por PREPARE/EXECUTE: o
+    tipo declarado de cada `$n` tem que aceitar o que o psycopg2 manda (lista
+    de str = text[]). Os fakes não enxergam esse descompasso; o Postgres sim."""
+    import asyncio
+
+    from infra import sql_preparado
+    from infra.database_async import fechar_pool_async
+    from repositories.usuarios import (
+        MOTIVO_JA_REGISTRADO,
+        MOTIVO_NAO_MATRICULADO,
+        registrar_presencas_por_face_lote_async,
+    )
+
+    monkeypatch.setattr(sql_preparado, "_LIGADO", True)
+    _cadastrar_rosto(pg_academico["mat_s3"])
+    _cadastrar_rosto(pg_academico["mat_s5"])
+    chamada = _abrir_chamada(pg_academico["turma3"])
+    aceito, outra_turma = str(pg_academico["mat_s3"]), str(pg_academico["mat_s5"])
+
+    async def cenario():
+        try:
+            primeiro = await registrar_presencas_por_face_lote_async([aceito, outra_turma], chamada)
+            # Mesma conexão, statements já preparados: agora só EXECUTE.
+            segundo = await registrar_presencas_por_face_lote_async([aceito], chamada)
+            return primeiro, segundo
+        finally:
+            fechar_pool_async()
+
+    primeiro, segundo = asyncio.run(cenario())
+
+    assert primeiro[aceito]["motivo"] is None
+    assert primeiro[aceito]["turma_nome"] != "Turma"  # dados de notificação vieram
+    assert primeiro[outra_turma]["motivo"] == MOTIVO_NAO_MATRICULADO
+    assert segundo[aceito]["motivo"] == MOTIVO_JA_REGISTRADO
+    assert _alunos_com_presenca(chamada) == [aceito]
+
+
+class _CursorQuebrado:
+    rowcount = 0
+
+    def execute(self, *args, **kwargs):
+        raise Exception("conexão derrubada no meio da transação")
+
+
+def test_erro_de_banco_vira_erro_interno_para_o_lote_inteiro(monkeypatch):
+    """Sem Postgres: o contrato "sempre dict, nunca levanta" vale no lote."""
+    import repositories.usuarios as usuarios_mod
+    from repositories.usuarios import (
+        MOTIVO_ERRO_INTERNO,
+        MOTIVO_ROSTO_DESCONHECIDO,
+        registrar_presencas_por_face_lote,
+    )
+
+    @contextmanager
+    def _get_db_cursor(commit=False, preparar=False):
+        yield _CursorQuebrado()
+
+    monkeypatch.setattr(usuarios_mod, "get_db_cursor", _get_db_cursor)
+    a = "11111111-1111-1111-1111-111111111111"
+    b = "22222222-2222-2222-2222-222222222222"
+
+    resultados = registrar_presencas_por_face_lote([a, b, "lixo"], 1)
+
+    assert resultados[a]["motivo"] == MOTIVO_ERRO_INTERNO
+    assert resultados[b]["motivo"] == MOTIVO_ERRO_INTERNO
+    assert resultados["lixo"]["motivo"] == MOTIVO_ROSTO_DESCONHECIDO
+
+
+class _CursorLote:
+    """Responde cada comando do lote pelo texto: chamada aberta, um aluno
+    apto e um de outra turma, o apto inserido."""
+
+    rowcount = 0
+
+    def __init__(self, a, b):
+        self.sqls = []
+        self._a, self._b = a, b
+
+    def execute(self, sql, params=None):
+        self.sqls.append(sql)
+
+    def fetchone(self):
+        return {"chamada_id": 1, "turma_id": 3, "total_aulas": 1}
+
+    def fetchall(self):
+        ultimo = self.sqls[-1]
+        if "tem_rosto" in ultimo:
+            return [{"aluno_id": self._a, "tem_rosto": True, "matriculado": True},
+                    {"aluno_id": self._b, "tem_rosto": True, "matriculado": False}]
+        if "INSERT INTO Presencas" in ultimo:
+            return [{"aluno_id": self._a}]
+        return [{"aluno_id": self._a, "nome": "Ana", "email": "ana@x.com",
+                 "usuario_id": "u1", "nome_disciplina": "BD"}]
+
+
+def test_lote_grava_os_jobs_dos_inseridos_antes_do_commit(monkeypatch):
+    import repositories.usuarios as usuarios_mod
+    from repositories.usuarios import MOTIVO_NAO_MATRICULADO, registrar_presencas_por_face_lote
+
+    a = "11111111-1111-1111-1111-111111111111"
+    b = "22222222-2222-2222-2222-222222222222"
+    cursor = _CursorLote(a, b)
+    no_commit = []
+
+    @contextmanager
+    def _get_db_cursor(commit=False, preparar=False):
+        yield cursor
+        no_commit.extend(cursor.sqls)
+
+    monkeypatch.setattr(usuarios_mod, "get_db_cursor", _get_db_cursor)
+    notificados = []
+
+    def _jobs(dados):
+        notificados.append(dados)
+        return [("push_presenca", {"usuario_id": dados["usuario_id"]}, 5)]
+
+    resultados = registrar_presencas_por_face_lote([a, b], 1, jobs_notificacao=_jobs)
+
+    assert resultados[a]["turma_nome"] == "BD"
+    assert resultados[b]["motivo"] == MOTIVO_NAO_MATRICULADO
+    # Só o inserido, com os dados lidos na própria transação.
+    assert [d["aluno_email"] for d in notificados] == ["ana@x.com"]
+    assert any("INSERT INTO jobs" in sql for sql in no_commit)
@@ -0,0 +1,169 @@
+"""Push de encerramento em lote: chamadas fechadas juntas = uma consulta e um envio."""
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+A = "ExponentPushToken[a]"
+B = "ExponentPushToken[b]"
+C = "ExponentPushToken[c]"
+
+
+def _mock_cursor(rows=()):
+    cur = MagicMock()
+    cur.fetchall.return_value = list(rows)
+    cm = MagicMock()
+    cm.__enter__.return_value = cur
+    cm.__exit__.return_value = False
+    return cm, cur
+
+
+def test_destinatarios_de_todas_as_chamadas_numa_consulta():
+    cm, cur = _mock_cursor([{"expo_token": A, "nome_disciplina": "BD"}])
+    with patch("repositories.turmas.get_db_cursor", return_value=cm):
+        from repositories.turmas import listar_destinatarios_encerramento
+        out = listar_destinatarios_encerramento([7, 8])
+    cur.execute.assert_called_once()
+    sql, params = cur.execute.call_args[0]
+    assert "SELECT DISTINCT pt.expo_token, t.nome_disciplina" in sql
+    assert "c.chamada_id = ANY(%s::int[])" in sql
+    assert params == ([7, 8],)
+    assert out == [{"expo_token": A, "nome_disciplina": "BD"}]
+
+
+def test_destinatarios_sem_chamadas_nao_consulta():
+    with patch("repositories.turmas.get_db_cursor") as m:
+        from repositories.turmas import listar_destinatarios_encerramento
+        assert listar_destinatarios_encerramento([]) == []
+    m.assert_not_called()
+
+
+def test_destinatarios_com_banco_fora_nao_viram_lista_vazia():
+    from contextlib import contextmanager
+
+    from infra.database import DB_INDISPONIVEL
+
+    @contextmanager
+    def sem_banco():
+        yield None
+
+    with patch("repositories.turmas.get_db_cursor", sem_banco):
+        from repositories.turmas import listar_destinatarios_encerramento
+        assert listar_destinatarios_encerramento([7]) is DB_INDISPONIVEL
+
+
+def test_encerramento_com_banco_fora_volta_para_a_fila(monkeypatch):
+    import services.fila_jobs as fila
+    import services.notificacoes as notif
+    from infra.database import DB_INDISPONIVEL
+
+    falhas = []
+    monkeypatch.setattr(notif, "listar_destinatarios_encerramento", lambda _ids: DB_INDISPONIVEL)
+    monkeypatch.setattr(notif, "send_expo_mensagens", lambda *a, **k: pytest.fail("não envia"))
+    monkeypatch.setattr(fila, "falhar_job", lambda *a: falhas.append(a))
+    monkeypatch.setattr(fila, "concluir_job", lambda *_: pytest.fail("não concluiu"))
+
+    registro = {"id": 3, "tipo": notif.JOB_PUSH_ENCERRAMENTO_LOTE, "tentativas": 1,
+                "max_tentativas": 5, "payload": {"chamada_ids": [7, 8], "hora": "10:30"}}
+    atraso = fila._processar(fila._tipos[notif.JOB_PUSH_ENCERRAMENTO_LOTE], registro)
+
+    assert atraso is not None
+    assert falhas[0][1].startswith("BancoIndisponivel")
+
+
+def test_um_envio_para_todas_com_uma_mensagem_por_token():
+    import services.notificacoes as notif
+
+    destinatarios = [
+        {"expo_token": A, "nome_disciplina": "BD"},
+        {"expo_token": A, "nome_disciplina": "Redes"},  # aluno nas duas turmas
+        {"expo_token": B, "nome_disciplina": "BD"},
+        {"expo_token": C, "nome_disciplina": "Redes"},
+    ]
+    res = {"ok": [A, B], "dead": [C], "tickets": [{"id": "1", "token": A}], "falhos": []}
+    with patch.object(notif, "listar_destinatarios_encerramento", return_value=destinatarios) as dest, \
+         patch.object(notif, "send_expo_mensagens", return_value=res) as envio, \
+         patch.object(notif, "remover_push_token") as rm, \
+         patch.object(notif, "registrar_tickets_pendentes") as reg:
+        notif.notificar_encerramentos([7, 8], "10:30")
+
+    dest.assert_called_once_with([7, 8])
+    envio.assert_called_once()
+    mensagens = {m["to"]: m["body"] for m in envio.call_args[0][0]}
+    assert mensagens == {
+        A: "As chamadas de BD e Redes foram encerradas às 10:30.",
+        B: "A chamada de BD foi encerrada às 10:30.",
+        C: "A chamada de Redes foi encerrada às 10:30.",
+    }
+    rm.assert_called_once_with([C])
+    reg.assert_called_once_with([{"id": "1", "token": A}])
+
+
+def test_sem_destinatarios_nao_envia():
+    import services.notificacoes as notif
+
+    with patch.object(notif, "listar_destinatarios_encerramento", return_value=[]), \
+         patch.object(notif, "send_expo_mensagens") as envio:
+        notif.notificar_encerramentos([7], "10:30")
+    envio.assert_not_called()
+
+
+def test_falhos_voltam_agrupados_pelo_texto():
+    import services.notificacoes as notif
+
+    destinatarios = [
+        {"expo_token": A, "nome_disciplina": "BD"},
+        {"expo_token": B, "nome_disciplina": "BD"},
+        {"expo_token": C, "nome_disciplina": "Redes"},
+    ]
+    res = {"ok": [], "dead": [], "tickets": [], "falhos": [A, B, C]}
+    with patch.object(notif, "listar_destinatarios_encerramento", return_value=destinatarios), \
+         patch.object(notif, "send_expo_mensagens", return_value=res), \
+         patch.object(notif, "enfileirar") as enf:
+        notif.notificar_encerramentos([7, 8], "10:30")
+    (jobs,), _ = enf.call_args
+    payloads = sorted((p["corpo"], p["tokens"]) for _t, p, _m in jobs)
+    assert payloads == [
+        ("A chamada de BD foi encerrada às 10:30.", [A, B]),
+        ("A chamada de Redes foi encerrada às 10:30.", [C]),
+    ]
+
+
+def test_jobs_encerramento_monta_um_job_so():
+    import services.notificacoes as notif
+
+    with patch.object(notif, "_hora_agora", return_value="08:50"):
+        jobs = notif.jobs_encerramento([7, 8, 9])
+    assert jobs == [(notif.JOB_PUSH_ENCERRAMENTO_LOTE, {"chamada_ids": [7, 8, 9], "hora": "08:50"}, 5)]
+    assert notif.jobs_encerramento([]) == []
+
+
+def test_fechar_pela_turma_grava_o_job_no_cursor_do_update():
+    import repositories.chamadas as repo
+
+    cm, cur = _mock_cursor([{"chamada_id": 7}])
+    pedidos = []
+
+    def _jobs(ids):
+        pedidos.append(ids)
+        return [("push_encerramento_lote", {"chamada_ids": ids, "hora": "08:50"}, 5)]
+
+    with patch.object(repo, "get_db_cursor", return_value=cm), \
+         patch.object(repo.indice_salas, "invalidar"):
+        assert repo.fechar_chamadas_abertas_por_turma("t1", jobs_encerramento=_jobs) == 1
+
+    # Só as chamadas que ESTE UPDATE fechou, e o INSERT depois dele.
+    assert pedidos == [[7]]
+    sqls = [c.args[0] for c in cur.execute.call_args_list]
+    assert "UPDATE Chamadas" in sqls[0]
+    assert any("INSERT INTO jobs" in sql for sql in sqls[1:])
+
+
+def test_fechar_pela_turma_sem_chamada_aberta_nao_grava_job():
+    import repositories.chamadas as repo
+
+    cm, cur = _mock_cursor([])
+    with patch.object(repo, "get_db_cursor", return_value=cm):
+        assert repo.fechar_chamadas_abertas_por_turma(
+            "t1", jobs_encerramento=lambda _ids: pytest.fail("nada fechou"),
+        ) == 0
+    assert cur.execute.call_count == 1
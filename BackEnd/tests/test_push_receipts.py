@@ -104,10 +104,14 @@ def test_remover_tickets_pendentes_antigos_por_idade():
     assert "%" not in sql.replace("%s", "").replace("%%", "")
 
 
+def _resposta_expo(data):
+    return (200, json.dumps({"data": data}).encode("utf-8"), None)
+
+
 def test_send_expo_push_expoe_tickets_ok():
     tokens = ["ExponentPushToken[a]", "ExponentPushToken[b]"]
-    cm = _mock_urlopen_data([{"status": "ok", "id": "tk1"}, {"status": "ok", "id": "tk2"}])
-    with patch("infra.notificacoes.urllib.request.urlopen", return_value=cm):
+    resp = _resposta_expo([{"status": "ok", "id": "tk1"}, {"status": "ok", "id": "tk2"}])
+    with patch("infra.notificacoes._postar_expo", return_value=resp):
         from infra.notificacoes import send_expo_push
         out = send_expo_push(tokens, "t", "b")
     assert out["tickets"] == [
@@ -117,8 +121,8 @@ def test_send_expo_push_expoe_tickets_ok():
 
 
 def test_send_expo_push_ticket_ok_sem_id_nao_entra_em_tickets():
-    cm = _mock_urlopen_data([{"status": "ok"}])  # sem id
-    with patch("infra.notificacoes.urllib.request.urlopen", return_value=cm):
+    resp = _resposta_expo([{"status": "ok"}])  # sem id
+    with patch("infra.notificacoes._postar_expo", return_value=resp):
         from infra.notificacoes import send_expo_push
         out = send_expo_push(["ExponentPushToken[a]"], "t", "b")
     assert out["ok"] == ["ExponentPushToken[a]"]
@@ -126,12 +130,13 @@ def test_send_expo_push_ticket_ok_sem_id_nao_entra_em_tickets():
 
 
 def test_send_expo_push_falha_transporte_tickets_vazio():
-    import urllib.error
-    err = urllib.error.HTTPError("u", 500, "erro", {}, io.BytesIO(b"x"))
-    with patch("infra.notificacoes.urllib.request.urlopen", side_effect=err):
+    import urllib3
+    err = urllib3.exceptions.ProtocolError("conexão caiu")
+    with patch("infra.notificacoes._postar_expo", side_effect=err), \
+         patch("infra.notificacoes.time.sleep"):
         from infra.notificacoes import send_expo_push
         out = send_expo_push(["ExponentPushToken[a]"], "t", "b")
-    assert out == {"ok": [], "dead": [], "tickets": []}
+    assert out == {"ok": [], "dead": [], "tickets": [], "falhos": ["ExponentPushToken[a]"]}
 
 
 def test_consultar_receipts_parseia_data():
@@ -212,8 +217,8 @@ def test_presenca_registra_tickets_pendentes():
          patch("services.notificacoes.remover_push_token"), \
          patch("services.notificacoes.registrar_tickets_pendentes") as reg, \
          patch("services.notificacoes.send_email_resend"):
-        from services.notificacoes import enviar_notificacoes_presenca
-        enviar_notificacoes_presenca("u1", "Ana", "", "Turma X")
+        from services.notificacoes import enviar_push_presenca
+        enviar_push_presenca("u1", "Turma X", "10:00")
     reg.assert_called_once_with(tickets)
 
 
@@ -235,7 +240,7 @@ def test_main_processa_pendentes_poda_e_limpa():
          patch("scripts.verificar_receipts.remover_tickets_pendentes_antigos", return_value=0) as remover_antigos:
         from scripts.verificar_receipts import main
         main()
-    remover_token.assert_called_once_with("ExponentPushToken[a]")
+    remover_token.assert_called_once_with(["ExponentPushToken[a]"])
     remover_pend.assert_called_once_with(["tk1", "tk2"])
     remover_antigos.assert_called_once()
     release_conn.assert_called_once()
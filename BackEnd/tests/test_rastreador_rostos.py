@@ -0,0 +1,83 @@
+"""Rastreador de rostos do burst — sem câmera, sem AWS.
+
+Cada trilha vira UM SearchFaces; errar a associação custa caro dos dois lados:
+juntar duas pessoas numa trilha dá a identidade de uma para os frames da outra,
+e quebrar uma pessoa em várias trilhas devolve o custo que o rastreador corta.
+"""
+import pytest
+
+from scripts.rastreador_rostos import RastreadorRostos, iou
+
+
+def test_iou_de_bboxes_identicos_e_um():
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == pytest.approx(1.0)
+
+
+def test_iou_sem_sobreposicao_e_zero():
+    assert iou((0, 0, 10, 10), (20, 20, 10, 10)) == 0.0
+
+
+def test_iou_de_bbox_degenerado_nao_divide_por_zero():
+    assert iou((0, 0, 0, 0), (0, 0, 0, 0)) == 0.0
+
+
+def test_mesmo_rosto_parado_mantem_a_trilha():
+    r = RastreadorRostos()
+    a = r.atribuir([(100, 100, 80, 80)])
+    b = r.atribuir([(104, 102, 80, 80)])
+    assert a == b
+
+
+def test_dois_rostos_nao_trocam_de_trilha():
+    r = RastreadorRostos()
+    ids1 = r.atribuir([(100, 100, 80, 80), (400, 100, 80, 80)])
+    # Ordem de saída do detector invertida no frame seguinte.
+    ids2 = r.atribuir([(402, 101, 80, 80), (101, 99, 80, 80)])
+    assert ids2 == [ids1[1], ids1[0]]
+
+
+def test_rosto_novo_abre_trilha_nova():
+    r = RastreadorRostos()
+    (a,) = r.atribuir([(100, 100, 80, 80)])
+    ids = r.atribuir([(100, 100, 80, 80), (600, 300, 80, 80)])
+    assert ids[0] == a
+    assert ids[1] != a
+    assert len(r) == 2
+
+
+def test_cada_trilha_recebe_um_bbox_por_frame():
+    # Dois bboxes sobrepostos ao mesmo rosto anterior: só o melhor herda.
+    r = RastreadorRostos()
+    (a,) = r.atribuir([(100, 100, 80, 80)])
+    ids = r.atribuir([(100, 100, 80, 80), (110, 110, 80, 80)])
+    assert ids[0] == a
+    assert ids[1] != a
+
+
+def test_fallback_por_centroide_segura_rosto_que_andou():
+    # Deslocou 35px com bbox de 80: IoU < 0.3, centroide ainda perto.
+    r = RastreadorRostos(iou_min=0.5, fator_centroide=0.5)
+    (a,) = r.atribuir([(100, 100, 80, 80)])
+    (b,) = r.atribuir([(135, 100, 80, 80)])
+    assert b == a
+
+
+def test_rosto_longe_demais_nao_herda_pelo_centroide():
+    r = RastreadorRostos()
+    (a,) = r.atribuir([(100, 100, 80, 80)])
+    (b,) = r.atribuir([(300, 100, 80, 80)])
+    assert b != a
+
+
+def test_trilha_sobrevive_a_frame_sem_deteccao():
+    r = RastreadorRostos()
+    (a,) = r.atribuir([(100, 100, 80, 80)])
+    assert r.atribuir([]) == []
+    (b,) = r.atribuir([(102, 100, 80, 80)])
+    assert b == a
+
+
+@pytest.mark.parametrize("kwargs", [{"iou_min": 0}, {"iou_min": 1.5}, {"fator_centroide": -1}])
+def test_parametros_invalidos_levantam(kwargs):
+    with pytest.raises(ValueError):
+        RastreadorRostos(**kwargs)
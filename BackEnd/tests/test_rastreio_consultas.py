@@ -0,0 +1,195 @@
+"""Rastreio de consultas (infra/rastreio_consultas.py) — sem banco."""
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+import infra.database as database
+from infra import rastreio_consultas as rastreio
+
+
+@pytest.fixture(autouse=True)
+def _limpo(monkeypatch):
+    monkeypatch.setattr(rastreio, "_LIGADO", True)
+    monkeypatch.setattr(rastreio, "LENTA_MS", 100)
+    monkeypatch.setattr(rastreio, "EXPLAIN_AMOSTRA", 0.0)
+    rastreio.limpar()
+    yield
+    rastreio.limpar()
+
+
+class _Cur:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = -1
+
+    def execute(self, sql, params=None):
+        self.conn.comandos.append(sql)
+        if sql.startswith("EXPLAIN") and self.conn.explain_falha:
+            raise RuntimeError("permission denied")
+        self.rowcount = 3
+
+    def fetchall(self):
+        return [("Seq Scan on chamadas",), ("Buffers: shared hit=12",)]
+
+    def close(self):
+        pass
+
+
+class _Conn:
+    def __init__(self, explain_falha=False):
+        self.comandos = []
+        self.explain_falha = explain_falha
+
+    def cursor(self, cursor_factory=None):
+        return _Cur(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_mesma_consulta_com_literais_diferentes_tem_a_mesma_digital():
+    a = rastreio.normalizar("SELECT * FROM t WHERE id = 10 AND nome = 'Ana'  -- x")
+    b = rastreio.normalizar("SELECT *\n  FROM t\n WHERE id = 99 AND nome = 'D''Ávila'")
+    c = rastreio.normalizar("SELECT * FROM t WHERE id = %s AND nome = %(nome)s")
+
+    assert a == b == c == "SELECT * FROM t WHERE id = ? AND nome = ?"
+
+
+def test_values_de_tamanhos_diferentes_colapsam():
+    dois = rastreio.normalizar("INSERT INTO p (a, b) VALUES (1, 'x'), (2, 'y')")
+    tres = rastreio.normalizar("INSERT INTO p (a, b) VALUES (1, 'x'), (2, 'y'), (3, 'z')")
+
+    assert dois == tres == "INSERT INTO p (a, b) VALUES (?, ?), ..."
+
+
+def test_get_db_cursor_registra_funcao_duracao_e_linhas(monkeypatch):
+    monkeypatch.setattr(database, "get_db_connection", lambda: _Conn())
+    monkeypatch.setattr(database, "release_connection", lambda conn, broken=False: None)
+
+    def listar_relatorios():
+        with database.get_db_cursor() as cur:
+            cur.execute("SELECT * FROM chamadas WHERE turma_id = %s", (1,))
+            cur.execute("SELECT * FROM chamadas WHERE turma_id = %s", (2,))
+
+    listar_relatorios()
+
+    (consulta,) = rastreio.mais_lentas()
+    assert consulta["sql"] == "SELECT * FROM chamadas WHERE turma_id = ?"
+    assert consulta["funcao"] == f"{__name__}.listar_relatorios"
+    assert consulta["execucoes"] == 2
+    assert consulta["linhas_media"] == 3
+
+
+def test_desligado_nao_guarda_nada(monkeypatch):
+    monkeypatch.setattr(rastreio, "_LIGADO", False)
+    monkeypatch.setattr(database, "get_db_connection", lambda: _Conn())
+    monkeypatch.setattr(database, "release_connection", lambda conn, broken=False: None)
+
+    with database.get_db_cursor() as cur:
+        cur.execute("SELECT 1")
+
+    assert rastreio.mais_lentas() == []
+
+
+def test_top_n_por_pior_execucao_ou_por_tempo_total():
+    rastreio.registrar("SELECT a", None, "r.a", 0.050, 1)
+    for _ in range(10):
+        rastreio.registrar("SELECT b", None, "r.b", 0.010, 1)
+    rastreio.registrar("SELECT c", None, "r.c", 0.030, 1)
+
+    assert [c["funcao"] for c in rastreio.mais_lentas("max", 2)] == ["r.a", "r.c"]
+    assert [c["funcao"] for c in rastreio.mais_lentas("total", 1)] == ["r.b"]
+
+
+def test_fora_da_janela_sai_da_visao(monkeypatch):
+    rastreio.registrar("SELECT a", None, "r.a", 0.050, 1)
+    monkeypatch.setattr(rastreio, "JANELA_S", -1)
+
+    assert rastreio.mais_lentas() == []
+
+
+def test_lenta_vai_para_o_log_sem_parametros(caplog):
+    with caplog.at_level(logging.WARNING, logger="scpi.consultas"):
+        rastreio.registrar("SELECT * FROM alunos WHERE ra = %s", ("RA123",), "alunos.buscar", 0.250, 1)
+        rastreio.registrar("SELECT 1", None, "x.y", 0.001, 1)
+
+    (registro,) = caplog.records
+    assert "250.0 ms" in registro.getMessage()
+    assert "alunos.buscar" in registro.getMessage()
+    assert "RA123" not in registro.getMessage()
+
+
+def test_explain_amostrado_so_em_select_e_num_savepoint(monkeypatch):
+    monkeypatch.setattr(rastreio, "EXPLAIN_AMOSTRA", 1.0)
+    conn = _Conn()
+
+    rastreio.registrar("SELECT * FROM chamadas", None, "r.a", 0.5, 1, conn)
+    rastreio.registrar("SELECT * FROM chamadas", None, "r.a", 0.5, 1, conn)  # dentro do intervalo
+    rastreio.registrar("UPDATE chamadas SET status = 'x'", None, "r.b", 0.5, 1, conn)
+
+    assert conn.comandos == [
+        "SAVEPOINT scpi_explain",
+        "EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM chamadas",
+        "ROLLBACK TO SAVEPOINT scpi_explain",
+        "RELEASE SAVEPOINT scpi_explain",
+    ]
+    (consulta,) = [c for c in rastreio.mais_lentas() if c["funcao"] == "r.a"]
+    assert consulta["plano"] == "Seq Scan on chamadas\nBuffers: shared hit=12"
+
+
+def test_explain_que_falha_volta_ao_savepoint(monkeypatch):
+    monkeypatch.setattr(rastreio, "EXPLAIN_AMOSTRA", 1.0)
+    conn = _Conn(explain_falha=True)
+
+    rastreio.registrar("SELECT 1", None, "r.a", 0.5, 1, conn)
+
+    assert conn.comandos[-2:] == ["ROLLBACK TO SAVEPOINT scpi_explain", "RELEASE SAVEPOINT scpi_explain"]
+
+
+def test_explain_analyze_nunca_confirma_efeitos_da_reexecucao(monkeypatch):
+    monkeypatch.setattr(rastreio, "EXPLAIN_AMOSTRA", 1.0)
+    conn = _Conn()
+
+    rastreio.registrar("SELECT pg_notify('jobs', 'x')", None, "r.a", 0.5, 1, conn)
+
+    assert conn.comandos == [
+        "SAVEPOINT scpi_explain",
+        "EXPLAIN (ANALYZE, BUFFERS) SELECT pg_notify('jobs', 'x')",
+        "ROLLBACK TO SAVEPOINT scpi_explain",
+        "RELEASE SAVEPOINT scpi_explain",
+    ]
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT nextval('jobs_id_seq')",
+    "SELECT pg_try_advisory_lock(4815162343)",
+    "SELECT pg_sleep(1)",
+])
+def test_efeito_fora_da_transacao_ganha_explain_sem_analyze(monkeypatch, sql):
+    monkeypatch.setattr(rastreio, "EXPLAIN_AMOSTRA", 1.0)
+    conn = _Conn()
+
+    rastreio.registrar(sql, None, "r.a", 0.5, 1, conn)
+
+    assert conn.comandos[1] == "EXPLAIN " + sql
+
+
+def test_admin_le_as_mais_lentas():
+    from api import app
+    from core.security import get_current_user
+
+    rastreio.registrar("SELECT a", None, "r.a", 0.050, 1)
+    app.dependency_overrides[get_current_user] = lambda: {"sub": "admin@teste.local", "role": "Admin"}
+    try:
+        resposta = TestClient(app).get("/admin/consultas-lentas", params={"ordem": "total"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert corpo["rastreio_ligado"] is True
+    assert corpo["consultas"][0]["funcao"] == "r.a"
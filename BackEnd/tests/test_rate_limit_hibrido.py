@@ -0,0 +1,140 @@
+"""HibridaStorage: contador da janela na memória, descarregado em lote."""
+import time
+from contextlib import contextmanager
+
+import pytest
+
+import core.limiter_storage as limiter_storage
+from core.limiter_storage import HibridaStorage
+
+
+def _storage():
+    return HibridaStorage(descarregar_em_segundo_plano=False)
+
+
+class _Banco:
+    """rate_limit_buckets de mentira: aplica o lote e devolve os totais."""
+
+    def __init__(self):
+        self.linhas = {}
+        self.comandos = 0
+        self.fora = False
+
+    @contextmanager
+    def cursor(self, commit=False, preparar=False):
+        if self.fora:
+            yield None
+            return
+        banco = self
+
+        class _Cur:
+            def execute(self, sql, params):
+                banco.comandos += 1
+                chaves, quantidades, expiracoes = params
+                self.resultado = []
+                for chave, n, expira_s in zip(chaves, quantidades, expiracoes):
+                    count, exp = banco.linhas.get(chave, (0, time.time() + expira_s))
+                    banco.linhas[chave] = (count + n, exp)
+                    self.resultado.append({"key": chave, "count": count + n, "exp": exp})
+
+            def fetchall(self):
+                return self.resultado
+
+        yield _Cur()
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    banco = _Banco()
+    monkeypatch.setattr(limiter_storage, "get_db_cursor", banco.cursor)
+    return banco
+
+
+def test_incr_nao_toca_o_banco(banco):
+    s = _storage()
+
+    assert [s.incr("login:1.2.3.4", 60) for _ in range(3)] == [1, 2, 3]
+    assert banco.comandos == 0
+
+
+def test_descarrega_todas_as_chaves_num_comando(banco):
+    s = _storage()
+    for _ in range(3):
+        s.incr("a", 60)
+    s.incr("b", 60)
+
+    assert s.descarregar() == 2
+    assert banco.comandos == 1
+    assert banco.linhas["a"][0] == 3 and banco.linhas["b"][0] == 1
+    assert s.descarregar() == 0  # nada pendente: nenhum comando
+    assert banco.comandos == 1
+
+
+def test_decide_pelo_total_compartilhado(banco):
+    outro_worker, s = _storage(), _storage()
+    for _ in range(4):
+        outro_worker.incr("login", 60)
+    outro_worker.descarregar()
+
+    s.incr("login", 60)
+    s.descarregar()
+
+    # Depois do descarregamento, este worker vê os 4 do outro + o seu.
+    assert s.incr("login", 60) == 6
+    assert s.get("login") == 6
+
+
+def test_banco_fora_mantem_pendente_para_a_proxima(banco):
+    s = _storage()
+    s.incr("a", 60)
+    s.incr("a", 60)
+    banco.fora = True
+
+    assert s.descarregar() == 0
+    assert s.incr("a", 60) == 3  # fail-open: decide pela memória
+
+    banco.fora = False
+    s.descarregar()
+    assert banco.linhas["a"][0] == 3
+
+
+def test_janela_vencida_recomeca_e_descarta_o_pendente(banco):
+    s = _storage()
+    s.incr("a", 0)
+
+    assert s.descarregar() == 0
+    assert banco.comandos == 0
+    assert s.incr("a", 60) == 1
+
+
+def test_clear_apaga_memoria_e_banco(banco, monkeypatch):
+    apagadas = []
+    monkeypatch.setattr(limiter_storage.PostgresStorage, "clear", lambda self, key: apagadas.append(key))
+    s = _storage()
+    s.incr("a", 60)
+
+    s.clear("a")
+
+    assert apagadas == ["a"]
+    assert s._janelas == {}
+
+
+def test_limiter_usa_o_hibrido_por_padrao():
+    from limits.storage import storage_from_string
+
+    assert isinstance(storage_from_string("scpi-hibrido://"), HibridaStorage)
+
+
+@pytest.mark.usefixtures("pg")
+def test_dois_workers_somam_no_postgres():
+    a, b = _storage(), _storage()
+    a.incr("k-hibrido", 60)
+    a.incr("k-hibrido", 60)
+    b.incr("k-hibrido", 60)
+
+    a.descarregar()
+    b.descarregar()
+
+    assert limiter_storage.PostgresStorage().get("k-hibrido") == 3
+    assert b.get("k-hibrido") == 3
+    assert a.get_expiry("k-hibrido") > time.time()
@@ -14,11 +14,14 @@ import { SafeAreaView } from "react-native-safe-area-context";
 import { Ionicons } from "@expo/vector-icons";
 import { useRouter, useLocalSearchParams } from "expo-router";
 
-import { apiGet, apiPost } from "../../services/api";
+import { apiGet, apiPost, apiStream } from "../../services/api";
 import { useErrorToast } from "../../hooks/useErrorToast";
 import { Colors } from "../../constants/theme";
 import { FloatingMenu } from "../../components/layout/floating-menu";
 
+// Depois de uma falha do stream, o polling segue sozinho por este tempo.
+const STREAM_RETENTATIVA_MS = 30000;
+
 export default function ListaPresenca() {
   const { turma_id, turma_nome } = useLocalSearchParams();
   const router = useRouter();
@@ -37,6 +40,12 @@ export default function ListaPresenca() {
   // segundos com a rede fora. Só a PRIMEIRA falha de cada sequência é
   // reportada; o flag zera no primeiro ciclo que voltar a dar certo.
   const jaAvisouFalhaRef = useRef(false);
+  // Stream SSE da chamada (/chamadas/{id}/eventos). Enquanto ele entrega
+  // eventos, o ciclo de 3s não busca nada; se cair, o polling reassume e só
+  // tenta o stream de novo depois de STREAM_RETENTATIVA_MS.
+  const fecharStreamRef = useRef<(() => void) | null>(null);
+  const streamAoVivoRef = useRef(false);
+  const streamFalhouEmRef = useRef(0);
 
   const pulseAnim = useRef(new Animated.Value(1)).current;
 
@@ -51,9 +60,10 @@ export default function ListaPresenca() {
     return () => pulse.stop();
   }, [pulseAnim]);
 
-  // Ordem importa: pararPolling → carregarStatus → iniciarPolling. Cada um
-  // aparece nas dependências do seguinte, e dependência é lida durante o
-  // render — declarar fora de ordem estoura TDZ.
+  // Ordem importa: pararPolling → aplicarEvento → fecharStream → abrirStream
+  // → carregarStatus → iniciarPolling. Cada um aparece nas dependências do
+  // seguinte, e dependência é lida durante o render — declarar fora de ordem
+  // estoura TDZ.
   const pararPolling = useCallback(() => {
     if (intervalRef.current) {
       clearInterval(intervalRef.current);
@@ -61,10 +71,64 @@ export default function ListaPresenca() {
     }
   }, []);
 
+  // O stream manda o estado das aulas de cada aluno (não delta): aplicar o
+  // mesmo evento duas vezes não muda nada.
+  const aplicarEvento = useCallback((evento: string, dados: any) => {
+    const contadores = (prev: any) => ({
+      ...prev,
+      total_alunos: dados.total_alunos,
+      presentes: dados.presentes,
+      ausentes: dados.ausentes,
+    });
+    if (evento === "estado") {
+      streamAoVivoRef.current = true;
+      chamadaAbertaRef.current = dados.status === "Aberta";
+      setStatusChamada((prev: any) => ({ ...contadores(prev), status: dados.status }));
+      setAlunos((prev) => prev.map((a) => ({ ...a, aulas_presentes: dados.alunos[a.id] ?? [] })));
+    } else if (evento === "presenca") {
+      setStatusChamada(contadores);
+      setAlunos((prev) =>
+        prev.map((a) => (a.id === dados.aluno_id ? { ...a, aulas_presentes: dados.aulas_presentes } : a))
+      );
+    } else if (evento === "fechada") {
+      chamadaAbertaRef.current = false;
+      setStatusChamada((prev: any) => ({ ...prev, status: "Fechada" }));
+      pararPolling();
+    }
+  }, [pararPolling]);
+
+  const fecharStream = useCallback(() => {
+    fecharStreamRef.current?.();
+    fecharStreamRef.current = null;
+    streamAoVivoRef.current = false;
+  }, []);
+
+  const abrirStream = useCallback(async (chamadaId: string) => {
+    if (fecharStreamRef.current) return;
+    if (Date.now() - streamFalhouEmRef.current < STREAM_RETENTATIVA_MS) return;
+    // Reserva o slot antes do await: a batida seguinte não abre um segundo.
+    let fechar: (() => void) | null = null;
+    let encerrado = false;
+    const encerrar = () => {
+      encerrado = true;
+      fechar?.();
+    };
+    fecharStreamRef.current = encerrar;
+    fechar = await apiStream(`/chamadas/${chamadaId}/eventos`, aplicarEvento, (erro: any) => {
+      if (erro) streamFalhouEmRef.current = Date.now();
+      if (fecharStreamRef.current === encerrar) {
+        fecharStreamRef.current = null;
+        streamAoVivoRef.current = false;
+      }
+    });
+    if (encerrado) fechar();
+  }, [aplicarEvento]);
+
   const carregarStatus = useCallback(async () => {
     // O ciclo faz dois requests em série; em rede lenta a próxima batida do
     // intervalo chegaria antes desta terminar e as chamadas se empilhariam.
     if (buscandoRef.current) return;
+    if (streamAoVivoRef.current) return;
     let falhou = false;
     try {
       if (!turma_id) return;
@@ -78,6 +142,7 @@ export default function ListaPresenca() {
         try {
           const listResp = await apiGet(`/chamadas/${statusResp.chamada_id}/alunos`);
           if (listResp && listResp.alunos) setAlunos(listResp.alunos);
+          abrirStream(String(statusResp.chamada_id));
         } catch (e) {
           falhou = true;
           console.log("Erro ao buscar alunos", e);
@@ -88,6 +153,7 @@ export default function ListaPresenca() {
         }
       } else {
         pararPolling();
+        fecharStream();
       }
     } catch (err: any) {
       falhou = true;
@@ -103,7 +169,7 @@ export default function ListaPresenca() {
       buscandoRef.current = false;
       setLoading(false);
     }
-  }, [turma_id, showError, pararPolling]);
+  }, [turma_id, showError, pararPolling, abrirStream, fecharStream]);
 
   const iniciarPolling = useCallback(() => {
     if (intervalRef.current) return;
@@ -113,8 +179,11 @@ export default function ListaPresenca() {
   useEffect(() => {
     carregarStatus();
     iniciarPolling();
-    return pararPolling;
-  }, [carregarStatus, iniciarPolling, pararPolling]);
+    return () => {
+      pararPolling();
+      fecharStream();
+    };
+  }, [carregarStatus, iniciarPolling, pararPolling, fecharStream]);
 
   // Em background o timer do JS segue rodando no Android, queimando rede e
   // bateria numa tela que ninguém está vendo. Ao voltar, buscar antes de
@@ -126,10 +195,11 @@ export default function ListaPresenca() {
         if (chamadaAbertaRef.current) iniciarPolling();
       } else {
         pararPolling();
+        fecharStream();
       }
     });
     return () => sub.remove();
-  }, [carregarStatus, iniciarPolling, pararPolling]);
+  }, [carregarStatus, iniciarPolling, pararPolling, fecharStream]);
 
   const [encerrandoChamada, setEncerrandoChamada] = useState(false);
 
@@ -239,6 +239,73 @@ export async function loginRequest(email, senha) {
   return data;
 }
 
+/**
+ * Abre um stream SSE autenticado (text/event-stream) e repassa cada evento
+ * como `aoEvento(nome, dadosJson)`.
+ *
+ * XMLHttpRequest e não fetch: no React Native o fetch só entrega o corpo
+ * quando a resposta termina; o XHR dispara onprogress com o texto parcial.
+ * `aoTerminar(erro)` roda uma vez quando o servidor encerra (erro null) ou a
+ * conexão cai / volta erro HTTP. Devolve `fechar()`, que não chama aoTerminar.
+ */
+export async function apiStream(endpoint, aoEvento, aoTerminar) {
+  const token = await storage.getItem("access_token");
+  const xhr = new XMLHttpRequest();
+  let lido = 0;
+  let pendente = "";
+  let terminou = false;
+
+  const terminar = (erro) => {
+    if (terminou) return;
+    terminou = true;
+    aoTerminar?.(erro);
+  };
+
+  const consumir = () => {
+    if (terminou || xhr.status < 200 || xhr.status >= 300) return;
+    pendente += xhr.responseText.slice(lido);
+    lido = xhr.responseText.length;
+    let fim;
+    while ((fim = pendente.indexOf("\n\n")) >= 0) {
+      const bloco = pendente.slice(0, fim);
+      pendente = pendente.slice(fim + 2);
+      let nome = "message";
+      const dados = [];
+      for (const linha of bloco.split("\n")) {
+        if (linha.startsWith("event:")) nome = linha.slice(6).trim();
+        else if (linha.startsWith("data:")) dados.push(linha.slice(5).trimStart());
+      }
+      // Bloco sem data: é comentário (batida do servidor).
+      if (!dados.length) continue;
+      try {
+        aoEvento(nome, JSON.parse(dados.join("\n")));
+      } catch (e) {
+        console.log("Evento do stream ignorado", e);
+      }
+    }
+  };
+
+  xhr.open("GET", `${API_URL}${endpoint}`);
+  xhr.setRequestHeader("Accept", "text/event-stream");
+  if (token) xhr.setRequestHeader("Authorization", `Bearer ${token}`);
+  xhr.onprogress = consumir;
+  xhr.onload = () => {
+    consumir();
+    if (xhr.status >= 200 && xhr.status < 300) {
+      terminar(null);
+    } else {
+      terminar(makeApiError(HTTP_STATUS_MESSAGES[xhr.status] || `Erro HTTP ${xhr.status}`, xhr.status, null));
+    }
+  };
+  xhr.onerror = () => terminar(makeApiError("Conexão com o servidor interrompida.", 0, null));
+  xhr.send();
+
+  return () => {
+    terminou = true;
+    xhr.abort();
+  };
+}
+
 // Re-exporta utilitário para que telas possam transformar erros em mensagens amigáveis.
 export { friendlyErrorMessage };
 